@@ -206,6 +206,12 @@ class JSONEncoder(object):
         '{"foo": ["bar", "baz"]}'
 
         """
+        if _pypyjson_encode is not None and self.encoding == 'utf-8':
+            return _pypyjson_encode(o, self.skipkeys, self.ensure_ascii,
+                                    self.check_circular, self.allow_nan,
+                                    self.sort_keys, self.indent,
+                                    self.item_separator, self.key_separator,
+                                    self.default)
         if self.check_circular:
             markers = {}
         else:
@@ -536,3 +542,7 @@ try:
     from _pypyjson import raw_encode_basestring_ascii
 except ImportError:
     pass
+try:
+    from _pypyjson import encode as _pypyjson_encode
+except ImportError:
+    _pypyjson_encode = None
@@ -102,6 +102,7 @@ This module also defines an exception 'error'.
 """
 
 import sys
+import _sre
 import sre_compile
 import sre_parse
 try:
@@ -195,6 +196,7 @@ def compile(pattern, flags=0):
 
 def purge():
     "Clear the regular expression cache"
+    _sre.clear_cache()
     _cache.clear()
     _cache_repl.clear()
 
@@ -226,13 +228,14 @@ _cache_repl = {}
 _pattern_type = type(sre_compile.compile("", 0))
 
 _MAXCACHE = 1000
+_sre_cached_types = (str, unicode)
 
 def _compile(*key):
     # internal: compile pattern
     pattern, flags = key
     bypass_cache = flags & DEBUG
-    if not bypass_cache:
-        cachekey = (type(key[0]),) + key
+    cachekey = (type(key[0]),) + key
+    if not bypass_cache and _cache:
         try:
             p, loc = _cache[cachekey]
             if loc is None or loc == _locale.setlocale(_locale.LC_CTYPE):
@@ -246,7 +249,15 @@ def _compile(*key):
     if not sre_compile.isstring(pattern):
         raise TypeError, "first argument must be string or compiled pattern"
     try:
-        p = sre_compile.compile(pattern, flags)
+        if not bypass_cache and type(pattern) in _sre_cached_types:
+            # PyPy: _sre.compile() compiles the pattern at interp-level,
+            # and keeps the most recently used ones in its own cache,
+            # except the ones that depend on the locale
+            p = _sre.compile(pattern, flags)
+            if not p.flags & LOCALE:
+                return p
+        else:
+            p = sre_compile.compile(pattern, flags)
     except error, v:
         raise error, v # invalid expression
     if not bypass_cache:
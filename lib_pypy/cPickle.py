@@ -625,3 +625,10 @@ def load(f):
 def loads(str):
     f = StringIO(str)
     return Unpickler(f).load()
+
+# Use the interp-level implementation when it is available; the pure
+# Python version above is kept as the fallback.
+try:
+    from _pickle import Pickler, Unpickler, dump, dumps, load, loads
+except ImportError:
+    pass
@@ -45,6 +45,8 @@ PYTHONIOENCODING: Encoding[:errors] used for stdin/stdout/stderr.
 PYPY_IRC_TOPIC: if set to a non-empty value, print a random #pypy IRC
                topic at startup of interactive mode.
 PYPYLOG: If set to a non-empty value, enable logging.
+PYPY_JIT_WARMUP_PROFILE: file where the JIT saves at exit which loops
+               became hot, to trace them at once in the next runs.
 """
 
 try:
@@ -560,6 +562,12 @@ def parse_command_line(argv):
     if os.getenv('PYTHONFAULTHANDLER'):
         run_faulthandler()
 
+    if not options["ignore_environment"]:
+        warmup_profile = os.getenv('PYPY_JIT_WARMUP_PROFILE')
+        if warmup_profile and 'pypyjit' in sys.builtin_module_names:
+            import pypyjit
+            pypyjit.set_warmup_profile(warmup_profile)
+
 ##    if not we_are_translated():
 ##        for key in sorted(options):
 ##            print '%40s: %s' % (key, options[key])
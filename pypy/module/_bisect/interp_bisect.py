@@ -0,0 +1,119 @@
+from rpython.rlib.objectmodel import specialize
+
+from pypy.interpreter.error import oefmt
+from pypy.interpreter.gateway import unwrap_spec
+from pypy.objspace.std.floatobject import W_FloatObject
+from pypy.objspace.std.intobject import W_IntObject
+from pypy.objspace.std.listobject import (
+    W_ListObject, IntegerListStrategy, FloatListStrategy)
+
+
+@specialize.argtype(0)
+def _bisect_unboxed(lst, x, lo, hi, right):
+    while lo < hi:
+        mid = (lo + hi) >> 1
+        if right:
+            if x < lst[mid]:
+                hi = mid
+            else:
+                lo = mid + 1
+        else:
+            if lst[mid] < x:
+                lo = mid + 1
+            else:
+                hi = mid
+    return lo
+
+@specialize.arg(5)
+def _bisect(space, w_a, w_x, lo, w_hi, right):
+    if lo < 0:
+        raise oefmt(space.w_ValueError, "lo must be non-negative")
+    if space.is_none(w_hi):
+        hi = -1
+    else:
+        hi = space.int_w(w_hi)
+    if hi == -1:
+        hi = space.len_w(w_a)
+    if type(w_a) is W_ListObject and hi <= w_a.length():
+        # lists of ints or floats: search directly the unboxed storage
+        if (w_a.strategy is space.fromcache(IntegerListStrategy) and
+                type(w_x) is W_IntObject):
+            return _bisect_unboxed(w_a.getitems_int(), w_x.intval,
+                                   lo, hi, right)
+        if (w_a.strategy is space.fromcache(FloatListStrategy) and
+                type(w_x) is W_FloatObject):
+            return _bisect_unboxed(w_a.getitems_float(), w_x.floatval,
+                                   lo, hi, right)
+    while lo < hi:
+        mid = (lo + hi) >> 1
+        w_litem = space.getitem(w_a, space.newint(mid))
+        if right:
+            if space.is_true(space.lt(w_x, w_litem)):
+                hi = mid
+            else:
+                lo = mid + 1
+        else:
+            if space.is_true(space.lt(w_litem, w_x)):
+                lo = mid + 1
+            else:
+                hi = mid
+    return lo
+
+def _insert(space, w_a, index, w_x):
+    if type(w_a) is W_ListObject:
+        w_a.insert(index, w_x)
+    else:
+        space.call_method(w_a, 'insert', space.newint(index), w_x)
+
+
+@unwrap_spec(lo=int)
+def bisect_left(space, w_a, w_x, lo=0, w_hi=None):
+    """bisect_left(a, x[, lo[, hi]]) -> index
+
+Return the index where to insert item x in list a, assuming a is sorted.
+
+The return value i is such that all e in a[:i] have e < x, and all e in
+a[i:] have e >= x.  So if x already appears in the list, i points just
+before the leftmost x already there.
+
+Optional args lo (default 0) and hi (default len(a)) bound the
+slice of a to be searched."""
+    return space.newint(_bisect(space, w_a, w_x, lo, w_hi, False))
+
+@unwrap_spec(lo=int)
+def bisect_right(space, w_a, w_x, lo=0, w_hi=None):
+    """bisect_right(a, x[, lo[, hi]]) -> index
+
+Return the index where to insert item x in list a, assuming a is sorted.
+
+The return value i is such that all e in a[:i] have e <= x, and all e in
+a[i:] have e > x.  So if x already appears in the list, i points just
+beyond the rightmost x already there
+
+Optional args lo (default 0) and hi (default len(a)) bound the
+slice of a to be searched."""
+    return space.newint(_bisect(space, w_a, w_x, lo, w_hi, True))
+
+@unwrap_spec(lo=int)
+def insort_left(space, w_a, w_x, lo=0, w_hi=None):
+    """insort_left(a, x[, lo[, hi]])
+
+Insert item x in list a, and keep it sorted assuming a is sorted.
+
+If x is already in a, insert it to the left of the leftmost x.
+
+Optional args lo (default 0) and hi (default len(a)) bound the
+slice of a to be searched."""
+    _insert(space, w_a, _bisect(space, w_a, w_x, lo, w_hi, False), w_x)
+
+@unwrap_spec(lo=int)
+def insort_right(space, w_a, w_x, lo=0, w_hi=None):
+    """insort_right(a, x[, lo[, hi]])
+
+Insert item x in list a, and keep it sorted assuming a is sorted.
+
+If x is already in a, insert it to the right of the rightmost x.
+
+Optional args lo (default 0) and hi (default len(a)) bound the
+slice of a to be searched."""
+    _insert(space, w_a, _bisect(space, w_a, w_x, lo, w_hi, True), w_x)
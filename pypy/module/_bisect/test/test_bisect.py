@@ -0,0 +1,75 @@
+class AppTestBisect(object):
+    spaceconfig = dict(usemodules=['_bisect'])
+
+    def test_bisect_left(self):
+        from _bisect import bisect_left
+        for a in [[], [1], [1, 2, 2, 2, 3, 5], [1.5, 2.5, 2.5, 4.5],
+                  ['a', 'b', 'b', 'd'], [(1, 2), (1, 3), (2, 1)]]:
+            for x in a + [0, 2, 2.5, 6, 'c', (1, 3), (3, 0)]:
+                i = bisect_left(a, x)
+                assert all(e < x for e in a[:i])
+                assert all(e >= x for e in a[i:])
+        assert bisect_left([1, 2, 3], 2, 2) == 2
+        assert bisect_left([1, 2, 3], 3, 0, 1) == 1
+        assert bisect_left([1, 2, 3], 3, hi=None) == 2
+        assert bisect_left((1, 2, 3), 2) == 1
+
+    def test_bisect_right(self):
+        from _bisect import bisect_right, bisect
+        assert bisect is bisect_right
+        for a in [[], [1], [1, 2, 2, 2, 3, 5], [1.5, 2.5, 2.5, 4.5],
+                  ['a', 'b', 'b', 'd'], [(1, 2), (1, 3), (2, 1)]]:
+            for x in a + [0, 2, 2.5, 6, 'c', (1, 3), (3, 0)]:
+                i = bisect_right(a, x)
+                assert all(e <= x for e in a[:i])
+                assert all(e > x for e in a[i:])
+        assert bisect_right([1, 2, 3], 2, 0, 1) == 1
+        assert bisect_right([1, 2, 3], 2, lo=2) == 2
+        assert bisect_right(range(10), 4) == 5
+
+    def test_insort(self):
+        from _bisect import insort_left, insort_right, insort
+        from __pypy__ import strategy
+        assert insort is insort_right
+        r = [(i * 7919) % 101 for i in range(100)]
+        for data in [r, [x / 7.0 for x in r]]:
+            for f in [insort_left, insort_right]:
+                l = []
+                for x in data:
+                    f(l, x)
+                assert l == sorted(data)
+                assert strategy(l) in ("IntegerListStrategy",
+                                       "FloatListStrategy")
+        l = [1, 1.0]
+        insort_left(l, 1L)
+        assert l == [1, 1, 1] and type(l[0]) is long
+        insort_right(l, 1.0)
+        assert type(l[3]) is float
+
+    def test_insort_custom_sequence(self):
+        from _bisect import insort
+        class MyList(object):
+            def __init__(self):
+                self.data = []
+            def __len__(self):
+                return len(self.data)
+            def __getitem__(self, i):
+                return self.data[i]
+            def insert(self, i, x):
+                self.data.insert(i, x)
+        l = MyList()
+        for x in [3, 1, 2]:
+            insort(l, x)
+        assert l.data == [1, 2, 3]
+
+    def test_errors(self):
+        from _bisect import bisect_left, insort
+        raises(ValueError, bisect_left, [1, 2], 1, -1)
+        raises(TypeError, bisect_left, 5, 1)
+        raises(IndexError, bisect_left, [1, 2], 5, 0, 10)
+        raises(AttributeError, insort, (1, 2), 1)
+
+    def test_bisect_module(self):
+        import bisect, _bisect
+        assert bisect.bisect is _bisect.bisect
+        assert bisect.insort_left is _bisect.insort_left
@@ -0,0 +1,283 @@
+from rpython.rlib.objectmodel import specialize
+
+from pypy.interpreter.error import oefmt
+from pypy.objspace.std.floatobject import W_FloatObject
+from pypy.objspace.std.intobject import W_IntObject
+from pypy.objspace.std.listobject import (
+    W_ListObject, IntegerListStrategy, FloatListStrategy)
+from pypy.objspace.std.specialisedtupleobject import Cls_ii, Cls_ff, Cls_oo
+
+
+def _check_heap(space, w_heap):
+    if not isinstance(w_heap, W_ListObject):
+        raise oefmt(space.w_TypeError, "heap argument must be a list")
+    return w_heap
+
+def _int_storage(space, w_heap, w_item):
+    """If 'w_heap' is a list of ints and 'w_item' is an int (or None),
+    return the unboxed storage of the list: the heap functions below then
+    work directly on it.  Otherwise, return None."""
+    if w_heap.strategy is space.fromcache(IntegerListStrategy):
+        if w_item is None or type(w_item) is W_IntObject:
+            return w_heap.getitems_int()
+    return None
+
+def _float_storage(space, w_heap, w_item):
+    """Same as _int_storage(), for lists of floats."""
+    if w_heap.strategy is space.fromcache(FloatListStrategy):
+        if w_item is None or type(w_item) is W_FloatObject:
+            return w_heap.getitems_float()
+    return None
+
+# ____________________________________________________________
+# comparison
+
+def _lt(space, w_x, w_y):
+    # fast paths for ints, floats and 2-tuples of them
+    if type(w_x) is W_IntObject and type(w_y) is W_IntObject:
+        return w_x.intval < w_y.intval
+    if type(w_x) is W_FloatObject and type(w_y) is W_FloatObject:
+        return w_x.floatval < w_y.floatval
+    if type(w_x) is Cls_ii and type(w_y) is Cls_ii:
+        if w_x.value0 != w_y.value0:
+            return w_x.value0 < w_y.value0
+        return w_x.value1 < w_y.value1
+    if type(w_x) is Cls_ff and type(w_y) is Cls_ff:
+        if w_x.value0 < w_y.value0:
+            return True
+        if w_y.value0 < w_x.value0:
+            return False
+        # equal or NaN: use the general case
+    elif type(w_x) is Cls_oo and type(w_y) is Cls_oo:
+        # (priority, item) tuples: decide on the priority if possible
+        w_a = w_x.value0
+        w_b = w_y.value0
+        if type(w_a) is W_IntObject and type(w_b) is W_IntObject:
+            if w_a.intval != w_b.intval:
+                return w_a.intval < w_b.intval
+        elif type(w_a) is W_FloatObject and type(w_b) is W_FloatObject:
+            if w_a.floatval < w_b.floatval:
+                return True
+            if w_b.floatval < w_a.floatval:
+                return False
+    # like heapq.cmp_lt(): use '<' if it is defined, and 'not >=' otherwise
+    if space.findattr(w_x, space.newtext('__lt__')) is not None:
+        return space.is_true(space.lt(w_x, w_y))
+    return not space.is_true(space.le(w_y, w_x))
+
+def _lt_check_size(space, w_heap, size, w_x, w_y):
+    result = _lt(space, w_x, w_y)
+    if w_heap.length() != size:
+        raise oefmt(space.w_RuntimeError,
+                    "list changed size during iteration")
+    return result
+
+# ____________________________________________________________
+# the algorithms, on wrapped lists
+
+def _siftdown(space, w_heap, startpos, pos):
+    # Follow the path to the root, moving parents down until finding a
+    # place newitem fits.
+    size = w_heap.length()
+    w_newitem = w_heap.getitem(pos)
+    while pos > startpos:
+        parentpos = (pos - 1) >> 1
+        w_parent = w_heap.getitem(parentpos)
+        if not _lt_check_size(space, w_heap, size, w_newitem, w_parent):
+            break
+        w_heap.setitem(pos, w_parent)
+        pos = parentpos
+    w_heap.setitem(pos, w_newitem)
+
+def _siftup(space, w_heap, pos):
+    # Bubble up the smaller child until hitting a leaf.
+    endpos = w_heap.length()
+    startpos = pos
+    w_newitem = w_heap.getitem(pos)
+    childpos = 2 * pos + 1
+    while childpos < endpos:
+        # Set childpos to index of smaller child.
+        rightpos = childpos + 1
+        if rightpos < endpos:
+            if not _lt_check_size(space, w_heap, endpos,
+                                  w_heap.getitem(childpos),
+                                  w_heap.getitem(rightpos)):
+                childpos = rightpos
+        # Move the smaller child up.
+        w_heap.setitem(pos, w_heap.getitem(childpos))
+        pos = childpos
+        childpos = 2 * pos + 1
+    # The leaf at pos is empty now.  Put newitem there, and bubble it up
+    # to its final resting place (by sifting its parents down).
+    w_heap.setitem(pos, w_newitem)
+    _siftdown(space, w_heap, startpos, pos)
+
+# ____________________________________________________________
+# the same algorithms, on the storage of lists of ints or floats
+
+@specialize.argtype(0)
+def _siftdown_unboxed(lst, startpos, pos):
+    newitem = lst[pos]
+    while pos > startpos:
+        parentpos = (pos - 1) >> 1
+        parent = lst[parentpos]
+        if not newitem < parent:
+            break
+        lst[pos] = parent
+        pos = parentpos
+    lst[pos] = newitem
+
+@specialize.argtype(0)
+def _siftup_unboxed(lst, pos):
+    endpos = len(lst)
+    startpos = pos
+    newitem = lst[pos]
+    childpos = 2 * pos + 1
+    while childpos < endpos:
+        rightpos = childpos + 1
+        if rightpos < endpos and not lst[childpos] < lst[rightpos]:
+            childpos = rightpos
+        lst[pos] = lst[childpos]
+        pos = childpos
+        childpos = 2 * pos + 1
+    lst[pos] = newitem
+    _siftdown_unboxed(lst, startpos, pos)
+
+@specialize.argtype(0)
+def _heappop_unboxed(lst):
+    lastelt = lst.pop()
+    if not lst:
+        return lastelt
+    returnitem = lst[0]
+    lst[0] = lastelt
+    _siftup_unboxed(lst, 0)
+    return returnitem
+
+@specialize.argtype(0)
+def _heapify_unboxed(lst):
+    for i in range(len(lst) // 2 - 1, -1, -1):
+        _siftup_unboxed(lst, i)
+
+# ____________________________________________________________
+# the functions exposed to app-level
+
+def heappush(space, w_heap, w_item):
+    """Push item onto heap, maintaining the heap invariant."""
+    w_heap = _check_heap(space, w_heap)
+    lst = _int_storage(space, w_heap, w_item)
+    if lst is not None:
+        assert isinstance(w_item, W_IntObject)
+        lst.append(w_item.intval)
+        _siftdown_unboxed(lst, 0, len(lst) - 1)
+        return
+    flst = _float_storage(space, w_heap, w_item)
+    if flst is not None:
+        assert isinstance(w_item, W_FloatObject)
+        flst.append(w_item.floatval)
+        _siftdown_unboxed(flst, 0, len(flst) - 1)
+        return
+    w_heap.append(w_item)
+    _siftdown(space, w_heap, 0, w_heap.length() - 1)
+
+def heappop(space, w_heap):
+    """Pop the smallest item off the heap, maintaining the heap invariant."""
+    w_heap = _check_heap(space, w_heap)
+    if w_heap.length() == 0:
+        raise oefmt(space.w_IndexError, "index out of range")
+    lst = _int_storage(space, w_heap, None)
+    if lst is not None:
+        return space.newint(_heappop_unboxed(lst))
+    flst = _float_storage(space, w_heap, None)
+    if flst is not None:
+        return space.newfloat(_heappop_unboxed(flst))
+    w_lastelt = w_heap.pop_end()
+    if w_heap.length() == 0:
+        return w_lastelt
+    w_returnitem = w_heap.getitem(0)
+    w_heap.setitem(0, w_lastelt)
+    _siftup(space, w_heap, 0)
+    return w_returnitem
+
+def heapreplace(space, w_heap, w_item):
+    """Pop and return the current smallest value, and add the new item.
+
+This is more efficient than heappop() followed by heappush(), and can be
+more appropriate when using a fixed-size heap.  Note that the value
+returned may be larger than item!  That constrains reasonable uses of
+this routine unless written as part of a conditional replacement:
+
+    if item > heap[0]:
+        item = heapreplace(heap, item)
+"""
+    w_heap = _check_heap(space, w_heap)
+    if w_heap.length() == 0:
+        raise oefmt(space.w_IndexError, "index out of range")
+    lst = _int_storage(space, w_heap, w_item)
+    if lst is not None:
+        assert isinstance(w_item, W_IntObject)
+        returnitem = lst[0]
+        lst[0] = w_item.intval
+        _siftup_unboxed(lst, 0)
+        return space.newint(returnitem)
+    flst = _float_storage(space, w_heap, w_item)
+    if flst is not None:
+        assert isinstance(w_item, W_FloatObject)
+        freturnitem = flst[0]
+        flst[0] = w_item.floatval
+        _siftup_unboxed(flst, 0)
+        return space.newfloat(freturnitem)
+    w_returnitem = w_heap.getitem(0)
+    w_heap.setitem(0, w_item)
+    _siftup(space, w_heap, 0)
+    return w_returnitem
+
+def heappushpop(space, w_heap, w_item):
+    """Push item on the heap, then pop and return the smallest item
+from the heap. The combined action runs more efficiently than
+heappush() followed by a separate call to heappop()."""
+    w_heap = _check_heap(space, w_heap)
+    if w_heap.length() == 0:
+        return w_item
+    lst = _int_storage(space, w_heap, w_item)
+    if lst is not None:
+        assert isinstance(w_item, W_IntObject)
+        item = w_item.intval
+        if lst[0] < item:
+            returnitem = lst[0]
+            lst[0] = item
+            _siftup_unboxed(lst, 0)
+            return space.newint(returnitem)
+        return w_item
+    flst = _float_storage(space, w_heap, w_item)
+    if flst is not None:
+        assert isinstance(w_item, W_FloatObject)
+        fitem = w_item.floatval
+        if flst[0] < fitem:
+            freturnitem = flst[0]
+            flst[0] = fitem
+            _siftup_unboxed(flst, 0)
+            return space.newfloat(freturnitem)
+        return w_item
+    w_top = w_heap.getitem(0)
+    if not _lt_check_size(space, w_heap, w_heap.length(), w_top, w_item):
+        return w_item
+    w_heap.setitem(0, w_item)
+    _siftup(space, w_heap, 0)
+    return w_top
+
+def heapify(space, w_heap):
+    """Transform list into a heap, in-place, in O(len(heap)) time."""
+    w_heap = _check_heap(space, w_heap)
+    lst = _int_storage(space, w_heap, None)
+    if lst is not None:
+        _heapify_unboxed(lst)
+        return
+    flst = _float_storage(space, w_heap, None)
+    if flst is not None:
+        _heapify_unboxed(flst)
+        return
+    # Transform bottom-up.  The largest index there's any point to
+    # looking at is the largest with a child index in-range, so must
+    # have 2*i + 1 < n, or i < (n-1)/2.
+    for i in range(w_heap.length() // 2 - 1, -1, -1):
+        _siftup(space, w_heap, i)
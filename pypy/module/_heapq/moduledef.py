@@ -0,0 +1,19 @@
+from pypy.interpreter.mixedmodule import MixedModule
+
+
+class Module(MixedModule):
+    """Heap queue algorithm (a.k.a. priority queue).
+
+Heaps are arrays for which a[k] <= a[2*k+1] and a[k] <= a[2*k+2] for
+all k, counting elements from 0.  This module is the fast version of
+the functions of the same name in heapq.py."""
+
+    appleveldefs = {}
+
+    interpleveldefs = {
+        'heappush':     'interp_heapq.heappush',
+        'heappop':      'interp_heapq.heappop',
+        'heapreplace':  'interp_heapq.heapreplace',
+        'heappushpop':  'interp_heapq.heappushpop',
+        'heapify':      'interp_heapq.heapify',
+        }
@@ -0,0 +1,133 @@
+class AppTestHeapq(object):
+    spaceconfig = dict(usemodules=['_heapq'])
+
+    def w_check_invariant(self, heap):
+        for pos, item in enumerate(heap):
+            if pos:
+                assert heap[(pos - 1) >> 1] <= item
+
+    def test_push_pop(self):
+        import _heapq
+        r = [(i * 7919) % 1009 for i in range(50)]
+        for data in [r,
+                     [x / 7.0 for x in r],
+                     [str(x) for x in r],
+                     [(x % 10, i) for i, x in enumerate(r)],
+                     [(x % 10 / 2.0, x / 3.0) for x in r],
+                     [(x % 10, str(i)) for i, x in enumerate(r)]]:
+            heap = []
+            for item in data:
+                _heapq.heappush(heap, item)
+            self.check_invariant(heap)
+            result = []
+            while heap:
+                result.append(_heapq.heappop(heap))
+            assert result == sorted(data)
+
+    def test_heapify(self):
+        import _heapq
+        for size in range(30):
+            r = [(i * 7919) % 101 for i in range(size)]
+            for heap in [r,
+                         [x / 7.0 for x in r],
+                         [(x % 5, i) for i, x in enumerate(r)],
+                         [str(x) for x in r]]:
+                _heapq.heapify(heap)
+                self.check_invariant(heap)
+
+    def test_replace_and_pushpop(self):
+        import _heapq
+        for heap, item, small in [([1, 5, 3], 4, 0),
+                                  ([1.5, 5.5, 3.5], 4.5, 0.5),
+                                  (['b', 'f', 'd'], 'e', 'a')]:
+            _heapq.heapify(heap)
+            smallest = heap[0]
+            assert _heapq.heapreplace(heap, item) == smallest
+            self.check_invariant(heap)
+            assert _heapq.heappushpop(heap, small) == small
+            smallest = heap[0]
+            assert _heapq.heappushpop(heap, item) == smallest
+            self.check_invariant(heap)
+        assert _heapq.heappushpop([], 5) == 5
+        heap = [3, 5]
+        assert _heapq.heapreplace(heap, 7) == 3
+        assert heap == [5, 7]
+        assert _heapq.heappushpop(heap, 6) == 5
+        assert heap == [6, 7]
+
+    def test_mixed_types(self):
+        import _heapq
+        heap = [3, 1.5, 2, 10L, 0.5]
+        _heapq.heapify(heap)
+        self.check_invariant(heap)
+        heap = [1, 2, 3]
+        _heapq.heappush(heap, 1.5)
+        _heapq.heappush(heap, 'x')
+        assert [_heapq.heappop(heap) for i in range(5)] == [1, 1.5, 2, 3, 'x']
+
+    def test_nan(self):
+        import _heapq
+        nan = float('nan')
+        heap = [(nan, 1), (nan, 0)]
+        _heapq.heapify(heap)
+        assert heap[0][1] == 0
+        heap = [nan, 1.5]
+        _heapq.heappush(heap, 0.5)
+        x = _heapq.heappop(heap)
+        assert x != x       # like on a list of objects
+
+    def test_strategy(self):
+        import _heapq
+        from __pypy__ import strategy
+        heap = []
+        for i in [5, 2, 8, 1]:
+            _heapq.heappush(heap, i)
+        assert strategy(heap) == "IntegerListStrategy"
+        assert _heapq.heappop(heap) == 1
+        assert strategy(heap) == "IntegerListStrategy"
+        heap = [2.5, 1.5, 3.5]
+        _heapq.heapify(heap)
+        assert _heapq.heapreplace(heap, 0.5) == 1.5
+        assert strategy(heap) == "FloatListStrategy"
+        heap = range(10, 0, -1)
+        _heapq.heapify(heap)
+        assert heap[0] == 1
+        self.check_invariant(heap)
+
+    def test_lt_only(self):
+        import _heapq
+        class LtOnly(object):
+            def __init__(self, x):
+                self.x = x
+            def __lt__(self, other):
+                return self.x < other.x
+        class LeOnly:
+            def __init__(self, x):
+                self.x = x
+            def __le__(self, other):
+                return self.x <= other.x
+        for cls in [LtOnly, LeOnly]:
+            heap = []
+            for i in [5, 3, 9, 1, 4]:
+                _heapq.heappush(heap, cls(i))
+            assert [_heapq.heappop(heap).x for i in range(5)] == [1, 3, 4, 5, 9]
+
+    def test_errors(self):
+        import _heapq
+        raises(TypeError, _heapq.heappush, (), 1)
+        raises(TypeError, _heapq.heappop, None)
+        raises(TypeError, _heapq.heapify, (3, 2))
+        raises(IndexError, _heapq.heappop, [])
+        raises(IndexError, _heapq.heapreplace, [], 1)
+        class Bad(object):
+            def __lt__(self, other):
+                del heap[:]
+                return True
+        heap = [Bad(), Bad()]
+        raises(RuntimeError, _heapq.heappush, heap, Bad())
+
+    def test_heapq_module(self):
+        import heapq, _heapq
+        assert heapq.heappush is _heapq.heappush
+        assert heapq.nsmallest(3, [5, 1, 4, 2, 3]) == [1, 2, 3]
+        assert heapq.nlargest(2, [5.5, 1.5, 4.5]) == [5.5, 4.5]
@@ -18,10 +18,13 @@ from pypy.module._io.interp_iobase import (
     W_IOBase, DEFAULT_BUFFER_SIZE, convert_size, trap_eintr,
     check_readable_w, check_writable_w, check_seekable_w)
 from pypy.module._io.interp_io import W_BlockingIOError
+from pypy.module._io.interp_fileio import W_FileIO
 from rpython.rlib import rthread
 
 STATE_ZERO, STATE_OK, STATE_DETACHED = range(3)
 
+HAVE_WRITEV = hasattr(rposix, 'writev')
+
 
 def make_write_blocking_error(space, written):
     # XXX CPython reads 'errno' here.  I *think* it doesn't make sense,
@@ -92,6 +95,9 @@ class W_BufferedIOBase(W_IOBase):
     def readinto_w(self, space, w_buffer):
         return self._readinto(space, w_buffer, "read")
 
+    def readinto1_w(self, space, w_buffer):
+        return self._readinto(space, w_buffer, "read1")
+
     def _readinto(self, space, w_buffer, methodname):
         rwbuffer = space.writebuf_w(w_buffer)
         length = rwbuffer.getlength()
@@ -112,6 +118,7 @@ W_BufferedIOBase.typedef = TypeDef(
     write = interp2app(W_BufferedIOBase.write_w),
     detach = interp2app(W_BufferedIOBase.detach_w),
     readinto = interp2app(W_BufferedIOBase.readinto_w),
+    readinto1 = interp2app(W_BufferedIOBase.readinto1_w),
 )
 
 class BufferedMixin:
@@ -370,6 +377,51 @@ class BufferedMixin:
     def _raw_write(self, space, start, end):
         return self._write(space, self.buffer[start:end])
 
+    def _writev_unlocked(self, space, data):
+        """Write the pending bytes of the buffer followed by 'data' with a
+        single writev() system call, if the raw stream is a FileIO.  Returns
+        the number of bytes of 'data' written; the caller must flush the
+        buffer as usual if some of it is left."""
+        if not HAVE_WRITEV or len(data) <= self.buffer_size:
+            return 0
+        if (self.write_end == -1 or self.write_pos == self.write_end or
+                self.pos != self.write_end or
+                (self.readable and self.read_end != -1)):
+            return 0
+        w_raw = self.w_raw
+        if space.type(w_raw) is not space.gettypeobject(W_FileIO.typedef):
+            return 0
+        assert isinstance(w_raw, W_FileIO)
+        # First, rewind
+        rewind = self._raw_offset() + (self.pos - self.write_pos)
+        if rewind != 0:
+            self._raw_seek(space, -rewind, 1)
+            self.raw_pos -= rewind
+
+        pending = self.buffer[self.write_pos:self.write_end]
+        while True:
+            try:
+                n = w_raw.writev(space, [pending, data])
+            except OperationError as e:
+                if trap_eintr(space, e):
+                    continue  # try again
+                raise
+            else:
+                break
+        if n < 0:
+            # Non-blocking stream would have blocked: the caller's
+            # flush will report it.
+            return 0
+        if self.abs_pos != -1:
+            self.abs_pos += n
+        if n < len(pending):
+            self.write_pos += n
+            self.raw_pos = self.write_pos
+            return 0
+        self.raw_pos = self.write_end
+        self._writer_reset_buf()
+        return n - len(pending)
+
     def detach_w(self, space):
         self._check_init(space)
         space.call_method(self, "flush")
@@ -481,10 +533,74 @@ class BufferedMixin:
             self.pos = endpos
             return space.newbytes(data)
 
+    def readinto_w(self, space, w_buffer):
+        return self._readinto_generic(space, w_buffer, False)
+
+    def readinto1_w(self, space, w_buffer):
+        return self._readinto_generic(space, w_buffer, True)
+
+    def _readinto_generic(self, space, w_buffer, read_once):
+        self._check_init(space)
+        self._check_closed(space, "readinto of closed file")
+        rwbuffer = space.writebuf_w(w_buffer)
+        length = rwbuffer.getlength()
+
+        with self.lock:
+            # First copy what we have in the current buffer
+            have = self._readahead()
+            if have >= length:
+                self.output_slice(space, rwbuffer, 0,
+                                  self.buffer[self.pos:self.pos + length])
+                self.pos += length
+                return space.newint(length)
+            written = 0
+            if have > 0:
+                self.output_slice(space, rwbuffer, 0,
+                                  self.buffer[self.pos:self.pos + have])
+                self.pos += have
+                written = have
+
+            # Flush the write buffer if necessary
+            if self.writable:
+                self._flush_and_rewind_unlocked(space)
+            self._reader_reset_buf()
+            self.pos = 0
+
+            while written < length:
+                remaining = length - written
+                try:
+                    if remaining > self.buffer_size:
+                        # Read directly into the caller's buffer, without
+                        # going through our own buffer
+                        size = self._raw_read(space, rwbuffer, written,
+                                              remaining)
+                    elif read_once and written > 0:
+                        # In readinto1() mode, only fill the buffer if we
+                        # have nothing to return yet
+                        break
+                    else:
+                        size = self._fill_buffer(space)
+                        if size > remaining:
+                            size = remaining
+                        self.output_slice(space, rwbuffer, written,
+                                          self.buffer[self.pos:self.pos + size])
+                        self.pos += size
+                except BlockingIOError:
+                    if written == 0:
+                        return space.w_None
+                    break
+                if size == 0:
+                    break
+                written += size
+                if read_once:
+                    break
+            return space.newint(written)
+
     def _read_all(self, space):
         "Read all the file, don't update the cache"
         # Must run with the lock held!
         builder = StringBuilder()
+        first = None
         # First copy what we have in the current buffer
         current_size = self._readahead()
         data = None
@@ -508,10 +624,21 @@ class BufferedMixin:
             size = len(data)
             if size == 0:
                 break
-            builder.append(data)
-            current_size += size
             if self.abs_pos != -1:
                 self.abs_pos += size
+            if current_size == 0:
+                # usually all the file is read by the first call: no need
+                # to copy it into the builder, unless more data follows
+                first = data
+                current_size = size
+                continue
+            if first is not None:
+                builder.append(first)
+                first = None
+            builder.append(data)
+            current_size += size
+        if first is not None:
+            return space.newbytes(first)
         return space.newbytes(builder.build())
 
     def _raw_read(self, space, buffer, start, length):
@@ -724,6 +851,10 @@ class BufferedMixin:
                     self.write_end = self.pos
                 return space.newint(size)
 
+            # Try to write the current buffer and the data together
+            written = self._writev_unlocked(space, data)
+            assert written >= 0
+
             # First write the current buffer
             try:
                 self._writer_flush_unlocked(space)
@@ -773,8 +904,7 @@ class BufferedMixin:
                 self.raw_pos -= offset
 
             # Then write buf itself. At this point the buffer has been emptied
-            remaining = size
-            written = 0
+            remaining = size - written
             while remaining > self.buffer_size:
                 try:
                     n = self._write(space, data[written:])
@@ -848,6 +978,8 @@ W_BufferedReader.typedef = TypeDef(
     read = interp2app(W_BufferedReader.read_w),
     peek = interp2app(W_BufferedReader.peek_w),
     read1 = interp2app(W_BufferedReader.read1_w),
+    readinto = interp2app(W_BufferedReader.readinto_w),
+    readinto1 = interp2app(W_BufferedReader.readinto1_w),
     raw = interp_attrproperty_w("w_raw", cls=W_BufferedReader),
     readline = interp2app(W_BufferedReader.readline_w),
 
@@ -962,7 +1094,8 @@ class W_BufferedRWPair(W_BufferedIOBase):
     needs_to_finalize = False
 
     # forward to reader
-    for method in ['read', 'peek', 'read1', 'readinto', 'readable']:
+    for method in ['read', 'peek', 'read1', 'readinto', 'readinto1',
+                   'readable']:
         locals()[method + '_w'] = make_forwarding_method(
             method, reader=True)
 
@@ -1002,7 +1135,8 @@ class W_BufferedRWPair(W_BufferedIOBase):
         return space.getattr(self.w_writer, space.newtext("closed"))
 
 methods = dict((method, interp2app(getattr(W_BufferedRWPair, method + '_w')))
-               for method in ['read', 'peek', 'read1', 'readinto', 'readable',
+               for method in ['read', 'peek', 'read1', 'readinto', 'readinto1',
+                              'readable',
                               'write', 'flush', 'writable',
                               'close',
                               'isatty'])
@@ -1045,6 +1179,8 @@ W_BufferedRandom.typedef = TypeDef(
     read = interp2app(W_BufferedRandom.read_w),
     peek = interp2app(W_BufferedRandom.peek_w),
     read1 = interp2app(W_BufferedRandom.read1_w),
+    readinto = interp2app(W_BufferedRandom.readinto_w),
+    readinto1 = interp2app(W_BufferedRandom.readinto1_w),
     readline = interp2app(W_BufferedRandom.readline_w),
 
     write = interp2app(W_BufferedRandom.write_w),
@@ -4,6 +4,7 @@ from pypy.interpreter.error import (
     OperationError, oefmt, wrap_oserror, wrap_oserror2)
 from rpython.rlib.objectmodel import keepalive_until_here
 from rpython.rlib.rarithmetic import r_longlong
+from rpython.rlib import rposix
 from rpython.rlib.rposix import c_read, get_saved_errno
 from rpython.rlib.rstring import StringBuilder
 from rpython.rtyper.lltypesystem import lltype, rffi
@@ -348,6 +349,19 @@ class W_FileIO(W_RawIOBase):
 
         return space.newint(n)
 
+    def writev(self, space, buffers):
+        """Interp-level only: writes the strings of the list 'buffers' with
+        a single system call.  Returns -1 if it would block."""
+        self._check_closed(space)
+        self._check_writable(space)
+        try:
+            return rposix.writev(self.fd, buffers)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return -1
+            raise wrap_oserror(space, e,
+                               w_exception_class=space.w_IOError)
+
     def read_w(self, space, w_size=None):
         self._check_closed(space)
         self._check_readable(space)
@@ -410,7 +424,9 @@ class W_FileIO(W_RawIOBase):
         self._check_readable(space)
         total = 0
 
-        builder = StringBuilder()
+        # the first chunk is usually the whole file: don't copy it again
+        result = None
+        builder = None
         while True:
             newsize = int(new_buffersize(self.fd, total))
 
@@ -430,9 +446,19 @@ class W_FileIO(W_RawIOBase):
 
             if not chunk:
                 break
-            builder.append(chunk)
+            if result is None:
+                result = chunk
+            else:
+                if builder is None:
+                    builder = StringBuilder(total + len(chunk))
+                    builder.append(result)
+                builder.append(chunk)
             total += len(chunk)
-        return space.newbytes(builder.build())
+        if builder is not None:
+            result = builder.build()
+        elif result is None:
+            result = ""
+        return space.newbytes(result)
 
     if sys.platform == "win32":
         def _truncate(self, size):
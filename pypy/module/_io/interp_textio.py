@@ -13,7 +13,10 @@ from rpython.rlib.rbigint import rbigint
 from rpython.rlib.rstring import StringBuilder
 from rpython.rlib.rutf8 import (check_utf8, next_codepoint_pos,
                                 codepoints_in_utf8, codepoints_in_utf8,
-                                Utf8StringBuilder)
+                                Utf8StringBuilder, CheckError)
+from rpython.rlib import runicode
+from pypy.interpreter.unicodehelper import (
+    str_decode_ascii, str_decode_latin_1, str_decode_utf8)
 
 
 STATE_ZERO, STATE_OK, STATE_DETACHED = range(3)
@@ -25,30 +28,83 @@ SEEN_ALL  = SEEN_CR | SEEN_LF | SEEN_CRLF
 
 _WINDOWS = sys.platform == 'win32'
 
+def make_newlines_dict(space):
+    # the values of the 'newlines' attribute, for each 'seennl'
+    return {
+        SEEN_CR: space.newutf8("\r", 1),
+        SEEN_LF: space.newutf8("\n", 1),
+        SEEN_CRLF: space.newutf8("\r\n", 2),
+        SEEN_CR | SEEN_LF: space.newtuple(
+            [space.newutf8("\r", 1),
+             space.newutf8("\n", 1)]),
+        SEEN_CR | SEEN_CRLF: space.newtuple(
+            [space.newutf8("\r", 1),
+             space.newutf8("\r\n", 2)]),
+        SEEN_LF | SEEN_CRLF: space.newtuple(
+            [space.newutf8("\n", 1),
+             space.newutf8("\r\n", 2)]),
+        SEEN_CR | SEEN_LF | SEEN_CRLF: space.newtuple(
+            [space.newutf8("\r", 1),
+             space.newutf8("\n", 1),
+             space.newutf8("\r\n", 2)]),
+        }
+
+def translate_newlines(output, translate, seennl):
+    """Record which newlines are in 'output', and replace \r\n and \r
+    with \n if 'translate' is true, all in one pass.  Returns the new
+    output, the new 'seennl', and the number of characters removed."""
+    crpos = output.find('\r')
+    if crpos < 0:
+        # If no \r, quick scan for a possible "\n" character.
+        # (there's nothing else to be done, even when in translation mode)
+        if not (seennl & SEEN_LF) and output.find('\n') >= 0:
+            seennl |= SEEN_LF
+        return output, seennl, 0
+    if not (seennl & SEEN_LF) and output.find('\n', 0, crpos) >= 0:
+        seennl |= SEEN_LF
+    if translate:
+        builder = StringBuilder(len(output))
+    else:
+        builder = None
+    removed = 0
+    start = 0       # the characters before 'start' are in the builder
+    while crpos >= 0:
+        end = crpos + 1
+        if end < len(output) and output[end] == '\n':
+            seennl |= SEEN_CRLF
+            end += 1
+            if builder is not None:
+                builder.append_slice(output, start, crpos)
+                start = crpos + 1      # keep the \n
+                removed += 1
+        else:
+            seennl |= SEEN_CR
+            if builder is not None:
+                builder.append_slice(output, start, crpos)
+                builder.append('\n')
+                start = end
+        if builder is None and seennl == SEEN_ALL:
+            break
+        crpos = output.find('\r', end)
+        if not (seennl & SEEN_LF):
+            stop = crpos
+            if stop < 0:
+                stop = len(output)
+            if output.find('\n', end, stop) >= 0:
+                seennl |= SEEN_LF
+    if builder is not None:
+        builder.append_slice(output, start, len(output))
+        output = builder.build()
+    return output, seennl, removed
+
+
 class W_IncrementalNewlineDecoder(W_Root):
     seennl = 0
     pendingcr = False
     w_decoder = None
 
     def __init__(self, space):
-        self.w_newlines_dict = {
-            SEEN_CR: space.newutf8("\r", 1),
-            SEEN_LF: space.newutf8("\n", 1),
-            SEEN_CRLF: space.newutf8("\r\n", 2),
-            SEEN_CR | SEEN_LF: space.newtuple(
-                [space.newutf8("\r", 1),
-                 space.newutf8("\n", 1)]),
-            SEEN_CR | SEEN_CRLF: space.newtuple(
-                [space.newutf8("\r", 1),
-                 space.newutf8("\r\n", 2)]),
-            SEEN_LF | SEEN_CRLF: space.newtuple(
-                [space.newutf8("\n", 1),
-                 space.newutf8("\r\n", 2)]),
-            SEEN_CR | SEEN_LF | SEEN_CRLF: space.newtuple(
-                [space.newutf8("\r", 1),
-                 space.newutf8("\n", 1),
-                 space.newutf8("\r\n", 2)]),
-            }
+        self.w_newlines_dict = make_newlines_dict(space)
 
     @unwrap_spec(translate=int)
     def descr_init(self, space, w_decoder, translate, w_errors=None):
@@ -103,51 +159,9 @@ class W_IncrementalNewlineDecoder(W_Root):
 
         # Record which newlines are read and do newline translation if
         # desired, all in one pass.
-        seennl = self.seennl
-
-        if output.find('\r') < 0:
-            # If no \r, quick scan for a possible "\n" character.
-            # (there's nothing else to be done, even when in translation mode)
-            if output.find('\n') >= 0:
-                seennl |= SEEN_LF
-                # Finished: we have scanned for newlines, and none of them
-                # need translating.
-        elif not self.translate:
-            i = 0
-            while i < len(output):
-                if seennl == SEEN_ALL:
-                    break
-                c = output[i]
-                i += 1
-                if c == '\n':
-                    seennl |= SEEN_LF
-                elif c == '\r':
-                    if i < len(output) and output[i] == '\n':
-                        seennl |= SEEN_CRLF
-                        i += 1
-                    else:
-                        seennl |= SEEN_CR
-        elif output.find('\r') >= 0:
-            # Translate!
-            builder = StringBuilder(len(output))
-            i = 0
-            while i < output_len:
-                c = output[i]
-                i += 1
-                if c == '\n':
-                    seennl |= SEEN_LF
-                elif c == '\r':
-                    if i < len(output) and output[i] == '\n':
-                        seennl |= SEEN_CRLF
-                        i += 1
-                    else:
-                        seennl |= SEEN_CR
-                    builder.append('\n')
-                    continue
-                builder.append(c)
-            output = builder.build()
-
-        self.seennl |= seennl
+        output, seennl, _ = translate_newlines(output, self.translate,
+                                               self.seennl)
+        self.seennl = seennl
         lgt = check_utf8(output, True)
         return space.newutf8(output, lgt)
 
@@ -292,6 +306,192 @@ class PositionSnapshot:
         self.input = input
 
 
+class TextDecoder(object):
+    """The decoder of a TextIOWrapper: the incremental decoder of the
+    codec, wrapped in an IncrementalNewlineDecoder for universal newlines.
+    decode() returns the decoded text as (utf8, length)."""
+
+    def decode(self, space, input, final):
+        raise NotImplementedError
+
+    def getstate(self, space):
+        """Returns (buffered bytes, flags), like the decoder's getstate()."""
+        raise NotImplementedError
+
+    def setstate(self, space, buffer, flags):
+        raise NotImplementedError
+
+    def reset(self, space):
+        raise NotImplementedError
+
+    def newlines_get_w(self, space):
+        raise NotImplementedError
+
+
+class AppLevelDecoder(TextDecoder):
+    """Calls the methods of an app-level decoder object."""
+
+    def __init__(self, w_decoder):
+        self.w_decoder = w_decoder
+
+    def decode(self, space, input, final):
+        w_decoded = space.call_method(self.w_decoder, "decode",
+                                      space.newbytes(input),
+                                      space.newbool(final))
+        check_decoded(space, w_decoded)
+        return space.utf8_len_w(w_decoded)
+
+    def getstate(self, space):
+        w_state = space.call_method(self.w_decoder, "getstate")
+        w_buffer, w_flags = space.unpackiterable(w_state, 2)
+        return space.bytes_w(w_buffer), space.int_w(w_flags)
+
+    def setstate(self, space, buffer, flags):
+        space.call_method(self.w_decoder, "setstate",
+                          space.newtuple([space.newbytes(buffer),
+                                          space.newint(flags)]))
+
+    def reset(self, space):
+        space.call_method(self.w_decoder, "reset")
+
+    def newlines_get_w(self, space):
+        return space.findattr(self.w_decoder, space.newtext("newlines"))
+
+
+DECODE_UTF8, DECODE_LATIN1, DECODE_ASCII = range(3)
+
+BUILTIN_CODECS = {
+    'utf-8': DECODE_UTF8,
+    'iso8859-1': DECODE_LATIN1,
+    'ascii': DECODE_ASCII,
+}
+
+class BuiltinDecoder(TextDecoder):
+    """Decodes utf-8, latin-1 and ascii, and handles the universal
+    newlines, without calling app-level decoder objects.  It gives the
+    same results and states as the codec's incremental decoder (inside
+    an IncrementalNewlineDecoder if 'universal')."""
+
+    def __init__(self, space, kind, errors, universal, translate):
+        self.kind = kind
+        self.errors = errors
+        self.errorhandler = space.fromcache(
+            interp_codecs.CodecState).decode_error_handler
+        self.universal = universal
+        self.translate = translate
+        self.w_newlines_dict = make_newlines_dict(space)
+        self.pending = ""       # the bytes of an incomplete utf-8 character
+        self.pendingcr = False
+        self.seennl = 0
+
+    def decode(self, space, input, final):
+        if self.kind == DECODE_UTF8:
+            output, length = self._decode_utf8(input, final)
+        elif self.kind == DECODE_LATIN1:
+            output, _, length = str_decode_latin_1(
+                input, self.errors, final, self.errorhandler)
+        else:
+            output, _, length = str_decode_ascii(
+                input, self.errors, final, self.errorhandler)
+        if not self.universal:
+            return output, length
+
+        # like W_IncrementalNewlineDecoder.decode_w()
+        if self.pendingcr and (final or length):
+            output = '\r' + output
+            length += 1
+            self.pendingcr = False
+        if not final and length > 0:
+            last = len(output) - 1
+            assert last >= 0
+            if output[last] == '\r':
+                output = output[:last]
+                self.pendingcr = True
+                length -= 1
+        if length == 0:
+            return "", 0
+        output, self.seennl, removed = translate_newlines(
+            output, self.translate, self.seennl)
+        return output, length - removed
+
+    def _decode_utf8(self, input, final):
+        if self.pending:
+            input = self.pending + input
+        # an incomplete character at the end waits for more input
+        end = len(input)
+        if not final:
+            end = _utf8_incomplete_start(input)
+        assert end >= 0
+        try:
+            length = check_utf8(input, True, 0, end)
+        except CheckError:
+            # errors or odd cases: decode like codecs.utf_8_decode()
+            output, end, length = str_decode_utf8(
+                input, self.errors, final, self.errorhandler)
+        else:
+            output = input
+            if end < len(input):
+                output = input[:end]
+        self.pending = input[end:]
+        return output, length
+
+    def getstate(self, space):
+        # the codecs themselves have no flags, only IncrementalNewlineDecoder
+        flags = 0
+        if self.universal and self.pendingcr:
+            flags = 1
+        return self.pending, flags
+
+    def setstate(self, space, buffer, flags):
+        if self.universal:
+            self.pendingcr = bool(flags & 1)
+        if self.kind == DECODE_UTF8:
+            self.pending = buffer
+
+    def reset(self, space):
+        self.pending = ""
+        self.pendingcr = False
+        self.seennl = 0
+
+    def newlines_get_w(self, space):
+        if not self.universal:
+            return None
+        return self.w_newlines_dict.get(self.seennl, space.w_None)
+
+
+def _utf8_incomplete_start(s):
+    # the position of the incomplete character at the end of 's', if any
+    end = len(s)
+    i = end - 1
+    while i >= 0 and i >= end - 3:
+        ordch = ord(s[i])
+        if ordch < 0x80:
+            break
+        if ordch >= 0xC0:
+            n = ord(runicode._utf8_code_length[ordch - 0x80])
+            if n > 0 and i + n > end:
+                return i
+            break
+        i -= 1
+    return end
+
+def make_decoder(space, w_codec, w_errors, universal, translate):
+    w_name = space.findattr(w_codec, space.newtext("name"))
+    if (w_name is not None and space.isinstance_w(w_name, space.w_text) and
+            space.isinstance_w(w_errors, space.w_text)):
+        name = space.text_w(w_name)
+        if name in BUILTIN_CODECS:
+            return BuiltinDecoder(space, BUILTIN_CODECS[name],
+                                  space.text_w(w_errors), universal,
+                                  translate)
+    w_decoder = space.call_method(w_codec, "incrementaldecoder", w_errors)
+    if universal:
+        w_decoder = space.call_function(
+            space.gettypeobject(W_IncrementalNewlineDecoder.typedef),
+            w_decoder, space.newbool(translate))
+    return AppLevelDecoder(w_decoder)
+
+
 class DecodeBuffer(object):
     def __init__(self, text=None, ulen=-1):
         # self.text is a valid utf-8 string
@@ -304,8 +504,11 @@ class DecodeBuffer(object):
 
     def set(self, space, w_decoded):
         check_decoded(space, w_decoded)
-        self.ulen = space.len_w(w_decoded)
-        self.text = space.utf8_w(w_decoded)
+        self.set_utf8(space.utf8_w(w_decoded), space.len_w(w_decoded))
+
+    def set_utf8(self, text, ulen):
+        self.ulen = ulen
+        self.text = text
         self.pos = 0
         self.upos = 0
 
@@ -390,8 +593,8 @@ class DecodeBuffer(object):
                 if scanned >= limit:
                     return False
                 if self.exhausted():
-                    # don't split potential \r\n
-                    return False
+                    # the decoder never splits \r\n, so this \r ends a line
+                    return True
                 ch = self.text[self.pos]
                 if ch == '\n':
                     self._advance_codepoint()
@@ -444,9 +647,19 @@ class DecodeBuffer(object):
                 return False
 
         if limit < 0:
-            limit = sys.maxint
-        # XXX it might be better to search for the marker quickly, then compute
-        # the new upos afterwards.
+            # search for the marker quickly, then compute the new upos
+            pos = self.pos
+            assert pos >= 0
+            end = self.text.find(marker, pos)
+            if end >= 0:
+                end += 1
+                found = True
+            else:
+                end = len(self.text)
+                found = False
+            self.upos += codepoints_in_utf8(self.text, pos, end)
+            self.pos = end
+            return found
         scanned = 0
         while scanned < limit:
             # don't use next_char here, since that computes a slice etc
@@ -478,7 +691,7 @@ class W_TextIOWrapper(W_TextIOBase):
         W_TextIOBase.__init__(self, space)
         self.state = STATE_ZERO
         self.w_encoder = None
-        self.w_decoder = None
+        self.decoder = None     # a TextDecoder
 
         self.decoded = DecodeBuffer()
         self.pending_bytes = None   # list of bytes objects waiting to be
@@ -533,12 +746,9 @@ class W_TextIOWrapper(W_TextIOBase):
         if space.is_true(space.call_method(w_buffer, "readable")):
             w_codec = interp_codecs.lookup_codec(space,
                                                  space.text_w(self.w_encoding))
-            self.w_decoder = space.call_method(w_codec,
-                                               "incrementaldecoder", w_errors)
-            if self.readuniversal:
-                self.w_decoder = space.call_function(
-                    space.gettypeobject(W_IncrementalNewlineDecoder.typedef),
-                    self.w_decoder, space.newbool(self.readtranslate))
+            self.decoder = make_decoder(space, w_codec, w_errors,
+                                        self.readuniversal,
+                                        self.readtranslate)
 
         # build the encoder object
         if space.is_true(space.call_method(w_buffer, "writable")):
@@ -613,9 +823,9 @@ class W_TextIOWrapper(W_TextIOBase):
 
     def newlines_get_w(self, space):
         self._check_attached(space)
-        if self.w_decoder is None:
+        if self.decoder is None:
             return space.w_None
-        return space.findattr(self.w_decoder, space.newtext("newlines"))
+        return self.decoder.newlines_get_w(space)
 
     def name_get_w(self, space):
         self._check_attached(space)
@@ -655,18 +865,15 @@ class W_TextIOWrapper(W_TextIOBase):
         The entire input chunk is sent to the decoder, though some of it may
         remain buffered in the decoder, yet to be converted."""
 
-        if not self.w_decoder:
+        if not self.decoder:
             raise oefmt(space.w_IOError, "not readable")
 
         if self.telling:
             # To prepare for tell(), we need to snapshot a point in the file
             # where the decoder's input buffer is empty.
-            w_state = space.call_method(self.w_decoder, "getstate")
             # Given this, we know there was a valid snapshot point
             # len(dec_buffer) bytes ago with decoder state (b'', dec_flags).
-            w_dec_buffer, w_dec_flags = space.unpackiterable(w_state, 2)
-            dec_buffer = space.bytes_w(w_dec_buffer)
-            dec_flags = space.int_w(w_dec_flags)
+            dec_buffer, dec_flags = self.decoder.getstate(space)
         else:
             dec_buffer = None
             dec_flags = 0
@@ -680,17 +887,17 @@ class W_TextIOWrapper(W_TextIOBase):
                   "object not '%T'"
             raise oefmt(space.w_TypeError, msg, w_input)
 
-        eof = space.len_w(w_input) == 0
-        w_decoded = space.call_method(self.w_decoder, "decode",
-                                      w_input, space.newbool(eof))
-        self.decoded.set(space, w_decoded)
-        if space.len_w(w_decoded) > 0:
+        input = space.bytes_w(w_input)
+        eof = len(input) == 0
+        decoded, lgt = self.decoder.decode(space, input, eof)
+        self.decoded.set_utf8(decoded, lgt)
+        if lgt > 0:
             eof = False
 
         if self.telling:
             # At the snapshot point, len(dec_buffer) bytes before the read,
             # the next input to be decoded is dec_buffer + input_chunk.
-            next_input = dec_buffer + space.bytes_w(w_input)
+            next_input = dec_buffer + input
             self.snapshot = PositionSnapshot(dec_flags, next_input)
 
         return not eof
@@ -711,6 +918,15 @@ class W_TextIOWrapper(W_TextIOBase):
     def next_w(self, space):
         self._check_attached(space)
         self.telling = False
+        if space.type(self) is space.gettypeobject(W_TextIOWrapper.typedef):
+            # readline() is not overridden: call it directly
+            self._check_closed(space)
+            self._writeflush(space)
+            text, lgt = self._readline(space, -1)
+            if lgt == 0:
+                self.telling = self.seekable
+                raise OperationError(space.w_StopIteration, space.w_None)
+            return space.newutf8(text, lgt)
         try:
             return W_TextIOBase.next_w(self, space)
         except OperationError as e:
@@ -721,7 +937,7 @@ class W_TextIOWrapper(W_TextIOBase):
     def read_w(self, space, w_size=None):
         self._check_attached(space)
         self._check_closed(space)
-        if not self.w_decoder:
+        if not self.decoder:
             raise oefmt(space.w_IOError, "not readable")
 
         size = convert_size(space, w_size)
@@ -730,13 +946,11 @@ class W_TextIOWrapper(W_TextIOBase):
         if size < 0:
             # Read everything
             w_bytes = space.call_method(self.w_buffer, "read")
-            w_decoded = space.call_method(self.w_decoder, "decode", w_bytes, space.w_True)
-            check_decoded(space, w_decoded)
+            decoded, decoded_lgt = self.decoder.decode(
+                space, space.bytes_w(w_bytes), True)
             chars, lgt = self.decoded.get_chars(-1)
-            w_result = space.newutf8(chars, lgt)
-            w_final = space.add(w_result, w_decoded)
             self.snapshot = None
-            return w_final
+            return space.newutf8(chars + decoded, lgt + decoded_lgt)
 
         remaining = size
         builder = Utf8StringBuilder(size)
@@ -752,15 +966,14 @@ class W_TextIOWrapper(W_TextIOBase):
         return space.newutf8(builder.build(), builder.getlength())
 
     def _scan_line_ending(self, limit):
-        if self.readuniversal:
+        if self.readtranslate:
+            # Newlines are already translated, only search for \n
+            return self.decoded.find_char('\n', limit)
+        elif self.readuniversal:
             return self.decoded.find_newline_universal(limit)
         else:
-            if self.readtranslate:
-                # Newlines are already translated, only search for \n
-                newline = '\n'
-            else:
-                # Non-universal mode.
-                newline = self.readnl
+            # Non-universal mode.
+            newline = self.readnl
             if newline == '\r\n':
                 return self.decoded.find_crlf(limit)
             else:
@@ -884,8 +1097,8 @@ class W_TextIOWrapper(W_TextIOBase):
 
         self.snapshot = None
 
-        if self.w_decoder:
-            space.call_method(self.w_decoder, "reset")
+        if self.decoder:
+            self.decoder.reset(space)
 
         return space.newint(textlen)
 
@@ -930,11 +1143,9 @@ class W_TextIOWrapper(W_TextIOBase):
         # at start is not (b"", 0) but e.g. (b"", 2) (meaning, in the case of
         # utf-16, that we are expecting a BOM).
         if cookie.start_pos == 0 and cookie.dec_flags == 0:
-            space.call_method(self.w_decoder, "reset")
+            self.decoder.reset(space)
         else:
-            space.call_method(self.w_decoder, "setstate",
-                              space.newtuple([space.newbytes(""),
-                                              space.newint(cookie.dec_flags)]))
+            self.decoder.setstate(space, "", cookie.dec_flags)
 
     def _encoder_setstate(self, space, cookie):
         if cookie.start_pos == 0 and cookie.dec_flags == 0:
@@ -968,8 +1179,8 @@ class W_TextIOWrapper(W_TextIOBase):
             space.call_method(self, "flush")
             self.decoded.reset()
             self.snapshot = None
-            if self.w_decoder:
-                space.call_method(self.w_decoder, "reset")
+            if self.decoder:
+                self.decoder.reset(space)
             return space.call_method(self.w_buffer, "seek",
                                      w_pos, space.newint(whence))
 
@@ -995,10 +1206,12 @@ class W_TextIOWrapper(W_TextIOBase):
         self.snapshot = None
 
         # Restore the decoder to its state from the safe start point.
-        if self.w_decoder:
+        if self.decoder:
             self._decoder_setstate(space, cookie)
 
         if cookie.chars_to_skip:
+            if not self.decoder:
+                raise oefmt(space.w_IOError, "not readable")
             # Just like _read_chunk, feed the decoder and save a snapshot.
             w_chunk = space.call_method(self.w_buffer, "read",
                                         space.newint(cookie.bytes_to_feed))
@@ -1007,19 +1220,18 @@ class W_TextIOWrapper(W_TextIOBase):
                       "a bytes object, not '%T'"
                 raise oefmt(space.w_TypeError, msg, w_chunk)
 
-            self.snapshot = PositionSnapshot(cookie.dec_flags,
-                                             space.bytes_w(w_chunk))
+            chunk = space.bytes_w(w_chunk)
+            self.snapshot = PositionSnapshot(cookie.dec_flags, chunk)
 
-            w_decoded = space.call_method(self.w_decoder, "decode",
-                                          w_chunk, space.newbool(bool(cookie.need_eof)))
-            w_decoded = check_decoded(space, w_decoded)
+            decoded, lgt = self.decoder.decode(space, chunk,
+                                               bool(cookie.need_eof))
 
             # Skip chars_to_skip of the decoded characters
-            if space.len_w(w_decoded) < cookie.chars_to_skip:
+            if lgt < cookie.chars_to_skip:
                 raise oefmt(space.w_IOError,
                             "can't restore logical file position")
-            self.decoded.set(space, w_decoded)
-            self.decoded.pos = w_decoded._index_to_byte(cookie.chars_to_skip)
+            self.decoded.set_utf8(decoded, lgt)
+            self.decoded.get_chars(cookie.chars_to_skip)
         else:
             self.snapshot = PositionSnapshot(cookie.dec_flags, "")
 
@@ -1042,7 +1254,7 @@ class W_TextIOWrapper(W_TextIOBase):
 
         w_pos = space.call_method(self.w_buffer, "tell")
 
-        if self.w_decoder is None or self.snapshot is None:
+        if self.decoder is None or self.snapshot is None:
             assert not self.decoded.text
             return w_pos
 
@@ -1063,7 +1275,7 @@ class W_TextIOWrapper(W_TextIOBase):
 
         # Starting from the snapshot position, we will walk the decoder
         # forward until it gives us enough decoded characters.
-        w_saved_state = space.call_method(self.w_decoder, "getstate")
+        saved_buffer, saved_flags = self.decoder.getstate(space)
 
         try:
             # Note our initial start point
@@ -1077,23 +1289,19 @@ class W_TextIOWrapper(W_TextIOBase):
             chars_decoded = 0
             i = 0
             while i < len(input):
-                w_decoded = space.call_method(self.w_decoder, "decode",
-                                              space.newbytes(input[i]))
-                check_decoded(space, w_decoded)
-                chars_decoded += space.len_w(w_decoded)
+                _, lgt = self.decoder.decode(space, input[i], False)
+                chars_decoded += lgt
 
                 cookie.bytes_to_feed += 1
 
-                w_state = space.call_method(self.w_decoder, "getstate")
-                w_dec_buffer, w_flags = space.unpackiterable(w_state, 2)
-                dec_buffer_len = space.len_w(w_dec_buffer)
+                dec_buffer, dec_flags = self.decoder.getstate(space)
 
-                if dec_buffer_len == 0 and chars_decoded <= chars_to_skip:
+                if len(dec_buffer) == 0 and chars_decoded <= chars_to_skip:
                     # Decoder buffer is empty, so this is a safe start point.
                     cookie.start_pos += cookie.bytes_to_feed
                     chars_to_skip -= chars_decoded
                     assert chars_to_skip >= 0
-                    cookie.dec_flags = space.int_w(w_flags)
+                    cookie.dec_flags = dec_flags
                     cookie.bytes_to_feed = 0
                     chars_decoded = 0
                 if chars_decoded >= chars_to_skip:
@@ -1101,18 +1309,15 @@ class W_TextIOWrapper(W_TextIOBase):
                 i += 1
             else:
                 # We didn't get enough decoded data; signal EOF to get more.
-                w_decoded = space.call_method(self.w_decoder, "decode",
-                                              space.newbytes(""),
-                                              space.newint(1))  # final=1
-                check_decoded(space, w_decoded)
-                chars_decoded += space.len_w(w_decoded)
+                _, lgt = self.decoder.decode(space, "", True)
+                chars_decoded += lgt
                 cookie.need_eof = 1
 
                 if chars_decoded < chars_to_skip:
                     raise oefmt(space.w_IOError,
                         "can't reconstruct logical file position")
         finally:
-            space.call_method(self.w_decoder, "setstate", w_saved_state)
+            self.decoder.setstate(space, saved_buffer, saved_flags)
 
         # The returned cookie corresponds to the last safe start point.
         cookie.chars_to_skip = chars_to_skip
@@ -369,3 +369,95 @@ def test_newlines2():
     for ch in msg:
         decoded += decoder.decode(ch)
     assert set(decoder.newlines) == {"\r", "\n", "\r\n"}
+
+def _register_slow_codecs():
+    # the same codecs under other names, so that TextIOWrapper goes
+    # through their app-level incremental decoders
+    import codecs
+    def search(name):
+        if name.startswith('slow_'):
+            info = codecs.lookup(name[5:])
+            return codecs.CodecInfo(info.encode, info.decode,
+                                    incrementalencoder=info.incrementalencoder,
+                                    incrementaldecoder=info.incrementaldecoder,
+                                    name=name)
+    codecs.register(search)
+
+def test_builtin_decoders():
+    _register_slow_codecs()
+    data = (u"h\xe9llo\r\nw€rld\r中\n\U0001f600\r\r\n\n" * 3
+            + u"\r")
+    for encoding in ['utf-8', 'latin-1', 'ascii']:
+        raw = data.encode(encoding, 'replace')
+        for newline in [None, '', '\n', '\r', '\r\n']:
+            for chunk_size in [1, 2, 5, 64]:
+                results = []
+                for enc in [encoding, 'slow_' + encoding]:
+                    b = _io.BufferedReader(_io.BytesIO(raw), 7)
+                    t = _io.TextIOWrapper(b, encoding=enc, newline=newline)
+                    t._CHUNK_SIZE = chunk_size
+                    lines = []
+                    cookies = []
+                    while True:
+                        cookies.append(t.tell())
+                        line = t.readline()
+                        if not line:
+                            break
+                        lines.append(line)
+                    # seek back to every line and read it again
+                    for cookie, line in zip(cookies, lines):
+                        t.seek(cookie)
+                        assert t.readline() == line
+                    t.seek(0)
+                    assert t.read(5) + t.read() == u''.join(lines)
+                    results.append((lines, cookies, t.newlines))
+                assert results[0] == results[1], (encoding, newline,
+                                                  chunk_size)
+
+def test_builtin_decoders_errors():
+    _register_slow_codecs()
+    raw = b"a\xff\xc3\r\n\xe2\x82\xacb\xe2\x82\r\xed\xa0\x80\xf4\x90\x80\x80z"
+    for encoding in ['utf-8', 'latin-1', 'ascii']:
+        for chunk_size in [1, 2, 3, 64]:
+            results = []
+            for enc in [encoding, 'slow_' + encoding]:
+                b = _io.BufferedReader(_io.BytesIO(raw), 7)
+                t = _io.TextIOWrapper(b, encoding=enc, errors='replace')
+                t._CHUNK_SIZE = chunk_size
+                results.append(list(t))
+            assert results[0] == results[1], (encoding, chunk_size)
+        b = _io.BufferedReader(_io.BytesIO(raw), 7)
+        t = _io.TextIOWrapper(b, encoding=encoding)
+        if encoding != 'latin-1':
+            raises(UnicodeDecodeError, t.read)
+
+def test_builtin_decoder_newlines():
+    r = _io.BytesIO(b"a\rb\r\nc\n")
+    t = _io.TextIOWrapper(r, encoding="utf-8")
+    assert t.newlines is None
+    assert t.readline() == u"a\n"
+    assert t.newlines == (u"\r", u"\n", u"\r\n")
+    r = _io.BytesIO(b"a\rb\r\nc\n")
+    t = _io.TextIOWrapper(r, encoding="utf-8", newline="\n")
+    assert t.read() == u"a\rb\r\nc\n"
+    assert t.newlines is None
+
+def test_iteration_calls_overridden_readline():
+    class MyTextIO(_io.TextIOWrapper):
+        def readline(self):
+            return _io.TextIOWrapper.readline(self).upper()
+    t = MyTextIO(_io.BytesIO(b"ab\ncd\n"), encoding="ascii")
+    assert list(t) == [u"AB\n", u"CD\n"]
+    t = _io.TextIOWrapper(_io.BytesIO(b"ab\ncd"), encoding="ascii")
+    assert list(t) == [u"ab\n", u"cd"]
+    assert t.tell() == 5
+    t.seek(0)
+    assert next(t) == u"ab\n"
+    raises(IOError, t.tell)
+
+def test_seek_cookie_not_readable():
+    class WriteOnly(_io.BytesIO):
+        def readable(self):
+            return False
+    t = _io.TextIOWrapper(WriteOnly(), encoding="utf-8")
+    raises(IOError, t.seek, 1 << 192)
@@ -169,6 +169,58 @@ class AppTestBufferedReader:
         assert f.readinto(a) == 99
         assert a == '\nb\nc' + 'a\nb\nc' * 19 + 'x' * 100
 
+    def test_readinto_direct(self):
+        import _io
+        class RecordingFileIO(_io.FileIO):
+            def readinto(self, buf):
+                self.sizes.append(len(buf))
+                return _io.FileIO.readinto(self, buf)
+        raw = RecordingFileIO(self.bigtmpfile)
+        raw.sizes = []
+        f = _io.BufferedReader(raw, buffer_size=8)
+        assert f.read(1) == 'a'
+        assert raw.sizes == [8]
+        # the 7 buffered bytes are copied, the rest is read directly
+        a = bytearray('x' * 50)
+        assert f.readinto(memoryview(a)) == 50
+        assert a == ('a\nb\nc' * 20)[1:51]
+        assert raw.sizes == [8, 43]
+        assert f.tell() == 51
+        # small reads still go through the buffer
+        a = bytearray('x' * 5)
+        assert f.readinto(a) == 5
+        assert a == ('a\nb\nc' * 20)[51:56]
+        assert raw.sizes == [8, 43, 8]
+        a = bytearray('x' * 60)
+        assert f.readinto(a) == 44
+        assert a == ('a\nb\nc' * 20)[56:] + 'x' * 16
+        assert f.readinto(a) == 0
+        f.close()
+
+    def test_readinto1(self):
+        import _io
+        class RecordingFileIO(_io.FileIO):
+            def readinto(self, buf):
+                self.nbreads += 1
+                return _io.FileIO.readinto(self, buf)
+        raw = RecordingFileIO(self.bigtmpfile)
+        raw.nbreads = 0
+        f = _io.BufferedReader(raw, buffer_size=8)
+        a = bytearray('x' * 5)
+        assert f.readinto1(a) == 5
+        assert a == 'a\nb\nc'
+        assert raw.nbreads == 1
+        # only the buffered bytes
+        assert f.readinto1(a) == 3
+        assert a == 'a\nb\nc'
+        assert raw.nbreads == 1
+        # one direct read
+        a = bytearray('x' * 20)
+        assert f.readinto1(a) == 20
+        assert raw.nbreads == 2
+        assert a == ('a\nb\nc' * 20)[8:28]
+        f.close()
+
     def test_seek(self):
         import _io
         raw = _io.FileIO(self.tmpfile)
@@ -329,6 +381,32 @@ class AppTestBufferedWriter:
         f.close()
         assert self.readfile() == "abcd" * 5000
 
+    def test_largewrite_after_smallwrite(self):
+        import _io
+        class RecordingFileIO(_io.FileIO):
+            def write(self, data):
+                self.nbwrites += 1
+                return _io.FileIO.write(self, data)
+        for cls in [_io.FileIO, RecordingFileIO]:
+            raw = cls(self.tmpfile, 'w')
+            raw.nbwrites = 0
+            f = _io.BufferedWriter(raw, buffer_size=16)
+            f.write("abc")
+            f.write("d" * 40)
+            assert f.tell() == 43
+            f.write("ef")
+            f.write("g" * 20)
+            f.flush()
+            assert f.tell() == 65
+            if cls is RecordingFileIO:
+                # no writev() with FileIO subclasses
+                assert raw.nbwrites == 4
+            f.seek(1)
+            f.write("XY" + "h" * 30)
+            f.close()
+            assert self.readfile() == ("aXY" + "h" * 30 + "d" * 10 + "ef" +
+                                       "g" * 20)
+
     def test_incomplete(self):
         import _io
         raw = _io.FileIO(self.tmpfile)
@@ -719,6 +797,21 @@ class AppTestBufferedRandom:
         f.seek(0)
         assert f.read() == 'abc'
 
+    def test_readinto_and_largewrite(self):
+        import _io
+        raw = _io.FileIO(self.tmpfile, 'wb+')
+        f = _io.BufferedRandom(raw, 8)
+        f.write("a" * 20 + "b" * 20)
+        f.seek(2)
+        a = bytearray(30)
+        assert f.readinto(a) == 30
+        assert a == "a" * 18 + "b" * 12
+        f.write("c")
+        f.write("d" * 10)
+        assert f.tell() == 43
+        f.seek(0)
+        assert f.read() == "a" * 20 + "b" * 12 + "c" + "d" * 10
+
     def test_write_rewind_write(self):
         # Various combinations of reading / writing / seeking
         # backwards / writing again
@@ -0,0 +1,3 @@
+# The exceptions are shared with pickle.py, so that code catching
+# pickle.PicklingError also catches the errors raised by cPickle.
+from pickle import PickleError, PicklingError, UnpicklingError
@@ -0,0 +1,1546 @@
+from rpython.rlib import objectmodel
+from rpython.rlib.rarithmetic import intmask, string_to_int
+from rpython.rlib.rbigint import rbigint
+from rpython.rlib.rfloat import string_to_float
+from rpython.rlib.rstring import StringBuilder, ParseStringError
+from rpython.rlib.rstring import ParseStringOverflowError, replace
+from rpython.rlib.rstruct import ieee
+
+from pypy.interpreter.baseobjspace import W_Root
+from pypy.interpreter.error import OperationError, oefmt
+from pypy.interpreter.function import Function
+from pypy.interpreter.gateway import applevel, interp2app, unwrap_spec
+from pypy.interpreter.typedef import TypeDef, GetSetProperty
+from pypy.interpreter.unicodehelper import (
+    check_utf8_or_raise, decode_raw_unicode_escape,
+    utf8_encode_raw_unicode_escape)
+from pypy.module.__builtin__.interp_classobj import (
+    W_ClassObject, W_InstanceObject)
+from pypy.module.cStringIO.interp_stringio import W_InputType, W_OutputType
+from pypy.objspace.std.bytesobject import string_escape_encode
+from pypy.objspace.std.dictmultiobject import W_DictMultiObject
+from pypy.objspace.std.floatobject import float2string
+from pypy.objspace.std.listobject import W_ListObject
+from pypy.interpreter.pyparser.parsestring import PyString_DecodeEscape
+
+
+HIGHEST_PROTOCOL = 2
+
+# the number of items written per APPENDS / SETITEMS opcode
+BATCHSIZE = 1000
+
+# pending output is written to the file once it grows beyond this size
+FLUSH_SIZE = 65536
+
+MARK            = '('
+STOP            = '.'
+POP             = '0'
+POP_MARK        = '1'
+DUP             = '2'
+FLOAT           = 'F'
+INT             = 'I'
+BININT          = 'J'
+BININT1         = 'K'
+LONG            = 'L'
+BININT2         = 'M'
+NONE            = 'N'
+PERSID          = 'P'
+BINPERSID       = 'Q'
+REDUCE          = 'R'
+STRING          = 'S'
+BINSTRING       = 'T'
+SHORT_BINSTRING = 'U'
+UNICODE         = 'V'
+BINUNICODE      = 'X'
+APPEND          = 'a'
+BUILD           = 'b'
+GLOBAL          = 'c'
+DICT            = 'd'
+EMPTY_DICT      = '}'
+APPENDS         = 'e'
+GET             = 'g'
+BINGET          = 'h'
+INST            = 'i'
+LONG_BINGET     = 'j'
+LIST            = 'l'
+EMPTY_LIST      = ']'
+OBJ             = 'o'
+PUT             = 'p'
+BINPUT          = 'q'
+LONG_BINPUT     = 'r'
+SETITEM         = 's'
+TUPLE           = 't'
+EMPTY_TUPLE     = ')'
+SETITEMS        = 'u'
+BINFLOAT        = 'G'
+
+TRUE            = 'I01\n'
+FALSE           = 'I00\n'
+
+# Protocol 2
+PROTO           = '\x80'
+NEWOBJ          = '\x81'
+EXT1            = '\x82'
+EXT2            = '\x83'
+EXT4            = '\x84'
+TUPLE1          = '\x85'
+TUPLE2          = '\x86'
+TUPLE3          = '\x87'
+NEWTRUE         = '\x88'
+NEWFALSE        = '\x89'
+LONG1           = '\x8a'
+LONG4           = '\x8b'
+
+_tuplesize2code = [EMPTY_TUPLE, TUPLE1, TUPLE2, TUPLE3]
+
+
+app = applevel(r'''
+def lookup_global(obj, name, proto):
+    import sys
+    from pickle import PicklingError, whichmodule
+    if name is None:
+        name = obj.__name__
+    module = getattr(obj, "__module__", None)
+    if module is None:
+        module = whichmodule(obj, name)
+    try:
+        __import__(module)
+        mod = sys.modules[module]
+        klass = getattr(mod, name)
+    except (ImportError, KeyError, AttributeError):
+        raise PicklingError(
+            "Can't pickle %r: it's not found as %s.%s" %
+            (obj, module, name))
+    else:
+        if klass is not obj:
+            raise PicklingError(
+                "Can't pickle %r: it's not the same object as %s.%s" %
+                (obj, module, name))
+    code = 0
+    if proto >= 2:
+        from copy_reg import _extension_registry
+        code = _extension_registry.get((module, name), 0)
+    return module, name, code
+
+def reduce_object(obj, proto):
+    """Return the result of the reduce protocol for 'obj', or None if the
+    object should be saved as a global."""
+    from copy_reg import dispatch_table
+    from pickle import PicklingError
+    t = type(obj)
+    reduce = dispatch_table.get(t)
+    if reduce:
+        rv = reduce(obj)
+    else:
+        try:
+            issc = issubclass(t, type)
+        except TypeError:
+            issc = False
+        if issc:
+            return None
+        reduce = getattr(obj, "__reduce_ex__", None)
+        if reduce:
+            rv = reduce(proto)
+        else:
+            reduce = getattr(obj, "__reduce__", None)
+            if reduce:
+                rv = reduce()
+            else:
+                raise PicklingError("Can't pickle %r object: %r" %
+                                    (t.__name__, obj))
+    if type(rv) is str:
+        return rv
+    if type(rv) is not tuple:
+        raise PicklingError("%s must return string or tuple" % reduce)
+    l = len(rv)
+    if not (2 <= l <= 5):
+        raise PicklingError("Tuple returned by %s must have "
+                            "two to five elements" % reduce)
+    return rv + (None,) * (5 - l)
+
+def get_extension(code, find_class):
+    from copy_reg import _extension_cache, _inverted_registry
+    nil = []
+    obj = _extension_cache.get(code, nil)
+    if obj is not nil:
+        return obj
+    key = _inverted_registry.get(code)
+    if not key:
+        raise ValueError("unregistered extension code %d" % code)
+    obj = find_class(*key)
+    _extension_cache[code] = obj
+    return obj
+''', filename=__file__)
+
+lookup_global = app.interphook('lookup_global')
+reduce_object = app.interphook('reduce_object')
+get_extension = app.interphook('get_extension')
+
+
+def _get_error(space, name):
+    w_module = space.getbuiltinmodule('_pickle')
+    return space.getattr(w_module, space.newtext(name))
+
+@objectmodel.dont_inline
+def pickling_error(space, msg):
+    return OperationError(_get_error(space, 'PicklingError'),
+                          space.newtext(msg))
+
+@objectmodel.dont_inline
+def unpickling_error(space, msg):
+    return OperationError(_get_error(space, 'UnpicklingError'),
+                          space.newtext(msg))
+
+def _check_protocol(space, w_protocol):
+    if space.is_none(w_protocol):
+        return 0
+    proto = space.int_w(w_protocol)
+    if proto < 0:
+        return HIGHEST_PROTOCOL
+    if proto > HIGHEST_PROTOCOL:
+        raise oefmt(space.w_ValueError,
+                    "pickle protocol %d asked for; the highest available "
+                    "protocol is %d", proto, HIGHEST_PROTOCOL)
+    return proto
+
+def _is_exact_dict(space, w_obj):
+    return (isinstance(w_obj, W_DictMultiObject) and
+            space.type(w_obj) is space.w_dict)
+
+def _is_exact_list(space, w_obj):
+    return (isinstance(w_obj, W_ListObject) and
+            space.type(w_obj) is space.w_list)
+
+def encode_int32(value):
+    return (chr(value & 0xff) + chr((value >> 8) & 0xff) +
+            chr((value >> 16) & 0xff) + chr((value >> 24) & 0xff))
+
+def decode_int32(s):
+    top = ord(s[3])
+    if top >= 128:
+        top -= 256
+    return ((top << 24) | (ord(s[2]) << 16) | (ord(s[1]) << 8) |
+            ord(s[0]))
+
+def encode_long(bigint):
+    """Encode a long as the minimal two's complement little-endian string
+    used by the LONG1 and LONG4 opcodes."""
+    if bigint.sign == 0:
+        return ''
+    if bigint.sign < 0:
+        nbits = bigint.invert().bit_length()
+    else:
+        nbits = bigint.bit_length()
+    nbytes = (nbits >> 3) + 1
+    return bigint.tobytes(nbytes, 'little', True)
+
+
+# ____________________________________________________________
+# Pickling
+
+class W_Pickler(W_Root):
+    def __init__(self, space, w_file, proto):
+        self.space = space
+        self.proto = proto
+        self.bin = proto >= 1
+        self.fast = False
+        self.w_file = w_file
+        self.w_write = None
+        if w_file is not None and not isinstance(w_file, W_OutputType):
+            self.w_write = space.getattr(w_file, space.newtext('write'))
+        # the memo maps the objects already pickled to their memo index;
+        # indexes start at 1, like in CPython's cPickle
+        self.memo = {}
+        self.output = StringBuilder()
+        self.w_persistent_id = None
+        self.w_inst_persistent_id = None
+
+    # ---------- output ----------
+
+    def write(self, s):
+        self.output.append(s)
+
+    def flush(self):
+        output = self.output
+        if self.w_file is None or output.getlength() == 0:
+            return
+        data = output.build()
+        self.output = StringBuilder()
+        w_file = self.w_file
+        if isinstance(w_file, W_OutputType):
+            w_file.check_closed()
+            w_file.write(data)
+        else:
+            self.space.call_function(self.w_write, self.space.newbytes(data))
+
+    def maybe_flush(self):
+        if self.output.getlength() > FLUSH_SIZE:
+            self.flush()
+
+    # ---------- memo ----------
+
+    def memoize(self, w_obj):
+        if self.fast:
+            return
+        index = len(self.memo) + 1
+        self.memo[w_obj] = index
+        self.write_put(index)
+
+    def write_put(self, index):
+        if self.bin:
+            if index < 256:
+                self.write(BINPUT)
+                self.write(chr(index))
+            else:
+                self.write(LONG_BINPUT)
+                self.write(encode_int32(index))
+        else:
+            self.write(PUT)
+            self.write(str(index))
+            self.write('\n')
+
+    def write_get(self, index):
+        if self.bin:
+            if index < 256:
+                self.write(BINGET)
+                self.write(chr(index))
+            else:
+                self.write(LONG_BINGET)
+                self.write(encode_int32(index))
+        else:
+            self.write(GET)
+            self.write(str(index))
+            self.write('\n')
+
+    # ---------- dispatch ----------
+
+    def save(self, w_obj, pers_save=False):
+        space = self.space
+        if not pers_save and self.w_persistent_id is not None:
+            if self.save_pers(self.w_persistent_id, w_obj):
+                return
+        w_type = space.type(w_obj)
+        if w_type is space.w_NoneType:
+            self.write(NONE)
+        elif w_type is space.w_bool:
+            self.save_bool(space.is_true(w_obj))
+        elif w_type is space.w_int:
+            self.save_int(space.int_w(w_obj))
+        elif w_type is space.w_float:
+            self.save_float(space.float_w(w_obj))
+        elif w_type is space.w_long:
+            self.save_long(space.bigint_w(w_obj))
+        else:
+            index = self.memo.get(w_obj, 0)
+            if index > 0:
+                self.write_get(index)
+            elif w_type is space.w_bytes:
+                self.save_string(w_obj)
+            elif w_type is space.w_unicode:
+                self.save_unicode(w_obj)
+            elif w_type is space.w_tuple:
+                self.save_tuple(w_obj)
+            elif w_type is space.w_list:
+                self.save_list(w_obj)
+            elif w_type is space.w_dict:
+                self.save_dict(w_obj)
+            elif (not pers_save and self.w_inst_persistent_id is not None
+                      and self.save_pers(self.w_inst_persistent_id, w_obj)):
+                pass
+            elif isinstance(w_obj, W_InstanceObject):
+                self.save_inst(w_obj)
+            elif (w_type is space.w_type or
+                      isinstance(w_obj, W_ClassObject) or
+                      isinstance(w_obj, Function)):
+                self.save_global(w_obj, None)
+            else:
+                self.save_reduce_object(w_obj)
+        self.maybe_flush()
+
+    def save_pers(self, w_func, w_obj):
+        space = self.space
+        w_pid = space.call_function(w_func, w_obj)
+        if space.is_w(w_pid, space.w_None):
+            return False
+        if self.bin:
+            self.save(w_pid, pers_save=True)
+            self.write(BINPERSID)
+        else:
+            self.write(PERSID)
+            self.write(space.text_w(space.str(w_pid)))
+            self.write('\n')
+        return True
+
+    # ---------- atomic objects ----------
+
+    def save_bool(self, value):
+        if self.proto >= 2:
+            self.write(NEWTRUE if value else NEWFALSE)
+        else:
+            self.write(TRUE if value else FALSE)
+
+    def save_int(self, value):
+        if self.bin:
+            if value >= 0:
+                if value <= 0xff:
+                    self.write(BININT1)
+                    self.write(chr(value))
+                    return
+                if value <= 0xffff:
+                    self.write(BININT2)
+                    self.write(chr(value & 0xff))
+                    self.write(chr(value >> 8))
+                    return
+            high_bits = value >> 31
+            if high_bits == 0 or high_bits == -1:
+                self.write(BININT)
+                self.write(encode_int32(value))
+                return
+        self.write(INT)
+        self.write(str(value))
+        self.write('\n')
+
+    def save_float(self, value):
+        if self.bin:
+            self.write(BINFLOAT)
+            unsigned = ieee.float_pack(value, 8)
+            for i in range(7, -1, -1):
+                self.write(chr(intmask(unsigned >> (i * 8)) & 0xff))
+        else:
+            self.write(FLOAT)
+            self.write(float2string(value, 'r', 0))
+            self.write('\n')
+
+    def save_long(self, bigint):
+        if self.proto >= 2:
+            data = encode_long(bigint)
+            n = len(data)
+            if n < 256:
+                self.write(LONG1)
+                self.write(chr(n))
+            else:
+                self.write(LONG4)
+                self.write(encode_int32(n))
+            self.write(data)
+        else:
+            self.write(LONG)
+            self.write(bigint.repr())
+            self.write('\n')
+
+    def save_string(self, w_obj):
+        s = self.space.bytes_w(w_obj)
+        if self.bin:
+            n = len(s)
+            if n < 256:
+                self.write(SHORT_BINSTRING)
+                self.write(chr(n))
+            else:
+                self.write(BINSTRING)
+                self.write(encode_int32(n))
+            self.write(s)
+        else:
+            self.write(STRING)
+            self.write(string_escape_encode(s, "'"))
+            self.write('\n')
+        self.memoize(w_obj)
+
+    def save_unicode(self, w_obj):
+        utf8 = self.space.utf8_w(w_obj)
+        if self.bin:
+            self.write(BINUNICODE)
+            self.write(encode_int32(len(utf8)))
+            self.write(utf8)
+        else:
+            utf8 = replace(utf8, '\\', '\\u005c')
+            utf8 = replace(utf8, '\n', '\\u000a')
+            s = utf8_encode_raw_unicode_escape(utf8, 'strict', None)
+            self.write(UNICODE)
+            self.write(s)
+            self.write('\n')
+        self.memoize(w_obj)
+
+    # ---------- containers ----------
+
+    def save_tuple(self, w_obj):
+        space = self.space
+        items_w = space.fixedview(w_obj)
+        n = len(items_w)
+        if n == 0:
+            if self.proto:
+                self.write(EMPTY_TUPLE)
+            else:
+                self.write(MARK)
+                self.write(TUPLE)
+            return
+        if n <= 3 and self.proto >= 2:
+            for w_item in items_w:
+                self.save(w_item)
+            # subtle: the tuple may have been memoized while saving
+            # its items, if it is part of a cycle
+            index = self.memo.get(w_obj, 0)
+            if index > 0:
+                self.write(POP * n)
+                self.write_get(index)
+            else:
+                self.write(_tuplesize2code[n])
+                self.memoize(w_obj)
+            return
+        self.write(MARK)
+        for w_item in items_w:
+            self.save(w_item)
+        index = self.memo.get(w_obj, 0)
+        if index > 0:
+            if self.bin:
+                self.write(POP_MARK)
+            else:
+                self.write(POP * (n + 1))
+            self.write_get(index)
+            return
+        self.write(TUPLE)
+        self.memoize(w_obj)
+
+    def save_list(self, w_list):
+        if self.bin:
+            self.write(EMPTY_LIST)
+        else:
+            self.write(MARK)
+            self.write(LIST)
+        self.memoize(w_list)
+        assert isinstance(w_list, W_ListObject)
+        if self.w_persistent_id is None:
+            # lists of unboxed ints or floats are written directly from
+            # their strategy's storage; no app-level code can run while
+            # doing so, so the list cannot be mutated underneath us
+            space = self.space
+            intlist = space.listview_int(w_list)
+            if intlist is not None:
+                self.batch_appends_int(intlist)
+                return
+            floatlist = space.listview_float(w_list)
+            if floatlist is not None:
+                self.batch_appends_float(floatlist)
+                return
+        self.batch_appends_list(w_list)
+
+    def batch_appends_int(self, intlist):
+        n = len(intlist)
+        start = 0
+        while start < n:
+            stop = min(start + BATCHSIZE, n)
+            if not self.bin or stop - start == 1:
+                for i in range(start, stop):
+                    self.save_int(intlist[i])
+                    self.write(APPEND)
+            else:
+                self.write(MARK)
+                for i in range(start, stop):
+                    self.save_int(intlist[i])
+                self.write(APPENDS)
+            start = stop
+            self.maybe_flush()
+
+    def batch_appends_float(self, floatlist):
+        n = len(floatlist)
+        start = 0
+        while start < n:
+            stop = min(start + BATCHSIZE, n)
+            if not self.bin or stop - start == 1:
+                for i in range(start, stop):
+                    self.save_float(floatlist[i])
+                    self.write(APPEND)
+            else:
+                self.write(MARK)
+                for i in range(start, stop):
+                    self.save_float(floatlist[i])
+                self.write(APPENDS)
+            start = stop
+            self.maybe_flush()
+
+    def batch_appends_list(self, w_list):
+        # the list may be mutated by app-level code called while saving
+        # its items, so its length is checked again at every step
+        i = 0
+        while i < w_list.length():
+            stop = i + BATCHSIZE
+            if not self.bin:
+                self.save(w_list.getitem(i))
+                self.write(APPEND)
+                i += 1
+                continue
+            if i + 1 == w_list.length():
+                self.save(w_list.getitem(i))
+                self.write(APPEND)
+                return
+            self.write(MARK)
+            while i < stop and i < w_list.length():
+                self.save(w_list.getitem(i))
+                i += 1
+            self.write(APPENDS)
+
+    def batch_appends_iter(self, w_iter):
+        while True:
+            items_w = self._next_items(w_iter)
+            if len(items_w) == 0:
+                return
+            if not self.bin or len(items_w) == 1:
+                for w_item in items_w:
+                    self.save(w_item)
+                    self.write(APPEND)
+            else:
+                self.write(MARK)
+                for w_item in items_w:
+                    self.save(w_item)
+                self.write(APPENDS)
+            if len(items_w) < BATCHSIZE:
+                return
+
+    def _next_items(self, w_iter):
+        space = self.space
+        items_w = []
+        while len(items_w) < BATCHSIZE:
+            try:
+                w_item = space.next(w_iter)
+            except OperationError as e:
+                if not e.match(space, space.w_StopIteration):
+                    raise
+                break
+            items_w.append(w_item)
+        return items_w
+
+    def save_dict(self, w_dict):
+        if self.bin:
+            self.write(EMPTY_DICT)
+        else:
+            self.write(MARK)
+            self.write(DICT)
+        self.memoize(w_dict)
+        assert isinstance(w_dict, W_DictMultiObject)
+        self.batch_setitems_dict(w_dict)
+
+    def batch_setitems_dict(self, w_dict):
+        # the strategy's item iterator raises RuntimeError if the dict
+        # changes size while we are saving its items
+        w_iter = w_dict.iteritems()
+        if not self.bin:
+            while True:
+                w_key, w_value = w_iter.next_item()
+                if w_key is None:
+                    return
+                self.save(w_key)
+                self.save(w_value)
+                self.write(SETITEM)
+        while True:
+            w_key, w_value = w_iter.next_item()
+            if w_key is None:
+                return
+            w_key2, w_value2 = w_iter.next_item()
+            if w_key2 is None:
+                self.save(w_key)
+                self.save(w_value)
+                self.write(SETITEM)
+                return
+            self.write(MARK)
+            self.save(w_key)
+            self.save(w_value)
+            self.save(w_key2)
+            self.save(w_value2)
+            count = 2
+            while count < BATCHSIZE:
+                w_key, w_value = w_iter.next_item()
+                if w_key is None:
+                    self.write(SETITEMS)
+                    return
+                self.save(w_key)
+                self.save(w_value)
+                count += 1
+            self.write(SETITEMS)
+
+    def batch_setitems_iter(self, w_iter):
+        space = self.space
+        while True:
+            items_w = self._next_items(w_iter)
+            if len(items_w) == 0:
+                return
+            if not self.bin or len(items_w) == 1:
+                for w_item in items_w:
+                    w_key, w_value = space.fixedview(w_item, 2)
+                    self.save(w_key)
+                    self.save(w_value)
+                    self.write(SETITEM)
+            else:
+                self.write(MARK)
+                for w_item in items_w:
+                    w_key, w_value = space.fixedview(w_item, 2)
+                    self.save(w_key)
+                    self.save(w_value)
+                self.write(SETITEMS)
+            if len(items_w) < BATCHSIZE:
+                return
+
+    # ---------- instances, globals and the reduce protocol ----------
+
+    def save_inst(self, w_obj):
+        space = self.space
+        w_cls = space.getattr(w_obj, space.newtext('__class__'))
+        w_getinitargs = space.findattr(w_obj, space.newtext('__getinitargs__'))
+        if w_getinitargs is not None:
+            args_w = space.unpackiterable(space.call_function(w_getinitargs))
+        else:
+            args_w = []
+        self.write(MARK)
+        if self.bin:
+            self.save(w_cls)
+            for w_arg in args_w:
+                self.save(w_arg)
+            self.write(OBJ)
+        else:
+            for w_arg in args_w:
+                self.save(w_arg)
+            self.write(INST)
+            self.write(space.text_w(
+                space.getattr(w_cls, space.newtext('__module__'))))
+            self.write('\n')
+            self.write(space.text_w(
+                space.getattr(w_cls, space.newtext('__name__'))))
+            self.write('\n')
+        self.memoize(w_obj)
+        w_getstate = space.findattr(w_obj, space.newtext('__getstate__'))
+        if w_getstate is not None:
+            w_state = space.call_function(w_getstate)
+        else:
+            w_state = space.getattr(w_obj, space.newtext('__dict__'))
+        self.save(w_state)
+        self.write(BUILD)
+
+    def save_global(self, w_obj, w_name):
+        space = self.space
+        w_result = lookup_global(space, w_obj, space.wrap_none(w_name),
+                                 space.newint(self.proto))
+        w_module, w_name, w_code = space.fixedview(w_result, 3)
+        code = space.int_w(w_code)
+        if code > 0:
+            if code <= 0xff:
+                self.write(EXT1)
+                self.write(chr(code))
+            elif code <= 0xffff:
+                self.write(EXT2)
+                self.write(chr(code & 0xff))
+                self.write(chr(code >> 8))
+            else:
+                self.write(EXT4)
+                self.write(encode_int32(code))
+            return
+        self.write(GLOBAL)
+        self.write(space.text_w(w_module))
+        self.write('\n')
+        self.write(space.text_w(w_name))
+        self.write('\n')
+        self.memoize(w_obj)
+
+    def save_reduce_object(self, w_obj):
+        space = self.space
+        w_rv = reduce_object(space, w_obj, space.newint(self.proto))
+        if space.is_w(w_rv, space.w_None):
+            self.save_global(w_obj, None)
+        elif space.isinstance_w(w_rv, space.w_bytes):
+            self.save_global(w_obj, w_rv)
+        else:
+            w_func, w_args, w_state, w_listitems, w_dictitems = (
+                space.fixedview(w_rv, 5))
+            self.save_reduce(w_func, w_args, w_state, w_listitems,
+                             w_dictitems, w_obj)
+
+    def save_reduce(self, w_func, w_args, w_state, w_listitems, w_dictitems,
+                    w_obj):
+        space = self.space
+        if not space.isinstance_w(w_args, space.w_tuple):
+            raise pickling_error(space, "args from reduce() should be a tuple")
+        if not space.is_true(space.callable(w_func)):
+            raise pickling_error(space, "func from reduce should be callable")
+        w_funcname = space.findattr(w_func, space.newtext('__name__'))
+        if (self.proto >= 2 and w_funcname is not None and
+                space.isinstance_w(w_funcname, space.w_text) and
+                space.text_w(w_funcname) == '__newobj__'):
+            args_w = space.fixedview(w_args)
+            if len(args_w) == 0:
+                raise pickling_error(space,
+                                     "__newobj__ arglist is empty")
+            w_cls = args_w[0]
+            if space.findattr(w_cls, space.newtext('__new__')) is None:
+                raise pickling_error(space,
+                            "args[0] from __newobj__ args has no __new__")
+            if not space.is_w(w_obj, space.w_None):
+                w_objcls = space.getattr(w_obj, space.newtext('__class__'))
+                if not space.is_w(w_cls, w_objcls):
+                    raise pickling_error(space,
+                        "args[0] from __newobj__ args has the wrong class")
+            self.save(w_cls)
+            self.save(space.newtuple(args_w[1:]))
+            self.write(NEWOBJ)
+        else:
+            self.save(w_func)
+            self.save(w_args)
+            self.write(REDUCE)
+        if not space.is_w(w_obj, space.w_None):
+            self.memoize(w_obj)
+        if not space.is_w(w_listitems, space.w_None):
+            self.batch_appends_iter(space.iter(w_listitems))
+        if not space.is_w(w_dictitems, space.w_None):
+            self.batch_setitems_iter(space.iter(w_dictitems))
+        if not space.is_w(w_state, space.w_None):
+            self.save(w_state)
+            self.write(BUILD)
+
+    # ---------- app-level interface ----------
+
+    def dump(self, w_obj):
+        if self.w_file is not None:
+            self.output = StringBuilder()
+        if self.proto >= 2:
+            self.write(PROTO)
+            self.write(chr(self.proto))
+        self.save(w_obj)
+        self.write(STOP)
+        self.flush()
+
+    def descr_dump(self, space, w_obj):
+        """Write a pickled representation of obj to the open file."""
+        self.dump(w_obj)
+        return self
+
+    def descr_clear_memo(self, space):
+        """Clears the pickler's "memo"."""
+        self.memo.clear()
+
+    @unwrap_spec(clear=int)
+    def descr_getvalue(self, space, clear=1):
+        """Finish a list-based pickler and return the data pickled so
+        far."""
+        if self.w_file is not None:
+            raise pickling_error(space,
+                "Attempt to getvalue() a non-list-based pickler")
+        data = self.output.build()
+        if clear:
+            self.output = StringBuilder()
+        return space.newbytes(data)
+
+    def descr_get_memo(self, space):
+        w_memo = space.newdict()
+        for w_obj, index in self.memo.items():
+            space.setitem(w_memo, space.id(w_obj),
+                          space.newtuple([space.newint(index), w_obj]))
+        return w_memo
+
+    def descr_set_memo(self, space, w_memo):
+        if not space.isinstance_w(w_memo, space.w_dict):
+            raise oefmt(space.w_TypeError, "memo must be a dictionary")
+        memo = {}
+        for w_value in space.listview(space.call_method(w_memo, 'values')):
+            w_index, w_obj = space.fixedview(w_value, 2)
+            memo[w_obj] = space.int_w(w_index)
+        self.memo = memo
+
+    def descr_get_fast(self, space):
+        return space.newint(int(self.fast))
+
+    def descr_set_fast(self, space, w_fast):
+        self.fast = space.is_true(w_fast)
+
+    def descr_get_binary(self, space):
+        return space.newint(int(self.bin))
+
+    def descr_get_proto(self, space):
+        return space.newint(self.proto)
+
+    def descr_get_persistent_id(self, space):
+        return space.wrap_none(self.w_persistent_id)
+
+    def descr_set_persistent_id(self, space, w_func):
+        self.w_persistent_id = None if space.is_none(w_func) else w_func
+
+    def descr_get_inst_persistent_id(self, space):
+        return space.wrap_none(self.w_inst_persistent_id)
+
+    def descr_set_inst_persistent_id(self, space, w_func):
+        self.w_inst_persistent_id = None if space.is_none(w_func) else w_func
+
+
+def descr_new_pickler(space, w_subtype, w_file=None, w_protocol=None):
+    """Pickler(file, protocol=0) -- Create a pickler.
+
+This takes a file-like object for writing a pickle data stream.  If
+'file' is an integer, or is omitted, the pickler is list-based and the
+data is returned by getvalue()."""
+    if w_protocol is None and (
+            w_file is None or space.isinstance_w(w_file, space.w_int)):
+        proto = _check_protocol(space, w_file)
+        w_file = None
+    else:
+        proto = _check_protocol(space, w_protocol)
+        if space.findattr(w_file, space.newtext('write')) is None:
+            raise oefmt(space.w_TypeError,
+                        "argument must have 'write' attribute")
+    w_pickler = space.allocate_instance(W_Pickler, w_subtype)
+    W_Pickler.__init__(w_pickler, space, w_file, proto)
+    return w_pickler
+
+W_Pickler.typedef = TypeDef(
+    '_pickle.Pickler',
+    __new__ = interp2app(descr_new_pickler),
+    dump = interp2app(W_Pickler.descr_dump),
+    clear_memo = interp2app(W_Pickler.descr_clear_memo),
+    getvalue = interp2app(W_Pickler.descr_getvalue),
+    memo = GetSetProperty(W_Pickler.descr_get_memo, W_Pickler.descr_set_memo),
+    fast = GetSetProperty(W_Pickler.descr_get_fast, W_Pickler.descr_set_fast),
+    binary = GetSetProperty(W_Pickler.descr_get_binary),
+    proto = GetSetProperty(W_Pickler.descr_get_proto),
+    persistent_id = GetSetProperty(W_Pickler.descr_get_persistent_id,
+                                   W_Pickler.descr_set_persistent_id),
+    inst_persistent_id = GetSetProperty(
+        W_Pickler.descr_get_inst_persistent_id,
+        W_Pickler.descr_set_inst_persistent_id),
+    __doc__ = """Pickler(file, protocol=0)
+
+Objects that know how to pickle objects to a file, in one of the
+pickle protocols 0, 1 or 2.""")
+
+
+# ____________________________________________________________
+# Unpickling
+
+class Reader(object):
+    """Abstract source of pickle data."""
+
+    def __init__(self, space):
+        self.space = space
+
+    def eof(self):
+        return OperationError(self.space.w_EOFError, self.space.w_None)
+
+    def readchar(self):
+        raise NotImplementedError
+
+    def read(self, n):
+        raise NotImplementedError
+
+    def readline(self):
+        """Return the next line, without its final newline."""
+        raise NotImplementedError
+
+    def done(self):
+        pass
+
+
+class StringReader(Reader):
+    def __init__(self, space, data, pos=0):
+        Reader.__init__(self, space)
+        self.data = data
+        self.pos = pos
+
+    def readchar(self):
+        pos = self.pos
+        if pos >= len(self.data):
+            raise self.eof()
+        self.pos = pos + 1
+        return self.data[pos]
+
+    def read(self, n):
+        pos = self.pos
+        end = pos + n
+        if n < 0 or end > len(self.data):
+            raise self.eof()
+        self.pos = end
+        return self.data[pos:end]
+
+    def readline(self):
+        pos = self.pos
+        end = self.data.find('\n', pos)
+        if end < 0:
+            raise self.eof()
+        self.pos = end + 1
+        return self.data[pos:end]
+
+
+class CStringIOReader(StringReader):
+    """Reads directly from the buffer of a cStringIO input object, and
+    updates its position once the load is done."""
+
+    def __init__(self, space, w_file):
+        w_file.check_closed()
+        StringReader.__init__(self, space, w_file.string, w_file.pos)
+        self.w_file = w_file
+
+    def done(self):
+        self.w_file.pos = self.pos
+
+
+class FileReader(Reader):
+    def __init__(self, space, w_read, w_readline):
+        Reader.__init__(self, space)
+        self.w_read = w_read
+        self.w_readline = w_readline
+
+    def readchar(self):
+        return self.read(1)[0]
+
+    def read(self, n):
+        space = self.space
+        if n < 0:
+            raise self.eof()
+        w_data = space.call_function(self.w_read, space.newint(n))
+        data = space.bytes_w(w_data)
+        if len(data) < n:
+            raise self.eof()
+        return data
+
+    def readline(self):
+        space = self.space
+        data = space.bytes_w(space.call_function(self.w_readline))
+        end = len(data) - 1
+        if end < 0 or data[end] != '\n':
+            raise self.eof()
+        return data[:end]
+
+
+class W_Unpickler(W_Root):
+    def __init__(self, space, w_file):
+        self.space = space
+        self.w_file = w_file
+        self.w_read = None
+        self.w_readline = None
+        if w_file is not None and not isinstance(w_file, W_InputType):
+            self.w_read = space.getattr(w_file, space.newtext('read'))
+            self.w_readline = space.getattr(w_file, space.newtext('readline'))
+        # the memo is a list indexed by memo index, with holes set to
+        # None; very large indexes go to 'memo_extra' instead
+        self.memo_w = []
+        self.memo_extra = {}
+        self.w_find_global = None
+        self.w_persistent_load = None
+        self.stack_w = []
+        self.marks = []
+
+    def make_reader(self):
+        w_file = self.w_file
+        if isinstance(w_file, W_InputType):
+            return CStringIOReader(self.space, w_file)
+        return FileReader(self.space, self.w_read, self.w_readline)
+
+    # ---------- stack ----------
+
+    def fence(self):
+        if self.marks:
+            return self.marks[-1]
+        return 0
+
+    def push(self, w_obj):
+        self.stack_w.append(w_obj)
+
+    def pop(self):
+        if len(self.stack_w) <= self.fence():
+            raise unpickling_error(self.space, "unpickling stack underflow")
+        return self.stack_w.pop()
+
+    def peek(self):
+        if len(self.stack_w) <= self.fence():
+            raise unpickling_error(self.space, "unpickling stack underflow")
+        return self.stack_w[-1]
+
+    def pop_mark(self):
+        """Remove the topmost mark and return the items above it."""
+        if not self.marks:
+            raise unpickling_error(self.space, "could not find MARK")
+        mark = self.marks.pop()
+        items_w = self.stack_w[mark:]
+        del self.stack_w[mark:]
+        return items_w
+
+    # ---------- memo ----------
+
+    def memo_put(self, index, w_obj):
+        space = self.space
+        if index < 0:
+            raise oefmt(space.w_ValueError, "negative PUT argument")
+        memo_w = self.memo_w
+        if index < len(memo_w):
+            memo_w[index] = w_obj
+        elif index <= 2 * len(memo_w) + 1024:
+            while len(memo_w) < index:
+                memo_w.append(None)
+            memo_w.append(w_obj)
+        else:
+            self.memo_extra[index] = w_obj
+
+    def memo_get(self, index):
+        w_obj = None
+        if 0 <= index < len(self.memo_w):
+            w_obj = self.memo_w[index]
+        elif index in self.memo_extra:
+            w_obj = self.memo_extra[index]
+        if w_obj is None:
+            space = self.space
+            raise OperationError(space.w_KeyError, space.newint(index))
+        return w_obj
+
+    # ---------- main loop ----------
+
+    def load(self, reader):
+        self.stack_w = []
+        self.marks = []
+        try:
+            while True:
+                op = reader.readchar()
+                if op == STOP:
+                    break
+                self.dispatch(reader, op)
+            return self.pop()
+        finally:
+            self.stack_w = []
+            self.marks = []
+            reader.done()
+
+    def dispatch(self, reader, op):
+        space = self.space
+        if op == MARK:
+            self.marks.append(len(self.stack_w))
+        elif op == BININT1:
+            self.push(space.newint(ord(reader.readchar())))
+        elif op == BININT2:
+            s = reader.read(2)
+            self.push(space.newint(ord(s[0]) | (ord(s[1]) << 8)))
+        elif op == BININT:
+            self.push(space.newint(decode_int32(reader.read(4))))
+        elif op == BINPUT:
+            self.memo_put(ord(reader.readchar()), self.peek())
+        elif op == LONG_BINPUT:
+            index = decode_int32(reader.read(4))
+            if index < 0:
+                raise oefmt(space.w_ValueError,
+                            "negative LONG_BINPUT argument")
+            self.memo_put(index, self.peek())
+        elif op == BINGET:
+            self.push(self.memo_get(ord(reader.readchar())))
+        elif op == LONG_BINGET:
+            self.push(self.memo_get(decode_int32(reader.read(4))))
+        elif op == SHORT_BINSTRING:
+            n = ord(reader.readchar())
+            self.push(space.newbytes(reader.read(n)))
+        elif op == BINSTRING:
+            n = decode_int32(reader.read(4))
+            if n < 0:
+                raise unpickling_error(space,
+                                       "BINSTRING pickle has negative byte count")
+            self.push(space.newbytes(reader.read(n)))
+        elif op == BINUNICODE:
+            n = decode_int32(reader.read(4))
+            if n < 0:
+                raise unpickling_error(space,
+                                       "BINUNICODE pickle has negative byte count")
+            self.load_binunicode(reader.read(n))
+        elif op == BINFLOAT:
+            self.push(space.newfloat(ieee.unpack_float(reader.read(8), True)))
+        elif op == NONE:
+            self.push(space.w_None)
+        elif op == NEWTRUE:
+            self.push(space.w_True)
+        elif op == NEWFALSE:
+            self.push(space.w_False)
+        elif op == EMPTY_LIST:
+            self.push(space.newlist([]))
+        elif op == EMPTY_DICT:
+            self.push(space.newdict())
+        elif op == EMPTY_TUPLE:
+            self.push(space.newtuple([]))
+        elif op == TUPLE1:
+            w_a = self.pop()
+            self.push(space.newtuple([w_a]))
+        elif op == TUPLE2:
+            w_b = self.pop()
+            w_a = self.pop()
+            self.push(space.newtuple([w_a, w_b]))
+        elif op == TUPLE3:
+            w_c = self.pop()
+            w_b = self.pop()
+            w_a = self.pop()
+            self.push(space.newtuple([w_a, w_b, w_c]))
+        elif op == TUPLE:
+            self.push(space.newtuple(self.pop_mark()))
+        elif op == LIST:
+            self.push(space.newlist(self.pop_mark()))
+        elif op == DICT:
+            self.load_dict()
+        elif op == APPEND:
+            self.load_append()
+        elif op == APPENDS:
+            self.load_appends()
+        elif op == SETITEM:
+            self.load_setitem()
+        elif op == SETITEMS:
+            self.load_setitems()
+        elif op == BUILD:
+            self.load_build()
+        elif op == GLOBAL:
+            module = reader.readline()
+            name = reader.readline()
+            self.push(self.find_class(module, name))
+        elif op == NEWOBJ:
+            self.load_newobj()
+        elif op == REDUCE:
+            w_args = self.pop()
+            w_func = self.peek()
+            self.stack_w[-1] = space.call(w_func, w_args)
+        elif op == OBJ:
+            items_w = self.pop_mark()
+            if not items_w:
+                raise unpickling_error(space, "unpickling stack underflow")
+            self.instantiate(items_w[0], items_w[1:])
+        elif op == INST:
+            module = reader.readline()
+            name = reader.readline()
+            w_klass = self.find_class(module, name)
+            self.instantiate(w_klass, self.pop_mark())
+        elif op == PROTO:
+            proto = ord(reader.readchar())
+            if proto > HIGHEST_PROTOCOL:
+                raise oefmt(space.w_ValueError,
+                            "unsupported pickle protocol: %d", proto)
+        elif op == POP:
+            if self.marks and self.marks[-1] == len(self.stack_w):
+                self.marks.pop()
+            else:
+                self.pop()
+        elif op == POP_MARK:
+            self.pop_mark()
+        elif op == DUP:
+            self.push(self.peek())
+        elif op == INT:
+            self.load_int(reader.readline())
+        elif op == LONG:
+            self.load_long(reader.readline())
+        elif op == FLOAT:
+            self.load_float(reader.readline())
+        elif op == STRING:
+            self.load_string(reader.readline())
+        elif op == UNICODE:
+            utf8, length = decode_raw_unicode_escape(space, reader.readline())
+            self.push(space.newutf8(utf8, length))
+        elif op == PUT:
+            self.memo_put(self.parse_index(reader.readline()), self.peek())
+        elif op == GET:
+            self.push(self.memo_get(self.parse_index(reader.readline())))
+        elif op == LONG1:
+            n = ord(reader.readchar())
+            self.load_long_binary(reader.read(n))
+        elif op == LONG4:
+            n = decode_int32(reader.read(4))
+            if n < 0:
+                raise unpickling_error(space,
+                                       "LONG pickle has negative byte count")
+            self.load_long_binary(reader.read(n))
+        elif op == EXT1:
+            self.load_extension(ord(reader.readchar()))
+        elif op == EXT2:
+            s = reader.read(2)
+            self.load_extension(ord(s[0]) | (ord(s[1]) << 8))
+        elif op == EXT4:
+            self.load_extension(decode_int32(reader.read(4)))
+        elif op == PERSID:
+            self.push(self.persistent_load(space.newbytes(reader.readline())))
+        elif op == BINPERSID:
+            w_pid = self.pop()
+            self.push(self.persistent_load(w_pid))
+        else:
+            raise unpickling_error(space, "invalid load key, '%s'." % op)
+
+    # ---------- individual opcodes ----------
+
+    def parse_index(self, s):
+        try:
+            return string_to_int(s)
+        except (ParseStringError, ParseStringOverflowError):
+            raise oefmt(self.space.w_ValueError,
+                        "invalid memo index: '%s'", s)
+
+    def load_int(self, s):
+        space = self.space
+        if s == '01':
+            self.push(space.w_True)
+            return
+        if s == '00':
+            self.push(space.w_False)
+            return
+        try:
+            self.push(space.newint(string_to_int(s)))
+        except (ParseStringError, ParseStringOverflowError):
+            # too large for an int, or invalid: let int() sort it out
+            self.push(space.call_function(space.w_int, space.newbytes(s)))
+
+    def load_long(self, s):
+        space = self.space
+        self.push(space.call_function(space.w_long, space.newbytes(s),
+                                      space.newint(0)))
+
+    def load_long_binary(self, data):
+        bigint = rbigint.frombytes(data, 'little', True)
+        self.push(self.space.newlong_from_rbigint(bigint))
+
+    def load_float(self, s):
+        space = self.space
+        try:
+            value = string_to_float(s)
+        except ParseStringError as e:
+            raise OperationError(space.w_ValueError, space.newtext(e.msg))
+        self.push(space.newfloat(value))
+
+    def load_string(self, s):
+        space = self.space
+        end = len(s) - 1
+        if end < 1 or (s[0] != "'" and s[0] != '"') or s[end] != s[0]:
+            raise oefmt(space.w_ValueError, "insecure string pickle")
+        self.push(space.newbytes(
+            PyString_DecodeEscape(space, s[1:end], 'strict', None)))
+
+    def load_binunicode(self, data):
+        length = check_utf8_or_raise(self.space, data)
+        self.push(self.space.newutf8(data, length))
+
+    def load_dict(self):
+        space = self.space
+        items_w = self.pop_mark()
+        if len(items_w) & 1:
+            raise unpickling_error(space, "odd number of items for DICT")
+        w_dict = space.newdict()
+        assert isinstance(w_dict, W_DictMultiObject)
+        for i in range(0, len(items_w), 2):
+            w_dict.setitem(items_w[i], items_w[i + 1])
+        self.push(w_dict)
+
+    def load_append(self):
+        space = self.space
+        w_value = self.pop()
+        w_list = self.peek()
+        if _is_exact_list(space, w_list):
+            assert isinstance(w_list, W_ListObject)
+            w_list.append(w_value)
+        else:
+            space.call_method(w_list, 'append', w_value)
+
+    def load_appends(self):
+        space = self.space
+        items_w = self.pop_mark()
+        w_list = self.peek()
+        # building the new list picks the best strategy for the items,
+        # which the target list then adopts or merges with directly
+        w_items = space.newlist(items_w)
+        if _is_exact_list(space, w_list):
+            assert isinstance(w_list, W_ListObject)
+            w_list.extend(w_items)
+        else:
+            space.call_method(w_list, 'extend', w_items)
+
+    def load_setitem(self):
+        space = self.space
+        w_value = self.pop()
+        w_key = self.pop()
+        w_dict = self.peek()
+        if _is_exact_dict(space, w_dict):
+            assert isinstance(w_dict, W_DictMultiObject)
+            w_dict.setitem(w_key, w_value)
+        else:
+            space.setitem(w_dict, w_key, w_value)
+
+    def load_setitems(self):
+        space = self.space
+        items_w = self.pop_mark()
+        if len(items_w) & 1:
+            raise unpickling_error(space, "odd number of items for SETITEMS")
+        w_dict = self.peek()
+        if _is_exact_dict(space, w_dict):
+            assert isinstance(w_dict, W_DictMultiObject)
+            for i in range(0, len(items_w), 2):
+                w_dict.setitem(items_w[i], items_w[i + 1])
+        else:
+            for i in range(0, len(items_w), 2):
+                space.setitem(w_dict, items_w[i], items_w[i + 1])
+
+    def load_newobj(self):
+        space = self.space
+        w_args = self.pop()
+        w_cls = self.peek()
+        w_new = space.getattr(w_cls, space.newtext('__new__'))
+        args_w = [w_cls] + space.fixedview(w_args)
+        self.stack_w[-1] = space.call(w_new, space.newtuple(args_w))
+
+    def load_build(self):
+        space = self.space
+        w_state = self.pop()
+        w_inst = self.peek()
+        w_setstate = space.findattr(w_inst, space.newtext('__setstate__'))
+        if w_setstate is not None:
+            space.call_function(w_setstate, w_state)
+            return
+        w_slotstate = None
+        if (space.isinstance_w(w_state, space.w_tuple) and
+                space.len_w(w_state) == 2):
+            w_state, w_slotstate = space.fixedview(w_state, 2)
+        if space.is_true(w_state):
+            w_dict = space.getattr(w_inst, space.newtext('__dict__'))
+            is_dict = _is_exact_dict(space, w_dict)
+            w_items = space.call_method(w_state, 'items')
+            for w_item in space.listview(w_items):
+                w_key, w_value = space.fixedview(w_item, 2)
+                if space.type(w_key) is space.w_bytes:
+                    w_key = space.new_interned_w_str(w_key)
+                if is_dict:
+                    assert isinstance(w_dict, W_DictMultiObject)
+                    w_dict.setitem(w_key, w_value)
+                else:
+                    space.setitem(w_dict, w_key, w_value)
+        if w_slotstate is not None and space.is_true(w_slotstate):
+            w_items = space.call_method(w_slotstate, 'items')
+            for w_item in space.listview(w_items):
+                w_key, w_value = space.fixedview(w_item, 2)
+                space.setattr(w_inst, w_key, w_value)
+
+    def instantiate(self, w_klass, args_w):
+        space = self.space
+        if (not args_w and isinstance(w_klass, W_ClassObject) and
+                space.findattr(w_klass,
+                               space.newtext('__getinitargs__')) is None):
+            # old-style class: create the instance without calling
+            # its __init__
+            w_value = w_klass.instantiate(space)
+        else:
+            try:
+                w_value = space.call(w_klass, space.newtuple(args_w))
+            except OperationError as e:
+                if not e.match(space, space.w_TypeError):
+                    raise
+                w_name = space.findattr(w_klass, space.newtext('__name__'))
+                if w_name is None:
+                    w_name = w_klass
+                raise oefmt(space.w_TypeError, "in constructor for %s: %s",
+                            space.text_w(space.str(w_name)),
+                            e.errorstr(space, use_repr=False))
+        self.push(w_value)
+
+    def find_class(self, module, name):
+        space = self.space
+        w_module = space.newtext(module)
+        w_name = space.newtext(name)
+        if self.w_find_global is not None:
+            if space.is_w(self.w_find_global, space.w_None):
+                raise unpickling_error(space,
+                    "Global and instance pickles are not supported.")
+            return space.call_function(self.w_find_global, w_module, w_name)
+        space.call_function(space.builtin.get('__import__'), w_module)
+        w_mod = space.getitem(space.sys.get('modules'), w_module)
+        return space.getattr(w_mod, w_name)
+
+    def load_extension(self, code):
+        space = self.space
+        w_find_class = space.newtext('find_class')
+        self.push(get_extension(space, space.newint(code),
+                                space.getattr(self, w_find_class)))
+
+    def persistent_load(self, w_pid):
+        space = self.space
+        if self.w_persistent_load is None:
+            raise unpickling_error(space,
+                "A load persistent id instruction was encountered,\n"
+                "but no persistent_load function was specified.")
+        return space.call_function(self.w_persistent_load, w_pid)
+
+    # ---------- app-level interface ----------
+
+    def descr_load(self, space):
+        """Load a pickle."""
+        return self.load(self.make_reader())
+
+    def descr_find_class(self, space, w_module, w_name):
+        return self.find_class(space.text_w(w_module), space.text_w(w_name))
+
+    def descr_get_memo(self, space):
+        w_memo = space.newdict()
+        for index in range(len(self.memo_w)):
+            w_obj = self.memo_w[index]
+            if w_obj is not None:
+                space.setitem(w_memo, space.newint(index), w_obj)
+        for index, w_obj in self.memo_extra.items():
+            space.setitem(w_memo, space.newint(index), w_obj)
+        return w_memo
+
+    def descr_set_memo(self, space, w_memo):
+        if not space.isinstance_w(w_memo, space.w_dict):
+            raise oefmt(space.w_TypeError, "memo must be a dictionary")
+        self.memo_w = []
+        self.memo_extra = {}
+        w_items = space.call_method(w_memo, 'items')
+        for w_item in space.listview(w_items):
+            w_key, w_value = space.fixedview(w_item, 2)
+            self.memo_put(space.int_w(space.int(w_key)), w_value)
+
+    def descr_get_find_global(self, space):
+        return space.wrap_none(self.w_find_global)
+
+    def descr_set_find_global(self, space, w_func):
+        self.w_find_global = w_func
+
+    def descr_get_persistent_load(self, space):
+        return space.wrap_none(self.w_persistent_load)
+
+    def descr_set_persistent_load(self, space, w_func):
+        self.w_persistent_load = None if space.is_none(w_func) else w_func
+
+
+def descr_new_unpickler(space, w_subtype, w_file):
+    """Unpickler(file) -- Create an unpickler.
+
+This takes a file-like object with read() and readline() methods,
+from which the pickle data stream is read."""
+    w_unpickler = space.allocate_instance(W_Unpickler, w_subtype)
+    W_Unpickler.__init__(w_unpickler, space, w_file)
+    return w_unpickler
+
+W_Unpickler.typedef = TypeDef(
+    '_pickle.Unpickler',
+    __new__ = interp2app(descr_new_unpickler),
+    load = interp2app(W_Unpickler.descr_load),
+    find_class = interp2app(W_Unpickler.descr_find_class),
+    memo = GetSetProperty(W_Unpickler.descr_get_memo,
+                          W_Unpickler.descr_set_memo),
+    find_global = GetSetProperty(W_Unpickler.descr_get_find_global,
+                                 W_Unpickler.descr_set_find_global),
+    persistent_load = GetSetProperty(W_Unpickler.descr_get_persistent_load,
+                                     W_Unpickler.descr_set_persistent_load),
+    __doc__ = """Unpickler(file)
+
+Objects that know how to unpickle.""")
+
+
+# ____________________________________________________________
+
+def dump(space, w_obj, w_file, w_protocol=None):
+    """dump(obj, file, protocol=0) -- Write an object in pickle format
+to the given file."""
+    proto = _check_protocol(space, w_protocol)
+    W_Pickler(space, w_file, proto).dump(w_obj)
+
+def dumps(space, w_obj, w_protocol=None):
+    """dumps(obj, protocol=0) -- Return a string containing an object
+in pickle format."""
+    proto = _check_protocol(space, w_protocol)
+    pickler = W_Pickler(space, None, proto)
+    pickler.dump(w_obj)
+    return space.newbytes(pickler.output.build())
+
+def load(space, w_file):
+    """load(file) -- Load a pickle from the given file"""
+    unpickler = W_Unpickler(space, w_file)
+    return unpickler.load(unpickler.make_reader())
+
+@unwrap_spec(data='bufferstr')
+def loads(space, data):
+    """loads(string) -- Load a pickle from the given string"""
+    unpickler = W_Unpickler(space, None)
+    return unpickler.load(StringReader(space, data))
@@ -0,0 +1,26 @@
+from pypy.interpreter.mixedmodule import MixedModule
+
+
+class Module(MixedModule):
+    """Fast interp-level implementation of the cPickle Pickler and
+Unpickler, supporting the pickle protocols 0, 1 and 2.  The pure
+Python version in lib_pypy/cPickle.py is used when this module is
+not available."""
+
+    appleveldefs = {
+        'PickleError':      'app_pickle.PickleError',
+        'PicklingError':    'app_pickle.PicklingError',
+        'UnpicklingError':  'app_pickle.UnpicklingError',
+        }
+
+    interpleveldefs = {
+        'HIGHEST_PROTOCOL': 'space.newint(interp_pickle.HIGHEST_PROTOCOL)',
+
+        'Pickler':   'interp_pickle.W_Pickler',
+        'Unpickler': 'interp_pickle.W_Unpickler',
+
+        'dump':      'interp_pickle.dump',
+        'dumps':     'interp_pickle.dumps',
+        'load':      'interp_pickle.load',
+        'loads':     'interp_pickle.loads',
+        }
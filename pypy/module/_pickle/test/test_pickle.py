@@ -0,0 +1,304 @@
+from pypy.module._pickle.interp_pickle import (
+    encode_int32, decode_int32, encode_long)
+from rpython.rlib.rbigint import rbigint
+
+
+def test_int32():
+    for value in [0, 1, 255, 256, 65535, 2 ** 31 - 1, -1, -2 ** 31]:
+        s = encode_int32(value)
+        assert len(s) == 4
+        assert decode_int32(s) == value
+
+def test_encode_long():
+    for value, expected in [(0, ''), (255, '\xff\x00'), (32767, '\xff\x7f'),
+                            (-256, '\x00\xff'), (-32768, '\x00\x80'),
+                            (-128, '\x80'), (127, '\x7f'), (-1, '\xff'),
+                            (128, '\x80\x00'), (-129, '\x7f\xff')]:
+        assert encode_long(rbigint.fromlong(value)) == expected
+
+
+class AppTestPickle(object):
+    spaceconfig = dict(usemodules=['_pickle', 'cStringIO', 'struct',
+                                   'binascii'])
+
+    def test_simple_roundtrip(self):
+        import _pickle
+        data = [None, True, False, 0, 1, -1, 255, 256, 65535, 65536,
+                2 ** 31 - 1, -2 ** 31, 2 ** 40, -2 ** 40, 12345678901234567890,
+                -12345678901234567890, 0L, 1.5, -0.0, 1e300, float('inf'),
+                'abc', 'a\x00\xa0\n\'"\\', u'\u03c0\n\\', u'', '',
+                (), (1,), (1, 2), (1, 2, 3), (1, 2, 3, 4), [], {},
+                {'a': 1, 'b': [2, 3]}, [1.5, 2.5], range(2000)]
+        for proto in range(3):
+            s = _pickle.dumps(data, proto)
+            assert _pickle.loads(s) == data
+            for x in data:
+                y = _pickle.loads(_pickle.dumps(x, proto))
+                assert y == x and type(y) is type(x)
+
+    def test_output_matches_pickle(self):
+        import _pickle, pickle
+        data = [1, 'abc', u'def', (1, 2), {'x': 1.5}, None, True, 2 ** 70]
+        for proto in range(3):
+            expected = pickle.dumps(data, proto)
+            got = _pickle.dumps(data, proto)
+            # cPickle starts counting memo indexes at 1
+            assert pickle.loads(got) == data
+            assert len(got) == len(expected)
+
+    def test_load_canned(self):
+        import _pickle
+        assert _pickle.loads('N.') is None
+        assert _pickle.loads('\x88.') is True
+        assert _pickle.loads('I01\n.') is True
+        assert _pickle.loads('I00\n.') is False
+        assert _pickle.loads("S'a\\x00\\xa0'\n.") == 'a\x00\xa0'
+        assert _pickle.loads('U\x03a\x00\xa0.') == 'a\x00\xa0'
+        assert _pickle.loads('V\\u03c0\n.') == u'\u03c0'
+        assert _pickle.loads('X\x02\x00\x00\x00\xcf\x80.') == u'\u03c0'
+        assert _pickle.loads('I9223372036854775807\n.') == 2 ** 63 - 1
+        assert _pickle.loads('L12345678901234567890L\n.') == \
+            12345678901234567890
+        l = _pickle.loads('(]r\x00\x00\x01\x00j\x00\x00\x01\x00t.')
+        assert l == ([], [])
+        assert l[0] is l[1]
+        l = _pickle.loads('((lp100000\ng100000\nt.')
+        assert l[0] is l[1]
+
+    def test_errors(self):
+        import _pickle
+        raises(EOFError, _pickle.loads, '')
+        raises(EOFError, _pickle.loads, 'N')
+        raises(EOFError, _pickle.loads, 'I0')
+        raises(EOFError, _pickle.loads, 'T\x03\x00\x00\x00ab')
+        raises(KeyError, _pickle.loads, 'g0\np0\n')
+        raises(_pickle.UnpicklingError, _pickle.loads, '0')
+        raises(_pickle.UnpicklingError, _pickle.loads, 'N(\x85')
+        raises(_pickle.UnpicklingError, _pickle.loads, '(.')
+        raises(ValueError, _pickle.loads, "S'abc\n.")
+        raises(ValueError, _pickle.loads, "S'\\'\n.")
+        raises(ValueError, _pickle.loads, 'I123JUNK\n.')
+        raises(ValueError, _pickle.dumps, 1, 3)
+
+    def test_exceptions_are_shared_with_pickle(self):
+        import _pickle, pickle
+        assert _pickle.PicklingError is pickle.PicklingError
+        assert _pickle.UnpicklingError is pickle.UnpicklingError
+
+    def test_memo_sharing(self):
+        import _pickle
+        a = ['x']
+        for proto in range(3):
+            b = _pickle.loads(_pickle.dumps([a, a, (a, a)], proto))
+            assert b[0] is b[1] is b[2][0] is b[2][1]
+
+    def test_recursive(self):
+        import _pickle
+        l = []
+        l.append(l)
+        d = {}
+        d[1] = d
+        for proto in range(3):
+            x = _pickle.loads(_pickle.dumps(l, proto))
+            assert x[0] is x
+            y = _pickle.loads(_pickle.dumps(d, proto))
+            assert y[1] is y
+            t = ([],)
+            t[0].append(t)
+            z = _pickle.loads(_pickle.dumps(t, proto))
+            assert z[0][0] is z
+
+    def test_instances(self):
+        import _pickle
+        class C:
+            pass
+        class D(object):
+            def __init__(self, x):
+                self.x = x
+        class E(object):
+            __slots__ = ['a']
+        import sys, types
+        mod = sys.modules['_pickle_test_mod'] = types.ModuleType('mod')
+        mod.C, mod.D, mod.E = C, D, E
+        C.__module__ = D.__module__ = E.__module__ = '_pickle_test_mod'
+        try:
+            c = C()
+            c.foo = [1, 2]
+            d = D(42)
+            for proto in range(3):
+                c2, d2, cls = _pickle.loads(_pickle.dumps((c, d, D), proto))
+                assert c2.__class__ is C and c2.foo == [1, 2]
+                assert type(d2) is D and d2.x == 42
+                assert cls is D
+            e = E()
+            e.a = 5
+            e2 = _pickle.loads(_pickle.dumps(e, 2))
+            assert e2.a == 5
+        finally:
+            del sys.modules['_pickle_test_mod']
+
+    def test_globals(self):
+        import _pickle, os
+        for proto in range(3):
+            assert _pickle.loads(_pickle.dumps(len, proto)) is len
+            assert _pickle.loads(_pickle.dumps(os.path.join, proto)) \
+                is os.path.join
+        def f():
+            pass
+        raises(_pickle.PicklingError, _pickle.dumps, f)
+
+    def test_extension_registry(self):
+        import _pickle, copy_reg, collections
+        copy_reg.add_extension('collections', 'OrderedDict', 0x1234)
+        try:
+            s = _pickle.dumps(collections.OrderedDict, 2)
+            assert '\x83\x34\x12' in s
+            assert _pickle.loads(s) is collections.OrderedDict
+        finally:
+            copy_reg.remove_extension('collections', 'OrderedDict', 0x1234)
+
+    def test_file_pickler(self):
+        import _pickle, cStringIO, StringIO
+        for cls in [cStringIO.StringIO, StringIO.StringIO]:
+            f = cls()
+            p = _pickle.Pickler(f, 2)
+            assert p.dump([1, 2]) is p
+            p.dump('abc')
+            data = f.getvalue()
+            f = cls(data + 'extra')
+            u = _pickle.Unpickler(f)
+            assert u.load() == [1, 2]
+            assert u.load() == 'abc'
+            assert f.read() == 'extra'
+            raises(EOFError, u.load)
+
+    def test_list_pickler(self):
+        import _pickle
+        p = _pickle.Pickler(1)
+        p.dump((1, 2))
+        assert _pickle.loads(p.getvalue()) == (1, 2)
+        p = _pickle.Pickler()
+        p.dump('x')
+        assert _pickle.loads(p.getvalue()) == 'x'
+        import cStringIO
+        p = _pickle.Pickler(cStringIO.StringIO())
+        raises(_pickle.PicklingError, p.getvalue)
+
+    def test_clear_memo(self):
+        import _pickle, cStringIO
+        data = ["abcdefg", "abcdefg", 44]
+        f = cStringIO.StringIO()
+        p = _pickle.Pickler(f)
+        p.dump(data)
+        first = f.getvalue()
+        f.seek(0)
+        f.truncate()
+        p.dump(data)
+        second = f.getvalue()
+        p.clear_memo()
+        f.seek(0)
+        f.truncate()
+        p.dump(data)
+        assert first != second
+        assert f.getvalue() == first
+
+    def test_priming_memo(self):
+        import _pickle, cStringIO
+        data = ["abcdefg", "abcdefg", 44]
+        f = cStringIO.StringIO()
+        p = _pickle.Pickler(f)
+        p.dump(data)
+        first = f.getvalue()
+        f = cStringIO.StringIO()
+        primed = _pickle.Pickler(f)
+        primed.memo = p.memo
+        primed.dump(data)
+        assert f.getvalue() != first
+        u = _pickle.Unpickler(cStringIO.StringIO(first))
+        data1 = u.load()
+        u2 = _pickle.Unpickler(cStringIO.StringIO(f.getvalue()))
+        u2.memo = u.memo
+        assert u2.load() is data1
+
+    def test_persistent(self):
+        import _pickle, cStringIO
+        def persistent_id(obj):
+            if isinstance(obj, int) and obj % 2 == 0:
+                return str(obj)
+            return None
+        loaded = []
+        def persistent_load(pid):
+            loaded.append(pid)
+            return int(pid)
+        for proto in range(3):
+            del loaded[:]
+            f = cStringIO.StringIO()
+            p = _pickle.Pickler(f, proto)
+            p.persistent_id = persistent_id
+            p.dump(range(5))
+            u = _pickle.Unpickler(cStringIO.StringIO(f.getvalue()))
+            raises(_pickle.UnpicklingError, u.load)
+            u = _pickle.Unpickler(cStringIO.StringIO(f.getvalue()))
+            u.persistent_load = persistent_load
+            assert u.load() == range(5)
+            assert loaded == ['0', '2', '4']
+
+    def test_find_global(self):
+        import _pickle, cStringIO
+        s = _pickle.dumps(len)
+        u = _pickle.Unpickler(cStringIO.StringIO(s))
+        u.find_global = None
+        raises(_pickle.UnpicklingError, u.load)
+        u = _pickle.Unpickler(cStringIO.StringIO(s))
+        u.find_global = lambda module, name: (module, name)
+        assert u.load() == ('__builtin__', 'len')
+
+    def test_fast(self):
+        import _pickle, cStringIO
+        f = cStringIO.StringIO()
+        p = _pickle.Pickler(f, 2)
+        p.fast = 1
+        a = ['x']
+        p.dump([a, a])
+        b = _pickle.loads(f.getvalue())
+        assert b == [['x'], ['x']]
+        assert b[0] is not b[1]
+
+    def test_strategies(self):
+        import _pickle
+        from __pypy__ import strategy
+        for proto in range(3):
+            l = _pickle.loads(_pickle.dumps([1, 2, 3], proto))
+            assert strategy(l) == "IntegerListStrategy"
+            l = _pickle.loads(_pickle.dumps([1.5, 2.5], proto))
+            assert strategy(l) == "FloatListStrategy"
+            d = _pickle.loads(_pickle.dumps({'a': 1, 'b': 2}, proto))
+            assert strategy(d) == "BytesDictStrategy"
+
+    def test_subclasses(self):
+        import _pickle
+        import collections
+        class L(list):
+            pass
+        class Dct(dict):
+            pass
+        import sys, types
+        mod = sys.modules['_pickle_test_mod'] = types.ModuleType('mod')
+        mod.L, mod.Dct = L, Dct
+        L.__module__ = Dct.__module__ = '_pickle_test_mod'
+        try:
+            for proto in range(3):
+                l = _pickle.loads(_pickle.dumps(L([1, 2]), proto))
+                assert type(l) is L and l == [1, 2]
+                d = _pickle.loads(_pickle.dumps(Dct(a=1), proto))
+                assert type(d) is Dct and d == {'a': 1}
+                od = collections.OrderedDict([(3, 4), (1, 2)])
+                od2 = _pickle.loads(_pickle.dumps(od, proto))
+                assert od2 == od and list(od2) == list(od)
+        finally:
+            del sys.modules['_pickle_test_mod']
+
+    def test_cpickle_uses_pickle_module(self):
+        import cPickle, _pickle
+        assert cPickle.Pickler is _pickle.Pickler
+        assert cPickle.loads is _pickle.loads
@@ -4,9 +4,11 @@ from rpython.rlib.objectmodel import specialize, always_inline
 from rpython.rlib import rfloat, runicode, jit, objectmodel, rutf8
 from rpython.rtyper.lltypesystem import lltype, rffi
 from rpython.rlib.rarithmetic import r_uint
-from pypy.interpreter.error import oefmt
+from pypy.interpreter.error import OperationError, oefmt
 from pypy.interpreter import unicodehelper
 from pypy.interpreter.baseobjspace import W_Root
+from pypy.interpreter.gateway import interp2app, unwrap_spec
+from pypy.interpreter.typedef import TypeDef
 from pypy.module._pypyjson import simd
 
 OVF_DIGITS = len(str(sys.maxint))
@@ -77,15 +79,10 @@ class JSONDecoder(W_Root):
         self.space = space
         self.w_empty_string = space.newutf8("", 0)
 
-        self.s = s
-
-        # we put our string in a raw buffer so:
-        # 1) we automatically get the '\0' sentinel at the end of the string,
-        #    which means that we never have to check for the "end of string"
-        # 2) we can pass the buffer directly to strtod
-        self.ll_chars, self.llobj, self.flag = rffi.get_nonmovingbuffer_ll_final_null(self.s)
-        self.end_ptr = lltype.malloc(rffi.CCHARPP.TO, 1, flavor='raw')
-        self.pos = 0
+        # total size of the input seen so far, used to decide whether string
+        # caching is worth it. Bigger than len(self.s) when streaming.
+        self.input_size = 0
+        self._init_buffer(s)
         self.intcache = space.fromcache(IntCache)
 
         # two caches, one for keys, one for general strings. they both have the
@@ -112,6 +109,22 @@ class JSONDecoder(W_Root):
         # object, before they get copied into the eventual dict
         self.scratch = [[None] * self.DEFAULT_SIZE_SCRATCH]
 
+    def _init_buffer(self, s):
+        self.s = s
+        self.input_size += len(s)
+
+        # we put our string in a raw buffer so:
+        # 1) we automatically get the '\0' sentinel at the end of the string,
+        #    which means that we never have to check for the "end of string"
+        # 2) we can pass the buffer directly to strtod
+        self.ll_chars, self.llobj, self.flag = rffi.get_nonmovingbuffer_ll_final_null(self.s)
+        self.end_ptr = lltype.malloc(rffi.CCHARPP.TO, 1, flavor='raw')
+        self.pos = 0
+
+    def reset(self, s):
+        """ Start decoding the new string s, after a call to close(). All the
+        caches are kept, which is what the stream decoder relies on. """
+        self._init_buffer(s)
 
     def close(self):
         rffi.free_nonmovingbuffer_ll(self.ll_chars, self.llobj, self.flag)
@@ -121,6 +134,7 @@ class JSONDecoder(W_Root):
             jsonmap = self._get_jsonmap_from_dict(w_obj)
             if jsonmap.is_state_blocked():
                 self._devolve_jsonmap_dict(w_obj)
+        self.unclear_objects = []
 
     def getslice(self, start, end):
         assert start >= 0
@@ -566,7 +580,7 @@ class JSONDecoder(W_Root):
             contextmap.decoded_strings += 1
             if not contextmap.should_cache_strings():
                 cache = False
-        if len(self.s) < self.MIN_SIZE_FOR_STRING_CACHE:
+        if self.input_size < self.MIN_SIZE_FOR_STRING_CACHE:
             cache = False
 
         if not cache:
@@ -1192,3 +1206,271 @@ def loads(space, w_s):
     finally:
         decoder.close()
 
+
+
+class W_JSONStreamDecoder(W_Root):
+    """ Iterator decoding a sequence of JSON values (or the items of one
+    top-level JSON array) read in chunks from a file or an iterator. Every
+    value is copied out of the chunk buffer and decoded on its own, reusing
+    one JSONDecoder so that the key maps and the string caches are shared
+    between the values. """
+
+    # states for the top-level array mode
+    ARRAY_START = 0
+    ARRAY_ITEMS = 1
+    ARRAY_AFTER_ITEM = 2
+    DONE = 3
+
+    def __init__(self, space, w_source, array, chunksize):
+        self.space = space
+        self.w_read = space.findattr(w_source, space.newtext('read'))
+        if self.w_read is None:
+            self.w_iter = space.iter(w_source)
+        else:
+            self.w_iter = None
+        self.array = array
+        self.chunksize = chunksize
+        self.state = self.ARRAY_START
+        # the not yet decoded input is self.buf[self.bufpos:]
+        self.buf = ''
+        self.bufpos = 0
+        # number of bytes dropped from the front of self.buf, for messages
+        self.consumed = 0
+        # the source has no more input; self.eof is only set once the
+        # input read until then has been looked at, too
+        self.exhausted = False
+        self.eof = False
+        self.decoder = None
+
+    def descr_iter(self, space):
+        return self
+
+    def descr_next(self, space):
+        start = self._find_next_value()
+        if start < 0:
+            self.state = self.DONE
+            raise OperationError(space.w_StopIteration, space.w_None)
+        end = self._scan_value(start)
+        start = self.bufpos     # may have been moved by _read_more()
+        assert end >= start
+        s = self.buf[start:end]
+        self.bufpos = end
+        if self.array:
+            self.state = self.ARRAY_AFTER_ITEM
+        return self._decode(s)
+
+    @jit.dont_look_inside
+    def _decode(self, s):
+        space = self.space
+        decoder = self.decoder
+        if decoder is None:
+            decoder = self.decoder = JSONDecoder(space, s)
+        else:
+            decoder.reset(s)
+        try:
+            w_res = decoder.decode_any(0)
+            i = decoder.skip_whitespace(decoder.pos)
+            if i < len(s):
+                start = self.consumed + self.bufpos - len(s) + i
+                raise oefmt(space.w_ValueError,
+                            "Extra data: char %d - %d", start,
+                            self.consumed + self.bufpos - 1)
+            return w_res
+        finally:
+            decoder.close()
+
+    def _read_chunk(self, size):
+        """ Return the next chunk of input, or None at the end. 'size' is
+        only used for file-like sources. """
+        space = self.space
+        if self.w_read is not None:
+            w_chunk = space.call_function(self.w_read, space.newint(size))
+        else:
+            try:
+                w_chunk = space.next(self.w_iter)
+            except OperationError as e:
+                if not e.match(space, space.w_StopIteration):
+                    raise
+                return None
+        if space.isinstance_w(w_chunk, space.w_unicode):
+            raise oefmt(space.w_TypeError,
+                        "Expected utf8-encoded str, got unicode")
+        chunk = space.bytes_w(w_chunk)
+        if not chunk and self.w_read is not None:
+            return None
+        return chunk
+
+    def _read_more(self):
+        """ Append more input to self.buf, dropping the already consumed
+        part. Returns by how much the positions in self.buf moved.
+
+        At least as much input as is still pending is read, so that a value
+        spanning many chunks makes self.buf grow geometrically instead of
+        being copied once per chunk. """
+        if self.eof:
+            return 0
+        if self.exhausted:
+            self.eof = True
+            return 0
+        shift = self.bufpos
+        assert shift >= 0
+        pending = len(self.buf) - shift
+        want = max(self.chunksize, pending)
+        builder = StringBuilder(pending + want)
+        builder.append_slice(self.buf, shift, len(self.buf))
+        got = 0
+        while True:
+            chunk = self._read_chunk(want)
+            if chunk is None:
+                self.exhausted = True
+                break
+            builder.append(chunk)
+            got += len(chunk)
+            # a file-like source got asked for 'want' bytes already, don't
+            # block on it for more than that
+            if got >= want or (self.w_read is not None and got > 0):
+                break
+        if got == 0:
+            self.eof = True
+            return 0
+        self.buf = builder.build()
+        self.bufpos = 0
+        self.consumed += shift
+        return shift
+
+    def _skip_whitespace(self, i):
+        """ Return the position of the next non-whitespace character, reading
+        more input if needed, or -1 at the end of the input. """
+        while True:
+            buf = self.buf
+            while i < len(buf):
+                if not is_whitespace(buf[i]):
+                    return i
+                i += 1
+            i -= self._read_more()
+            if self.eof:
+                return -1
+
+    def _find_next_value(self):
+        """ Return the position in self.buf where the next value starts, or
+        -1 if there are no more values. Moves self.bufpos there. """
+        space = self.space
+        i = self._skip_whitespace(self.bufpos)
+        if not self.array:
+            if i >= 0:
+                self.bufpos = i
+            return i
+        if self.state == self.DONE:
+            return -1
+        if self.state == self.ARRAY_START:
+            if i < 0 or self.buf[i] != '[':
+                raise oefmt(space.w_ValueError,
+                            "No JSON array could be decoded at char %d",
+                            self._position(i))
+            i = self._skip_whitespace(i + 1)
+            if i >= 0 and self.buf[i] == ']':
+                self._check_end(i + 1)
+                return -1
+            self.state = self.ARRAY_ITEMS
+        elif self.state == self.ARRAY_AFTER_ITEM:
+            if i >= 0 and self.buf[i] == ']':
+                self._check_end(i + 1)
+                return -1
+            if i < 0 or self.buf[i] != ',':
+                self._raise_array_error(i)
+            i = self._skip_whitespace(i + 1)
+        if i < 0 or self.buf[i] == ']' or self.buf[i] == ',':
+            self._raise_array_error(i)
+        self.bufpos = i
+        return i
+
+    def _position(self, i):
+        if i < 0:
+            return self.consumed + len(self.buf)
+        return self.consumed + i
+
+    def _raise_array_error(self, i):
+        if i < 0:
+            raise oefmt(self.space.w_ValueError,
+                        "Unterminated array at char %d", self._position(i))
+        raise oefmt(self.space.w_ValueError,
+                    "Unexpected '%s' when decoding array (char %d)",
+                    self.buf[i], self._position(i))
+
+    def _check_end(self, i):
+        self.bufpos = i
+        self.state = self.DONE
+        j = self._skip_whitespace(i)
+        if j >= 0:
+            raise oefmt(self.space.w_ValueError, "Extra data: char %d",
+                        self._position(j))
+
+    def _scan_value(self, i):
+        """ Return the end of the value starting at i. It is only delimited
+        here; checking it is left to the decoder. """
+        buf = self.buf
+        ch = buf[i]
+        if ch == '{' or ch == '[' or ch == '"':
+            return self._scan_nested(i)
+        while True:
+            buf = self.buf
+            while i < len(buf):
+                ch = buf[i]
+                if (is_whitespace(ch) or ch == ',' or ch == ']' or
+                        ch == '}' or ch == '[' or ch == '{' or ch == '"'):
+                    return i
+                i += 1
+            i -= self._read_more()
+            if self.eof:
+                return i
+
+    def _scan_nested(self, i):
+        depth = 0
+        in_string = False
+        escape = False
+        while True:
+            buf = self.buf
+            while i < len(buf):
+                ch = buf[i]
+                i += 1
+                if in_string:
+                    if escape:
+                        escape = False
+                    elif ch == '\\':
+                        escape = True
+                    elif ch == '"':
+                        in_string = False
+                        if depth == 0:
+                            return i
+                elif ch == '"':
+                    in_string = True
+                elif ch == '[' or ch == '{':
+                    depth += 1
+                elif ch == ']' or ch == '}':
+                    depth -= 1
+                    if depth == 0:
+                        return i
+            i -= self._read_more()
+            if self.eof:
+                # incomplete value, the decoder will complain about it
+                return i
+
+W_JSONStreamDecoder.typedef = TypeDef("_pypyjson.JSONStreamDecoder",
+    __iter__ = interp2app(W_JSONStreamDecoder.descr_iter),
+    next = interp2app(W_JSONStreamDecoder.descr_next),
+)
+W_JSONStreamDecoder.typedef.acceptable_as_base_class = False
+
+
+@unwrap_spec(array=bool, chunksize=int)
+def iterload(space, w_source, array=False, chunksize=65536):
+    """iterload(source, array=False, chunksize=65536)
+
+    Return an iterator over the JSON values found in 'source', which is
+    either a file-like object with a read() method or an iterable of str
+    chunks.  The values can be separated by whitespace, e.g. one per line.
+    If 'array' is true, the input must be a single JSON array instead, and
+    the iterator returns its items one by one."""
+    if chunksize <= 0:
+        raise oefmt(space.w_ValueError, "chunksize must be positive")
+    return W_JSONStreamDecoder(space, w_source, array, chunksize)
@@ -1,6 +1,11 @@
+import math
 from rpython.rlib.rstring import StringBuilder
 from rpython.rlib import rutf8
+from rpython.rlib.rfloat import isfinite
 from pypy.interpreter import unicodehelper
+from pypy.interpreter.error import OperationError, oefmt
+from pypy.interpreter.gateway import applevel, unwrap_spec, WrappedDefault
+from pypy.objspace.std.floatobject import float2string
 
 
 HEX = '0123456789abcdef'
@@ -19,20 +24,11 @@ ESCAPE_BEFORE_SPACE = [ESCAPE_DICT.get(chr(_i), '\\u%04x' % _i)
 def raw_encode_basestring_ascii(space, w_string):
     if space.isinstance_w(w_string, space.w_bytes):
         s = space.bytes_w(w_string)
-        for i in range(len(s)):
-            c = s[i]
-            if c >= ' ' and c <= '~' and c != '"' and c != '\\':
-                pass
-            else:
-                first = i
-                break
-        else:
+        first = _find_first_unsafe_ascii(s)
+        if first == -1:
             # the input is a string with only non-special ascii chars
             return w_string
-
         unicodehelper.check_utf8_or_raise(space, s)
-        sb = StringBuilder(len(s))
-        sb.append_slice(s, 0, first)
     else:
         # We used to check if 'u' contains only safe characters, and return
         # 'w_string' directly.  But this requires an extra pass over all
@@ -42,13 +38,29 @@ def raw_encode_basestring_ascii(space, w_string):
         # over the characters.  So we may as well directly turn it into a
         # string here --- only one pass.
         s = space.utf8_w(w_string)
-        sb = StringBuilder(len(s))
         first = 0
+    sb = StringBuilder(len(s))
+    _encode_ascii_from(sb, s, first)
+    res = sb.build()
+    return space.newtext(res)
+
 
-    it = rutf8.Utf8StringIterator(s)
-    for i in range(first):
-        it.next()
-    for c in it:
+def _find_first_unsafe_ascii(s):
+    for i in range(len(s)):
+        c = s[i]
+        if c >= ' ' and c <= '~' and c != '"' and c != '\\':
+            pass
+        else:
+            return i
+    return -1
+
+def _encode_ascii_from(sb, s, first):
+    # 's' is valid utf-8, and s[:first] only contains safe ascii chars
+    sb.append_slice(s, 0, first)
+    i = first
+    while i < len(s):
+        c = rutf8.codepoint_at_pos(s, i)
+        i = rutf8.next_codepoint_pos(s, i)
         if c <= ord('~'):
             if c == ord('"') or c == ord('\\'):
                 sb.append('\\')
@@ -77,5 +89,401 @@ def raw_encode_basestring_ascii(space, w_string):
                 sb.append(HEX[(s2 >> 4) & 0x0f])
                 sb.append(HEX[s2 & 0x0f])
 
-    res = sb.build()
-    return space.newtext(res)
+def _encode_unescaped_nonascii(sb, s):
+    # like json.encoder.raw_encode_basestring(): only '"', '\\' and the
+    # control characters are escaped, everything else is copied as it is
+    start = 0
+    for i in range(len(s)):
+        c = s[i]
+        if c == '"' or c == '\\' or c < ' ':
+            sb.append_slice(s, start, i)
+            if c < ' ':
+                sb.append(ESCAPE_BEFORE_SPACE[ord(c)])
+            else:
+                sb.append('\\')
+                sb.append(c)
+            start = i + 1
+    sb.append_slice(s, start, len(s))
+
+def _is_ascii(s):
+    for c in s:
+        if ord(c) >= 0x80:
+            return False
+    return True
+
+
+class JSONEncoder(object):
+    """ Encodes a tree of dicts, lists, tuples, strings, numbers, bools and
+    None into a StringBuilder, following the logic of the app-level
+    json.encoder.JSONEncoder.encode() """
+
+    def __init__(self, space, skipkeys, ensure_ascii, check_circular,
+                 allow_nan, sort_keys, indent, item_separator, key_separator,
+                 w_default):
+        self.space = space
+        self.skipkeys = skipkeys
+        self.ensure_ascii = ensure_ascii
+        self.allow_nan = allow_nan
+        self.sort_keys = sort_keys
+        self.indent = indent    # -1 means no indentation
+        self.item_separator = item_separator
+        self.key_separator = key_separator
+        self.w_default = w_default
+        if check_circular:
+            self.markers = {}
+        else:
+            self.markers = None
+        self.builder = StringBuilder()
+        # only used if not ensure_ascii: the result is a unicode if any
+        # unicode string is seen, which requires all str to be ascii
+        self.seen_unicode = False
+        self.nonascii_bytes = None
+        # only set if not ensure_ascii: writing the separator switches to
+        # a unicode result, like a unicode string does
+        self.unicode_item_separator = False
+        self.unicode_key_separator = False
+
+    def build(self):
+        space = self.space
+        res = self.builder.build()
+        if not self.seen_unicode:
+            return space.newbytes(res)
+        if self.nonascii_bytes is not None:
+            # raises the same UnicodeDecodeError as the app-level encoder
+            space.call_method(space.newbytes(self.nonascii_bytes), 'decode',
+                              space.newtext('ascii'))
+        return space.newutf8(res, rutf8.codepoints_in_utf8(res))
+
+    def mark(self, w_obj):
+        if self.markers is not None:
+            if w_obj in self.markers:
+                raise oefmt(self.space.w_ValueError,
+                            "Circular reference detected")
+            self.markers[w_obj] = None
+
+    def unmark(self, w_obj):
+        if self.markers is not None:
+            del self.markers[w_obj]
+
+    def write_string(self, s, is_unicode):
+        sb = self.builder
+        sb.append('"')
+        if self.ensure_ascii:
+            first = _find_first_unsafe_ascii(s)
+            if first == -1:
+                sb.append(s)
+            else:
+                if not is_unicode and not _is_ascii(s):
+                    unicodehelper.check_utf8_or_raise(self.space, s)
+                _encode_ascii_from(sb, s, first)
+        else:
+            if is_unicode:
+                self.seen_unicode = True
+            elif self.nonascii_bytes is None and not _is_ascii(s):
+                self.nonascii_bytes = s
+            _encode_unescaped_nonascii(sb, s)
+        sb.append('"')
+
+    def write_item_separator(self, separator):
+        self.builder.append(separator)
+        if self.unicode_item_separator:
+            self.seen_unicode = True
+
+    def write_key_separator(self):
+        self.builder.append(self.key_separator)
+        if self.unicode_key_separator:
+            self.seen_unicode = True
+
+    def write_w_string(self, w_string):
+        space = self.space
+        if space.isinstance_w(w_string, space.w_bytes):
+            self.write_string(space.bytes_w(w_string), False)
+        else:
+            self.write_string(space.utf8_w(w_string), True)
+
+    def floatstr(self, x):
+        if isfinite(x):
+            return float2string(x, 'r', 0)
+        if math.isnan(x):
+            text = 'NaN'
+        elif x > 0.0:
+            text = 'Infinity'
+        else:
+            text = '-Infinity'
+        if not self.allow_nan:
+            raise oefmt(self.space.w_ValueError,
+                        "Out of range float values are not JSON compliant: "
+                        "%s", float2string(x, 'r', 0))
+        return text
+
+    def intstr(self, w_obj):
+        space = self.space
+        w_type = space.type(w_obj)
+        if w_type is space.w_int:
+            return str(space.int_w(w_obj))
+        if w_type is space.w_long:
+            return space.bigint_w(w_obj).str()
+        # subclasses may override __str__
+        return space.text_w(space.str(w_obj))
+
+    def newline_indent(self, level):
+        return '\n' + ' ' * (self.indent * level)
+
+    def encode(self, w_obj, level):
+        space = self.space
+        sb = self.builder
+        w_type = space.type(w_obj)
+        if w_type is space.w_bytes:
+            self.write_string(space.bytes_w(w_obj), False)
+        elif w_type is space.w_unicode:
+            self.write_string(space.utf8_w(w_obj), True)
+        elif w_type is space.w_int:
+            sb.append(str(space.int_w(w_obj)))
+        elif w_type is space.w_float:
+            sb.append(self.floatstr(space.float_w(w_obj)))
+        elif w_type is space.w_dict:
+            self.encode_dict(w_obj, level)
+        elif w_type is space.w_list:
+            self.encode_list(w_obj, level)
+        elif w_type is space.w_tuple:
+            self.encode_sequence(space.fixedview(w_obj), w_obj, level)
+        elif space.is_w(w_obj, space.w_None):
+            sb.append('null')
+        elif space.is_w(w_obj, space.w_True):
+            sb.append('true')
+        elif space.is_w(w_obj, space.w_False):
+            sb.append('false')
+        elif space.isinstance_w(w_obj, space.w_basestring):
+            self.write_w_string(w_obj)
+        elif (space.isinstance_w(w_obj, space.w_int) or
+              space.isinstance_w(w_obj, space.w_long)):
+            sb.append(self.intstr(w_obj))
+        elif space.isinstance_w(w_obj, space.w_float):
+            sb.append(self.floatstr(space.float_w(w_obj)))
+        elif (space.isinstance_w(w_obj, space.w_list) or
+              space.isinstance_w(w_obj, space.w_tuple)):
+            self.encode_sequence(space.unpackiterable(w_obj), w_obj, level)
+        elif space.isinstance_w(w_obj, space.w_dict):
+            self.encode_dict(w_obj, level)
+        else:
+            self.encode_default(w_obj, level)
+
+    def encode_default(self, w_obj, level):
+        space = self.space
+        if self.w_default is None:
+            raise oefmt(space.w_TypeError, "%R is not JSON serializable",
+                        w_obj)
+        self.mark(w_obj)
+        w_res = space.call_function(self.w_default, w_obj)
+        self.encode(w_res, level)
+        self.unmark(w_obj)
+
+    def start_container(self, opening, level):
+        self.builder.append(opening)
+        if self.indent >= 0:
+            newline_indent = self.newline_indent(level + 1)
+            self.builder.append(newline_indent)
+            return self.item_separator + newline_indent
+        return self.item_separator
+
+    def end_container(self, closing, level):
+        if self.indent >= 0:
+            self.builder.append(self.newline_indent(level))
+        self.builder.append(closing)
+
+    def encode_list(self, w_list, level):
+        from pypy.objspace.std.listobject import W_ListObject
+        space = self.space
+        assert isinstance(w_list, W_ListObject)
+        length = w_list.length()
+        if length == 0:
+            self.builder.append('[]')
+            return
+        intlist = space.listview_int(w_list)
+        if intlist is not None:
+            separator = self.start_container('[', level)
+            for i in range(len(intlist)):
+                if i > 0:
+                    self.write_item_separator(separator)
+                self.builder.append(str(intlist[i]))
+            self.end_container(']', level)
+            return
+        floatlist = space.listview_float(w_list)
+        if floatlist is not None:
+            separator = self.start_container('[', level)
+            for i in range(len(floatlist)):
+                if i > 0:
+                    self.write_item_separator(separator)
+                self.builder.append(self.floatstr(floatlist[i]))
+            self.end_container(']', level)
+            return
+        self.mark(w_list)
+        separator = self.start_container('[', level)
+        i = 0
+        # the list may be mutated by the 'default' callback
+        while i < w_list.length():
+            if i > 0:
+                self.write_item_separator(separator)
+            self.encode(w_list.getitem(i), level + 1)
+            i += 1
+        self.end_container(']', level)
+        self.unmark(w_list)
+
+    def encode_sequence(self, items_w, w_seq, level):
+        if len(items_w) == 0:
+            self.builder.append('[]')
+            return
+        self.mark(w_seq)
+        separator = self.start_container('[', level)
+        for i in range(len(items_w)):
+            if i > 0:
+                self.write_item_separator(separator)
+            self.encode(items_w[i], level + 1)
+        self.end_container(']', level)
+        self.unmark(w_seq)
+
+    def encode_dict(self, w_dict, level):
+        from pypy.objspace.std.dictmultiobject import W_DictMultiObject
+        from pypy.objspace.std.jsondict import JsonDictStrategy
+        from pypy.objspace.std.mapdict import MapDictStrategy
+        space = self.space
+        if not space.is_true(w_dict):
+            self.builder.append('{}')
+            return
+        self.mark(w_dict)
+        separator = self.start_container('{', level)
+        first = True
+        if self.sort_keys:
+            items_w = space.fixedview(sorted_items(space, w_dict))
+            for w_item in items_w:
+                w_key, w_value = space.fixedview(w_item, 2)
+                first = self.encode_item(w_key, w_value, first, separator,
+                                         level)
+        elif space.type(w_dict) is space.w_dict:
+            assert isinstance(w_dict, W_DictMultiObject)
+            strategy = w_dict.get_strategy()
+            if isinstance(strategy, JsonDictStrategy):
+                keys_w = strategy.jsonmap.get_keys_in_order()
+                values_w = strategy.unerase(w_dict.dstorage)
+                for i in range(len(values_w)):
+                    if i > 0:
+                        self.write_item_separator(separator)
+                    self.write_string(space.utf8_w(keys_w[i]), True)
+                    self.write_key_separator()
+                    self.encode(values_w[i], level + 1)
+            elif isinstance(strategy, MapDictStrategy):
+                keys, values_w = strategy.getitems_str(w_dict)
+                for i in range(len(values_w)):
+                    if i > 0:
+                        self.write_item_separator(separator)
+                    self.write_string(keys[i], False)
+                    self.write_key_separator()
+                    self.encode(values_w[i], level + 1)
+            else:
+                iterator = w_dict.iteritems()
+                while True:
+                    w_key, w_value = iterator.next_item()
+                    if w_key is None:
+                        break
+                    first = self.encode_item(w_key, w_value, first,
+                                             separator, level)
+        else:
+            # dict subclass: go through a possibly overridden iteritems()
+            w_iter = space.call_method(w_dict, 'iteritems')
+            while True:
+                try:
+                    w_item = space.next(w_iter)
+                except OperationError as e:
+                    if not e.match(space, space.w_StopIteration):
+                        raise
+                    break
+                w_key, w_value = space.fixedview(w_item, 2)
+                first = self.encode_item(w_key, w_value, first, separator,
+                                         level)
+        self.end_container('}', level)
+        self.unmark(w_dict)
+
+    def encode_item(self, w_key, w_value, first, separator, level):
+        space = self.space
+        sb = self.builder
+        if space.isinstance_w(w_key, space.w_basestring):
+            key = None
+        elif space.isinstance_w(w_key, space.w_float):
+            key = self.floatstr(space.float_w(w_key))
+        elif space.is_w(w_key, space.w_True):
+            key = 'true'
+        elif space.is_w(w_key, space.w_False):
+            key = 'false'
+        elif space.is_w(w_key, space.w_None):
+            key = 'null'
+        elif (space.isinstance_w(w_key, space.w_int) or
+              space.isinstance_w(w_key, space.w_long)):
+            key = self.intstr(w_key)
+        elif self.skipkeys:
+            return first
+        else:
+            raise oefmt(space.w_TypeError, "key %R is not a string", w_key)
+        if not first:
+            self.write_item_separator(separator)
+        if key is None:
+            self.write_w_string(w_key)
+        else:
+            sb.append('"')
+            sb.append(key)
+            sb.append('"')
+        self.write_key_separator()
+        self.encode(w_value, level + 1)
+        return False
+
+
+app = applevel(r"""
+    def sorted_items(d):
+        return sorted(d.items(), key=lambda kv: kv[0])
+""", filename=__file__)
+
+sorted_items = app.interphook('sorted_items')
+
+
+@unwrap_spec(w_skipkeys=WrappedDefault(False),
+             w_ensure_ascii=WrappedDefault(True),
+             w_check_circular=WrappedDefault(True),
+             w_allow_nan=WrappedDefault(True),
+             w_sort_keys=WrappedDefault(False),
+             w_item_separator=WrappedDefault(', '),
+             w_key_separator=WrappedDefault(': '))
+def encode(space, w_obj, w_skipkeys, w_ensure_ascii, w_check_circular,
+           w_allow_nan, w_sort_keys, w_indent=None, w_item_separator=None,
+           w_key_separator=None, w_default=None):
+    """encode(obj, skipkeys=False, ensure_ascii=True, check_circular=True,
+              allow_nan=True, sort_keys=False, indent=None,
+              item_separator=', ', key_separator=': ', default=None)
+
+    Return the JSON representation of obj, as done by
+    json.JSONEncoder(...).encode(obj) with the utf-8 encoding."""
+    if space.is_none(w_indent):
+        indent = -1
+    else:
+        indent = space.int_w(w_indent)
+        if indent < 0:
+            indent = 0
+    if space.is_none(w_default):
+        w_default = None
+    ensure_ascii = space.is_true(w_ensure_ascii)
+    encoder = JSONEncoder(space, space.is_true(w_skipkeys), ensure_ascii,
+                          space.is_true(w_check_circular),
+                          space.is_true(w_allow_nan),
+                          space.is_true(w_sort_keys), indent,
+                          _separator_w(space, w_item_separator),
+                          _separator_w(space, w_key_separator), w_default)
+    if not ensure_ascii:
+        encoder.unicode_item_separator = space.isinstance_w(
+            w_item_separator, space.w_unicode)
+        encoder.unicode_key_separator = space.isinstance_w(
+            w_key_separator, space.w_unicode)
+    encoder.encode(w_obj, 0)
+    return encoder.build()
+
+def _separator_w(space, w_sep):
+    if space.isinstance_w(w_sep, space.w_unicode):
+        return space.utf8_w(w_sep)
+    return space.bytes_w(w_sep)
@@ -1,6 +1,7 @@
 # -*- encoding: utf-8 -*-
 import pytest
 from pypy.module._pypyjson.interp_decoder import JSONDecoder, Terminator, MapBase
+from pypy.module._pypyjson.interp_decoder import W_JSONStreamDecoder
 from rpython.rtyper.lltypesystem import lltype, rffi
 
 
@@ -273,6 +274,27 @@ class TestJson(object):
         dec.close()
 
 
+    def test_stream_decoder_keeps_caches(self):
+        space = self.space
+        data = '{"a": 1, "b": 2}\n{"a": 3, "b": 4}\n'
+        w_source = space.newlist([space.newbytes(data[i:i + 5])
+                                  for i in range(0, len(data), 5)])
+        stream = W_JSONStreamDecoder(space, w_source, False, 5)
+        w_d1 = stream.descr_next(space)
+        dec = stream.decoder
+        assert len(dec.cache_keys) == 2
+        w_d2 = stream.descr_next(space)
+        assert stream.decoder is dec
+        assert len(dec.cache_keys) == 2
+        assert dec.input_size == len(data.strip()) - 1
+        assert space.int_w(space.getitem(w_d2, space.newutf8("b", 1))) == 4
+        assert (w_d1.get_strategy().jsonmap is
+                w_d2.get_strategy().jsonmap)
+        # the first value was dropped from the buffer
+        assert '"a": 1' not in stream.buf
+        assert stream.buf[stream.bufpos:].strip() == ''
+
+
 class AppTest(object):
     spaceconfig = {"objspace.usemodules._pypyjson": True}
 
@@ -513,6 +535,204 @@ class AppTest(object):
         assert check("\\\"\b\f\n\r\t") == '\\\\\\"\\b\\f\\n\\r\\t'
         assert check("\x07") == "\\u0007"
 
+    def test_encode_simple(self):
+        import _pypyjson
+        enc = _pypyjson.encode
+        assert enc(None) == 'null'
+        assert enc(True) == 'true'
+        assert enc(False) == 'false'
+        assert enc(42) == '42'
+        assert enc(-2 ** 70) == '-1180591620717411303424'
+        assert enc(1.5) == '1.5'
+        assert enc(0.1) == '0.1'
+        assert enc(float('inf')) == 'Infinity'
+        assert enc(float('-inf')) == '-Infinity'
+        assert enc(float('nan')) == 'NaN'
+        raises(ValueError, enc, float('nan'), allow_nan=False)
+        assert enc("a\"b\n") == '"a\\"b\\n"'
+        assert enc(u"\u1234") == '"\\u1234"'
+        assert type(enc(u"x")) is str
+        raises(UnicodeDecodeError, enc, "\xc0")
+        assert enc([]) == '[]'
+        assert enc({}) == '{}'
+        assert enc(()) == '[]'
+        assert enc([1, "a", None, [2.5, ()]]) == '[1, "a", null, [2.5, []]]'
+        assert enc((1, 2)) == '[1, 2]'
+        assert enc({"a": {"b": [1]}}) == '{"a": {"b": [1]}}'
+
+    def test_encode_list_strategies(self):
+        import _pypyjson
+        assert _pypyjson.encode(range(5)) == '[0, 1, 2, 3, 4]'
+        assert _pypyjson.encode([1.5, -0.0, 1e100]) == '[1.5, -0.0, 1e+100]'
+        raises(ValueError, _pypyjson.encode, [1.5, float('inf')],
+               allow_nan=False)
+        assert _pypyjson.encode([1, 2], item_separator=',') == '[1,2]'
+
+    def test_encode_dict_keys(self):
+        import _pypyjson
+        enc = _pypyjson.encode
+        assert enc({1: 2}) == '{"1": 2}'
+        assert enc({1.5: 2}) == '{"1.5": 2}'
+        assert enc({True: 1}) == '{"true": 1}'
+        assert enc({None: 1}) == '{"null": 1}'
+        assert enc({u"\xe9": 1}) == '{"\\u00e9": 1}'
+        raises(TypeError, enc, {(1,): 2})
+        assert enc({(1,): 2, "a": 3}, skipkeys=True) == '{"a": 3}'
+        d = {"b": 1, "a": 2, "c": 3}
+        assert enc(d, sort_keys=True) == '{"a": 2, "b": 1, "c": 3}'
+
+    def test_encode_json_and_map_dicts(self):
+        import _pypyjson, __pypy__
+        d = _pypyjson.loads('{"a": 1, "b": [1, 2], "c": "x"}')
+        assert __pypy__.strategy(d) == "JsonDictStrategy"
+        assert _pypyjson.encode(d) == '{"a": 1, "b": [1, 2], "c": "x"}'
+        class A(object):
+            pass
+        a = A()
+        a.x = 1
+        a.y = u"\u1234"
+        a.z = [a.x]
+        assert __pypy__.strategy(a.__dict__) == "MapDictStrategy"
+        assert _pypyjson.encode(a.__dict__) == (
+            '{"x": 1, "y": "\\u1234", "z": [1]}')
+        assert _pypyjson.encode(a.__dict__, sort_keys=True,
+                                key_separator='=') == (
+            '{"x"=1, "y"="\\u1234", "z"=[1]}')
+
+    def test_encode_indent(self):
+        import _pypyjson
+        res = _pypyjson.encode({"a": [1, {}, [2]]}, indent=2,
+                               item_separator=',')
+        assert res == '{\n  "a": [\n    1,\n    {},\n    [\n      2\n    ]\n  ]\n}'
+        assert _pypyjson.encode([1], indent=0) == '[\n1\n]'
+
+    def test_encode_default_and_circular(self):
+        import _pypyjson
+        class X(object):
+            pass
+        raises(TypeError, _pypyjson.encode, X())
+        assert _pypyjson.encode([X()], default=lambda o: "X") == '["X"]'
+        l = []
+        l.append(l)
+        exc = raises(ValueError, _pypyjson.encode, l)
+        assert str(exc.value) == "Circular reference detected"
+        d = {}
+        d["a"] = d
+        raises(ValueError, _pypyjson.encode, d)
+        x = X()
+        raises(ValueError, _pypyjson.encode, x, default=lambda o: [o])
+        a = [1]
+        assert _pypyjson.encode([a, a]) == '[[1], [1]]'
+
+    def test_encode_not_ensure_ascii(self):
+        import _pypyjson
+        enc = _pypyjson.encode
+        res = enc([u"\u1234", "a\n"], ensure_ascii=False)
+        assert type(res) is unicode
+        assert res == u'["\u1234", "a\\n"]'
+        res = enc(["\xc3\xa9"], ensure_ascii=False)
+        assert type(res) is str
+        assert res == '["\xc3\xa9"]'
+        raises(UnicodeDecodeError, enc, ["\xc3\xa9", u"x"],
+               ensure_ascii=False)
+
+    def test_encode_subclasses(self):
+        import _pypyjson
+        class MyInt(int):
+            def __str__(self):
+                return "7"
+        class MyList(list):
+            def __iter__(self):
+                return iter([3])
+        class MyDict(dict):
+            def iteritems(self):
+                return iter([("k", "v")])
+        class MyStr(str):
+            pass
+        assert _pypyjson.encode(MyInt(5)) == '7'
+        assert _pypyjson.encode(MyList([1, 2])) == '[3]'
+        assert _pypyjson.encode(MyDict(a=1)) == '{"k": "v"}'
+        assert _pypyjson.encode(MyStr("x")) == '"x"'
+        assert _pypyjson.encode(2.5 .__class__(2.5)) == '2.5'
+
+    def test_iterload_values(self):
+        import _pypyjson
+        data = '{"a": 1, "b": [1, 2]}\n{"a": 2, "b": []}\n 12 "x}" [3]\ntrue'
+        expected = [{u"a": 1, u"b": [1, 2]}, {u"a": 2, u"b": []}, 12, u"x}",
+                    [3], True]
+        for size in [1, 2, 3, 7, 1000]:
+            chunks = [data[i:i + size] for i in range(0, len(data), size)]
+            assert list(_pypyjson.iterload(iter(chunks))) == expected
+        assert list(_pypyjson.iterload([])) == []
+        assert list(_pypyjson.iterload(['  \n', '', ' '])) == []
+
+    def test_iterload_file(self):
+        import _pypyjson
+        class File(object):
+            def __init__(self, data):
+                self.data = data
+                self.sizes = []
+            def read(self, n):
+                self.sizes.append(n)
+                res = self.data[:n]
+                self.data = self.data[n:]
+                return res
+        f = File('[{"k": "v\\"]"}, 1.5, null, {"k": "w"}] \n')
+        it = _pypyjson.iterload(f, array=True, chunksize=4)
+        assert next(it) == {u"k": u'v"]'}
+        assert f.data != ''    # not read completely yet
+        assert list(it) == [1.5, None, {u"k": u"w"}]
+        assert f.sizes[0] == 4 and min(f.sizes) == 4
+        raises(StopIteration, next, it)
+        assert list(_pypyjson.iterload(File(' [ ] '), array=True)) == []
+
+    def test_iterload_large_value(self):
+        import _pypyjson
+        class File(object):
+            def __init__(self, data):
+                self.data = data
+                self.sizes = []
+            def read(self, n):
+                self.sizes.append(n)
+                res = self.data[:n]
+                self.data = self.data[n:]
+                return res
+        big = ["x" * 50] * 100
+        data = '1 %s 2' % (_pypyjson.encode(big),)
+        assert len(data) > 5000
+        f = File(data)
+        assert list(_pypyjson.iterload(f, chunksize=64)) == [1, big, 2]
+        # the read size doubles while the value does not fit, instead of
+        # the buffer being copied once for every chunk of 64 bytes
+        assert len(f.sizes) < 15
+        assert sum(f.sizes) < 4 * len(data)
+        chunks = [data[i:i + 64] for i in range(0, len(data), 64)]
+        assert list(_pypyjson.iterload(iter(chunks), chunksize=64)) == [
+            1, big, 2]
+
+    def test_iterload_shares_maps(self):
+        import _pypyjson, __pypy__
+        data = '\n'.join(['{"id": %d, "name": "n%d"}' % (i, i)
+                          for i in range(20)])
+        res = list(_pypyjson.iterload([data], array=False))
+        assert [d[u"id"] for d in res] == range(20)
+        assert __pypy__.strategy(res[-1]) == "JsonDictStrategy"
+
+    def test_iterload_errors(self):
+        import _pypyjson
+        raises(ValueError, list, _pypyjson.iterload(['{"a": 1'], ))
+        raises(ValueError, list, _pypyjson.iterload(['[1, 2'], array=True))
+        raises(ValueError, list, _pypyjson.iterload(['[1 2]'], array=True))
+        raises(ValueError, list, _pypyjson.iterload(['[1,]'], array=True))
+        raises(ValueError, list, _pypyjson.iterload(['{}'], array=True))
+        raises(ValueError, list, _pypyjson.iterload(['[1] 2'], array=True))
+        raises(ValueError, list, _pypyjson.iterload(['12abc']))
+        raises(TypeError, list, _pypyjson.iterload([u'1']))
+        raises(ValueError, _pypyjson.iterload, [], chunksize=0)
+        it = _pypyjson.iterload(['1 nope 3'])
+        assert next(it) == 1
+        raises(ValueError, next, it)
+
     def test_error_position(self):
         import _pypyjson
         test_cases = [
@@ -538,3 +758,37 @@ class AppTest(object):
         a = '{"abc": "4", "k": 1, "k": 1.5, "c": null, "k": 2}'
         d = _pypyjson.loads(a)
         assert d == {u"abc": u"4", u"c": None, u"k": 2}
+
+
+class AppTestJsonModule(object):
+    spaceconfig = dict(usemodules=['_pypyjson', 'struct', 'binascii'])
+
+    def test_json_module_uses_encode(self):
+        import json
+        assert json.dumps({"a": [1, 2.5, None]}) == '{"a": [1, 2.5, null]}'
+        assert json.dumps([1, {"b": 2}], indent=1, separators=(',', ':'),
+                          sort_keys=True) == '[\n 1,\n {\n  "b":2\n }\n]'
+        assert json.dumps(set([1]), default=list) == '[1]'
+
+    def test_unicode_separators_same_type_as_app_level(self):
+        import json, json.encoder
+        def dumps_app_level(*args, **kwds):
+            saved = json.encoder._pypyjson_encode
+            json.encoder._pypyjson_encode = None
+            try:
+                return json.dumps(*args, **kwds)
+            finally:
+                json.encoder._pypyjson_encode = saved
+        for seps in [(u',', u':'), (',', u':'), (u',', ':')]:
+            for indent in [None, 2]:
+                for obj in [5, [], {}, [1], [1, 2], {"a": 1},
+                            {"a": 1, "b": [2, 3]}, "x", u"x"]:
+                    res = json.dumps(obj, ensure_ascii=False,
+                                     separators=seps, indent=indent)
+                    expected = dumps_app_level(obj, ensure_ascii=False,
+                                               separators=seps,
+                                               indent=indent)
+                    assert type(res) is type(expected), (obj, seps, indent)
+                    assert res == expected
+        assert type(json.dumps(5, ensure_ascii=False,
+                               separators=(u',', u':'))) is str
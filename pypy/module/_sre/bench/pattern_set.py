@@ -0,0 +1,74 @@
+"""
+Searching log lines with many patterns: _sre.compile_set() against a loop
+calling search() on each pattern.  Run it with a translated pypy:
+
+    pypy pypy/module/_sre/bench/pattern_set.py
+"""
+import random, re, sys, time
+import _sre
+
+WORDS = ['GET', 'POST', 'user', 'session', 'timeout', 'db', 'cache', 'miss',
+         'request', 'id', 'status', 'retry', 'upstream', 'worker', 'queue']
+
+def make_patterns(n, r):
+    regexps = []
+    for i in range(n):
+        kind = i % 4
+        word = r.choice(WORDS)
+        if kind == 0:
+            regexps.append(r'\b%s%d\b' % (word, i))
+        elif kind == 1:
+            regexps.append(r'%s=\d{%d,}' % (word, 3 + i % 5))
+        elif kind == 2:
+            regexps.append(r'(?i)%s\s+%s-%d' % (word, r.choice(WORDS), i))
+        else:
+            regexps.append(r'^\[%s\] .*%d(ms|s)$' % (word.upper(), i))
+    return [re.compile(regexp) for regexp in regexps]
+
+def make_lines(count, r):
+    lines = []
+    for i in range(count):
+        words = [r.choice(WORDS) + str(r.randrange(2000))
+                 for j in range(r.randrange(5, 15))]
+        lines.append('[%s] %s %dms' % (r.choice(WORDS).upper(),
+                                       ' '.join(words), r.randrange(2000)))
+    return lines
+
+def naive(patterns, lines):
+    result = 0
+    for line in lines:
+        for pattern in patterns:
+            if pattern.search(line):
+                result += 1
+    return result
+
+def with_set(patterns, lines):
+    patternset = _sre.compile_set(patterns)
+    result = 0
+    for line in lines:
+        result += len(patternset.search(line))
+    return result
+
+def bench(func, patterns, lines):
+    func(patterns, lines[:100])     # warm up the JIT and the DFA
+    t0 = time.time()
+    result = func(patterns, lines)
+    return result, time.time() - t0
+
+def main(argv):
+    if len(argv) > 1:
+        num_lines = int(argv[1])
+    else:
+        num_lines = 20000
+    r = random.Random(42)
+    lines = make_lines(num_lines, r)
+    for n in [10, 100, 1000]:
+        patterns = make_patterns(n, r)
+        expected, t_naive = bench(naive, patterns, lines)
+        result, t_set = bench(with_set, patterns, lines)
+        assert result == expected
+        print '%5d patterns: loop %7.3fs   set %7.3fs   (%d matches)' % (
+            n, t_naive, t_set, result)
+
+if __name__ == '__main__':
+    main(sys.argv)
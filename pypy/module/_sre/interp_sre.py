@@ -1,4 +1,5 @@
 import sys
+from collections import OrderedDict
 from pypy.interpreter.baseobjspace import W_Root
 from pypy.interpreter.typedef import GetSetProperty, TypeDef
 from pypy.interpreter.typedef import interp_attrproperty, interp_attrproperty_w
@@ -6,6 +7,7 @@ from pypy.interpreter.typedef import make_weakref_descr
 from pypy.interpreter.gateway import interp2app, unwrap_spec, WrappedDefault
 from pypy.interpreter.error import OperationError, oefmt
 from rpython.rlib.rarithmetic import intmask
+from rpython.rlib.objectmodel import move_to_end
 from rpython.rlib import jit, rutf8
 from rpython.rlib.rstring import StringBuilder
 
@@ -13,7 +15,8 @@ from rpython.rlib.rstring import StringBuilder
 #
 # Constants and exposed functions
 
-from rpython.rlib.rsre import rsre_core, rsre_utf8
+from rpython.rlib.rsre import rsre_core, rsre_dfa, rsre_utf8, rsre_compile
+from rpython.rlib.rsre.rsre_constants import SRE_FLAG_LOCALE
 from rpython.rlib.rsre.rsre_char import CODESIZE, MAXREPEAT, getlower, set_unicode_db
 
 
@@ -84,19 +87,26 @@ def allgroups_w(space, ctx, fmarks, num_groups, w_default):
     return space.newtuple(grps)
 
 
-def import_re(space):
+def import_module(space, name):
     w_builtin = space.getbuiltinmodule('__builtin__')
     w_import = space.getattr(w_builtin, space.newtext("__import__"))
-    return space.call_function(w_import, space.newtext("re"))
+    return space.call_function(w_import, space.newtext(name))
+
+def import_re(space):
+    return import_module(space, "re")
 
 def matchcontext(space, ctx, pattern):
     try:
+        if pattern.dfa is not None:
+            return rsre_dfa.match_context(ctx, pattern)
         return rsre_core.match_context(ctx, pattern)
     except rsre_core.Error as e:
         raise OperationError(space.w_RuntimeError, space.newtext(e.msg))
 
 def searchcontext(space, ctx, pattern):
     try:
+        if pattern.dfa is not None:
+            return rsre_dfa.search_context(ctx, pattern)
         return rsre_core.search_context(ctx, pattern)
     except rsre_core.Error as e:
         raise OperationError(space.w_RuntimeError, space.newtext(e.msg))
@@ -437,14 +447,23 @@ def _sub_append_slice(ctx, space, use_builder, sublist_w,
     else:
         sublist_w.append(slice_w(space, ctx, start, end, space.w_None))
 
-@unwrap_spec(flags=int, groups=int, w_groupindex=WrappedDefault(None),
+@unwrap_spec(flags=int, w_code=WrappedDefault(None), groups=int,
+             w_groupindex=WrappedDefault(None),
              w_indexgroup=WrappedDefault(None))
-def SRE_Pattern__new__(space, w_subtype, w_pattern, flags, w_code,
+def SRE_Pattern__new__(space, w_subtype, w_pattern, flags=0, w_code=None,
               groups=0, w_groupindex=None, w_indexgroup=None):
+    if space.is_none(w_code):
+        # _sre.compile(pattern, flags): parse and compile the pattern
+        # here, and cache the result
+        return compile_cached(space, w_pattern, flags)
     n = space.len_w(w_code)
     code = [intmask(space.uint_w(space.getitem(w_code, space.newint(i))))
             for i in range(n)]
-    #
+    return new_pattern(space, w_subtype, w_pattern, flags, code, groups,
+                       w_groupindex, w_indexgroup)
+
+def new_pattern(space, w_subtype, w_pattern, flags, code, groups,
+                w_groupindex, w_indexgroup):
     w_srepat = space.allocate_instance(W_SRE_Pattern, w_subtype)
     srepat = space.interp_w(W_SRE_Pattern, w_srepat)
     srepat.space = space
@@ -455,12 +474,130 @@ def SRE_Pattern__new__(space, w_subtype, w_pattern, flags, w_code,
     # objects all the time would be bad for the JIT, which relies on the
     # identity of the CompiledPattern() object.
     srepat.code = rsre_core.CompiledPattern(code, flags)
+    # if backtracking could take an exponential time on this pattern, and
+    # it doesn't need backtracking anyway, match it in linear time
+    if rsre_dfa.may_backtrack_a_lot(srepat.code):
+        srepat.code.dfa = rsre_dfa.compile_dfa(srepat.code)
     srepat.num_groups = groups
     srepat.w_groupindex = w_groupindex
     srepat.w_indexgroup = w_indexgroup
     return w_srepat
 
 
+class PatternCache(object):
+    """The patterns compiled by _sre.compile(pattern, flags), the least
+    recently used first.  Unlike the cache of re.py, which used to be
+    cleared when full, only the least recently used pattern is dropped."""
+    maxsize = 1000
+
+    def __init__(self, space):
+        self.patterns_w = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        if key in self.patterns_w:
+            self.hits += 1
+            move_to_end(self.patterns_w, key)
+            return self.patterns_w[key]
+        self.misses += 1
+        return None
+
+    def store(self, key, w_srepat):
+        if len(self.patterns_w) >= self.maxsize:
+            for oldest in self.patterns_w:
+                break
+            else:
+                return
+            del self.patterns_w[oldest]
+        self.patterns_w[key] = w_srepat
+
+    def clear(self):
+        self.patterns_w.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def pattern_key(space, w_pattern, flags):
+    # only patterns that are exactly 'str' or 'unicode' can be cached
+    w_type = space.type(w_pattern)
+    if space.is_w(w_type, space.w_bytes):
+        return 'b%d:%s' % (flags, space.bytes_w(w_pattern))
+    elif space.is_w(w_type, space.w_unicode):
+        return 'u%d:%s' % (flags, space.utf8_w(w_pattern))
+    return None
+
+@jit.dont_look_inside
+def compile_cached(space, w_pattern, flags):
+    cache = space.fromcache(PatternCache)
+    key = pattern_key(space, w_pattern, flags)
+    if key is not None:
+        w_srepat = cache.lookup(key)
+        if w_srepat is not None:
+            return w_srepat
+    w_srepat = compile_pattern(space, w_pattern, flags)
+    srepat = space.interp_w(W_SRE_Pattern, w_srepat)
+    # the code of LOCALE patterns depends on the current locale
+    if key is not None and not (srepat.flags & SRE_FLAG_LOCALE):
+        cache.store(key, w_srepat)
+    return w_srepat
+
+def compile_pattern(space, w_pattern, flags):
+    w_type = space.type(w_pattern)
+    if space.is_w(w_type, space.w_bytes):
+        s = space.bytes_w(w_pattern)
+        chars = [ord(c) for c in s]
+        is_unicode = False
+    elif space.is_w(w_type, space.w_unicode):
+        chars = [c for c in rutf8.Utf8StringIterator(space.utf8_w(w_pattern))]
+        is_unicode = True
+    else:
+        chars = None
+        is_unicode = False
+    if chars is not None:
+        try:
+            compiled = rsre_compile.compile(chars, flags)
+        except rsre_compile.NotSupported:
+            pass
+        else:
+            w_groupindex = space.newdict()
+            indexgroup_w = [space.w_None] * (compiled.groups + 1)
+            for name, gid in compiled.groupindex.items():
+                if is_unicode:
+                    w_name = space.newutf8(name, len(name))
+                else:
+                    w_name = space.newtext(name)
+                space.setitem(w_groupindex, w_name, space.newint(gid))
+                indexgroup_w[gid] = w_name
+            w_subtype = space.gettypeobject(W_SRE_Pattern.typedef)
+            return new_pattern(space, w_subtype, w_pattern, compiled.flags,
+                               compiled.code, compiled.groups, w_groupindex,
+                               space.newlist(indexgroup_w))
+    # raise the errors, and compile the rare patterns not supported by
+    # rsre_compile, with the app-level sre_compile module
+    w_sre_compile = import_module(space, "sre_compile")
+    return space.call_method(w_sre_compile, "compile", w_pattern,
+                             space.newint(flags))
+
+def cache_info(space):
+    """cache_info() -> (hits, misses, maxsize, currsize)
+
+    Statistics about the cache of the patterns compiled by
+    _sre.compile(pattern, flags)."""
+    cache = space.fromcache(PatternCache)
+    return space.newtuple([space.newint(cache.hits),
+                           space.newint(cache.misses),
+                           space.newint(cache.maxsize),
+                           space.newint(len(cache.patterns_w))])
+
+def clear_cache(space):
+    """clear_cache()
+
+    Empty the cache of the patterns compiled by _sre.compile(pattern,
+    flags), and reset its statistics."""
+    space.fromcache(PatternCache).clear()
+
+
 W_SRE_Pattern.typedef = TypeDef(
     'SRE_Pattern',
     __new__      = interp2app(SRE_Pattern__new__),
@@ -762,3 +899,81 @@ W_SRE_Scanner.typedef = TypeDef(
     pattern  = interp_attrproperty_w('srepat', W_SRE_Scanner),
 )
 W_SRE_Scanner.typedef.acceptable_as_base_class = False
+
+# ____________________________________________________________
+#
+# SRE_PatternSet class
+# Not in CPython.  For the programs that search a string with many
+# patterns: the patterns that don't need backtracking are combined into
+# a single DFA, which reads the string only once.
+
+class W_SRE_PatternSet(W_Root):
+    def __init__(self, space, patterns_w):
+        self.space = space
+        self.patterns_w = patterns_w
+        self.setdfa = rsre_dfa.compile_set_dfa(
+            [srepat.code for srepat in patterns_w])
+
+    def search_indices(self, w_string, pos, endpos):
+        if len(self.patterns_w) == 0:
+            return []
+        ctx = self.patterns_w[0].make_ctx(w_string, pos, endpos)
+        try:
+            return rsre_dfa.search_set(ctx, self.setdfa)
+        except rsre_core.Error as e:
+            raise OperationError(self.space.w_RuntimeError,
+                                 self.space.newtext(e.msg))
+
+    @unwrap_spec(pos=int, endpos=int)
+    def search_w(self, w_string, pos=0, endpos=sys.maxint):
+        """Return the sorted list of the indices of the patterns that
+        match somewhere in the string."""
+        return self.space.newlist_int(
+            self.search_indices(w_string, pos, endpos))
+
+    @unwrap_spec(pos=int, endpos=int)
+    def search_spans_w(self, w_string, pos=0, endpos=sys.maxint):
+        """Return a list of (index, start, end) for the patterns that
+        match somewhere in the string, with the span of their first
+        match, like pattern.search(string).span()."""
+        space = self.space
+        result_w = []
+        for index in self.search_indices(w_string, pos, endpos):
+            srepat = self.patterns_w[index]
+            ctx = srepat.make_ctx(w_string, pos, endpos)
+            if not searchcontext(space, ctx, srepat.code):
+                continue     # should not occur
+            match = W_SRE_Match(srepat, ctx)
+            result_w.append(space.newtuple([
+                space.newint(index),
+                space.newint(match.bytepos_to_charindex(ctx.match_start)),
+                space.newint(match.bytepos_to_charindex(ctx.match_end))]))
+        return space.newlist(result_w)
+
+    def fget_patterns(self, space):
+        list_w = []
+        for srepat in self.patterns_w:
+            list_w.append(srepat)
+        return space.newlist(list_w)
+
+    def len_w(self):
+        return self.space.newint(len(self.patterns_w))
+
+
+def compile_set(space, w_patterns):
+    """compile_set(patterns) -> SRE_PatternSet
+
+    Combine a sequence of compiled patterns, to find which of them match
+    a string by reading it only once."""
+    patterns_w = [space.interp_w(W_SRE_Pattern, w_pattern)
+                  for w_pattern in space.listview(w_patterns)]
+    return W_SRE_PatternSet(space, patterns_w)
+
+W_SRE_PatternSet.typedef = TypeDef(
+    'SRE_PatternSet',
+    __len__      = interp2app(W_SRE_PatternSet.len_w),
+    search       = interp2app(W_SRE_PatternSet.search_w),
+    search_spans = interp2app(W_SRE_PatternSet.search_spans_w),
+    patterns     = GetSetProperty(W_SRE_PatternSet.fget_patterns),
+)
+W_SRE_PatternSet.typedef.acceptable_as_base_class = False
@@ -10,6 +10,9 @@ class Module(MixedModule):
         'MAGIC':          'space.newint(20031017)',
         'MAXREPEAT':      'space.newint(interp_sre.MAXREPEAT)',
         'compile':        'interp_sre.W_SRE_Pattern',
+        'cache_info':     'interp_sre.cache_info',
+        'clear_cache':    'interp_sre.clear_cache',
+        'compile_set':    'interp_sre.compile_set',
         'getlower':       'interp_sre.w_getlower',
         'getcodesize':    'interp_sre.w_getcodesize',
     }
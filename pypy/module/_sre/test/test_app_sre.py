@@ -155,6 +155,95 @@ class AppTestSrePattern:
         res = re.match(r'(a)|(b)', 'b').start(1)
         assert res == -1
 
+    def test_no_catastrophic_backtracking(self):
+        # matched with rsre_dfa: a backtracking matcher would take
+        # forever here
+        import re
+        s = 'a' * 100
+        assert re.match(r'(a|aa)*c', s) is None
+        assert re.search(r'(a|aa)*c', s) is None
+        m = re.search(r'(a|aa)*(c)', s + 'c')
+        assert m.span() == (0, 101)
+        assert m.span(1) == (99, 100)
+        assert m.span(2) == (100, 101)
+
+
+class AppTestSreCompile:
+    spaceconfig = dict(usemodules=('_locale',))
+
+    def test_same_as_sre_compile(self):
+        import _sre, sre_compile
+        for regexp, flags in [("abc", 0), ("(b)l(?P<g>a)", 0), ("a|b", 2),
+                              (u"(?P<x>\u1234)+(?i)[\xe9a-c]", 32),
+                              ("^x$", 8), ("(a)?(?(1)b|c)", 0)]:
+            p1 = _sre.compile(regexp, flags)
+            p2 = sre_compile.compile(regexp, flags)
+            assert p1.pattern is regexp
+            assert p1.flags == p2.flags
+            assert p1.groups == p2.groups
+            assert p1.groupindex == p2.groupindex
+            for string in ["", "abc", "blaBLA", "x\ny", u"\u1234\xc9"]:
+                m1 = p1.search(string)
+                m2 = p2.search(string)
+                if m2 is None:
+                    assert m1 is None
+                else:
+                    assert m1.span() == m2.span()
+                    assert m1.groups() == m2.groups()
+                    assert m1.lastgroup == m2.lastgroup
+
+    def test_group_names(self):
+        import _sre
+        p = _sre.compile(u"(?P<name>a)", 0)
+        assert type(p.groupindex.keys()[0]) is unicode
+        assert p.match(u"a").lastgroup == u"name"
+        p = _sre.compile("(?P<name>a)", 0)
+        assert type(p.groupindex.keys()[0]) is str
+
+    def test_errors(self):
+        import _sre, re, sre_constants
+        raises(sre_constants.error, _sre.compile, "(", 0)
+        raises(sre_constants.error, _sre.compile, "(?P<1>a)", 0)
+        raises(re.error, re.compile, "a**")
+        raises(OverflowError, re.compile, "a{%d}" % _sre.MAXREPEAT)
+
+    def test_cache(self):
+        import _sre, re
+        _sre.clear_cache()
+        assert _sre.cache_info() == (0, 0, 1000, 0)
+        p = _sre.compile("a+b", 0)
+        assert _sre.compile("a+b", 0) is p
+        assert _sre.compile("a+b", re.I) is not p
+        assert _sre.compile(u"a+b", 0) is not p
+        assert re.compile("a+b") is p
+        assert _sre.cache_info() == (2, 3, 1000, 3)
+        re.purge()
+        assert _sre.cache_info() == (0, 0, 1000, 0)
+        assert _sre.compile("a+b", 0) is not p
+
+    def test_cache_not_for_locale(self):
+        import _sre, re
+        _sre.clear_cache()
+        p = _sre.compile("a", re.L)
+        assert _sre.compile("a", re.L) is not p
+        assert _sre.compile("(?L)a", 0) is not _sre.compile("(?L)a", 0)
+        assert _sre.cache_info()[3] == 0
+        assert re.compile("(?L)a") is re.compile("(?L)a")
+
+    def test_cache_least_recently_used(self):
+        import _sre
+        _sre.clear_cache()
+        maxsize = _sre.cache_info()[2]
+        first = _sre.compile("x", 0)
+        second = _sre.compile("y", 0)
+        for i in range(maxsize - 2):
+            _sre.compile(str(i), 0)
+        assert _sre.compile("x", 0) is first
+        _sre.compile("one more", 0)
+        assert _sre.cache_info()[3] == maxsize
+        assert _sre.compile("x", 0) is first
+        assert _sre.compile("y", 0) is not second
+
 
 class AppTestSreMatch:
     spaceconfig = dict(usemodules=('array', ))
@@ -425,6 +514,45 @@ class AppTestSreScanner:
         assert None == p.search()
 
 
+class AppTestSrePatternSet:
+    def test_search(self):
+        import re, _sre
+        patterns = [re.compile(r"\bERROR\b"), re.compile(r"(a)\1"),
+                    re.compile(r"[0-9]+ms"), re.compile(r"^GET /")]
+        s = _sre.compile_set(patterns)
+        assert len(s) == 4
+        assert s.patterns == patterns
+        assert s.search("GET /x aa 12ms") == [1, 2, 3]
+        assert s.search("x ERROR") == [0]
+        assert s.search("GET /x aa 12ms", 1) == [1, 2]
+        assert s.search("GET /x aa 12ms", 0, 9) == [1, 3]
+        assert s.search("nothing") == []
+        assert _sre.compile_set([]).search("abc") == []
+
+    def test_same_as_search(self):
+        import re, _sre
+        regexps = [r"a|bc", r"(?i)B+", r"c$", r"\w+@", r"(a)(?=b)",
+                   r"x*", r"\Ad", u"\u1234"]
+        patterns = [re.compile(r) for r in regexps]
+        s = _sre.compile_set(patterns)
+        for string in ["", "abc", "db@", "ddd", "bbb\n", u"\u1234c",
+                       u"x\u1234b@c"]:
+            expected = [i for i, p in enumerate(patterns)
+                        if p.search(string)]
+            assert s.search(string) == expected
+
+    def test_search_spans(self):
+        import re, _sre
+        s = _sre.compile_set([re.compile(u"b+"), re.compile(u"x"),
+                              re.compile(u"(c)\\1")])
+        assert s.search_spans(u"\u1234abbcc") == [(0, 2, 4), (2, 4, 6)]
+        assert s.search_spans(u"\u1234abbcc", 3) == [(0, 3, 4), (2, 4, 6)]
+
+    def test_bad_argument(self):
+        import _sre
+        raises(TypeError, _sre.compile_set, ["abc"])
+
+
 class AppTestGetlower:
     spaceconfig = dict(usemodules=('_locale',))
 
@@ -0,0 +1,322 @@
+"""
+Sampling allocation profiler: gc.start_alloc_profile().
+
+About every 'interval' bytes allocated in the nursery, the GC calls the
+hooks on_gc_alloc_sample() and then on_gc_alloc_sample_type() (see
+rpython/memory/gc/hook.py).  The first one records the vmprof stack of
+the allocating code in a raw buffer, and the second one adds the type of
+the object.  These hooks cannot allocate or do I/O, so the samples are
+written to the file later, by an AsyncAction.
+
+The file has the format of the vmprof profiles (RPython flavor), so that
+the vmprof tools can read it: every sample is a stack trace whose
+innermost entry is a pseudo-function standing for the type of the
+allocated object, named "rpy:<type name>:<type index>:typeids".  The
+'count' of a sample is the number of intervals that the object covers,
+at least 1.  The period stored in the header is the interval in bytes.
+"""
+import os, sys, time
+
+from rpython.rlib.objectmodel import specialize
+from rpython.rlib.rarithmetic import r_uint, intmask
+from rpython.rlib.rstring import StringBuilder
+from rpython.rlib.rvmprof import cintf, rvmprof
+from rpython.rtyper.lltypesystem import lltype, llmemory, rffi
+from pypy.interpreter.error import oefmt, wrap_oserror
+from pypy.interpreter.executioncontext import AsyncAction
+from pypy.interpreter.gateway import unwrap_spec
+from pypy.interpreter.pycode import PyCode
+
+WORD = rffi.sizeof(lltype.Signed)
+BIG_ENDIAN = sys.byteorder == 'big'
+
+MARKER_STACKTRACE = '\x01'
+MARKER_VIRTUAL_IP = '\x02'
+MARKER_TRAILER = '\x03'
+MARKER_HEADER = '\x05'
+MARKER_TIME_N_ZONE = '\x06'
+MARKER_META = '\x07'
+VERSION_TIMESTAMP = '\x06'
+PROFILE_RPYTHON = '\x08'
+
+MAX_STACK_DEPTH = 256      # in words: (tag, value) pairs
+BUFFER_SIZE = 65536        # in words
+# a sample in the buffer: [count] [type index] [depth] [stack...]
+SAMPLE_HEADER = 3
+TYPE_UNKNOWN = -1
+TYPE_PENDING = -2
+
+
+def _long(x):
+    # a C 'long' in the native byte order
+    x = r_uint(x)
+    chars = ['\x00'] * WORD
+    for i in range(WORD):
+        chars[i] = chr(intmask(x & 0xff))
+        x >>= 8
+    if BIG_ENDIAN:
+        chars.reverse()
+    return ''.join(chars)
+
+def _safe(s):
+    if len(s) > 110:
+        s = s[:107] + '...'
+    return s.replace(':', ';')
+
+def _type_name(line):
+    # "member123  GcStruct W_IntObject { super, inst_intval }"
+    #     => "W_IntObject"
+    words = [word for word in line.split(' ') if word]
+    result = []
+    for word in words:
+        if word == '{':
+            break
+        if word.startswith('member') or word == 'GcStruct':
+            continue
+        result.append(word)
+    return ' '.join(result)
+
+def type_addr(type_index):
+    # the address of the pseudo-function of a type, which doesn't
+    # collide with the unique ids of code objects (multiples of 4)
+    return type_index * 4 + 2
+
+@specialize.memo()
+def _get_code_weak_list():
+    # None if the _vmprof module is not there
+    return getattr(PyCode, '_vmprof_weak_list', None)
+
+
+class AllocProfiler(object):
+
+    def __init__(self, space):
+        "NOT_RPYTHON"
+        self.space = space
+        self.action = AllocProfileAction(space, self)
+        self.buf = lltype.nullptr(rffi.SIGNEDP.TO)
+        self.enabled = False
+        self.interval = 0
+        self.fileno = -1
+        self.pos = 0
+        self.pending = -1          # position of the sample without a type
+        self.dropped = 0           # samples lost because the buffer is full
+        self.error = 0             # errno of the first failed write
+        self.type_names = []
+        self.written_types = {}
+        self.written_codes = {}
+
+    def start(self, fileno, interval, typeids):
+        if not self.buf:
+            # allocated once and kept for the next profiles
+            self.buf = lltype.malloc(rffi.SIGNEDP.TO, BUFFER_SIZE,
+                                     flavor='raw', track_allocation=False)
+        self.fileno = fileno
+        self.interval = interval
+        self.pos = 0
+        self.pending = -1
+        self.dropped = 0
+        self.error = 0
+        self.type_names = [_type_name(line) for line in typeids.split('\n')]
+        self.written_types = {}
+        self.written_codes = {}
+        builder = StringBuilder()
+        for x in [0, 3, 0, interval, 0]:
+            builder.append(_long(x))
+        builder.append(MARKER_HEADER)
+        builder.append('\x00')
+        builder.append(VERSION_TIMESTAMP)
+        builder.append(PROFILE_RPYTHON)
+        builder.append(chr(len('pypy')))
+        builder.append('pypy')
+        now = time.time()
+        seconds = int(now)
+        builder.append(MARKER_TIME_N_ZONE)
+        builder.append(_long(seconds))
+        builder.append(_long(int((now - seconds) * 1000000.0)))
+        builder.append('\x00' * 8)
+        self._write_meta(builder, 'bits', str(WORD * 8))
+        self._write_meta(builder, 'alloc_sample_interval', str(interval))
+        self._write(builder.build())
+        if self.error:
+            raise wrap_oserror(self.space, OSError(self.error, "write"))
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+        if self.pending >= 0:
+            self.pos = self.pending     # never got its type, drop it
+            self.pending = -1
+        self.flush()
+        self._write(MARKER_TRAILER)
+        if self.error:
+            raise wrap_oserror(self.space, OSError(self.error, "write"))
+
+    # ---------- called from the GC: no allocation here ----------
+
+    def sample(self, size):
+        if self.pending >= 0:     # should not occur
+            self.buf[self.pending + 1] = TYPE_UNKNOWN
+            self.pending = -1
+        if not self.enabled:
+            return
+        pos = self.pos
+        if pos + SAMPLE_HEADER + MAX_STACK_DEPTH > BUFFER_SIZE:
+            self.dropped += 1
+            return
+        buf = self.buf
+        buf[pos] = max(size // self.interval, 1)
+        buf[pos + 1] = TYPE_PENDING
+        depth = 0
+        if cintf.IS_SUPPORTED:
+            stack = cintf.get_rvmprof_stack()
+            depth = rvmprof._get_vmprof().cintf.vmprof_get_traceback(
+                stack, llmemory.NULL, rffi.ptradd(buf, pos + SAMPLE_HEADER),
+                MAX_STACK_DEPTH)
+        buf[pos + 2] = depth
+        self.pending = pos
+        self.pos = pos + SAMPLE_HEADER + depth
+
+    def sample_type(self, type_index):
+        pos = self.pending
+        if pos >= 0:
+            self.pending = -1
+            self.buf[pos + 1] = type_index
+            self.action.fire()
+
+    def _compact(self, end):
+        # move the samples after 'end' to the start of the buffer
+        buf = self.buf
+        i = end
+        while i < self.pos:
+            buf[i - end] = buf[i]
+            i += 1
+        self.pos -= end
+        if self.pending >= 0:
+            self.pending -= end
+
+    # ----------
+
+    def flush(self):
+        """Write the complete samples to the file."""
+        if not self.buf:
+            return
+        end = self.pos
+        if self.pending >= 0:
+            end = self.pending
+        builder = StringBuilder()
+        buf = self.buf
+        i = 0
+        while i < end:
+            count = buf[i]
+            type_index = buf[i + 1]
+            depth = buf[i + 2]
+            stack = i + SAMPLE_HEADER
+            self._write_type(builder, type_index)
+            j = 0
+            while j < depth - 1:
+                tag = buf[stack + j]
+                if (tag == rvmprof.VMPROF_CODE_TAG or
+                        tag == rvmprof.VMPROF_JITTED_TAG):
+                    self._write_code(builder, buf[stack + j + 1])
+                j += 2
+            builder.append(MARKER_STACKTRACE)
+            builder.append(_long(count))
+            builder.append(_long(depth + 2))
+            builder.append(_long(rvmprof.VMPROF_CODE_TAG))
+            builder.append(_long(type_addr(type_index)))
+            j = 0
+            while j < depth:
+                builder.append(_long(buf[stack + j]))
+                j += 1
+            builder.append(_long(0))      # thread id
+            i = stack + depth
+        self._compact(end)
+        if builder.getlength() > 0:
+            self._write(builder.build())
+
+    def _write_type(self, builder, type_index):
+        if type_index in self.written_types:
+            return
+        self.written_types[type_index] = None
+        if 0 <= type_index < len(self.type_names):
+            name = self.type_names[type_index]
+        else:
+            name = ''
+        if not name:
+            name = '<type %d>' % type_index
+        name = 'rpy:%s:%d:typeids' % (_safe(name), type_index)
+        self._write_virtual_ip(builder, type_addr(type_index), name)
+
+    def _write_code(self, builder, uid):
+        if uid in self.written_codes:
+            return
+        self.written_codes[uid] = None
+        weak_list = _get_code_weak_list()
+        if weak_list is None:
+            return
+        # write the names of all the code objects not written so far;
+        # the other ones are not known (for example if vmprof is enabled
+        # too, as the code objects are then not in the weak list)
+        for wref in weak_list.get_all_handles():
+            code = wref()
+            if code is not None:
+                code_uid = code._vmprof_unique_id
+                if code_uid != 0 and (code_uid == uid or
+                                      code_uid not in self.written_codes):
+                    self.written_codes[code_uid] = None
+                    name = "py:%s:%d:%s" % (_safe(code.co_name),
+                                            code.co_firstlineno,
+                                            _safe(code.co_filename))
+                    self._write_virtual_ip(builder, code_uid, name)
+
+    def _write_virtual_ip(self, builder, addr, name):
+        builder.append(MARKER_VIRTUAL_IP)
+        builder.append(_long(addr))
+        builder.append(_long(len(name)))
+        builder.append(name)
+
+    def _write_meta(self, builder, key, value):
+        builder.append(MARKER_META)
+        builder.append(_long(len(key)))
+        builder.append(key)
+        builder.append(_long(len(value)))
+        builder.append(value)
+
+    def _write(self, data):
+        if self.error:
+            return
+        while data:
+            try:
+                count = os.write(self.fileno, data)
+            except OSError as e:
+                self.error = e.errno
+                return
+            data = data[count:]
+
+
+class AllocProfileAction(AsyncAction):
+    def __init__(self, space, profiler):
+        AsyncAction.__init__(self, space)
+        self.profiler = profiler
+
+    def perform(self, ec, frame):
+        self.profiler.flush()
+
+
+@unwrap_spec(fileno=int, interval=int, typeids='bytes')
+def start_alloc_profile(space, fileno, interval, typeids):
+    profiler = space.fromcache(AllocProfiler)
+    if profiler.enabled:
+        raise oefmt(space.w_ValueError,
+                    "the allocation profiler is already running")
+    if interval <= 0:
+        raise oefmt(space.w_ValueError, "the interval must be positive")
+    profiler.start(fileno, interval, typeids)
+
+def stop_alloc_profile(space):
+    """Stop the allocation profiler started by start_alloc_profile().
+    The file is not closed."""
+    profiler = space.fromcache(AllocProfiler)
+    if not profiler.enabled:
+        raise oefmt(space.w_ValueError, "the allocation profiler is not running")
+    profiler.stop()
@@ -2,7 +2,7 @@
 
 import gc
 
-def dump_rpy_heap(file):
+def dump_rpy_heap(file, fork=False):
     """Write a full dump of the objects in the heap to the given file
     (which can be a file, a file name, or a file descritor).
     Format for each object (each item is one machine word):
@@ -18,10 +18,20 @@ def dump_rpy_heap(file):
     If the argument is a filename and the 'zlib' module is available,
     we also write 'typeids.txt' and 'typeids.lst' in the same directory,
     if they don't already exist.
+
+    If 'fork' is true, the dump is written by a child process, which
+    sees a copy-on-write snapshot of the heap: this process continues
+    at once, and the pid of the child is returned.  Use os.waitpid() to
+    know when the dump is complete; the child exits with status 0 if
+    it succeeded.  Only on POSIX systems.
     """
+    if fork:
+        dump = gc._dump_rpy_heap_fork
+    else:
+        dump = gc._dump_rpy_heap
     if isinstance(file, str):
         f = open(file, 'wb')
-        gc._dump_rpy_heap(f.fileno())
+        result = dump(f.fileno())
         f.close()
         try:
             import zlib, os
@@ -47,7 +57,33 @@ def dump_rpy_heap(file):
             if hasattr(file, 'flush'):
                 file.flush()
             fd = file.fileno()
-        gc._dump_rpy_heap(fd)
+        result = dump(fd)
+    return result
+
+def start_alloc_profile(file, interval=512*1024):
+    """Start the sampling allocation profiler: about every 'interval'
+    bytes allocated, record the stack of the allocating code and the
+    RPython type of the allocated object.  The samples are written to
+    the given file (a file or a file descriptor, which must stay open
+    until stop_alloc_profile() is called) in the format of vmprof.
+
+    Sampling starts at the next minor collection.  The objects that are
+    allocated directly outside the nursery (big ones, or of pretenured
+    types) are not sampled.
+    """
+    if isinstance(file, int):
+        fd = file
+    else:
+        if hasattr(file, 'flush'):
+            file.flush()
+        fd = file.fileno()
+    try:
+        import zlib
+    except ImportError:
+        typeids = ''     # no type names, only numbers
+    else:
+        typeids = zlib.decompress(gc.get_typeids_z())
+    gc._start_alloc_profile(fd, interval, typeids)
 
 class GcStats(object):
     def __init__(self, s):
@@ -58,6 +94,7 @@ class GcStats(object):
                      'peak_memory', 'peak_allocated_memory', 'total_arena_memory',
                      'total_rawmalloced_memory', 'nursery_size',
                      'peak_arena_memory', 'peak_rawmalloced_memory',
+                     'released_arena_memory', 'pretenured_memory',
                      ):
             setattr(self, item, self._format(getattr(self._s, item)))
         self.memory_used_sum = self._format(self._s.total_gc_memory + self._s.total_memory_pressure +
@@ -65,6 +102,8 @@ class GcStats(object):
         self.memory_allocated_sum = self._format(self._s.total_allocated_memory + self._s.total_memory_pressure +
                                             self._s.jit_backend_allocated)
         self.total_gc_time = self._s.total_gc_time
+        self.pretenured_types = self._s.pretenured_types
+        self.pretenure_reverts = self._s.pretenure_reverts
 
     def _format(self, v):
         if v < 1000000:
@@ -95,6 +134,11 @@ class GcStats(object):
     -----------------------------
     Total:                   %s
 
+    Arena memory given back to the OS: %s
+
+    Pretenured types:        %d (reverted: %d)
+    allocated pretenured:    %s
+
     Total time spent in GC:  %s
     """ % (self.total_gc_memory, self.peak_memory,
               self.total_arena_memory,
@@ -111,6 +155,9 @@ class GcStats(object):
            self.jit_backend_allocated,
            extra,
            self.memory_allocated_sum,
+           self.released_arena_memory,
+           self.pretenured_types, self.pretenure_reverts,
+           self.pretenured_memory,
            self.total_gc_time / 1000.0)
 
 
@@ -7,6 +7,7 @@ from pypy.interpreter.gateway import interp2app, unwrap_spec, WrappedDefault
 from pypy.interpreter.baseobjspace import W_Root
 from pypy.interpreter.typedef import TypeDef, interp_attrproperty, GetSetProperty
 from pypy.interpreter.executioncontext import AsyncAction
+from pypy.module.gc.allocprofile import AllocProfiler
 
 inf = float("inf")
 
@@ -24,6 +25,7 @@ class LowLevelGcHooks(GcHooks):
     def __init__(self, space):
         self.space = space
         self.w_hooks = space.fromcache(W_AppLevelHooks)
+        self.alloc_profiler = space.fromcache(AllocProfiler)
 
     def is_gc_minor_enabled(self):
         return self.w_hooks.gc_minor_enabled
@@ -34,6 +36,17 @@ class LowLevelGcHooks(GcHooks):
     def is_gc_collect_enabled(self):
         return self.w_hooks.gc_collect_enabled
 
+    def get_alloc_sample_interval(self):
+        if self.alloc_profiler.enabled:
+            return self.alloc_profiler.interval
+        return 0
+
+    def on_gc_alloc_sample(self, size):
+        self.alloc_profiler.sample(size)
+
+    def on_gc_alloc_sample_type(self, type_index):
+        self.alloc_profiler.sample_type(type_index)
+
     def on_gc_minor(self, duration, total_memory_used, pinned_objects):
         action = self.w_hooks.gc_minor
         action.count += 1
@@ -44,12 +57,15 @@ class LowLevelGcHooks(GcHooks):
         action.pinned_objects = pinned_objects
         action.fire()
 
-    def on_gc_collect_step(self, duration, oldstate, newstate):
+    def on_gc_collect_step(self, duration, oldstate, newstate,
+                           duration_parallel, threads):
         action = self.w_hooks.gc_collect_step
         action.count += 1
         action.duration += duration
         action.duration_min = min(action.duration_min, duration)
         action.duration_max = max(action.duration_max, duration)
+        action.duration_parallel += duration_parallel
+        action.threads = max(action.threads, threads)
         action.oldstate = oldstate
         action.newstate = newstate
         action.fire()
@@ -184,6 +200,8 @@ class GcCollectStepHookAction(NoRecursiveAction):
         self.duration = 0.0
         self.duration_min = inf
         self.duration_max = 0.0
+        self.duration_parallel = 0.0
+        self.threads = 0
 
     def fix_annotation(self):
         # the annotation of the class and its attributes must be completed
@@ -194,6 +212,8 @@ class GcCollectStepHookAction(NoRecursiveAction):
             self.duration = NonConstant(-53.2)
             self.duration_min = NonConstant(-53.2)
             self.duration_max = NonConstant(-53.2)
+            self.duration_parallel = NonConstant(-53.2)
+            self.threads = NonConstant(-42)
             self.oldstate = NonConstant(-42)
             self.newstate = NonConstant(-42)
             self.fire()
@@ -206,7 +226,9 @@ class GcCollectStepHookAction(NoRecursiveAction):
             self.duration_max,
             self.oldstate,
             self.newstate,
-            rgc.is_done__states(self.oldstate, self.newstate))
+            rgc.is_done__states(self.oldstate, self.newstate),
+            self.duration_parallel,
+            self.threads)
         self.reset()
         self.space.call_function(self.w_callable, w_stats)
 
@@ -284,7 +306,8 @@ class W_GcCollectStepStats(W_Root):
     GC_STATES = tuple(incminimark.GC_STATES + ['USERDEL'])
 
     def __init__(self, count, duration, duration_min, duration_max,
-                 oldstate, newstate, major_is_done):
+                 oldstate, newstate, major_is_done,
+                 duration_parallel=0.0, threads=1):
         self.count = count
         self.duration = duration
         self.duration_min = duration_min
@@ -292,6 +315,8 @@ class W_GcCollectStepStats(W_Root):
         self.oldstate = oldstate
         self.newstate = newstate
         self.major_is_done = major_is_done
+        self.duration_parallel = duration_parallel
+        self.threads = threads
 
 
 class W_GcCollectStats(W_Root):
@@ -366,6 +391,8 @@ W_GcCollectStepStats.typedef = TypeDef(
         "duration",
         "duration_min",
         "duration_max",
+        "duration_parallel",
+        "threads",
         "oldstate",
         "newstate"))
     )
@@ -117,7 +117,8 @@ class StepCollector(object):
             duration_max = duration,
             oldstate = oldstate,
             newstate = newstate,
-            major_is_done = major_is_done)
+            major_is_done = major_is_done,
+            duration_parallel = duration)
 
     def _collect_step(self):
         return rgc.collect_step()
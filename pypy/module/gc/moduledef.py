@@ -1,3 +1,4 @@
+import os
 from pypy.interpreter.mixedmodule import MixedModule
 
 
@@ -20,6 +21,7 @@ class Module(MixedModule):
             self.appleveldefs.update({
                 'dump_rpy_heap': 'app_referents.dump_rpy_heap',
                 'get_stats': 'app_referents.get_stats',
+                'start_alloc_profile': 'app_referents.start_alloc_profile',
                 })
             self.interpleveldefs.update({
                 'collect_step': 'interp_gc.collect_step',
@@ -37,5 +39,10 @@ class Module(MixedModule):
                 'GcRef': 'referents.W_GcRef',
                 'hooks': 'space.fromcache(hook.W_AppLevelHooks)',
                 'GcCollectStepStats': 'hook.W_GcCollectStepStats',
+                '_start_alloc_profile': 'allocprofile.start_alloc_profile',
+                'stop_alloc_profile': 'allocprofile.stop_alloc_profile',
                 })
+            if os.name == 'posix':
+                self.interpleveldefs['_dump_rpy_heap_fork'] = (
+                    'referents._dump_rpy_heap_fork')
         MixedModule.__init__(self, space, w_name)
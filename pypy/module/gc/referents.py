@@ -1,4 +1,6 @@
-from rpython.rlib import rgc, jit_hooks
+import os
+from rpython.rlib import rgc, jit_hooks, rposix
+from rpython.rtyper.lltypesystem import lltype, rffi
 from pypy.interpreter.baseobjspace import W_Root
 from pypy.interpreter.typedef import TypeDef, interp_attrproperty
 from pypy.interpreter.gateway import unwrap_spec, interp2app
@@ -163,6 +165,25 @@ def _dump_rpy_heap(space, fd):
     if not ok:
         raise missing_operation(space)
 
+@unwrap_spec(fd=int)
+def _dump_rpy_heap_fork(space, fd):
+    # Fork, and dump the heap from the child process, which is a
+    # copy-on-write snapshot of this one.  We call the C fork() directly,
+    # without the fork hooks of the posix module nor the GC's
+    # thread_after_fork(): the child runs no Python code, and we want
+    # it to keep the shadow stacks of all threads, to dump their roots.
+    pid = rffi.cast(lltype.Signed, rposix.c_fork())
+    if pid == -1:
+        errno = rffi.cast(lltype.Signed, rposix._get_errno())
+        raise wrap_oserror(space, OSError(errno, "fork"))
+    if pid == 0:
+        try:
+            ok = rgc.dump_rpy_heap(fd)
+        except OSError:
+            ok = False
+        os._exit(0 if ok else 1)
+    return space.newint(pid)
+
 def get_typeids_z(space):
     a = rgc.get_typeids_z()
     s = ''.join([a[i] for i in range(len(a))])
@@ -192,6 +213,10 @@ class W_GcStats(W_Root):
         self.peak_rawmalloced_memory = rgc.get_stats(rgc.PEAK_RAWMALLOCED_MEMORY)
         self.nursery_size = rgc.get_stats(rgc.NURSERY_SIZE)
         self.total_gc_time = rgc.get_stats(rgc.TOTAL_GC_TIME)
+        self.released_arena_memory = rgc.get_stats(rgc.RELEASED_ARENA_MEMORY)
+        self.pretenured_types = rgc.get_stats(rgc.PRETENURED_TYPES)
+        self.pretenured_memory = rgc.get_stats(rgc.PRETENURED_MEMORY)
+        self.pretenure_reverts = rgc.get_stats(rgc.PRETENURE_REVERTS)
 
 W_GcStats.typedef = TypeDef("GcStats",
     total_memory_pressure=interp_attrproperty("total_memory_pressure",
@@ -220,6 +245,14 @@ W_GcStats.typedef = TypeDef("GcStats",
         cls=W_GcStats, wrapfn="newint"),
     total_gc_time=interp_attrproperty("total_gc_time",
         cls=W_GcStats, wrapfn="newint"),
+    released_arena_memory=interp_attrproperty("released_arena_memory",
+        cls=W_GcStats, wrapfn="newint"),
+    pretenured_types=interp_attrproperty("pretenured_types",
+        cls=W_GcStats, wrapfn="newint"),
+    pretenured_memory=interp_attrproperty("pretenured_memory",
+        cls=W_GcStats, wrapfn="newint"),
+    pretenure_reverts=interp_attrproperty("pretenure_reverts",
+        cls=W_GcStats, wrapfn="newint"),
 )
 
 @unwrap_spec(memory_pressure=bool)
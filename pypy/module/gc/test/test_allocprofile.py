@@ -0,0 +1,110 @@
+import pytest
+from rpython.tool.udir import udir
+from pypy.module.gc.hook import LowLevelGcHooks
+from pypy.module.gc.allocprofile import _type_name
+from pypy.interpreter.baseobjspace import ObjSpace
+from pypy.interpreter.gateway import interp2app, unwrap_spec
+
+
+def test_type_name():
+    assert _type_name("member12   GcStruct W_IntObject { super, inst_intval }"
+                      ) == "W_IntObject"
+    assert _type_name("member3    GcArray of * GcStruct W_Root") == (
+        "GcArray of * W_Root")
+    assert _type_name("member0    ?") == "?"
+    assert _type_name("") == ""
+
+
+class AppTestAllocProfile(object):
+    spaceconfig = {'usemodules': ['struct']}
+
+    def setup_class(cls):
+        if cls.runappdirect:
+            pytest.skip("these tests cannot work with -A")
+        space = cls.space
+        gchooks = space.fromcache(LowLevelGcHooks)
+
+        @unwrap_spec(ObjSpace, int, int)
+        def fire_gc_alloc_sample(space, size, type_index):
+            if gchooks.get_alloc_sample_interval() > 0:
+                gchooks.fire_gc_alloc_sample(size)
+                gchooks.fire_gc_alloc_sample_type(type_index)
+
+        cls.w_fire_gc_alloc_sample = space.wrap(
+            interp2app(fire_gc_alloc_sample))
+        cls.w_filename = space.wrap(str(udir.join('alloc_profile.prof')))
+        cls.w_typeids = space.newbytes(
+            "member0    ?\n"
+            "member1    GcStruct W_Foo { super, inst_x }\n"
+            "member2    GcArray of Signed\n")
+
+    def w_read_profile(self):
+        # a minimal reader of the vmprof format
+        import struct
+        WORD = struct.calcsize('l')
+        def read_long():
+            return struct.unpack('l', f.read(WORD))[0]
+        f = open(self.filename, 'rb')
+        header = [read_long() for i in range(5)]
+        assert f.read(4) == '\x05\x00\x06\x08'
+        assert f.read(ord(f.read(1))) == 'pypy'
+        names = {}
+        samples = []
+        meta = {}
+        while True:
+            marker = f.read(1)
+            if marker == '\x01':
+                count = read_long()
+                depth = read_long()
+                stack = [read_long() for i in range(depth)]
+                thread_id = read_long()
+                samples.append((count, stack))
+            elif marker == '\x02':
+                addr = read_long()
+                names[addr] = f.read(read_long())
+            elif marker == '\x03':
+                break
+            elif marker == '\x06':
+                f.read(8 + 8 + 8)
+            elif marker == '\x07':
+                key = f.read(read_long())
+                meta[key] = f.read(read_long())
+            else:
+                raise AssertionError("bad marker %r" % (marker,))
+        assert f.read() == ''
+        f.close()
+        return header, meta, names, samples
+
+    def test_profile(self):
+        import gc
+        f = open(self.filename, 'wb')
+        gc._start_alloc_profile(f.fileno(), 1000, self.typeids)
+        raises(ValueError, gc._start_alloc_profile, f.fileno(), 1000, '')
+        self.fire_gc_alloc_sample(24, 1)
+        self.fire_gc_alloc_sample(5500, 2)
+        self.fire_gc_alloc_sample(24, 1)
+        self.fire_gc_alloc_sample(40, 7)
+        gc.stop_alloc_profile()
+        raises(ValueError, gc.stop_alloc_profile)
+        self.fire_gc_alloc_sample(24, 1)    # ignored
+        f.close()
+        #
+        header, meta, names, samples = self.read_profile()
+        assert header == [0, 3, 0, 1000, 0]
+        assert meta['alloc_sample_interval'] == '1000'
+        assert [count for (count, stack) in samples] == [1, 5, 1, 1]
+        leaves = []
+        for count, stack in samples:
+            assert stack[0] == 1     # VMPROF_CODE_TAG
+            leaves.append(names[stack[1]])
+            for i in range(2, len(stack) - 1, 2):
+                if stack[i] == 1:
+                    assert names[stack[i + 1]].startswith('py:')
+        assert leaves == ['rpy:W_Foo:1:typeids',
+                          'rpy:GcArray of Signed:2:typeids',
+                          'rpy:W_Foo:1:typeids',
+                          'rpy:<type 7>:7:typeids']
+
+    def test_bad_interval(self):
+        import gc
+        raises(ValueError, gc._start_alloc_profile, 1, 0, '')
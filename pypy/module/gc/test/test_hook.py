@@ -29,8 +29,8 @@ class AppTestGcHooks(object):
             gchooks.fire_gc_minor(5.0, 0, 0)
             gchooks.fire_gc_minor(7.0, 0, 0)
             gchooks.fire_gc_collect_step(5.0, 0, 0)
-            gchooks.fire_gc_collect_step(15.0, 0, 0)
-            gchooks.fire_gc_collect_step(22.0, 0, 0)
+            gchooks.fire_gc_collect_step(15.0, 0, 0, 4.0, 3)
+            gchooks.fire_gc_collect_step(22.0, 0, 0, 6.0, 2)
             gchooks.fire_gc_collect(1, 2, 3, 4, 5, 6)
 
         cls.w_fire_gc_minor = space.wrap(interp2app(fire_gc_minor))
@@ -143,7 +143,8 @@ class AppTestGcHooks(object):
 
             def on_gc_collect_step(self, stats):
                 self.steps.append((stats.count, stats.duration,
-                                   stats.duration_min, stats.duration_max))
+                                   stats.duration_min, stats.duration_max,
+                                   stats.duration_parallel, stats.threads))
 
             on_gc_collect = None
 
@@ -151,7 +152,7 @@ class AppTestGcHooks(object):
         gc.hooks.set(myhooks)
         self.fire_many()
         assert myhooks.minors == [(2, 12, 5, 7)]
-        assert myhooks.steps == [(3, 42, 5, 22)]
+        assert myhooks.steps == [(3, 42, 5, 22, 10, 3)]
 
     def test_clear_queue(self):
         import gc
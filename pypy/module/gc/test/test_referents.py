@@ -1,4 +1,5 @@
 from pypy.conftest import option
+from rpython.tool.udir import udir
 
 
 class AppTestReferents(object):
@@ -129,6 +130,8 @@ class AppTestReferentsMore(object):
         rgc.get_rpy_roots = lambda: (
             map(rgc._GcRef, cls.ALL_ROOTS) + [rgc.NULL_GCREF]*2)
         cls.w_runappdirect = cls.space.wrap(option.runappdirect)
+        cls.w_dump_filename = cls.space.wrap(
+            str(udir.join('dump_rpy_heap.fork')))
 
     def teardown_class(cls):
         from rpython.rlib import rgc
@@ -150,3 +153,17 @@ class AppTestReferentsMore(object):
         assert a in lst
         lst = gc.get_referrers(A)
         assert a in lst
+
+    def test_dump_rpy_heap_fork(self):
+        import gc, os
+        if not self.runappdirect:
+            skip("forks the whole process: only when translated")
+        if not hasattr(gc, '_dump_rpy_heap_fork'):
+            skip("no fork() on this platform")
+        pid = gc.dump_rpy_heap(self.dump_filename, fork=True)
+        assert isinstance(pid, int) and pid > 0
+        pid1, status = os.waitpid(pid, 0)
+        assert pid1 == pid
+        assert os.WIFEXITED(status)
+        assert os.WEXITSTATUS(status) == 0
+        assert os.path.getsize(self.dump_filename) > 0
@@ -0,0 +1,227 @@
+"""
+Per-code-object JIT introspection: pypyjit.get_code_info(code) and
+pypyjit.iter_loops().
+
+The statistics of the loops come from jit_hooks.stats_get_loop_stats(),
+which describes the loops currently kept alive by the JIT (see
+rpython/jit/metainterp/memmgr.py).  They are always maintained, so a
+dashboard can poll them cheaply.  The abort reasons are different: they
+are recorded by the on_abort() hook (see hooks.py), which slows down the
+JIT, so only after set_abort_recording(True).
+"""
+from rpython.rlib import jit_hooks
+from rpython.rlib.jit import Counters, dont_look_inside
+from rpython.rlib.rarithmetic import r_uint
+from rpython.rlib.rweakref import RWeakKeyDictionary
+from rpython.rtyper.annlowlevel import (cast_instance_to_gcref,
+    cast_base_ptr_to_instance, hlstr)
+from rpython.rtyper.lltypesystem import lltype
+from rpython.rtyper.rclass import OBJECT
+from pypy.interpreter.baseobjspace import W_Root
+from pypy.interpreter.gateway import unwrap_spec
+from pypy.interpreter.pycode import PyCode
+from pypy.interpreter.typedef import (TypeDef, interp_attrproperty,
+     interp_attrproperty_w)
+from pypy.module.pypyjit.interp_resop import unwrap_pypyjit_greenkey
+
+
+class CodeInfoCache(object):
+
+    def __init__(self, space):
+        self.space = space
+        self.recording_aborts = False
+        # {pycode: app-level dict {reason: number of aborts}}
+        self.aborts = RWeakKeyDictionary(PyCode, W_Root)
+
+    def record_abort(self, jitdriver, greenkey, reason):
+        if (not self.recording_aborts or greenkey is None or
+                jitdriver.name != 'pypyjit'):
+            return
+        space = self.space
+        pycode, _, _ = unwrap_pypyjit_greenkey(greenkey)
+        w_aborts = self.aborts.get(pycode)
+        if w_aborts is None:
+            w_aborts = space.newdict()
+            self.aborts.set(pycode, w_aborts)
+        w_reason = space.newtext(Counters.counter_names[reason])
+        w_count = space.finditem(w_aborts, w_reason)
+        if w_count is None:
+            count = 0
+        else:
+            count = space.int_w(w_count)
+        space.setitem(w_aborts, w_reason, space.newint(count + 1))
+
+
+def _get_pycode(ll_stats, i):
+    """Return the code object in which the loop ll_stats[i] starts, if it
+    is a loop of the main interpreter loop, or None."""
+    greenkey = ll_stats[i].greenkey
+    jitdriver_name = ll_stats[i].jitdriver_name
+    if (not greenkey or not jitdriver_name or
+            hlstr(jitdriver_name) != 'pypyjit'):
+        return None
+    ll_code = lltype.cast_opaque_ptr(lltype.Ptr(OBJECT),
+                                     jit_hooks.box_getref(greenkey[2]))
+    return cast_base_ptr_to_instance(PyCode, ll_code)
+
+
+class W_JitLoopStats(W_Root):
+    """ Statistics of a compiled loop, kept up to date by the JIT.
+    The times and the code size include the bridges of the loop.
+    """
+
+    def __init__(self, space, ll_stats, i):
+        item = ll_stats[i]
+        self.loop_no = item.number
+        if item.jitdriver_name:
+            self.jd_name = hlstr(item.jitdriver_name)
+        else:
+            self.jd_name = ''
+        pycode = _get_pycode(ll_stats, i)
+        if pycode is None:
+            self.w_green_key = space.w_None
+        else:
+            next_instr = jit_hooks.box_getint(item.greenkey[0])
+            is_being_profiled = jit_hooks.box_getint(item.greenkey[1])
+            self.w_green_key = space.newtuple([
+                pycode, space.newint(next_instr),
+                space.newbool(bool(is_being_profiled))])
+        self.entry_count = item.entry_count
+        self.guard_failures = item.guard_failures
+        self.bridge_count = item.bridges_count
+        self.trace_time = item.trace_time
+        self.backend_time = item.backend_time
+        self.code_size = item.code_size
+        self.invalidated = item.invalidated
+
+W_JitLoopStats.typedef = TypeDef(
+    'JitLoopStats',
+    __doc__ = W_JitLoopStats.__doc__,
+    loop_no = interp_attrproperty('loop_no', cls=W_JitLoopStats,
+        doc="Loop cardinal number, as in JitLoopInfo", wrapfn="newint"),
+    jitdriver_name = interp_attrproperty('jd_name', cls=W_JitLoopStats,
+        doc="Name of the JitDriver, pypyjit for the main one",
+        wrapfn="newtext"),
+    greenkey = interp_attrproperty_w('w_green_key', cls=W_JitLoopStats,
+        doc="(code, ofs, is_profiled) for the main interpreter loop, "
+            "otherwise None"),
+    entry_count = interp_attrproperty('entry_count', cls=W_JitLoopStats,
+        doc="Number of times the loop was entered from the interpreter",
+        wrapfn="newint"),
+    guard_failures = interp_attrproperty('guard_failures', cls=W_JitLoopStats,
+        doc="Number of guard failures that went back to the interpreter",
+        wrapfn="newint"),
+    bridge_count = interp_attrproperty('bridge_count', cls=W_JitLoopStats,
+        doc="Number of bridges compiled for the loop", wrapfn="newint"),
+    trace_time = interp_attrproperty('trace_time', cls=W_JitLoopStats,
+        doc="Seconds spent tracing and optimizing", wrapfn="newfloat"),
+    backend_time = interp_attrproperty('backend_time', cls=W_JitLoopStats,
+        doc="Seconds spent producing machine code", wrapfn="newfloat"),
+    code_size = interp_attrproperty('code_size', cls=W_JitLoopStats,
+        doc="Bytes of machine code", wrapfn="newint"),
+    invalidated = interp_attrproperty('invalidated', cls=W_JitLoopStats,
+        doc="True if the loop was invalidated", wrapfn="newbool"),
+)
+W_JitLoopStats.typedef.acceptable_as_base_class = False
+
+
+class W_JitCodeInfo(W_Root):
+    """ What the JIT did with a code object.  The counts and times are
+    the sums over the loops in 'loops'.
+    """
+
+    def __init__(self, space, w_code, loops_w, dont_trace_here, w_aborts):
+        self.w_code = w_code
+        self.w_loops = space.newlist(loops_w)
+        self.dont_trace_here = dont_trace_here
+        self.w_aborts = w_aborts
+        self.entry_count = 0
+        self.guard_failures = 0
+        self.bridge_count = 0
+        self.trace_time = 0.0
+        self.backend_time = 0.0
+        for w_loop in loops_w:
+            assert isinstance(w_loop, W_JitLoopStats)
+            self.entry_count += w_loop.entry_count
+            self.guard_failures += w_loop.guard_failures
+            self.bridge_count += w_loop.bridge_count
+            self.trace_time += w_loop.trace_time
+            self.backend_time += w_loop.backend_time
+
+W_JitCodeInfo.typedef = TypeDef(
+    'JitCodeInfo',
+    __doc__ = W_JitCodeInfo.__doc__,
+    code = interp_attrproperty_w('w_code', cls=W_JitCodeInfo),
+    loops = interp_attrproperty_w('w_loops', cls=W_JitCodeInfo,
+        doc="List of JitLoopStats of the loops starting in the code"),
+    dont_trace_here = interp_attrproperty('dont_trace_here',
+        cls=W_JitCodeInfo, wrapfn="newbool",
+        doc="True if the JIT does not trace into calls to the code, "
+            "e.g. because it was too long to be inlined"),
+    aborts = interp_attrproperty_w('w_aborts', cls=W_JitCodeInfo,
+        doc="{reason: count} of the traces that started in the code and "
+            "were aborted, recorded after set_abort_recording(True)"),
+    entry_count = interp_attrproperty('entry_count', cls=W_JitCodeInfo,
+        wrapfn="newint"),
+    guard_failures = interp_attrproperty('guard_failures', cls=W_JitCodeInfo,
+        wrapfn="newint"),
+    bridge_count = interp_attrproperty('bridge_count', cls=W_JitCodeInfo,
+        wrapfn="newint"),
+    trace_time = interp_attrproperty('trace_time', cls=W_JitCodeInfo,
+        wrapfn="newfloat"),
+    backend_time = interp_attrproperty('backend_time', cls=W_JitCodeInfo,
+        wrapfn="newfloat"),
+)
+W_JitCodeInfo.typedef.acceptable_as_base_class = False
+
+
+def iter_loops(space):
+    """iter_loops()
+
+    Return an iterator over the JitLoopStats of all the loops that the JIT
+    currently keeps alive.  Like get_stats_snapshot(), it is a snapshot:
+    call it again to get new numbers.
+    """
+    ll_stats = jit_hooks.stats_get_loop_stats(None)
+    loops_w = []
+    if ll_stats:
+        for i in range(len(ll_stats)):
+            loops_w.append(W_JitLoopStats(space, ll_stats, i))
+    return space.iter(space.newlist(loops_w))
+
+@unwrap_spec(w_code=PyCode)
+@dont_look_inside
+def get_code_info(space, w_code):
+    """get_code_info(code)
+
+    Return a JitCodeInfo describing what the JIT did with 'code': its
+    loops currently alive, with their entry counts, guard failures,
+    bridges and compilation times; whether the JIT stopped tracing into
+    it (dont_trace_here); and, after set_abort_recording(True), why the
+    traces started in it were aborted.
+    """
+    ll_stats = jit_hooks.stats_get_loop_stats(None)
+    loops_w = []
+    if ll_stats:
+        for i in range(len(ll_stats)):
+            if _get_pycode(ll_stats, i) is w_code:
+                loops_w.append(W_JitLoopStats(space, ll_stats, i))
+    ll_code = cast_instance_to_gcref(w_code)
+    dont_trace_here = (
+        jit_hooks.is_dont_trace_here('pypyjit', r_uint(0), 0, ll_code) or
+        jit_hooks.is_dont_trace_here('pypyjit', r_uint(0), 1, ll_code))
+    w_aborts = space.fromcache(CodeInfoCache).aborts.get(w_code)
+    if w_aborts is None:
+        w_aborts = space.newdict()
+    else:
+        w_aborts = space.call_method(w_aborts, 'copy')
+    return W_JitCodeInfo(space, w_code, loops_w, dont_trace_here, w_aborts)
+
+@unwrap_spec(enabled=bool)
+def set_abort_recording(space, enabled):
+    """set_abort_recording(enabled)
+
+    Start or stop recording, for get_code_info(), why the traces are
+    aborted.  This enables the JIT hooks, which makes the JIT a bit slower.
+    """
+    space.fromcache(CodeInfoCache).recording_aborts = enabled
@@ -0,0 +1,65 @@
+"""
+The JIT compiler worker: pypyjit.compile_worker().
+
+See rpython/jit/metainterp/compilequeue.py.  The worker sleeps on a
+lock, without the GIL, until the JIT puts a loop in the compile queue
+(the hook on_compile_queued() in hooks.py releases the lock).
+"""
+from rpython.rlib import jit_hooks, rthread, rgil
+from pypy.interpreter.error import oefmt
+
+
+class CompileWorker(object):
+
+    def __init__(self, space):
+        self.space = space
+        self.lock = None      # not None while a worker is running
+
+    def wake_up(self):
+        lock = self.lock
+        if lock is not None:
+            lock.acquire(False)
+            lock.release()
+
+    def reinit_in_child(self):
+        # after a fork(), the worker thread is gone
+        if self.lock is not None:
+            self.lock = None
+            jit_hooks.compile_worker_stop(None)
+
+
+def reinit_in_child(space):
+    space.fromcache(CompileWorker).reinit_in_child()
+
+
+def compile_worker(space):
+    """compile_worker()
+
+    Run a JIT compiler worker in the current thread.  It never returns,
+    so start it in a daemon thread, e.g. with
+    threading.Thread(target=pypyjit.compile_worker).  From then on, the
+    loops that the JIT traces are compiled by the worker, while the
+    thread that traced them goes on in the interpreter, and runs the
+    machine code as soon as it is ready.  The worker still needs the GIL
+    to compile, but it gets it when the other threads release it, e.g.
+    while they wait for I/O.  At most 'compile_queue_size' loops (a JIT
+    parameter) can wait for the worker; after that, the threads compile
+    the loops themselves, which get_stats_snapshot() counts as
+    COMPILE_QUEUE_FULL.  Bridges are always compiled by the thread that
+    traced them.
+    """
+    worker = space.fromcache(CompileWorker)
+    if worker.lock is not None:
+        raise oefmt(space.w_RuntimeError,
+                    "a JIT compiler worker is already running")
+    lock = rthread.allocate_lock()
+    lock.acquire(True)
+    worker.lock = lock
+    jit_hooks.compile_worker_start(None)
+    while True:
+        # sleep until there is a loop in the queue, releasing the GIL
+        lock.acquire(True)
+        while jit_hooks.compile_worker_run_one(None):
+            if space.config.objspace.usemodules.thread:
+                # let the other threads run between two loops
+                rgil.yield_thread()
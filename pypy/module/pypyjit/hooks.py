@@ -5,6 +5,9 @@ from rpython.rlib.jit import JitHookInterface, Counters
 from pypy.interpreter.error import OperationError
 from pypy.module.pypyjit.interp_resop import (Cache, wrap_greenkey,
     WrappedOp, W_JitLoopInfo, wrap_oplist)
+from pypy.module.pypyjit.warmup import WarmupProfile, HOT, TOO_LONG, ABORTED
+from pypy.module.pypyjit.compileworker import CompileWorker
+from pypy.module.pypyjit.codeinfo import CodeInfoCache
 
 class PyPyJitIface(JitHookInterface):
     def are_hooks_enabled(self):
@@ -12,11 +15,17 @@ class PyPyJitIface(JitHookInterface):
         cache = space.fromcache(Cache)
         return (cache.w_compile_hook is not None or
                 cache.w_abort_hook is not None or
-                cache.w_trace_too_long_hook is not None)
+                cache.w_trace_too_long_hook is not None or
+                space.fromcache(WarmupProfile).recording or
+                space.fromcache(CodeInfoCache).recording_aborts)
 
 
     def on_abort(self, reason, jitdriver, greenkey, greenkey_repr, logops, operations):
         space = self.space
+        space.fromcache(WarmupProfile).record(jitdriver, greenkey, ABORTED,
+                                              len(operations))
+        space.fromcache(CodeInfoCache).record_abort(jitdriver, greenkey,
+                                                    reason)
         cache = space.fromcache(Cache)
         if cache.in_recursion:
             return
@@ -36,8 +45,12 @@ class PyPyJitIface(JitHookInterface):
             finally:
                 cache.in_recursion = False
 
+    def on_compile_queued(self, jitdriver, greenkey, greenkey_repr):
+        self.space.fromcache(CompileWorker).wake_up()
+
     def on_trace_too_long(self, jitdriver, greenkey, greenkey_repr):
         space = self.space
+        space.fromcache(WarmupProfile).record(jitdriver, greenkey, TOO_LONG, 0)
         cache = space.fromcache(Cache)
         if cache.in_recursion:
             return
@@ -67,6 +80,10 @@ class PyPyJitIface(JitHookInterface):
 
     def _compile_hook(self, debug_info, is_bridge):
         space = self.space
+        if not is_bridge:
+            space.fromcache(WarmupProfile).record(
+                debug_info.get_jitdriver(), debug_info.greenkey, HOT,
+                len(debug_info.operations))
         cache = space.fromcache(Cache)
         if cache.in_recursion:
             return
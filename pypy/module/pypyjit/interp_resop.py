@@ -30,18 +30,25 @@ class Cache(object):
         self.no += 1
         return self.no - 1
 
+def unwrap_pypyjit_greenkey(greenkey):
+    """Return (pycode, next_instr, is_being_profiled) from a greenkey
+    of the 'pypyjit' jitdriver."""
+    next_instr = greenkey[0].getint()
+    is_being_profiled = greenkey[1].getint()
+    ll_code = lltype.cast_opaque_ptr(lltype.Ptr(OBJECT),
+                                     greenkey[2].getref_base())
+    pycode = cast_base_ptr_to_instance(PyCode, ll_code)
+    return pycode, next_instr, bool(is_being_profiled)
+
 def wrap_greenkey(space, jitdriver, greenkey, greenkey_repr):
     if greenkey is None:
         return space.w_None
     jitdriver_name = jitdriver.name
     if jitdriver_name == 'pypyjit':
-        next_instr = greenkey[0].getint()
-        is_being_profiled = greenkey[1].getint()
-        ll_code = lltype.cast_opaque_ptr(lltype.Ptr(OBJECT),
-                                         greenkey[2].getref_base())
-        pycode = cast_base_ptr_to_instance(PyCode, ll_code)
+        pycode, next_instr, is_being_profiled = unwrap_pypyjit_greenkey(
+            greenkey)
         return space.newtuple([pycode, space.newint(next_instr),
-                               space.newbool(bool(is_being_profiled))])
+                               space.newbool(is_being_profiled)])
     else:
         return space.newtext(greenkey_repr)
 
@@ -17,6 +17,12 @@ class Module(MixedModule):
         'set_trace_too_long_hook': 'interp_resop.set_trace_too_long_hook',
         'get_stats_snapshot': 'interp_resop.get_stats_snapshot',
         'get_stats_asmmemmgr': 'interp_resop.get_stats_asmmemmgr',
+        'set_warmup_profile': 'warmup.set_warmup_profile',
+        'save_warmup_profile': 'warmup.save_warmup_profile',
+        'compile_worker': 'compileworker.compile_worker',
+        'get_code_info': 'codeinfo.get_code_info',
+        'iter_loops': 'codeinfo.iter_loops',
+        'set_abort_recording': 'codeinfo.set_abort_recording',
         # those things are disabled because they have bugs, but if
         # they're found to be useful, fix test_ztranslation_jit_stats
         # in the backend first. get_stats_snapshot still produces
@@ -30,6 +36,13 @@ class Module(MixedModule):
         'PARAMETER_DOCS': 'space.wrap(rpython.rlib.jit.PARAMETER_DOCS)',
     }
 
+    def __init__(self, space, *args):
+        "NOT_RPYTHON"
+        MixedModule.__init__(self, space, *args)
+        from pypy.module.posix.interp_posix import add_fork_hook
+        from pypy.module.pypyjit.compileworker import reinit_in_child
+        add_fork_hook('child', reinit_in_child)
+
     def setup_after_space_initialization(self):
         # force the __extend__ hacks to occur early
         from pypy.module.pypyjit.interp_jit import pypyjitdriver
@@ -41,3 +54,7 @@ class Module(MixedModule):
         w_obj = space.wrap(PARAMETERS)
         space.setattr(self, space.newtext('defaults'), w_obj)
         pypy_hooks.space = space
+
+    def shutdown(self, space):
+        from pypy.module.pypyjit.warmup import WarmupProfile
+        space.fromcache(WarmupProfile).shutdown()
@@ -0,0 +1,126 @@
+from rpython.jit.metainterp.history import ConstInt, ConstPtr
+from rpython.rlib import jit_hooks
+from rpython.rlib.jit import Counters
+from rpython.rtyper.annlowlevel import cast_instance_to_gcref, llstr
+from rpython.rtyper.lltypesystem import lltype
+from pypy.interpreter.pycode import PyCode
+from pypy.module.pypyjit.interp_jit import pypyjitdriver
+from pypy.module.pypyjit.hooks import pypy_hooks
+from pypy.module.pypyjit.codeinfo import CodeInfoCache
+
+
+class TestCodeInfo(object):
+    spaceconfig = dict(usemodules=('pypyjit',))
+
+    def setup_method(self, meth):
+        self.loops = []
+        self.dont_trace_here = []
+        def stats_get_loop_stats(warmrunnerdesc):
+            result = lltype.malloc(jit_hooks.LOOP_STATS_CONTAINER,
+                                   len(self.loops), zero=True)
+            for i, (jd_name, greenkey, number, entry_count) in enumerate(
+                    self.loops):
+                result[i].number = number
+                result[i].jitdriver_name = llstr(jd_name)
+                result[i].greenkey = lltype.malloc(jit_hooks.BOX_ARRAY,
+                                                   len(greenkey))
+                for j, box in enumerate(greenkey):
+                    result[i].greenkey[j] = cast_instance_to_gcref(box)
+                result[i].entry_count = entry_count
+                result[i].guard_failures = 2
+                result[i].bridges_count = 1
+                result[i].trace_time = 0.25
+                result[i].backend_time = 0.5
+                result[i].code_size = 1024
+            return result
+        def is_dont_trace_here(name, next_instr, is_being_profiled, ll_code):
+            return (next_instr, is_being_profiled,
+                    ll_code) in self.dont_trace_here
+        self._old = (jit_hooks.stats_get_loop_stats,
+                     jit_hooks.is_dont_trace_here)
+        jit_hooks.stats_get_loop_stats = stats_get_loop_stats
+        jit_hooks.is_dont_trace_here = is_dont_trace_here
+
+    def teardown_method(self, meth):
+        (jit_hooks.stats_get_loop_stats,
+         jit_hooks.is_dont_trace_here) = self._old
+        self.space.fromcache(CodeInfoCache).recording_aborts = False
+
+    def make_code(self, name):
+        space = self.space
+        w_code = space.appexec([space.newtext(name)], """(name):
+            d = {}
+            exec('def %s(n):\\n    while n > 0:\\n        n -= 1\\n' % name,
+                 d)
+            return d[name].__code__
+        """)
+        return space.interp_w(PyCode, w_code)
+
+    def greenkey(self, pycode, next_instr):
+        return [ConstInt(next_instr), ConstInt(0),
+                ConstPtr(cast_instance_to_gcref(pycode))]
+
+    def test_get_code_info(self):
+        space = self.space
+        f = self.make_code('f')
+        g = self.make_code('g')
+        self.loops = [('pypyjit', self.greenkey(f, 12), 3, 10),
+                      ('pypyjit', self.greenkey(g, 12), 4, 100),
+                      ('pypyjit', self.greenkey(f, 30), 5, 20),
+                      ('other', [ConstInt(5)], 6, 1000)]
+        self.dont_trace_here = [(0, 0, cast_instance_to_gcref(g))]
+        w_info = space.call_function(
+            space.getattr(space.getbuiltinmodule('pypyjit'),
+                          space.newtext('get_code_info')), f)
+        w_res = space.appexec([w_info, f], """(info, f):
+            assert info.code is f
+            assert [loop.loop_no for loop in info.loops] == [3, 5]
+            loop = info.loops[1]
+            assert loop.greenkey == (f, 30, False)
+            assert loop.jitdriver_name == 'pypyjit'
+            assert loop.entry_count == 20
+            assert (loop.guard_failures, loop.bridge_count) == (2, 1)
+            assert (loop.trace_time, loop.backend_time) == (0.25, 0.5)
+            assert loop.code_size == 1024
+            assert not loop.invalidated
+            assert info.entry_count == 30
+            assert info.guard_failures == 4
+            assert info.bridge_count == 2
+            assert info.backend_time == 1.0
+            assert not info.dont_trace_here
+            assert info.aborts == {}
+            return True
+        """)
+        assert space.is_true(w_res)
+        w_res = space.appexec([g], """(g):
+            import pypyjit
+            info = pypyjit.get_code_info(g)
+            assert info.dont_trace_here
+            assert info.entry_count == 100
+            return sorted([(loop.loop_no, loop.greenkey is None)
+                           for loop in pypyjit.iter_loops()])
+        """)
+        assert space.unwrap(w_res) == [(3, False), (4, False), (5, False),
+                                       (6, True)]
+
+    def test_aborts(self):
+        space = self.space
+        f = self.make_code('f')
+        greenkey = self.greenkey(f, 12)
+        assert not pypy_hooks.are_hooks_enabled()
+        space.appexec([], """():
+            import pypyjit
+            pypyjit.set_abort_recording(True)
+        """)
+        assert pypy_hooks.are_hooks_enabled()
+        cache = space.fromcache(CodeInfoCache)
+        cache.record_abort(pypyjitdriver, greenkey, Counters.ABORT_TOO_LONG)
+        cache.record_abort(pypyjitdriver, greenkey, Counters.ABORT_TOO_LONG)
+        cache.record_abort(pypyjitdriver, greenkey, Counters.ABORT_BRIDGE)
+        cache.record_abort(pypyjitdriver, None, Counters.ABORT_BRIDGE)
+        w_res = space.appexec([f], """(f):
+            import pypyjit
+            pypyjit.set_abort_recording(False)
+            return pypyjit.get_code_info(f).aborts
+        """)
+        assert space.unwrap(w_res) == {'ABORT_TOO_LONG': 2, 'ABORT_BRIDGE': 1}
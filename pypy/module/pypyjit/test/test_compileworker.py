@@ -0,0 +1,25 @@
+from rpython.rlib import rthread
+from pypy.module.pypyjit.interp_jit import pypyjitdriver
+from pypy.module.pypyjit.hooks import pypy_hooks
+from pypy.module.pypyjit.compileworker import CompileWorker
+
+
+class TestCompileWorker(object):
+    spaceconfig = dict(usemodules=('pypyjit',))
+
+    def test_wake_up(self):
+        worker = self.space.fromcache(CompileWorker)
+        worker.wake_up()           # no worker: nothing to do
+        lock = rthread.allocate_lock()
+        lock.acquire(True)
+        worker.lock = lock
+        try:
+            pypy_hooks.on_compile_queued(pypyjitdriver, None, 'f')
+            assert lock.acquire(False)
+            # several loops queued before the worker wakes up
+            worker.wake_up()
+            worker.wake_up()
+            assert lock.acquire(False)
+            assert not lock.acquire(False)
+        finally:
+            worker.lock = None
@@ -0,0 +1,122 @@
+from rpython.tool.udir import udir
+from rpython.jit.metainterp.history import ConstInt, ConstPtr
+from rpython.rtyper.annlowlevel import cast_instance_to_gcref
+from rpython.rlib.jit import JitDebugInfo
+from pypy.interpreter.pycode import PyCode, CodeHookCache
+from pypy.module.pypyjit.interp_jit import pypyjitdriver
+from pypy.module.pypyjit.hooks import pypy_hooks
+from pypy.module.pypyjit.warmup import WarmupProfile, HOT, TOO_LONG, ABORTED
+
+
+SOURCE = """
+def f(n):
+    while n > 0:
+        n -= 1
+"""
+
+class MockJitDriverSD(object):
+    jitdriver = pypyjitdriver
+
+
+class TestWarmupProfile(object):
+    spaceconfig = dict(usemodules=('pypyjit',))
+
+    def setup_method(self, meth):
+        self.seeded = []
+        def _seed(profile, pycode, entry, flag):
+            self.seeded.append((pycode, entry.next_instr, flag))
+        self._old_seed = WarmupProfile.__dict__['_seed']
+        WarmupProfile._seed = _seed
+
+    def teardown_method(self, meth):
+        WarmupProfile._seed = self._old_seed
+        self.space.fromcache(WarmupProfile).recording = False
+        self.space.fromcache(CodeHookCache)._warmup_profile = None
+
+    def compile(self, source, filename):
+        space = self.space
+        w_code = space.appexec([space.newtext(source),
+                                space.newtext(filename)], """(source, filename):
+            return compile(source, filename, 'exec')
+        """)
+        pycode = space.interp_w(PyCode, w_code)
+        for w_const in pycode.co_consts_w:
+            if isinstance(w_const, PyCode):
+                return w_const       # the code of 'f'
+        assert False
+
+    def greenkey(self, pycode, next_instr):
+        return [ConstInt(next_instr), ConstInt(0),
+                ConstPtr(cast_instance_to_gcref(pycode))]
+
+    def test_record_save_and_load(self):
+        space = self.space
+        filename = str(udir.join('warmup_profile_1'))
+        profile = space.fromcache(WarmupProfile)
+        profile.start(filename)
+        pycode = self.compile(SOURCE, 'mod1.py')
+        assert self.seeded == []
+        profile.record(pypyjitdriver, self.greenkey(pycode, 12), HOT, 50)
+        profile.record(pypyjitdriver, self.greenkey(pycode, 12), ABORTED, 70)
+        profile.record(pypyjitdriver, self.greenkey(pycode, 0), TOO_LONG, 0)
+        profile.record(pypyjitdriver, None, HOT, 5)     # ignored
+        profile.save()
+        lines = sorted(open(filename).read().splitlines())
+        code_hash = hash(pycode.co_code)
+        assert lines == [
+            '2 0 0 2 %d 0 f mod1.py' % code_hash,
+            '5 12 0 2 %d 70 f mod1.py' % code_hash,
+        ]
+        #
+        # the next run
+        profile.start(filename)
+        pycode2 = self.compile(SOURCE, 'mod1.py')
+        assert sorted(self.seeded) == [(pycode2, 0, TOO_LONG),
+                                       (pycode2, 12, HOT)]
+        del self.seeded[:]
+        self.compile(SOURCE, 'mod1.py')       # only once
+        self.compile(SOURCE, 'mod2.py')
+        assert self.seeded == []
+        # what was loaded is saved again
+        profile.save()
+        assert sorted(open(filename).read().splitlines()) == lines
+
+    def test_code_changed(self):
+        space = self.space
+        filename = str(udir.join('warmup_profile_2'))
+        profile = space.fromcache(WarmupProfile)
+        profile.start(filename)
+        pycode = self.compile(SOURCE, 'mod1.py')
+        profile.record(pypyjitdriver, self.greenkey(pycode, 12), HOT, 50)
+        profile.save()
+        profile.start(filename)
+        self.compile(SOURCE.replace('n -= 1', 'n = n - 1'), 'mod1.py')
+        assert self.seeded == []
+        profile.save()
+        assert open(filename).read() == ''
+
+    def test_corrupted_file(self):
+        space = self.space
+        filename = str(udir.join('warmup_profile_3'))
+        with open(filename, 'w') as f:
+            f.write('garbage\n1 x 0 2 3 4 f mod1.py\n\n1 12 0')
+        profile = space.fromcache(WarmupProfile)
+        profile.start(filename)
+        assert profile.pending == {}
+
+    def test_hooks(self):
+        space = self.space
+        profile = space.fromcache(WarmupProfile)
+        profile.start(str(udir.join('warmup_profile_4')))
+        assert pypy_hooks.are_hooks_enabled()
+        pycode = self.compile(SOURCE, 'mod1.py')
+        greenkey = self.greenkey(pycode, 12)
+        debug_info = JitDebugInfo(MockJitDriverSD, None, None, [None] * 7,
+                                  'loop', greenkey)
+        pypy_hooks.after_compile(debug_info)
+        pypy_hooks.on_trace_too_long(pypyjitdriver, self.greenkey(pycode, 0),
+                                     'f')
+        entries = sorted([(next_instr, entry.flags, entry.length)
+                          for (_, _, _, next_instr, _), entry
+                              in profile.recorded.items()])
+        assert entries == [(0, TOO_LONG, 0), (12, HOT, 7)]
@@ -0,0 +1,235 @@
+"""
+Persistent JIT warm-up profile: pypyjit.set_warmup_profile(filename).
+
+While the program runs, the JIT hooks (see hooks.py) record the
+greenkeys from which a loop was compiled, the functions that were too
+long to be inlined, and the traces that were aborted.  At exit, they are
+written to the file.  In the next run, each code object that is created
+with the same file name, name, first line number and bytecode gets its
+greenkeys pre-seeded in the JIT:
+
+  * a loop that was compiled is traced the first time it is reached,
+    instead of after 'threshold' iterations (trace_when_reached());
+
+  * a function that was too long is marked with dont_trace_here(), as
+    the JIT would do after its first trace too long.
+
+Aborted traces are only saved for information.  No machine code is
+saved: the warm-up still traces and compiles, but skips the counting.
+
+The file is text, with one greenkey per line:
+
+    flags next_instr is_being_profiled firstlineno code_hash length name filename
+
+where 'length' is the number of operations of the longest trace.
+"""
+import os
+
+from rpython.rlib import jit, jit_hooks
+from rpython.rlib.objectmodel import compute_hash
+from rpython.rlib.rarithmetic import r_uint, string_to_int
+from rpython.rlib.rstring import (StringBuilder, ParseStringError,
+    ParseStringOverflowError)
+from rpython.rtyper.annlowlevel import cast_instance_to_gcref
+from pypy.interpreter.error import wrap_oserror
+from pypy.interpreter.gateway import unwrap_spec
+from pypy.interpreter.pycode import CodeHookCache
+from pypy.module.pypyjit.interp_resop import unwrap_pypyjit_greenkey
+
+HOT = 0x01          # a loop was compiled from there
+TOO_LONG = 0x02     # a function too long to be inlined
+ABORTED = 0x04      # a trace from there was aborted
+
+
+class ProfileEntry(object):
+    def __init__(self, next_instr, is_being_profiled, code_hash):
+        self.next_instr = next_instr
+        self.is_being_profiled = is_being_profiled
+        self.code_hash = code_hash
+        self.flags = 0
+        self.length = 0
+
+
+class WarmupProfile(object):
+
+    def __init__(self, space):
+        self.space = space
+        self.filename = None
+        self.recording = False
+        # {(co_filename, co_name, co_firstlineno): [ProfileEntry]}
+        # loaded from the file, for the code objects not created yet
+        self.pending = {}
+        # {(co_filename, co_name, co_firstlineno, next_instr,
+        #   is_being_profiled): ProfileEntry} recorded in this run
+        self.recorded = {}
+
+    def start(self, filename):
+        self.filename = filename
+        self.pending = {}
+        self.recorded = {}
+        try:
+            data = _read_file(filename)
+        except OSError:
+            data = ''      # no profile yet
+        for line in data.split('\n'):
+            self._load_line(line)
+        self.recording = True
+        self.space.fromcache(CodeHookCache)._warmup_profile = self
+
+    def _load_line(self, line):
+        fields = line.split(' ', 7)
+        if len(fields) != 8:
+            return
+        try:
+            flags = string_to_int(fields[0])
+            next_instr = string_to_int(fields[1])
+            is_being_profiled = string_to_int(fields[2])
+            firstlineno = string_to_int(fields[3])
+            code_hash = string_to_int(fields[4])
+            length = string_to_int(fields[5])
+        except (ParseStringError, ParseStringOverflowError):
+            return       # ignore corrupted lines
+        entry = ProfileEntry(next_instr, bool(is_being_profiled), code_hash)
+        entry.flags = flags
+        entry.length = length
+        key = (fields[7], fields[6], firstlineno)
+        self.pending.setdefault(key, []).append(entry)
+
+    @jit.dont_look_inside
+    def new_code(self, pycode):
+        """Called when a code object is created: pre-seed the JIT with
+        the greenkeys of the same code in the profile."""
+        key = (pycode.co_filename, pycode.co_name, pycode.co_firstlineno)
+        entries = self.pending.pop(key, None)
+        if entries is None:
+            return
+        code_hash = compute_hash(pycode.co_code)
+        for entry in entries:
+            if entry.code_hash != code_hash:
+                continue     # the code changed
+            # keep it in the profile saved by this run
+            self.recorded[key + (entry.next_instr,
+                                 entry.is_being_profiled)] = entry
+            if entry.flags & TOO_LONG:
+                self._seed(pycode, entry, TOO_LONG)
+            elif entry.flags & HOT:
+                self._seed(pycode, entry, HOT)
+
+    def _seed(self, pycode, entry, flag):
+        ll_pycode = cast_instance_to_gcref(pycode)
+        next_instr = r_uint(entry.next_instr)
+        is_being_profiled = int(entry.is_being_profiled)
+        if flag == TOO_LONG:
+            jit_hooks.dont_trace_here(
+                'pypyjit', next_instr, is_being_profiled, ll_pycode)
+        else:
+            jit_hooks.trace_when_reached(
+                'pypyjit', next_instr, is_being_profiled, ll_pycode)
+
+    # ---------- called from the JIT hooks ----------
+
+    def record(self, jitdriver, greenkey, flag, length):
+        if (not self.recording or greenkey is None or
+                jitdriver.name != 'pypyjit'):
+            return
+        pycode, next_instr, is_being_profiled = unwrap_pypyjit_greenkey(
+            greenkey)
+        key = (pycode.co_filename, pycode.co_name, pycode.co_firstlineno,
+               next_instr, is_being_profiled)
+        entry = self.recorded.get(key, None)
+        if entry is None:
+            entry = ProfileEntry(next_instr, is_being_profiled,
+                                 compute_hash(pycode.co_code))
+            self.recorded[key] = entry
+        entry.flags |= flag
+        if length > entry.length:
+            entry.length = length
+
+    # ----------
+
+    def save(self):
+        builder = StringBuilder()
+        for key, entry in self.recorded.items():
+            co_filename, co_name, co_firstlineno, _, _ = key
+            _write_entry(builder, co_filename, co_name, co_firstlineno,
+                         entry)
+        # keep what we know about the code that did not run this time
+        for key, entries in self.pending.items():
+            co_filename, co_name, co_firstlineno = key
+            for entry in entries:
+                _write_entry(builder, co_filename, co_name, co_firstlineno,
+                             entry)
+        # write a new file and rename it, in case several processes
+        # save the same profile at the same time
+        tmpname = '%s.%d' % (self.filename, os.getpid())
+        _write_file(tmpname, builder.build())
+        os.rename(tmpname, self.filename)
+
+    def shutdown(self):
+        if self.recording:
+            self.recording = False
+            try:
+                self.save()
+            except OSError:
+                pass     # too late to report it
+
+
+def _write_entry(builder, co_filename, co_name, co_firstlineno, entry):
+    if ('\n' in co_filename or ' ' in co_name or '\n' in co_name or
+            not co_name):
+        return
+    builder.append('%d %d %d %d %d %d %s %s\n' % (
+        entry.flags, entry.next_instr, int(entry.is_being_profiled),
+        co_firstlineno, entry.code_hash, entry.length, co_name, co_filename))
+
+def _read_file(filename):
+    fd = os.open(filename, os.O_RDONLY, 0)
+    try:
+        builder = StringBuilder()
+        while True:
+            data = os.read(fd, 65536)
+            if not data:
+                break
+            builder.append(data)
+    finally:
+        os.close(fd)
+    return builder.build()
+
+def _write_file(filename, data):
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0666)
+    try:
+        while data:
+            count = os.write(fd, data)
+            data = data[count:]
+    finally:
+        os.close(fd)
+
+
+@unwrap_spec(filename='fsencode')
+def set_warmup_profile(space, filename):
+    """set_warmup_profile(filename)
+
+    Pre-seed the JIT with the warm-up profile saved in 'filename' by a
+    previous run, if any, and record the profile of this run to save it
+    in the same file at exit.  The loops that were compiled in the
+    previous run are traced the first time they are reached, instead of
+    after many iterations.  Only the code objects created after this call
+    are pre-seeded.  The PYPY_JIT_WARMUP_PROFILE environment variable
+    calls this function at startup.
+    """
+    profile = space.fromcache(WarmupProfile)
+    profile.start(filename)
+
+def save_warmup_profile(space):
+    """save_warmup_profile()
+
+    Save now the warm-up profile started with set_warmup_profile(),
+    instead of waiting until exit (which might not happen normally,
+    e.g. in the processes of a pre-fork server).
+    """
+    profile = space.fromcache(WarmupProfile)
+    if profile.recording:
+        try:
+            profile.save()
+        except OSError as e:
+            raise wrap_oserror(space, e, filename=profile.filename)
@@ -97,14 +97,19 @@ def get_strategy_from_list_objects(space, list_w, sizehint):
         else:
             return space.fromcache(BytesListStrategy)
 
-    elif type(w_firstobj) is W_UnicodeObject and w_firstobj.is_ascii():
-        # check for all-unicodes containing only ascii
+    elif type(w_firstobj) is W_UnicodeObject:
+        # check for all-unicodes, and whether they contain only ascii
+        is_ascii = w_firstobj.is_ascii()
         for i in range(1, len(list_w)):
             item = list_w[i]
-            if type(item) is not W_UnicodeObject or not item.is_ascii():
+            if type(item) is not W_UnicodeObject:
                 break
+            if is_ascii and not item.is_ascii():
+                is_ascii = False
         else:
-            return space.fromcache(AsciiListStrategy)
+            if is_ascii:
+                return space.fromcache(AsciiListStrategy)
+            return space.fromcache(Utf8ListStrategy)
 
     elif type(w_firstobj) is W_FloatObject:
         # check for all-floats
@@ -203,6 +208,13 @@ class W_ListObject(W_Root):
         storage = strategy.erase(list_u)
         return W_ListObject.from_storage_and_strategy(space, storage, strategy)
 
+    @staticmethod
+    def newlist_utf8(space, list_u):
+        strategy = space.fromcache(Utf8ListStrategy)
+        storage = strategy.erase([(u, rutf8.codepoints_in_utf8(u))
+                                  for u in list_u])
+        return W_ListObject.from_storage_and_strategy(space, storage, strategy)
+
     @staticmethod
     def newlist_int(space, list_i):
         strategy = space.fromcache(IntegerListStrategy)
@@ -342,6 +354,11 @@ class W_ListObject(W_Root):
         not use the list strategy, return None."""
         return self.strategy.getitems_ascii(self)
 
+    def getitems_utf8(self):
+        """Return the items in the list as unwrapped utf8 strings.  If the
+        list does not use the ascii or the utf8 list strategy, return None."""
+        return self.strategy.getitems_utf8(self)
+
     def getitems_int(self):
         """Return the items in the list as unwrapped ints. If the list does not
         use the list strategy, return None."""
@@ -806,6 +823,9 @@ class ListStrategy(object):
     def getitems_ascii(self, w_list):
         return None
 
+    def getitems_utf8(self, w_list):
+        return None
+
     def getitems_int(self, w_list):
         return None
 
@@ -949,8 +969,11 @@ class EmptyListStrategy(ListStrategy):
             strategy = self.space.fromcache(IntegerListStrategy)
         elif type(w_item) is W_BytesObject:
             strategy = self.space.fromcache(BytesListStrategy)
-        elif type(w_item) is W_UnicodeObject and w_item.is_ascii():
-            strategy = self.space.fromcache(AsciiListStrategy)
+        elif type(w_item) is W_UnicodeObject:
+            if w_item.is_ascii():
+                strategy = self.space.fromcache(AsciiListStrategy)
+            else:
+                strategy = self.space.fromcache(Utf8ListStrategy)
         elif type(w_item) is W_FloatObject:
             strategy = self.space.fromcache(FloatListStrategy)
         else:
@@ -1006,6 +1029,17 @@ class EmptyListStrategy(ListStrategy):
         space = self.space
         if (isinstance(w_iterable, W_AbstractTupleObject)
                 and space._uses_tuple_iter(w_iterable)):
+            # tuples of ints or floats can be copied without boxing
+            intlist = space.unpackiterable_int(w_iterable)
+            if intlist is not None:
+                w_list.strategy = strategy = space.fromcache(IntegerListStrategy)
+                w_list.lstorage = strategy.erase(intlist)
+                return
+            floatlist = space.unpackiterable_float(w_iterable)
+            if floatlist is not None:
+                w_list.strategy = strategy = space.fromcache(FloatListStrategy)
+                w_list.lstorage = strategy.erase(floatlist)
+                return
             w_list.__init__(space, w_iterable.getitems_copy())
             return
 
@@ -2024,6 +2058,82 @@ class AsciiListStrategy(ListStrategy):
     def getitems_ascii(self, w_list):
         return self.unerase(w_list.lstorage)
 
+    getitems_utf8 = getitems_ascii
+
+    _base_extend_from_list = _extend_from_list
+
+    def _extend_from_list(self, w_list, w_other):
+        if w_other.strategy is self.space.fromcache(Utf8ListStrategy):
+            self.switch_to_utf8_strategy(w_list)
+            w_list.extend(w_other)
+            return
+        return self._base_extend_from_list(w_list, w_other)
+
+    def switch_to_utf8_strategy(self, w_list):
+        # for ascii, the length in code points is the length in bytes
+        strategy = self.space.fromcache(Utf8ListStrategy)
+        l = self.unerase(w_list.lstorage)
+        w_list.lstorage = strategy.erase([(u, len(u)) for u in l])
+        w_list.strategy = strategy
+
+    def switch_to_next_strategy(self, w_list, w_sample_item):
+        if type(w_sample_item) is W_UnicodeObject:
+            # a non-ascii unicode
+            self.switch_to_utf8_strategy(w_list)
+            return
+        w_list.switch_to_object_strategy()
+
+
+class Utf8ListStrategy(ListStrategy):
+    """A list of arbitrary unicode objects, stored as pairs (utf8, length)
+    of their utf8 encoding and their length in code points, so that boxing
+    an item again is cheap.  Comparing utf8 strings bytewise gives the same
+    result as comparing the code points, so 'in', index() and sort() work
+    directly on the storage.
+    """
+    import_from_mixin(AbstractUnwrappedStrategy)
+
+    _none_value = ("", 0)
+
+    def wrap(self, item):
+        utf8, length = item
+        return self.space.newutf8(utf8, length)
+
+    def unwrap(self, w_string):
+        assert isinstance(w_string, W_UnicodeObject)
+        return (w_string._utf8, w_string._len())
+
+    erase, unerase = rerased.new_erasing_pair("utf8")
+    erase = staticmethod(erase)
+    unerase = staticmethod(unerase)
+
+    def is_correct_type(self, w_obj):
+        return type(w_obj) is W_UnicodeObject
+
+    def list_is_correct_type(self, w_list):
+        return w_list.strategy is self.space.fromcache(Utf8ListStrategy)
+
+    _base_extend_from_list = _extend_from_list
+
+    def _extend_from_list(self, w_list, w_other):
+        if w_other.strategy is self.space.fromcache(AsciiListStrategy):
+            l = self.unerase(w_list.lstorage)
+            other = w_other.getitems_ascii()
+            assert other is not None
+            l += [(u, len(u)) for u in other]
+            return
+        return self._base_extend_from_list(w_list, w_other)
+
+    def sort(self, w_list, reverse):
+        l = self.unerase(w_list.lstorage)
+        sorter = Utf8Sort(l, len(l))
+        sorter.sort()
+        if reverse:
+            l.reverse()
+
+    def getitems_utf8(self, w_list):
+        return [utf8 for utf8, _ in self.unerase(w_list.lstorage)]
+
 # _______________________________________________________
 
 init_signature = Signature(['sequence'], None, None)
@@ -2057,6 +2167,7 @@ IntBaseTimSort = make_timsort_class()
 FloatBaseTimSort = make_timsort_class()
 IntOrFloatBaseTimSort = make_timsort_class()
 UnicodeBaseTimSort = make_timsort_class()
+Utf8BaseTimSort = make_timsort_class()
 
 
 class KeyContainer(W_Root):
@@ -2097,6 +2208,11 @@ class UnicodeSort(UnicodeBaseTimSort):
         return a < b
 
 
+class Utf8Sort(Utf8BaseTimSort):
+    def lt(self, a, b):
+        return a[0] < b[0]
+
+
 class CustomCompareSort(SimpleSort):
     def lt(self, a, b):
         space = self.space
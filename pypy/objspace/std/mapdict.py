@@ -1,7 +1,8 @@
 import weakref, sys
 
 from rpython.rlib import jit, objectmodel, debug, rerased
-from rpython.rlib.rarithmetic import intmask, r_uint
+from rpython.rlib.rarithmetic import intmask, r_uint, r_longlong
+from rpython.rlib.longlong2float import longlong2float, float2longlong
 
 from pypy.interpreter.baseobjspace import W_Root
 from pypy.objspace.std.dictmultiobject import (
@@ -9,6 +10,8 @@ from pypy.objspace.std.dictmultiobject import (
     BaseValueIterator, BaseItemIterator, _never_equal_to_string,
     W_DictObject, BytesDictStrategy, UnicodeDictStrategy
 )
+from pypy.objspace.std.floatobject import W_FloatObject
+from pypy.objspace.std.intobject import W_IntObject
 from pypy.objspace.std.typeobject import MutableCell
 
 
@@ -29,6 +32,12 @@ NUM_DIGITS_POW2 = 1 << NUM_DIGITS
 # dict)
 LIMIT_MAP_ATTRIBUTES = 80
 
+# the kinds of attributes: BOXED attributes store the W_Root in the storage
+# directly, the other kinds keep the value unboxed (see UnboxedValues)
+BOXED = 0
+UNBOXED_INT = 1
+UNBOXED_FLOAT = 2
+
 
 class AbstractAttribute(object):
     _immutable_fields_ = ['terminator']
@@ -44,6 +53,8 @@ class AbstractAttribute(object):
         attr = self.find_map_attr(name, index)
         if attr is None:
             return self.terminator._read_terminator(obj, name, index)
+        if isinstance(attr, UnboxedPlainAttribute):
+            return attr._read_unboxed_attr(obj)
         if (
             jit.isconstant(attr.storageindex) and
             jit.isconstant(obj) and
@@ -63,7 +74,7 @@ class AbstractAttribute(object):
             return self.terminator._write_terminator(obj, name, index, w_value)
         if not attr.ever_mutated:
             attr.ever_mutated = True
-        obj._mapdict_write_storage(attr.storageindex, w_value)
+        attr._direct_write(obj, w_value)
         return True
 
     def delete(self, obj, name, index):
@@ -134,14 +145,17 @@ class AbstractAttribute(object):
         return None
 
     @jit.elidable
-    def _get_new_attr(self, name, index):
+    def _get_new_attr(self, name, index, kind=BOXED):
         cache = self.cache_attrs
         if cache is None:
             cache = self.cache_attrs = {}
-        attr = cache.get((name, index), None)
+        attr = cache.get((name, index, kind), None)
         if attr is None:
-            attr = PlainAttribute(name, index, self)
-            cache[name, index] = attr
+            if kind == BOXED:
+                attr = PlainAttribute(name, index, self)
+            else:
+                attr = UnboxedPlainAttribute(name, index, self, kind)
+            cache[name, index, kind] = attr
         return attr
 
     def add_attr(self, obj, name, index, w_value):
@@ -155,7 +169,8 @@ class AbstractAttribute(object):
             oldattr._size_estimate = size_est
 
     def _add_attr_without_reordering(self, obj, name, index, w_value):
-        attr = self._get_new_attr(name, index)
+        kind = _attribute_kind(self.terminator, index, w_value)
+        attr = self._get_new_attr(name, index, kind)
         attr._switch_map_and_write_storage(obj, w_value)
 
     @jit.unroll_safe
@@ -174,13 +189,13 @@ class AbstractAttribute(object):
 
 
     @jit.elidable
-    def _find_branch_to_move_into(self, name, index):
+    def _find_branch_to_move_into(self, name, index, kind):
         # walk up the map chain to find an ancestor with lower order that
         # already has the current name as a child inserted
         current_order = sys.maxint
         number_to_readd = 0
         current = self
-        key = (name, index)
+        key = (name, index, kind)
         while True:
             attr = None
             if current.cache_attrs is not None:
@@ -189,7 +204,7 @@ class AbstractAttribute(object):
                 # we reached the top, so we didn't find it anywhere,
                 # just add it to the top attribute
                 if not isinstance(current, PlainAttribute):
-                    return 0, self._get_new_attr(name, index)
+                    return 0, self._get_new_attr(name, index, kind)
 
             else:
                 return number_to_readd, attr
@@ -226,7 +241,9 @@ class AbstractAttribute(object):
         stack_index = 0
         while True:
             current = self
-            number_to_readd, attr = self._find_branch_to_move_into(name, index)
+            kind = _attribute_kind(self.terminator, index, w_value)
+            number_to_readd, attr = self._find_branch_to_move_into(
+                    name, index, kind)
             # we found the attributes further up, need to save the
             # previous values of the attributes we passed
             if number_to_readd:
@@ -235,8 +252,7 @@ class AbstractAttribute(object):
                 current = self
                 for i in range(number_to_readd):
                     assert isinstance(current, PlainAttribute)
-                    w_self_value = obj._mapdict_read_storage(
-                            current.storageindex)
+                    w_self_value = current._direct_read(obj)
                     stack[stack_index] = erase_map(current)
                     stack[stack_index + 1] = erase_item(w_self_value)
                     stack_index += 2
@@ -268,11 +284,15 @@ class AbstractAttribute(object):
 
 
 class Terminator(AbstractAttribute):
-    _immutable_fields_ = ['w_cls']
+    _immutable_fields_ = ['w_cls', 'allow_unboxing?']
 
     def __init__(self, space, w_cls):
         AbstractAttribute.__init__(self, space, self)
         self.w_cls = w_cls
+        # set to False the first time an unboxed attribute of an instance of
+        # w_cls is overwritten with a value of a different type; from then
+        # on, all new attributes are boxed
+        self.allow_unboxing = True
 
     def _read_terminator(self, obj, name, index):
         return None
@@ -390,6 +410,12 @@ class PlainAttribute(AbstractAttribute):
         w_value = self.read(obj, self.name, self.index)
         new_obj._get_mapdict_map().add_attr(new_obj, self.name, self.index, w_value)
 
+    def _direct_read(self, obj):
+        return obj._mapdict_read_storage(self.storageindex)
+
+    def _direct_write(self, obj, w_value):
+        obj._mapdict_write_storage(self.storageindex, w_value)
+
     def delete(self, obj, name, index):
         if index == self.index and name == self.name:
             # ok, attribute is deleted
@@ -423,7 +449,7 @@ class PlainAttribute(AbstractAttribute):
         new_obj = self.back.materialize_r_dict(space, obj, dict_w)
         if self.index == DICT:
             w_attr = space.newtext(self.name)
-            dict_w[w_attr] = obj._mapdict_read_storage(self.storageindex)
+            dict_w[w_attr] = self._direct_read(obj)
         else:
             self._copy_attr(obj, new_obj)
         return new_obj
@@ -431,7 +457,7 @@ class PlainAttribute(AbstractAttribute):
     def materialize_str_dict(self, space, obj, str_dict):
         new_obj = self.back.materialize_str_dict(space, obj, str_dict)
         if self.index == DICT:
-            str_dict[self.name] = obj._mapdict_read_storage(self.storageindex)
+            str_dict[self.name] = self._direct_read(obj)
         else:
             self._copy_attr(obj, new_obj)
         return new_obj
@@ -445,6 +471,136 @@ class PlainAttribute(AbstractAttribute):
     def __repr__(self):
         return "<PlainAttribute %s %s %s %r>" % (self.name, self.index, self.storageindex, self.back)
 
+
+class UnboxedValues(W_Root):
+    """ The storage entry shared by all the unboxed attributes of an
+    object: the ints and floats are kept in 'values' as longlongs, the
+    floats via float2longlong. """
+    typedef = None
+    _immutable_fields_ = ['values']
+
+    def __init__(self, values):
+        self.values = values
+
+
+def _attribute_kind(terminator, index, w_value):
+    if index != DICT or not terminator.allow_unboxing:
+        return BOXED
+    if type(w_value) is W_IntObject:
+        return UNBOXED_INT
+    if type(w_value) is W_FloatObject:
+        return UNBOXED_FLOAT
+    return BOXED
+
+def _unbox(kind, w_value):
+    if kind == UNBOXED_INT:
+        assert isinstance(w_value, W_IntObject)
+        return r_longlong(w_value.intval)
+    assert isinstance(w_value, W_FloatObject)
+    return float2longlong(w_value.floatval)
+
+def _box(space, kind, value):
+    if kind == UNBOXED_INT:
+        return space.newint(intmask(value))
+    return space.newfloat(longlong2float(value))
+
+def _read_unboxed(obj, storageindex, listindex):
+    w_values = obj._mapdict_read_storage(storageindex)
+    assert isinstance(w_values, UnboxedValues)
+    return w_values.values[listindex]
+
+
+class UnboxedPlainAttribute(PlainAttribute):
+    """ An attribute that only ever stored exact ints or exact floats.  All
+    the unboxed attributes of an object share a single storage entry, an
+    UnboxedValues, in which each of them owns the item 'listindex'.
+    Writing a value of a different type turns the whole object back into
+    boxed attributes. """
+    _immutable_fields_ = ['kind', 'listindex', 'first_unboxed']
+
+    def __init__(self, name, index, back, kind):
+        assert kind != BOXED
+        self.kind = kind
+        prev = back
+        while isinstance(prev, PlainAttribute):
+            if isinstance(prev, UnboxedPlainAttribute):
+                break
+            prev = prev.back
+        if isinstance(prev, UnboxedPlainAttribute):
+            self.first_unboxed = False
+            self.listindex = prev.listindex + 1
+        else:
+            self.first_unboxed = True
+            self.listindex = 0
+        PlainAttribute.__init__(self, name, index, back)
+        if isinstance(prev, UnboxedPlainAttribute):
+            self.storageindex = prev.storageindex
+            self._size_estimate = self.length() * NUM_DIGITS_POW2
+
+    def length(self):
+        if self.first_unboxed:
+            return self.storageindex + 1
+        return self.back.length()
+
+    def _is_correct_type(self, w_value):
+        if self.kind == UNBOXED_INT:
+            return type(w_value) is W_IntObject
+        return type(w_value) is W_FloatObject
+
+    def _read_unboxed_attr(self, obj):
+        if jit.isconstant(obj) and not self.ever_mutated:
+            value = self._pure_read_unboxed(obj)
+        else:
+            value = _read_unboxed(obj, self.storageindex, self.listindex)
+        return _box(self.space, self.kind, value)
+
+    @jit.elidable
+    def _pure_read_unboxed(self, obj):
+        return _read_unboxed(obj, self.storageindex, self.listindex)
+
+    def _direct_read(self, obj):
+        value = _read_unboxed(obj, self.storageindex, self.listindex)
+        return _box(self.space, self.kind, value)
+
+    def _direct_write(self, obj, w_value):
+        if self._is_correct_type(w_value):
+            w_values = obj._mapdict_read_storage(self.storageindex)
+            assert isinstance(w_values, UnboxedValues)
+            w_values.values[self.listindex] = _unbox(self.kind, w_value)
+        else:
+            self._write_boxed(obj, w_value)
+
+    @jit.dont_look_inside
+    def _write_boxed(self, obj, w_value):
+        # a value of the wrong type: stop unboxing attributes of this class,
+        # rebuild the object with boxed attributes and write again
+        self.terminator.allow_unboxing = False
+        new_obj = obj._get_mapdict_map().copy(obj)
+        obj._set_mapdict_storage_and_map(new_obj.storage, new_obj.map)
+        flag = obj._get_mapdict_map().write(obj, self.name, self.index, w_value)
+        assert flag
+
+    @jit.unroll_safe
+    def _switch_map_and_write_storage(self, obj, w_value):
+        value = _unbox(self.kind, w_value)
+        if self.first_unboxed:
+            w_values = UnboxedValues([value])
+            PlainAttribute._switch_map_and_write_storage(self, obj, w_values)
+            return
+        w_oldvalues = obj._mapdict_read_storage(self.storageindex)
+        assert isinstance(w_oldvalues, UnboxedValues)
+        values = [r_longlong(0)] * (self.listindex + 1)
+        for i in range(self.listindex):
+            values[i] = w_oldvalues.values[i]
+        values[self.listindex] = value
+        obj._set_mapdict_map(self)
+        obj._mapdict_write_storage(self.storageindex, UnboxedValues(values))
+
+    def __repr__(self):
+        return "<UnboxedPlainAttribute %s %s %s %s %s %r>" % (
+            self.name, self.index, self.kind, self.storageindex,
+            self.listindex, self.back)
+
 class MapAttrCache(object):
     def __init__(self, space):
         SIZE = 1 << space.config.objspace.std.methodcachesizeexp
@@ -861,6 +1017,24 @@ class MapDictStrategy(DictStrategy):
 
     # XXX could implement a more efficient w_keys based on space.newlist_bytes
 
+    def getitems_str(self, w_dict):
+        """ Returns the unwrapped keys and the values as two lists, in the
+        same order as iteration. Used by the json encoder. """
+        w_obj = self.unerase(w_dict.dstorage)
+        attrs = []
+        curr = w_obj._get_mapdict_map().search(DICT)
+        while curr is not None:
+            attrs.append(curr)
+            curr = curr.back.search(DICT)
+        keys = [None] * len(attrs)
+        values_w = [None] * len(attrs)
+        for i in range(len(attrs)):
+            attr = attrs[len(attrs) - 1 - i]
+            assert isinstance(attr, PlainAttribute)
+            keys[i] = attr.name
+            values_w[i] = attr._direct_read(w_obj)
+        return keys, values_w
+
     def iterkeys(self, w_dict):
         return MapDictIteratorKeys(self.space, self, w_dict)
     def itervalues(self, w_dict):
@@ -970,6 +1144,8 @@ class MapDictIteratorItems(BaseItemIterator):
 class CacheEntry(object):
     version_tag = None
     storageindex = 0
+    kind = BOXED         # for unboxed attributes, the kind and the
+    listindex = 0        # index in the UnboxedValues
     w_method = None # for callmethod
     success_counter = 0
     failure_counter = 0
@@ -1002,7 +1178,8 @@ def init_mapdict_cache(pycode):
     pycode._mapdict_caches = [INVALID_CACHE_ENTRY] * num_entries
 
 @jit.dont_look_inside
-def _fill_cache(pycode, nameindex, map, version_tag, storageindex, w_method=None):
+def _fill_cache(pycode, nameindex, map, version_tag, storageindex, w_method=None,
+                kind=BOXED, listindex=0):
     if not pycode.space._side_effects_ok():
         return
     entry = pycode._mapdict_caches[nameindex]
@@ -1012,6 +1189,8 @@ def _fill_cache(pycode, nameindex, map, version_tag, storageindex, w_method=None
     entry.map_wref = weakref.ref(map)
     entry.version_tag = version_tag
     entry.storageindex = storageindex
+    entry.kind = kind
+    entry.listindex = listindex
     entry.w_method = w_method
     if pycode.space.config.objspace.std.withmethodcachecounter:
         entry.failure_counter += 1
@@ -1023,7 +1202,10 @@ def LOAD_ATTR_caching(pycode, w_obj, nameindex):
     map = w_obj._get_mapdict_map()
     if entry.is_valid_for_map(map) and entry.w_method is None:
         # everything matches, it's incredibly fast
-        return w_obj._mapdict_read_storage(entry.storageindex)
+        if entry.kind == BOXED:
+            return w_obj._mapdict_read_storage(entry.storageindex)
+        value = _read_unboxed(w_obj, entry.storageindex, entry.listindex)
+        return _box(pycode.space, entry.kind, value)
     return LOAD_ATTR_slowpath(pycode, w_obj, nameindex, map)
 LOAD_ATTR_caching._always_inline_ = True
 
@@ -1069,8 +1251,15 @@ def LOAD_ATTR_slowpath(pycode, w_obj, nameindex, map):
                     # Note that if map.terminator is a DevolvedDictTerminator
                     # or the class provides its own dict, not using mapdict, then:
                     # map.find_map_attr will always return None if index==DICT.
-                    _fill_cache(pycode, nameindex, map, version_tag, attr.storageindex)
-                    return w_obj._mapdict_read_storage(attr.storageindex)
+                    assert isinstance(attr, PlainAttribute)
+                    if isinstance(attr, UnboxedPlainAttribute):
+                        _fill_cache(pycode, nameindex, map, version_tag,
+                                    attr.storageindex, kind=attr.kind,
+                                    listindex=attr.listindex)
+                    else:
+                        _fill_cache(pycode, nameindex, map, version_tag,
+                                    attr.storageindex)
+                    return attr._direct_read(w_obj)
     if space.config.objspace.std.withmethodcachecounter:
         INVALID_CACHE_ENTRY.failure_counter += 1
     return space.getattr(w_obj, w_name)
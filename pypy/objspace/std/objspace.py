@@ -312,7 +312,7 @@ class StdObjSpace(ObjSpace):
     def newlist_utf8(self, list_u, is_ascii):
         if is_ascii:
             return W_ListObject.newlist_ascii(self, list_u)
-        return ObjSpace.newlist_utf8(self, list_u, False)
+        return W_ListObject.newlist_utf8(self, list_u)
 
     def newlist_int(self, list_i):
         return W_ListObject.newlist_int(self, list_i)
@@ -518,6 +518,13 @@ class StdObjSpace(ObjSpace):
             return w_obj.getitems_ascii()
         return None
 
+    def listview_utf8(self, w_obj):
+        if type(w_obj) is W_ListObject:
+            return w_obj.getitems_utf8()
+        if isinstance(w_obj, W_ListObject) and self._uses_list_iter(w_obj):
+            return w_obj.getitems_utf8()
+        return None
+
     def listview_int(self, w_obj):
         if type(w_obj) is W_ListObject:
             return w_obj.getitems_int()
@@ -532,8 +539,9 @@ class StdObjSpace(ObjSpace):
     def listview_float(self, w_obj):
         if type(w_obj) is W_ListObject:
             return w_obj.getitems_float()
-        # dict and set don't have FloatStrategy, so we can just ignore them
-        # for now
+        if type(w_obj) is W_DictObject:
+            return w_obj.listview_float()
+        # set doesn't have FloatStrategy, so we can just ignore it for now
         if isinstance(w_obj, W_ListObject) and self._uses_list_iter(w_obj):
             return w_obj.getitems_float()
         return None
@@ -1,6 +1,12 @@
+import operator
+
 from pypy.interpreter.error import oefmt
-from pypy.objspace.std.tupleobject import W_AbstractTupleObject
+from pypy.objspace.std.tupleobject import (
+    W_AbstractTupleObject, UNROLL_CUTOFF, _unroll_condition,
+    _unroll_condition_cmp)
 from pypy.objspace.std.util import negate
+from rpython.rlib import jit
+from rpython.rlib.debug import make_sure_not_resized
 from rpython.rlib.objectmodel import specialize
 from rpython.rlib.rarithmetic import intmask
 from rpython.rlib.unroll import unrolling_iterable
@@ -137,12 +143,178 @@ def make_specialised_class(typetuple):
     _specialisations.append(cls)
     return cls
 
+
+def _make_tuple_comparison(cls, name):
+    op = getattr(operator, name)
+
+    def compare_tuples(self, space, w_other):
+        if not isinstance(w_other, W_AbstractTupleObject):
+            return space.w_NotImplemented
+        if not isinstance(w_other, cls):
+            return getattr(W_AbstractTupleObject, 'descr_' + name)(
+                self, space, w_other)
+        return _compare_tuples(self, space, w_other)
+
+    @jit.look_inside_iff(_unroll_condition_cmp)
+    def _compare_tuples(self, space, w_other):
+        values1 = self.values
+        values2 = w_other.values
+        ncmp = min(len(values1), len(values2))
+        # Search for the first index where items are different
+        for p in range(ncmp):
+            if not cls._item_eq(values1[p], values2[p]):
+                return space.newbool(op(values1[p], values2[p]))
+        # No more items to compare -- compare sizes
+        return space.newbool(op(len(values1), len(values2)))
+
+    compare_tuples.__name__ = 'descr_' + name
+    return compare_tuples
+
+
+def make_homogeneous_class(typ):
+    """ Make a tuple class storing any number of items, which are all
+    ints or all floats, unboxed in a fixed-size list. """
+    if typ == int:
+        def wrap(space, x):
+            return space.newint(x)
+        def item_hash(space, x):
+            from pypy.objspace.std.intobject import _hash_int
+            return _hash_int(x)
+        def item_eq(x, y):
+            return x == y
+        def is_item(space, w_obj):
+            from pypy.objspace.std.intobject import W_IntObject
+            return type(w_obj) is W_IntObject
+        def unwrap(space, w_obj):
+            return space.int_w(w_obj)
+        suffix = 'ints'
+    elif typ == float:
+        def wrap(space, x):
+            return space.newfloat(x)
+        def item_hash(space, x):
+            from pypy.objspace.std.floatobject import _hash_float
+            return _hash_float(space, x)
+        def item_eq(x, y):
+            # NaNs are equal if they are the same object, which for floats
+            # means the same bit pattern
+            return x == y or float2longlong(x) == float2longlong(y)
+        def is_item(space, w_obj):
+            from pypy.objspace.std.floatobject import W_FloatObject
+            return type(w_obj) is W_FloatObject
+        def unwrap(space, w_obj):
+            return space.float_w(w_obj)
+        suffix = 'floats'
+    else:
+        assert 0
+
+    class cls(W_AbstractTupleObject):
+        _immutable_fields_ = ['values[*]']
+
+        def __init__(self, space, values):
+            make_sure_not_resized(values)
+            self.space = space
+            self.values = values
+
+        def length(self):
+            return len(self.values)
+
+        def tolist(self):
+            values = self.values
+            list_w = [None] * len(values)
+            for i in range(len(values)):
+                list_w[i] = wrap(self.space, values[i])
+            return list_w
+
+        # same source code, but builds and returns a resizable list
+        getitems_copy = func_with_new_name(tolist, 'getitems_copy')
+
+        if typ == int:
+            def unpackiterable_int(self, space):
+                return self.values[:]
+        else:
+            def unpackiterable_float(self, space):
+                return self.values[:]
+
+        def descr_hash(self, space):
+            return space.newint(self._hash(space))
+
+        @jit.look_inside_iff(lambda self, space: _unroll_condition(self))
+        def _hash(self, space):
+            mult = 1000003
+            x = 0x345678
+            z = len(self.values)
+            for value in self.values:
+                y = item_hash(space, value)
+                x = (x ^ y) * mult
+                z -= 1
+                mult += 82520 + z + z
+            x += 97531
+            return intmask(x)
+
+        def descr_eq(self, space, w_other):
+            if not isinstance(w_other, W_AbstractTupleObject):
+                return space.w_NotImplemented
+            if not isinstance(w_other, cls):
+                return self._descr_eq_generic(space, w_other)
+            return space.newbool(self._eq_values(w_other.values))
+
+        @jit.look_inside_iff(lambda self, values: _unroll_condition(self))
+        def _eq_values(self, values):
+            if len(self.values) != len(values):
+                return False
+            for i in range(len(values)):
+                if not item_eq(self.values[i], values[i]):
+                    return False
+            return True
+
+        @jit.look_inside_iff(_unroll_condition_cmp)
+        def _descr_eq_generic(self, space, w_other):
+            if len(self.values) != w_other.length():
+                return space.w_False
+            items2 = w_other.tolist()
+            for i in range(len(self.values)):
+                w_item = wrap(space, self.values[i])
+                if not space.eq_w(w_item, items2[i]):
+                    return space.w_False
+            return space.w_True
+
+        descr_ne = negate(descr_eq)
+
+        def descr_contains(self, space, w_obj):
+            if is_item(space, w_obj):
+                return space.newbool(self._contains(unwrap(space, w_obj)))
+            return W_AbstractTupleObject.descr_contains(self, space, w_obj)
+
+        @jit.look_inside_iff(lambda self, value: _unroll_condition(self))
+        def _contains(self, value):
+            for x in self.values:
+                if item_eq(x, value):
+                    return True
+            return False
+
+        def getitem(self, space, index):
+            try:
+                return wrap(space, self.values[index])
+            except IndexError:
+                raise oefmt(space.w_IndexError, "tuple index out of range")
+
+    cls._item_eq = staticmethod(item_eq)
+    cls.descr_lt = _make_tuple_comparison(cls, 'lt')
+    cls.descr_le = _make_tuple_comparison(cls, 'le')
+    cls.descr_gt = _make_tuple_comparison(cls, 'gt')
+    cls.descr_ge = _make_tuple_comparison(cls, 'ge')
+    cls.__name__ = 'W_SpecialisedTupleObject_' + suffix
+    _specialisations.append(cls)
+    return cls
+
 # ---------- current specialized versions ----------
 
 _specialisations = []
 Cls_ii = make_specialised_class((int, int))
 Cls_oo = make_specialised_class((object, object))
 Cls_ff = make_specialised_class((float, float))
+Cls_ints = make_homogeneous_class(int)
+Cls_floats = make_homogeneous_class(float)
 
 def makespecialisedtuple(space, list_w):
     from pypy.objspace.std.intobject import W_IntObject
@@ -156,8 +328,57 @@ def makespecialisedtuple(space, list_w):
             if type(w_arg2) is W_FloatObject:
                 return Cls_ff(space, space.float_w(w_arg1), space.float_w(w_arg2))
         return Cls_oo(space, w_arg1, w_arg2)
-    else:
-        raise NotSpecialised
+    elif len(list_w) > 2:
+        w_arg1 = list_w[0]
+        if type(w_arg1) is W_IntObject:
+            return _make_homogeneous_ints(space, list_w)
+        elif type(w_arg1) is W_FloatObject:
+            return _make_homogeneous_floats(space, list_w)
+    raise NotSpecialised
+
+def _homogeneous_unroll_condition(space, list_w):
+    return jit.loop_unrolling_heuristic(list_w, len(list_w), UNROLL_CUTOFF)
+
+@jit.look_inside_iff(_homogeneous_unroll_condition)
+def _make_homogeneous_ints(space, list_w):
+    from pypy.objspace.std.intobject import W_IntObject
+    values = [0] * len(list_w)
+    for i in range(len(list_w)):
+        w_item = list_w[i]
+        if type(w_item) is not W_IntObject:
+            raise NotSpecialised
+        values[i] = space.int_w(w_item)
+    return Cls_ints(space, values)
+
+@jit.look_inside_iff(_homogeneous_unroll_condition)
+def _make_homogeneous_floats(space, list_w):
+    from pypy.objspace.std.floatobject import W_FloatObject
+    values = [0.0] * len(list_w)
+    for i in range(len(list_w)):
+        w_item = list_w[i]
+        if type(w_item) is not W_FloatObject:
+            raise NotSpecialised
+        values[i] = space.float_w(w_item)
+    return Cls_floats(space, values)
+
+def newtuple_from_list_storage(space, w_list):
+    """ Build a tuple directly from the storage of a list using the
+    integer or float strategy, without boxing the items.  Returns None if
+    the list does not use such a strategy. """
+    from pypy.objspace.std.listobject import W_ListObject
+    if type(w_list) is not W_ListObject:
+        return None
+    intlist = w_list.getitems_int()
+    if intlist is not None:
+        if len(intlist) <= 2:
+            return None
+        return Cls_ints(space, intlist[:])
+    floatlist = w_list.getitems_float()
+    if floatlist is not None:
+        if len(floatlist) <= 2:
+            return None
+        return Cls_floats(space, floatlist[:])
+    return None
 
 # --------------------------------------------------
 # Special code based on list strategies to implement zip(),
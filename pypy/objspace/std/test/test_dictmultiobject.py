@@ -1126,6 +1126,62 @@ class AppTestDictViews:
         assert logger_copy.issubset({(foo1, foo2_bis), (foo2, foo2_bis), (foo3, foo2_bis)})
 
 
+class AppTestIntPairStrategy(object):
+    spaceconfig = {"objspace.std.withspecialisedtuple": True}
+
+    def setup_class(cls):
+        if cls.runappdirect:
+            py.test.skip("__repr__ doesn't work on appdirect")
+
+    def w_get_strategy(self, obj):
+        import __pypy__
+        r = __pypy__.internal_repr(obj)
+        return r[r.find("(") + 1: r.find(")")]
+
+    def test_empty_to_int_pair(self):
+        d = {}
+        d[1, 2] = "a"
+        assert "IntPairDictStrategy" in self.get_strategy(d)
+        d[(-5, 2 ** 40)] = "b"
+        assert d[1, 2] == "a"
+        assert d[-5, 2 ** 40] == "b"
+        assert d.get((2, 1)) is None
+        assert d.get(None) is None
+        assert d.get(12) is None
+        assert "IntPairDictStrategy" in self.get_strategy(d)
+        assert sorted(d) == [(-5, 2 ** 40), (1, 2)]
+        assert sorted(d.items()) == [((-5, 2 ** 40), "b"), ((1, 2), "a")]
+        assert type(d.keys()[0]) is tuple
+        del d[1, 2]
+        assert d == {(-5, 2 ** 40): "b"}
+
+    def test_int_pair_switch(self):
+        d = {(1, 2): "a"}
+        assert "IntPairDictStrategy" in self.get_strategy(d)
+        assert d[1.0, 2.0] == "a"
+        assert "ObjectDictStrategy" in self.get_strategy(d)
+        assert d[1, 2] == "a"
+
+        d = {(1, 2): "a"}
+        d[1, 2, 3] = "b"
+        assert "ObjectDictStrategy" in self.get_strategy(d)
+        assert d == {(1, 2): "a", (1, 2, 3): "b"}
+
+        d = {(1, 2): "a"}
+        d[True, 2] = "b"
+        assert d == {(1, 2): "b"}
+
+    def test_int_pair_grid(self):
+        grid = {}
+        for x in range(10):
+            for y in range(10):
+                grid[x, y] = x * y
+        assert "IntPairDictStrategy" in self.get_strategy(grid)
+        assert len(grid) == 100
+        assert sum(grid[x, x] for x in range(10)) == 285
+        assert sum(grid.itervalues()) == 2025
+
+
 class AppTestStrategies(object):
     def setup_class(cls):
         if cls.runappdirect:
@@ -1170,6 +1226,64 @@ class AppTestStrategies(object):
         assert "IntDictStrategy" in self.get_strategy(d)
         assert d[1L] == "hi"
 
+    def test_empty_to_float(self):
+        d = {}
+        d[1.5] = "hi"
+        assert "FloatDictStrategy" in self.get_strategy(d)
+        assert d[1.5] == "hi"
+        d[2.0] = "two"
+        assert d[2] == "two"     # switches to the object strategy
+        assert "ObjectDictStrategy" in self.get_strategy(d)
+        assert d[2.0] == "two"
+
+        d = {}
+        d[2.5] = 1
+        assert d.get(2) is None
+        assert "ObjectDictStrategy" in self.get_strategy(d)
+
+        d = {}
+        d[2.5] = 1
+        assert d.get(None) is None
+        assert d.keys() == [2.5]
+        assert type(d.keys()[0]) is float
+        assert "FloatDictStrategy" in self.get_strategy(d)
+
+    def test_float_strategy_zero_and_nan(self):
+        d = {}
+        d[-0.0] = "a"
+        d[0.0] = "b"
+        assert "FloatDictStrategy" in self.get_strategy(d)
+        assert len(d) == 1
+        assert str(d.keys()[0]) == "-0.0"
+        assert d[0.0] == d[-0.0] == "b"
+
+        nan = float("nan")
+        assert d.get(nan) is None
+        assert "FloatDictStrategy" in self.get_strategy(d)
+        d[nan] = "nan"
+        assert "ObjectDictStrategy" in self.get_strategy(d)
+        assert d[nan] == "nan"
+
+        d = {}
+        d[nan] = 1
+        assert "FloatDictStrategy" not in self.get_strategy(d)
+        assert d[nan] == 1
+
+    def test_float_strategy_iterate(self):
+        d = dict.fromkeys([0.5, 1.5, 2.5], 0)
+        d[3.5] = 1
+        assert "FloatDictStrategy" in self.get_strategy(d)
+        assert sorted(d) == [0.5, 1.5, 2.5, 3.5]
+        assert sorted(d.items()) == [(0.5, 0), (1.5, 0), (2.5, 0), (3.5, 1)]
+        assert sorted(list(d.iterkeys())) == [0.5, 1.5, 2.5, 3.5]
+        d2 = {}
+        d2.update(d)
+        assert "FloatDictStrategy" in self.get_strategy(d2)
+        assert d2 == d
+        del d[0.5]
+        assert d.pop(1.5) == 0
+        assert d == {2.5: 0, 3.5: 1}
+
     def test_iter_dict_length_change(self):
         d = {1: 2, 3: 4, 5: 6}
         it = d.iteritems()
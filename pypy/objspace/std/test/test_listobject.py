@@ -703,6 +703,34 @@ class AppTestListObject(object):
         l.sort()
         assert l == ["a", "b", "c", "d"]
 
+    def test_sort_utf8(self):
+        l = [u"\u1234", u"b", u"\U00012345", u"\xe9", u"\ud800", u"a"]
+        l.sort()
+        assert l == [u"a", u"b", u"\xe9", u"\u1234", u"\ud800",
+                     u"\U00012345"]
+        l.sort(reverse=True)
+        assert l[0] == u"\U00012345" and l[-1] == u"a"
+        assert u"\xe9" in l
+        assert u"\xe8" not in l
+        assert l.index(u"\u1234") == 2
+        assert u"-".join(l[:2]) == u"\U00012345-\ud800"
+        assert len(u"\u20ac".join(l)) == 11
+
+    def test_utf8_items_length(self):
+        l = [u"\u1234\xe9", u"b", u"\U00012345"]
+        l.append(u"\xe9" * 5)
+        l.extend([u"ab", u"\u20acx"])
+        assert [len(x) for x in l] == [2, 1, 1, 5, 2, 2]
+        assert l[0][1] == u"\xe9" and l[-1][0] == u"\u20ac"
+        assert l[3][4] == u"\xe9"
+        assert [x[-1] for x in l] == [u"\xe9", u"b", u"\U00012345", u"\xe9",
+                                      u"b", u"x"]
+        assert len(l.pop()) == 2
+        l2 = l[1:3] + [3]
+        assert len(l2[1]) == 1 and l2[1][0] == u"\U00012345"
+        l.sort()
+        assert [len(x) for x in l] == [2, 1, 5, 2, 1]
+
     def test_sort_range(self):
         l = range(3, 10, 3)
         l.sort()
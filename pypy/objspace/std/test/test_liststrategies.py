@@ -4,7 +4,7 @@ from pypy.objspace.std.listobject import (
     W_ListObject, EmptyListStrategy, ObjectListStrategy, IntegerListStrategy,
     FloatListStrategy, BytesListStrategy, RangeListStrategy,
     SimpleRangeListStrategy, make_range_list, AsciiListStrategy,
-    IntOrFloatListStrategy)
+    Utf8ListStrategy, IntOrFloatListStrategy)
 from pypy.objspace.std import listobject
 from pypy.objspace.std.test.test_listobject import TestW_ListObject
 
@@ -82,6 +82,35 @@ class TestW_ListStrategies(TestW_ListObject):
         l.append(space.wrap(3))
         assert isinstance(l.strategy, ObjectListStrategy)
 
+    def test_utf8_to_any(self):
+        space = self.space
+        w_pi = space.newutf8('\xcf\x80', 1)
+        l = W_ListObject(space, [space.wrap(u'a'), w_pi])
+        assert isinstance(l.strategy, Utf8ListStrategy)
+        l = W_ListObject(space, [space.wrap(u'a'), space.wrap(u'b')])
+        assert isinstance(l.strategy, AsciiListStrategy)
+        l.append(w_pi)
+        assert isinstance(l.strategy, Utf8ListStrategy)
+        l.append(space.wrap(u'c'))
+        assert isinstance(l.strategy, Utf8ListStrategy)
+        assert space.len_w(l.getitem(2)) == 1
+        assert l.getitems_utf8() == ['a', 'b', '\xcf\x80', 'c']
+        # the length in code points is stored next to the utf8
+        storage = l.strategy.unerase(l.lstorage)
+        assert storage == [('a', 1), ('b', 1), ('\xcf\x80', 1), ('c', 1)]
+        l.append(space.wrap(3))
+        assert isinstance(l.strategy, ObjectListStrategy)
+
+        l = W_ListObject(space, [])
+        l.append(w_pi)
+        assert isinstance(l.strategy, Utf8ListStrategy)
+        l.extend(W_ListObject(space, [space.wrap(u'x')]))
+        assert isinstance(l.strategy, Utf8ListStrategy)
+        l = W_ListObject(space, [space.wrap(u'x')])
+        l.extend(W_ListObject(space, [w_pi]))
+        assert isinstance(l.strategy, Utf8ListStrategy)
+        assert l.getitems_utf8() == ['x', '\xcf\x80']
+
     def test_float_to_any(self):
         l = W_ListObject(self.space,
                          [self.space.wrap(1.1),self.space.wrap(2.2),self.space.wrap(3.3)])
@@ -680,6 +709,27 @@ class TestW_ListStrategies(TestW_ListObject):
         assert space.listview_ascii(w_l3) == [u"a", u"b", u"c"]
         assert space.listview_ascii(w_l4) == [u"a", u"b", u"c"]
 
+    def test_unicode_uses_newlist_utf8(self):
+        space = self.space
+        w_u = space.newutf8("a \xcf\x80 c", 5)
+        space.newlist = None
+        try:
+            w_l = space.call_method(w_u, "split")
+            w_l2 = space.call_method(w_u, "rsplit", space.wrap(" "))
+        finally:
+            del space.newlist
+        assert isinstance(w_l.strategy, Utf8ListStrategy)
+        assert space.listview_utf8(w_l) == ["a", "\xcf\x80", "c"]
+        assert space.listview_utf8(w_l2) == ["a", "\xcf\x80", "c"]
+
+    def test_unicode_join_uses_listview_utf8(self):
+        space = self.space
+        w_l = space.newlist([space.wrap(u'a'), space.newutf8('\xcf\x80', 1)])
+        w_l.getitems = None
+        w_res = space.call_method(space.newutf8('\xc3\xa9', 1), "join", w_l)
+        assert space.utf8_w(w_res) == 'a\xc3\xa9\xcf\x80'
+        assert space.len_w(w_res) == 3
+
     def test_pop_without_argument_is_fast(self):
         space = self.space
         w_l = W_ListObject(space, [space.wrap(1), space.wrap(2), space.wrap(3)])
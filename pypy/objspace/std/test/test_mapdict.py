@@ -475,6 +475,18 @@ def test_getdict():
     assert obj.getdict(space) is obj.getdict(space)
     assert obj.getdict(space).length() == 3
 
+def test_getitems_str():
+    cls = Class()
+    obj = cls.instantiate()
+    obj.setslotvalue(0, 50)
+    obj.setdictvalue(space, "b", 61)
+    obj.setdictvalue(space, "a", 51)
+    obj.setdictvalue(space, "c", 71)
+    w_dict = obj.getdict(space)
+    keys, values = w_dict.get_strategy().getitems_str(w_dict)
+    assert keys == ["b", "a", "c"]
+    assert values == [61, 51, 71]
+
 
 def test_materialize_r_dict():
     cls = Class()
@@ -529,6 +541,102 @@ def test_size_prediction():
                 obj.setdictvalue(space, a, 50)
         assert c.terminator.size_estimate() in [(i + 10) // 2, (i + 11) // 2]
 
+def _setup_unboxing(monkeypatch):
+    from pypy.objspace.std.intobject import W_IntObject
+    from pypy.objspace.std.floatobject import W_FloatObject
+    monkeypatch.setattr(space, "newint", W_IntObject, raising=False)
+    monkeypatch.setattr(space, "newfloat", W_FloatObject, raising=False)
+    return W_IntObject, W_FloatObject
+
+def test_unboxed_attributes(monkeypatch):
+    W_IntObject, W_FloatObject = _setup_unboxing(monkeypatch)
+    cls = Class()
+    obj = cls.instantiate()
+    obj.setdictvalue(space, "a", W_IntObject(5))
+    obj.setdictvalue(space, "b", "boxed")
+    obj.setdictvalue(space, "c", W_FloatObject(1.5))
+    assert isinstance(obj.map, UnboxedPlainAttribute)
+    assert obj.map.kind == UNBOXED_FLOAT
+    assert type(obj.map.back) is PlainAttribute
+    assert obj.map.back.back.kind == UNBOXED_INT
+    # the two unboxed attributes share a single storage entry
+    assert obj.map.length() == 2
+    assert obj.map.storageindex == obj.map.back.back.storageindex == 0
+    w_values = obj.storage[0]
+    assert isinstance(w_values, UnboxedValues)
+    assert len(w_values.values) == 2
+    assert obj.getdictvalue(space, "a").intval == 5
+    assert obj.getdictvalue(space, "b") == "boxed"
+    assert obj.getdictvalue(space, "c").floatval == 1.5
+
+    map = obj.map
+    obj.setdictvalue(space, "a", W_IntObject(-7))
+    obj.setdictvalue(space, "c", W_FloatObject(-0.25))
+    assert obj.map is map
+    assert obj.storage[0] is w_values
+    assert obj.getdictvalue(space, "a").intval == -7
+    assert obj.getdictvalue(space, "c").floatval == -0.25
+
+    obj2 = cls.instantiate()
+    obj2.setdictvalue(space, "a", W_IntObject(1))
+    obj2.setdictvalue(space, "b", None)
+    obj2.setdictvalue(space, "c", W_FloatObject(2.0))
+    assert obj2.map is map
+    assert obj2.storage[0] is not w_values
+
+def test_unboxed_attributes_different_type(monkeypatch):
+    W_IntObject, W_FloatObject = _setup_unboxing(monkeypatch)
+    cls = Class()
+    obj = cls.instantiate()
+    obj.setdictvalue(space, "a", W_IntObject(5))
+    obj.setdictvalue(space, "b", W_FloatObject(1.5))
+    obj2 = cls.instantiate()
+    obj2.setdictvalue(space, "a", W_IntObject(6))
+    assert cls.terminator.allow_unboxing
+    obj.setdictvalue(space, "a", W_FloatObject(2.5))
+    assert not cls.terminator.allow_unboxing
+    assert type(obj.map) is PlainAttribute
+    assert type(obj.map.back) is PlainAttribute
+    assert obj.getdictvalue(space, "a").floatval == 2.5
+    assert obj.getdictvalue(space, "b").floatval == 1.5
+    # other instances are converted lazily, new attributes are boxed
+    assert isinstance(obj2.map, UnboxedPlainAttribute)
+    obj2.setdictvalue(space, "b", W_FloatObject(3.5))
+    assert type(obj2.map) is PlainAttribute
+    obj2.setdictvalue(space, "a", "x")
+    assert type(obj2.map.back) is PlainAttribute
+    assert obj2.getdictvalue(space, "a") == "x"
+    assert obj2.getdictvalue(space, "b").floatval == 3.5
+
+def test_unboxed_attributes_reorder_and_delete(monkeypatch):
+    W_IntObject, W_FloatObject = _setup_unboxing(monkeypatch)
+    cls = Class()
+    obj = cls.instantiate()
+    for i, name in enumerate("abcd"):
+        obj.setdictvalue(space, name, W_IntObject(i))
+    obj2 = cls.instantiate()
+    for i, name in enumerate("dcba"):
+        obj2.setdictvalue(space, name, W_FloatObject(i + 0.5))
+    obj3 = cls.instantiate()
+    for i, name in enumerate("badc"):
+        obj3.setdictvalue(space, name, W_IntObject(i * 10))
+    for i, name in enumerate("abcd"):
+        assert obj.getdictvalue(space, name).intval == i
+    for i, name in enumerate("dcba"):
+        assert obj2.getdictvalue(space, name).floatval == i + 0.5
+    for i, name in enumerate("badc"):
+        assert obj3.getdictvalue(space, name).intval == i * 10
+    assert obj3.deldictvalue(space, "a")
+    assert obj3.getdictvalue(space, "a") is None
+    assert obj3.getdictvalue(space, "b").intval == 0
+    assert obj3.getdictvalue(space, "d").intval == 20
+    assert obj3.getdictvalue(space, "c").intval == 30
+    w_dict = obj3.getdict(space)
+    keys, values = w_dict.get_strategy().getitems_str(w_dict)
+    assert sorted(zip(keys, [w_value.intval for w_value in values])) == [
+        ("b", 0), ("c", 30), ("d", 20)]
+    assert cls.terminator.allow_unboxing
+
 # ___________________________________________________________
 # dict tests
 
@@ -734,6 +842,37 @@ class AppTestWithMapDict(object):
 
 
 
+    def test_unboxed_attributes(self):
+        class A(object):
+            pass
+        def f(a):
+            return a.x, a.y, a.z
+        a = A()
+        a.x = 5
+        a.y = 1.5
+        a.z = "z"
+        for i in range(3):
+            assert f(a) == (5, 1.5, "z")
+        a.x += 1
+        a.y *= 2
+        assert f(a) == (6, 3.0, "z")
+        assert a.__dict__ == {"x": 6, "y": 3.0, "z": "z"}
+        assert type(a.x) is int and type(a.y) is float
+        import sys
+        b = A()
+        b.x = -sys.maxint - 1
+        b.y = float("inf")
+        b.z = -0.0
+        assert f(b)[:2] == (-sys.maxint - 1, float("inf"))
+        assert str(b.z) == "-0.0"
+        a.x = "a string"
+        a.y = True
+        assert f(a) == ("a string", True, "z")
+        assert type(a.y) is bool
+        assert f(b)[2] == 0.0
+        b.x = 1.5
+        assert b.x == 1.5
+
     def test_slot_name_conflict(self):
         class A(object):
             __slots__ = 'slot1'
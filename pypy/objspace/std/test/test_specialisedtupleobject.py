@@ -49,7 +49,9 @@ class TestW_SpecialisedTupleObject():
         hash_test([1, (1, 2)])
         hash_test([1, ('a', 2)])
         hash_test([1, ()])
-        hash_test([1, 2, 3], must_be_specialized=False)
+        hash_test([1, 2, 3])
+        hash_test([1.5, -0.0, 1e300, 7.0])
+        hash_test([1, 2.5, 3], must_be_specialized=False)
         hash_test([1 << 62, 0])
 
     try:
@@ -101,7 +103,7 @@ class AppTestW_SpecialisedTupleObject:
         assert len(t) == 2
 
     def test_notspecialisedtuple(self):
-        assert not self.isspecialised((42, 43, 44, 45))
+        assert not self.isspecialised((42, 43, '44', 45))
         assert not self.isspecialised((1.5,))
 
     def test_slicing_to_specialised(self):
@@ -226,7 +228,7 @@ class AppTestW_SpecialisedTupleObject:
         assert a == (2.2,) + b
         assert not a != (2.2,) + b
         #
-        if not self.isspecialised((1, 2, 3)):
+        if not self.isspecialised((1, 2, 3), '_ooo'):
             skip("don't have specialization for 3-tuples")
         a = (1, 2.2, '333')
         assert self.isspecialised(a)
@@ -236,6 +238,89 @@ class AppTestW_SpecialisedTupleObject:
         assert a == (1, 2.2,) + b
         assert not a != (1, 2.2) + b
 
+    def test_homogeneous(self):
+        for t, kind in [((1, 2, 3), '_ints'), ((1.5, 2.5, 3.5, 4.5), '_floats'),
+                        (tuple(range(50)), '_ints'), ((1, 2, 3, 1.5), '')]:
+            assert self.isspecialised(t, kind) == bool(kind)
+        assert not self.isspecialised((1, 2, True))
+        assert not self.isspecialised((1.5, 2.5, 3))
+        t = (7, -1, 2 ** 40, 4)
+        assert len(t) == 4
+        assert t[0] == 7 and t[-1] == 4 and t[2] == 2 ** 40
+        raises(IndexError, "t[4]")
+        assert t[1:3] == (-1, 2 ** 40)
+        a, b, c, d = t
+        assert (a, b, c, d) == (7, -1, 2 ** 40, 4)
+        assert list(t) == [7, -1, 2 ** 40, 4]
+        assert 2 ** 40 in t and 2.0 ** 40 in t and 5 not in t
+        assert t.index(4) == 3 and t.count(7) == 1
+
+    def test_homogeneous_eq_hash(self):
+        t1 = (1, 2, 3)
+        t2 = (1,) + (2, 3)
+        assert t1 == t2 and not t1 != t2
+        assert hash(t1) == hash(t2) == hash((1L, 2L, 3L)) == hash((1.0, 2, 3))
+        assert t1 == (1.0, 2.0, 3.0)
+        assert (1.0, 2.0, 3.0) == t1
+        assert t1 == (1L, 2, 3L)
+        assert t1 != (1, 2, 3, 4)
+        assert t1 != (1, 2, 4)
+        f = (0.0, 1.5, 2.5)
+        assert f == (-0.0, 1.5, 2.5)
+        assert hash(f) == hash((0, 1.5, 2.5))
+        nan = float('nan')
+        t = (nan, 1.0, 2.0)
+        assert t == (nan, 1.0, 2.0)
+        assert nan in t
+
+    def test_homogeneous_ordering(self):
+        a = (1, 2, 3)
+        assert a < (1, 2, 4)
+        assert a < (1, 3, 0)
+        assert a < (1, 2, 3, 0)
+        assert not a < (1, 2, 3)
+        assert a <= (1, 2, 3)
+        assert a > (1, 2, 2)
+        assert a >= (1, 2, 3)
+        assert not a > (1, 2, 3)
+        assert a < (1, 2, 3.5)
+        assert a < (1, 2, 'x')
+        f = (1.5, 2.5, 3.5)
+        assert f < (1.5, 2.5, 4.5)
+        assert f > (1.5, 2.5, 3)
+        assert sorted([(3, 2, 1), (1, 2, 3), (2, 2, 2)]) == [
+            (1, 2, 3), (2, 2, 2), (3, 2, 1)]
+        nan = float('nan')
+        assert (1.0, nan, 0.0) < (1.0, nan, 1.0)
+        assert not (1.0, nan, 2.0) < (1.0, 2.0, 2.0)
+        assert not (1.0, nan, 2.0) >= (1.0, 2.0, 2.0)
+
+    def test_homogeneous_from_list(self):
+        from __pypy__ import strategy
+        l = [1, 2, 3, 4]
+        assert strategy(l) == "IntegerListStrategy"
+        t = tuple(l)
+        assert self.isspecialised(t, '_ints')
+        l.append(5)
+        assert t == (1, 2, 3, 4)
+        t = tuple([1.5, 2.5, 3.5])
+        assert self.isspecialised(t, '_floats')
+        assert t == (1.5, 2.5, 3.5)
+        assert self.isspecialised(tuple(range(10)), '_ints')
+        assert tuple(range(10)) == (0, 1, 2, 3, 4, 5, 6, 7, 8, 9)
+        #
+        l = list((1, 2, 3, 4))
+        assert strategy(l) == "IntegerListStrategy"
+        assert l == [1, 2, 3, 4]
+        l = list((1.5, 2.5, 3.5))
+        assert strategy(l) == "FloatListStrategy"
+        l.append(7.5)
+        assert l == [1.5, 2.5, 3.5, 7.5]
+        class T(tuple):
+            pass
+        t = T([1, 2, 3])
+        assert type(t) is T and t == (1, 2, 3)
+
     def test_subclasses(self):
         class I(int): pass
         class F(float): pass
@@ -199,6 +199,39 @@ class TestUnicodeObject:
         with py.test.raises(OperationError):
             w_u._getitem_result_constant_index_jit(space, -len(u) - 1)
 
+    def test_lazy_index_storage(self):
+        from rpython.rlib import rutf8
+        space = self.space
+        u = u"\xe4x\u20ac" * 1000
+        w_u = space.wrap(u)
+        # indexing close to either end doesn't build the index
+        for i in [0, 1, 63, -1, -64]:
+            w_res = space.getitem(w_u, space.newint(i))
+            assert space.utf8_w(w_res) == u[i].encode("utf-8")
+        assert not w_u._index_storage
+        w_res = space.call_method(w_u, "find", space.wrap(u"\u20ac\xe4"))
+        assert space.int_w(w_res) == 2
+        w_res = space.call_method(w_u, "rfind", space.wrap(u"\xe4"))
+        assert space.int_w(w_res) == len(u) - 3
+        assert not w_u._index_storage
+        # the index is only built up to the highest index asked for
+        w_res = space.getitem(w_u, space.newint(200))
+        assert space.utf8_w(w_res) == u[200].encode("utf-8")
+        assert len(w_u._index_storage) == 200 // 64 + 1
+        w_res = space.call_method(w_u, "find", space.wrap(u"x"),
+                                  space.newint(100))
+        assert space.int_w(w_res) == 100
+        w_res = space.call_method(w_u, "find", space.wrap(u"\u20ac\xe4"),
+                                  space.newint(1500))
+        assert space.int_w(w_res) == 1502
+        w_res = space.call_method(w_u, "count", space.wrap(u"x"),
+                                  space.newint(10), space.newint(2000))
+        assert space.int_w(w_res) == u.count(u"x", 10, 2000)
+        for i in range(len(u)):
+            w_res = space.getitem(w_u, space.newint(i))
+            assert space.utf8_w(w_res) == u[i].encode("utf-8")
+        assert len(w_u._index_storage) == len(u) // 64 + 1
+
     def test_getslice_constant_index_jit(self):
         space = self.space
         u = u"äöabcéééß"
@@ -103,6 +103,13 @@ class W_AbstractTupleObject(W_Root):
               space.is_w(space.type(w_sequence), space.w_tuple)):
             return w_sequence
         else:
+            if (space.config.objspace.std.withspecialisedtuple and
+                    space.is_w(w_tupletype, space.w_tuple)):
+                from pypy.objspace.std.specialisedtupleobject import (
+                    newtuple_from_list_storage)
+                w_result = newtuple_from_list_storage(space, w_sequence)
+                if w_result is not None:
+                    return w_result
             tuple_w = space.fixedview(w_sequence)
         w_obj = space.allocate_instance(W_TupleObject, w_tupletype)
         W_TupleObject.__init__(w_obj, tuple_w)
@@ -257,14 +264,14 @@ If the argument is a tuple, the return value is the same object.""",
 
     __eq__ = interpindirect2app(W_AbstractTupleObject.descr_eq),
     __ne__ = interpindirect2app(W_AbstractTupleObject.descr_ne),
-    __lt__ = interp2app(W_AbstractTupleObject.descr_lt),
-    __le__ = interp2app(W_AbstractTupleObject.descr_le),
-    __gt__ = interp2app(W_AbstractTupleObject.descr_gt),
-    __ge__ = interp2app(W_AbstractTupleObject.descr_ge),
+    __lt__ = interpindirect2app(W_AbstractTupleObject.descr_lt),
+    __le__ = interpindirect2app(W_AbstractTupleObject.descr_le),
+    __gt__ = interpindirect2app(W_AbstractTupleObject.descr_gt),
+    __ge__ = interpindirect2app(W_AbstractTupleObject.descr_ge),
 
     __len__ = interp2app(W_AbstractTupleObject.descr_len),
     __iter__ = interp2app(W_AbstractTupleObject.descr_iter),
-    __contains__ = interp2app(W_AbstractTupleObject.descr_contains),
+    __contains__ = interpindirect2app(W_AbstractTupleObject.descr_contains),
 
     __add__ = interp2app(W_AbstractTupleObject.descr_add),
     __mul__ = interp2app(W_AbstractTupleObject.descr_mul),
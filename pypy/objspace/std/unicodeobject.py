@@ -33,6 +33,10 @@ __all__ = ['W_UnicodeObject', 'wrapunicode', 'plain_str2unicode',
 
 MAX_UNROLL_NEXT_CODEPOINT_POS = 4
 
+# indexing at most this many characters away from either end of a
+# non-ascii string walks the utf8 directly instead of building the index
+INDEX_WALK_LIMIT = 64
+
 @jit.elidable
 def next_codepoint_pos_dont_look_inside(utf8, p):
     return rutf8.next_codepoint_pos(utf8, p)
@@ -487,6 +491,12 @@ class W_UnicodeObject(W_Root):
                 return space.newutf8(l[0], len(l[0]))
             s = self._utf8.join(l)
             return space.newutf8(s, len(s))
+        l = space.listview_utf8(w_list)
+        if l is not None:
+            if len(l) == 1:
+                return space.newutf8(l[0], rutf8.codepoints_in_utf8(l[0]))
+            s = self._utf8.join(l)
+            return space.newutf8(s, rutf8.codepoints_in_utf8(s))
         return self._StringMethods_descr_join(space, w_list)
 
     def _join_return_one(self, space, w_obj):
@@ -899,13 +909,14 @@ class W_UnicodeObject(W_Root):
 
     descr_rmul = descr_mul
 
-    def _get_index_storage(self):
-        return jit.conditional_call_elidable(self._index_storage,
-                    W_UnicodeObject._compute_index_storage, self)
-
-    def _compute_index_storage(self):
-        storage = rutf8.create_utf8_index_storage(self._utf8, self._length)
-        self._index_storage = storage
+    def _get_index_storage(self, index):
+        # the index storage is built lazily, only up to the highest index
+        # asked for so far
+        storage = self._index_storage
+        if not rutf8.utf8_index_storage_covers(storage, index):
+            storage = rutf8.extend_utf8_index_storage(
+                self._utf8, self._length, storage, index)
+            self._index_storage = storage
         return storage
 
     def _getitem_result(self, space, index):
@@ -955,8 +966,24 @@ class W_UnicodeObject(W_Root):
         if self.is_ascii():
             assert index >= 0
             return index
+        return self._index_to_byte_nonascii(index)
+
+    @jit.elidable
+    def _index_to_byte_nonascii(self, index):
+        utf8 = self._utf8
+        if not rutf8.utf8_index_storage_covers(self._index_storage, index):
+            if index <= INDEX_WALK_LIMIT:
+                pos = 0
+                for i in range(index):
+                    pos = rutf8.next_codepoint_pos(utf8, pos)
+                return pos
+            if index >= self._length - INDEX_WALK_LIMIT:
+                pos = len(utf8)
+                for i in range(self._length - index):
+                    pos = rutf8.prev_codepoint_pos(utf8, pos)
+                return pos
         return rutf8.codepoint_position_at_index(
-            self._utf8, self._get_index_storage(), index)
+            utf8, self._get_index_storage(index), index)
 
     def _codepoints_in_utf8(self, start, end):
         if self.is_ascii():
@@ -969,8 +996,18 @@ class W_UnicodeObject(W_Root):
         """
         if self.is_ascii():
             return bytepos
+        return self._byte_to_index_nonascii(bytepos)
+
+    @jit.elidable
+    def _byte_to_index_nonascii(self, bytepos):
+        if bytepos < 0:
+            return bytepos
+        storage = self._index_storage
+        if not storage:
+            # counting the characters is cheaper than building the index
+            return rutf8.codepoints_in_utf8(self._utf8, 0, bytepos)
         return rutf8.codepoint_index_at_byte_position(
-            self._utf8, self._get_index_storage(), bytepos, self._len())
+            self._utf8, storage, bytepos, self._len())
 
     def next_codepoint_pos_dont_look_inside(self, pos):
         if self.is_ascii():
@@ -0,0 +1,221 @@
+#! /usr/bin/env python
+"""
+Compares two dumpfiles produced by gc.dump_rpy_heap(), and prints for
+each type how much memory its objects retain in each dump.
+
+Syntax:  gcdump_diff.py  <dumpfile1>  <dumpfile2>  [<typeids.txt>]
+
+By default, typeids.txt is loaded from the same dir as dumpfile2.
+
+The retained size of an object is the total size of the objects that
+are only reachable through it, itself included (i.e. the objects that
+it dominates).  The retained size of a type is the sum of the retained
+sizes of its objects, not counting twice the objects of that type which
+are only reachable through another one.  Types are sorted by how much
+more memory they retain in the second dump.
+"""
+import sys, os, array
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.realpath(os.path.join(
+        os.path.dirname(__file__), '..', '..')))
+from pypy.tool.gcdump import Stat
+
+
+class HeapGraph(object):
+    """The objects of a dump, numbered from 0 to n-1, plus the node n
+    which stands for the GC roots and points to all of them."""
+
+    def __init__(self, stat, a):
+        self.types = array.array('l')
+        self.sizes = array.array('l')
+        self.edge_start = array.array('l')   # n + 2 items
+        self.edges = array.array('l')
+        numbers = {}
+        links_list = []
+        roots = []
+        in_roots = True
+        for _, addr, typenum, size, links in stat.walk(a):
+            if addr == 0 and len(links) == 0:
+                in_roots = False       # the marker after the roots
+                continue
+            numbers[addr] = len(self.types)
+            if in_roots:
+                roots.append(addr)
+            self.types.append(typenum)
+            self.sizes.append(size)
+            links_list.append(links)
+        links_list.append(roots)
+        self.types.append(0)
+        self.sizes.append(0)
+        self.root = len(links_list) - 1
+        for links in links_list:
+            self.edge_start.append(len(self.edges))
+            for addr in links:
+                if addr in numbers:
+                    self.edges.append(numbers[addr])
+        self.edge_start.append(len(self.edges))
+
+    def compute_idom(self):
+        """Compute the immediate dominator of every object with the
+        Lengauer-Tarjan algorithm (simple version)."""
+        n = len(self.types)
+        edge_start = self.edge_start
+        edges = self.edges
+        root = self.root
+        # depth-first numbering
+        dfnum = array.array('l', [-1]) * n
+        parent = array.array('l', [-1]) * n
+        vertex = array.array('l')
+        stack = [(root, -1)]
+        while stack:
+            v, p = stack.pop()
+            if dfnum[v] >= 0:
+                continue
+            dfnum[v] = len(vertex)
+            vertex.append(v)
+            parent[v] = p
+            for i in xrange(edge_start[v], edge_start[v + 1]):
+                w = edges[i]
+                if dfnum[w] < 0:
+                    stack.append((w, v))
+        # predecessors, only among the reachable objects
+        preds = [[] for i in xrange(n)]
+        for v in vertex:
+            for i in xrange(edge_start[v], edge_start[v + 1]):
+                preds[edges[i]].append(v)
+        #
+        semi = array.array('l', dfnum)
+        ancestor = array.array('l', [-1]) * n
+        label = array.array('l', range(n))
+        idom = array.array('l', [-1]) * n
+        buckets = {}
+
+        def eval(v):
+            if ancestor[v] < 0:
+                return v
+            path = []
+            u = v
+            while ancestor[ancestor[u]] >= 0:
+                path.append(u)
+                u = ancestor[u]
+            for x in reversed(path):
+                a = ancestor[x]
+                if semi[label[a]] < semi[label[x]]:
+                    label[x] = label[a]
+                ancestor[x] = ancestor[a]
+            return label[v]
+
+        for k in xrange(len(vertex) - 1, 0, -1):
+            w = vertex[k]
+            p = parent[w]
+            for v in preds[w]:
+                u = eval(v)
+                if semi[u] < semi[w]:
+                    semi[w] = semi[u]
+            buckets.setdefault(vertex[semi[w]], []).append(w)
+            ancestor[w] = p
+            for v in buckets.pop(p, ()):
+                u = eval(v)
+                if semi[u] < semi[v]:
+                    idom[v] = u
+                else:
+                    idom[v] = p
+        for k in xrange(1, len(vertex)):
+            w = vertex[k]
+            if idom[w] != vertex[semi[w]]:
+                idom[w] = idom[idom[w]]
+        idom[root] = root
+        self.idom = idom
+        self.vertex = vertex
+
+    def type_summary(self):
+        """Return {typenum: [count, shallow size, retained size]}."""
+        self.compute_idom()
+        n = len(self.types)
+        idom = self.idom
+        vertex = self.vertex
+        types = self.types
+        # retained sizes: the dominators come before in 'vertex'
+        retained = array.array('l', self.sizes)
+        for k in xrange(len(vertex) - 1, 0, -1):
+            v = vertex[k]
+            retained[idom[v]] += retained[v]
+        # the children in the dominator tree
+        children = [[] for i in xrange(n)]
+        for k in xrange(1, len(vertex)):
+            v = vertex[k]
+            children[idom[v]].append(v)
+        # walk the dominator tree, counting the types on the current path
+        summary = {}
+        on_path = {}
+        stack = [~self.root, self.root]
+        while stack:
+            v = stack.pop()
+            if v < 0:
+                on_path[types[~v]] -= 1
+                continue
+            t = types[v]
+            if v != self.root:
+                try:
+                    stat = summary[t]
+                except KeyError:
+                    stat = summary[t] = [0, 0, 0]
+                stat[0] += 1
+                stat[1] += self.sizes[v]
+                if not on_path.get(t):
+                    stat[2] += retained[v]
+            on_path[t] = on_path.get(t, 0) + 1
+            for w in children[v]:
+                stack.append(~w)
+                stack.append(w)
+        return summary
+
+
+def load_summary(stat, filename):
+    a = stat.load_dump_file(filename)
+    return HeapGraph(stat, a).type_summary()
+
+def diff_summaries(summary1, summary2):
+    """Return a list of (delta retained, typenum, stat1, stat2), sorted
+    by delta, for the types that changed."""
+    result = []
+    for typenum in set(summary1) | set(summary2):
+        stat1 = summary1.get(typenum, [0, 0, 0])
+        stat2 = summary2.get(typenum, [0, 0, 0])
+        if stat1 != stat2:
+            result.append((stat2[2] - stat1[2], typenum, stat1, stat2))
+    result.sort()
+    return result
+
+def print_diff(stat, diff):
+    M = 1024.0 * 1024.0
+    print '%9s %9s %9s %9s %9s  %s' % ('count', 'size', 'retained',
+                                       'retained', 'delta', 'type')
+    print '%9s %9s %9s %9s %9s' % ('delta', 'delta', 'before', 'after', '')
+    for delta, typenum, stat1, stat2 in diff:
+        print '%+9d %+8.2fM %8.2fM %8.2fM %+8.2fM  %s' % (
+            stat2[0] - stat1[0], (stat2[1] - stat1[1]) / M,
+            stat1[2] / M, stat2[2] / M, delta / M,
+            stat.get_type_name(typenum))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) <= 2:
+        print >> sys.stderr, __doc__
+        sys.exit(2)
+    stat = Stat()
+    summary1 = load_summary(stat, sys.argv[1])
+    summary2 = load_summary(stat, sys.argv[2])
+    #
+    if len(sys.argv) > 3:
+        typeid_name = sys.argv[3]
+    else:
+        typeid_name = os.path.join(os.path.dirname(sys.argv[2]), 'typeids.txt')
+    if os.path.isfile(typeid_name):
+        stat.load_typeids(typeid_name)
+    else:
+        import zlib, gc
+        stat.load_typeids(zlib.decompress(gc.get_typeids_z()).split("\n"))
+    #
+    print_diff(stat, diff_summaries(summary1, summary2))
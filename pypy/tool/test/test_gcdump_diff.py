@@ -0,0 +1,116 @@
+import array
+from rpython.tool.udir import udir
+from pypy.tool.gcdump import Stat
+from pypy.tool.gcdump_diff import HeapGraph, load_summary, diff_summaries
+
+
+def make_dump(roots, others):
+    # each object is (addr, typenum, size, [addr1, ...])
+    a = array.array('l')
+    for objects in [roots, others]:
+        for addr, typenum, size, links in objects:
+            a.extend([addr, typenum, size] + links + [-1])
+        if objects is roots:
+            a.extend([0, 0, 0, -1])
+    return a
+
+def summarize(roots, others):
+    stat = Stat()
+    return HeapGraph(stat, make_dump(roots, others)).type_summary()
+
+
+def test_tree():
+    # 10 -> 20 -> 30
+    #    \-> 40
+    summary = summarize([(10, 1, 8, [20, 40])],
+                        [(20, 2, 16, [30]),
+                         (30, 3, 32, []),
+                         (40, 3, 64, [])])
+    assert summary == {1: [1, 8, 120],
+                       2: [1, 16, 48],
+                       3: [2, 96, 96]}
+
+def test_shared_object():
+    # 30 is reachable from both 10 and 20, so neither retains it
+    summary = summarize([(10, 1, 8, [30]), (20, 2, 16, [30])],
+                        [(30, 3, 32, [])])
+    assert summary == {1: [1, 8, 8],
+                       2: [1, 16, 16],
+                       3: [1, 32, 32]}
+
+def test_diamond_and_cycle():
+    # 10 -> 20 -> 40 -> 50 -> 40
+    #    \-> 30 -/
+    summary = summarize([(10, 1, 1, [20, 30])],
+                        [(20, 2, 2, [40]),
+                         (30, 2, 4, [40]),
+                         (40, 3, 8, [50]),
+                         (50, 4, 16, [40])])
+    assert summary == {1: [1, 1, 31],
+                       2: [2, 6, 6],
+                       3: [1, 8, 24],
+                       4: [1, 16, 16]}
+
+def test_nested_same_type():
+    # a linked list: the retained size of its type is counted only once
+    summary = summarize([(10, 1, 8, [20])],
+                        [(20, 1, 8, [30]),
+                         (30, 1, 8, [])])
+    assert summary == {1: [3, 24, 24]}
+
+def test_diff():
+    dump1 = make_dump([(10, 1, 8, [20])],
+                      [(20, 2, 16, [])])
+    dump2 = make_dump([(10, 1, 8, [20, 30])],
+                      [(20, 2, 16, []),
+                       (30, 3, 32, [40]),
+                       (40, 2, 16, [])])
+    stat = Stat()
+    for i, a in enumerate([dump1, dump2]):
+        f = open(str(udir.join('gcdump_diff.%d' % i)), 'wb')
+        a.tofile(f)
+        f.close()
+    summary1 = load_summary(stat, str(udir.join('gcdump_diff.0')))
+    summary2 = load_summary(stat, str(udir.join('gcdump_diff.1')))
+    diff = diff_summaries(summary1, summary2)
+    assert diff == [(16, 2, [1, 16, 16], [2, 32, 32]),
+                    (48, 1, [1, 8, 24], [1, 8, 72]),
+                    (48, 3, [0, 0, 0], [1, 32, 48])]
+
+def test_idom_random():
+    import random
+    rnd = random.Random(42)
+    for n in range(2, 40):
+        objects = []
+        for i in range(n):
+            links = [rnd.randrange(n) * 8 + 8
+                     for j in range(rnd.randrange(4))]
+            objects.append((i * 8 + 8, 1, 1, links))
+        roots = objects[:rnd.randrange(1, 3)]
+        graph = HeapGraph(Stat(), make_dump(roots, objects[len(roots):]))
+        graph.compute_idom()
+        #
+        def reachable(removed):
+            seen = set()
+            pending = [graph.root]
+            while pending:
+                v = pending.pop()
+                if v in seen or v == removed:
+                    continue
+                seen.add(v)
+                for i in range(graph.edge_start[v], graph.edge_start[v + 1]):
+                    pending.append(graph.edges[i])
+            return seen
+        #
+        everything = reachable(-1)
+        for v in everything:
+            if v == graph.root:
+                continue
+            # the immediate dominator of 'v' is the one that is
+            # dominated by all the other dominators of 'v'
+            dominators = [d for d in everything
+                          if d != v and v not in reachable(d)]
+            idom = [d for d in dominators
+                    if all(d2 == d or d not in reachable(d2)
+                           for d2 in dominators)]
+            assert idom == [graph.idom[v]]
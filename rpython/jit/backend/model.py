@@ -10,6 +10,8 @@ class CPUTotalTracker(object):
     total_compiled_bridges = 0
     total_freed_loops = 0
     total_freed_bridges = 0
+    total_evicted_loops = 0
+    total_evicted_bridges = 0
 
 class AbstractCPU(object):
     supports_floats = False
@@ -298,6 +300,7 @@ class CompiledLoopToken(object):
         self.cpu = cpu
         self.number = number
         self.bridges_count = 0
+        self.guard_failures = 0
         self.invalidate_positions = []
         # a list of weakrefs to looptokens that has been redirected to
         # this one
@@ -306,6 +309,15 @@ class CompiledLoopToken(object):
         debug_print("allocating Loop #", self.number)
         debug_stop("jit-mem-looptoken-alloc")
 
+    def get_code_size(self):
+        """The number of bytes of machine code and data of the loop and
+        its bridges, as allocated by the backend."""
+        size = 0
+        if self.asmmemmgr_blocks is not None:
+            for rawstart, rawstop in self.asmmemmgr_blocks:
+                size += rawstop - rawstart
+        return size
+
     def compiling_a_bridge(self):
         self.cpu.tracker.total_compiled_bridges += 1
         self.bridges_count += 1
@@ -1,3 +1,4 @@
+import time
 import weakref
 from rpython.rtyper.lltypesystem import lltype, llmemory
 from rpython.rtyper.annlowlevel import (
@@ -243,7 +244,8 @@ def compile_simple_loop(metainterp, greenkey, trace, runtime_args, enable_opts,
         loop.check_consistency()
     jitcell_token.target_tokens = [target_token]
     send_loop_to_backend(greenkey, jitdriver_sd, metainterp_sd, loop, "loop",
-                         runtime_args, metainterp.box_names_memo)
+                         runtime_args, metainterp.box_names_memo,
+                         metainterp.tracing_started)
     record_loop_or_bridge(metainterp_sd, loop)
     return target_token
 
@@ -328,7 +330,8 @@ def compile_loop(metainterp, greenkey, start, inputargs, jumpargs,
     if not we_are_translated():
         loop.check_consistency()
     send_loop_to_backend(greenkey, jitdriver_sd, metainterp_sd, loop, "loop",
-                         inputargs, metainterp.box_names_memo)
+                         inputargs, metainterp.box_names_memo,
+                         metainterp.tracing_started)
     record_loop_or_bridge(metainterp_sd, loop)
     loop_info.post_loop_compilation(loop, jitdriver_sd, metainterp, jitcell_token)
     return start_descr
@@ -497,7 +500,7 @@ def forget_optimization_info(lst, reset_values=False):
             item.reset_value()
 
 def send_loop_to_backend(greenkey, jitdriver_sd, metainterp_sd, loop, type,
-                         orig_inpargs, memo):
+                         orig_inpargs, memo, tracing_started=0.0):
     forget_optimization_info(loop.operations)
     forget_optimization_info(loop.inputargs)
     vinfo = jitdriver_sd.virtualizable_info
@@ -507,6 +510,7 @@ def send_loop_to_backend(greenkey, jitdriver_sd, metainterp_sd, loop, type,
 
     original_jitcell_token = loop.original_jitcell_token
     original_jitcell_token.number = n = metainterp_sd.jitlog.trace_id
+    original_jitcell_token.greenkey = greenkey
 
     if not we_are_translated():
         show_procedures(metainterp_sd, loop)
@@ -525,6 +529,7 @@ def send_loop_to_backend(greenkey, jitdriver_sd, metainterp_sd, loop, type,
             hooks = None
     operations = get_deep_immutable_oplist(loop.operations)
     metainterp_sd.profiler.start_backend()
+    backend_started = time.time()
     debug_start("jit-backend")
     log = have_debug_prints() or jl.jitlog_enabled()
     try:
@@ -539,6 +544,8 @@ def send_loop_to_backend(greenkey, jitdriver_sd, metainterp_sd, loop, type,
     finally:
         debug_stop("jit-backend")
     metainterp_sd.profiler.end_backend()
+    record_compile_times(original_jitcell_token, tracing_started,
+                         backend_started)
     if hooks is not None:
         debug_info.asminfo = asminfo
         hooks.after_compile(debug_info)
@@ -559,7 +566,8 @@ def send_loop_to_backend(greenkey, jitdriver_sd, metainterp_sd, loop, type,
         metainterp_sd.warmrunnerdesc.memory_manager.keep_loop_alive(original_jitcell_token)
 
 def send_bridge_to_backend(jitdriver_sd, metainterp_sd, faildescr, inputargs,
-                           operations, original_loop_token, memo):
+                           operations, original_loop_token, memo,
+                           tracing_started=0.0):
     forget_optimization_info(operations)
     forget_optimization_info(inputargs)
     if not we_are_translated():
@@ -579,6 +587,7 @@ def send_bridge_to_backend(jitdriver_sd, metainterp_sd, faildescr, inputargs,
             hooks = None
     operations = get_deep_immutable_oplist(operations)
     metainterp_sd.profiler.start_backend()
+    backend_started = time.time()
     debug_start("jit-backend")
     log = have_debug_prints() or jl.jitlog_enabled()
     try:
@@ -589,6 +598,8 @@ def send_bridge_to_backend(jitdriver_sd, metainterp_sd, faildescr, inputargs,
     finally:
         debug_stop("jit-backend")
     metainterp_sd.profiler.end_backend()
+    record_compile_times(original_loop_token, tracing_started,
+                         backend_started)
     if hooks is not None:
         debug_info.asminfo = asminfo
         hooks.after_compile_bridge(debug_info)
@@ -608,6 +619,15 @@ def send_bridge_to_backend(jitdriver_sd, metainterp_sd, faildescr, inputargs,
     #        original_loop_token)
     return asminfo
 
+def record_compile_times(jitcell_token, tracing_started, backend_started):
+    """Add to the statistics of 'jitcell_token' (see
+    MemoryManager.get_all_loop_stats()) the time spent tracing and
+    optimizing, from 'tracing_started' (if known) to 'backend_started',
+    and the time spent in the backend since then."""
+    if tracing_started > 0.0:
+        jitcell_token.trace_time += backend_started - tracing_started
+    jitcell_token.backend_time += time.time() - backend_started
+
 # ____________________________________________________________
 
 class _DoneWithThisFrameDescr(AbstractFailDescr):
@@ -689,6 +709,8 @@ class AbstractResumeGuardDescr(ResumeDescr):
         raise NotImplementedError("abstract base class")
 
     def handle_fail(self, deadframe, metainterp_sd, jitdriver_sd):
+        if self.rd_loop_token is not None:
+            self.rd_loop_token.guard_failures += 1
         if (self.must_compile(deadframe, metainterp_sd, jitdriver_sd)
                 and not rstack.stack_almost_full()):
             self.start_compiling()
@@ -792,7 +814,8 @@ class AbstractResumeGuardDescr(ResumeDescr):
         send_bridge_to_backend(metainterp.jitdriver_sd, metainterp.staticdata,
                                self, inputargs, new_loop.operations,
                                new_loop.original_jitcell_token,
-                               metainterp.box_names_memo)
+                               metainterp.box_names_memo,
+                               metainterp.tracing_started)
         record_loop_or_bridge(metainterp.staticdata, new_loop)
 
     def make_a_counter_per_value(self, guard_value_op, index):
@@ -999,7 +1022,8 @@ class ResumeFromInterpDescr(ResumeDescr):
         propagate_original_jitcell_token(new_loop)
         send_loop_to_backend(self.original_greenkey, metainterp.jitdriver_sd,
                              metainterp_sd, new_loop, "entry bridge",
-                             orig_inputargs, metainterp.box_names_memo)
+                             orig_inputargs, metainterp.box_names_memo,
+                             metainterp.tracing_started)
         # send the new_loop to warmspot.py, to be called directly the next time
         jitdriver_sd.warmstate.attach_procedure_to_interp(
             self.original_greenkey, jitcell_token)
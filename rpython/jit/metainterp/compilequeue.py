@@ -0,0 +1,88 @@
+"""
+Deferred compilation of loops by a compiler worker.
+
+Normally, when tracing closes a loop, the thread that was tracing
+optimizes it and sends it to the backend immediately, which can take a
+while for large traces.  If a compiler worker is running (see
+jit_hooks.compile_worker_start()) and the queue is not full, the trace
+is instead put in the compile queue: its JitCell gets the flag
+JC_COMPILING, and the thread goes back to the interpreter.  Later, the
+worker calls jit_hooks.compile_worker_run_one(), which compiles the
+loop and attaches it to the JitCell.  The next time any thread reaches
+that greenkey (i.e. at a jit_merge_point, which is a safe point) it
+enters the new machine code.
+
+Only loops are deferred this way; bridges are still compiled by the
+thread that traced them.  The JIT is not thread-safe, so the worker
+must hold the GIL (or equivalent) while it compiles.  What we gain is
+that the compilation occurs when the worker gets the GIL, e.g. when
+the other threads wait for I/O, instead of in the middle of the code
+that happened to reach the threshold.
+"""
+
+from rpython.rlib.debug import debug_print
+from rpython.jit.metainterp.warmstate import JC_COMPILING
+
+
+class CompileJob(object):
+    def __init__(self, metainterp, original_boxes, live_arg_boxes, start,
+                 use_unroll):
+        self.metainterp = metainterp
+        self.original_boxes = original_boxes
+        self.live_arg_boxes = live_arg_boxes
+        self.start = start
+        self.use_unroll = use_unroll
+        self.tracing_time = 0.0
+
+    def get_jitcell(self):
+        metainterp = self.metainterp
+        num_green_args = metainterp.jitdriver_sd.num_green_args
+        greenkey = self.original_boxes[:num_green_args]
+        JitCell = metainterp.jitdriver_sd.warmstate.JitCell
+        return JitCell.get_jit_cell_at_key(greenkey)
+
+
+class CompileQueue(object):
+    """The queue of the loops waiting for a compiler worker.  There is
+    a single one, and its size is the global parameter
+    'compile_queue_size'."""
+
+    def __init__(self):
+        self.jobs = []
+        self.limit = 0
+        self.num_workers = 0
+
+    def is_active(self):
+        return self.num_workers > 0
+
+    def is_full(self):
+        return len(self.jobs) >= self.limit
+
+    def push(self, job):
+        self.jobs.append(job)
+
+    def compile_one(self):
+        """Compile the oldest loop of the queue.  Returns False if the
+        queue was empty."""
+        if not self.jobs:
+            return False
+        job = self.jobs.pop(0)
+        job.metainterp.compile_queued_loop(job)
+        return True
+
+    def start_worker(self):
+        self.num_workers += 1
+
+    def stop_worker(self):
+        assert self.num_workers > 0
+        self.num_workers -= 1
+        if self.num_workers == 0:
+            # nobody will compile them: forget them, so that the loops
+            # can be traced again
+            if self.jobs:
+                debug_print('compile queue: dropped', len(self.jobs), 'loops')
+            for job in self.jobs:
+                cell = job.get_jitcell()
+                if cell is not None:
+                    cell.flags &= ~JC_COMPILING
+            self.jobs = []
@@ -118,6 +118,7 @@ class AbstractFailDescr(AbstractDescr):
     _attrs_ = ('adr_jump_offset', 'rd_locs', 'rd_loop_token', 'rd_vector_info')
 
     rd_vector_info = None
+    rd_loop_token = None
 
     def handle_fail(self, deadframe, metainterp_sd, jitdriver_sd):
         raise NotImplementedError
@@ -421,6 +422,11 @@ class JitCellToken(AbstractDescr):
     # and more data specified by the backend when the loop is compiled
     number = -1
     generation = r_int64(0)
+    entry_count = 0       # for the memory manager
+    # statistics, see MemoryManager.get_all_loop_stats()
+    greenkey = None
+    trace_time = 0.0
+    backend_time = 0.0
     # one purpose of LoopToken is to keep alive the CompiledLoopToken
     # returned by the backend.  When the LoopToken goes away, the
     # CompiledLoopToken has its __del__ called, which frees the assembler
@@ -11,7 +11,7 @@ from rpython.rlib.jit import Counters
 
 JITPROF_LINES = Counters.ncounters + 1 + 1
 # one for TOTAL, 1 for calls, update if needed
-_CPU_LINES = 4       # the last 4 lines are stored on the cpu
+_CPU_LINES = 6       # the last 6 lines are stored on the cpu
 
 class BaseProfiler(object):
     pass
@@ -110,6 +110,10 @@ class Profiler(BaseProfiler):
             return self.cpu.tracker.total_freed_loops
         elif num == Counters.TOTAL_FREED_BRIDGES:
             return self.cpu.tracker.total_freed_bridges
+        elif num == Counters.TOTAL_EVICTED_LOOPS:
+            return self.cpu.tracker.total_evicted_loops
+        elif num == Counters.TOTAL_EVICTED_BRIDGES:
+            return self.cpu.tracker.total_evicted_bridges
         return self.counters[num]
 
     def get_times(self, num):
@@ -153,6 +157,9 @@ class Profiler(BaseProfiler):
         self._print_intline("abort: bad loop", cnt[Counters.ABORT_BAD_LOOP])
         self._print_intline("abort: force quasi-immut",
                             cnt[Counters.ABORT_FORCE_QUASIIMMUT])
+        self._print_intline("compile queued", cnt[Counters.COMPILE_QUEUED])
+        self._print_intline("compile queue full",
+                            cnt[Counters.COMPILE_QUEUE_FULL])
         self._print_intline("nvirtuals", cnt[Counters.NVIRTUALS])
         self._print_intline("nvholes", cnt[Counters.NVHOLES])
         self._print_intline("nvreused", cnt[Counters.NVREUSED])
@@ -168,6 +175,10 @@ class Profiler(BaseProfiler):
                                 cpu.tracker.total_freed_loops)
             self._print_intline("Freed # of bridges",
                                 cpu.tracker.total_freed_bridges)
+            self._print_intline("Evicted # of loops",
+                                cpu.tracker.total_evicted_loops)
+            self._print_intline("Evicted # of bridges",
+                                cpu.tracker.total_evicted_bridges)
 
     def _print_line_time(self, string, i, tim):
         final = "%s:%s\t%d\t%f" % (string, " " * max(0, 13-len(string)), i, tim)
@@ -1,7 +1,11 @@
 import math
 from rpython.rlib.rarithmetic import r_int64
+from rpython.rlib.listsort import make_timsort_class
 from rpython.rlib.debug import debug_start, debug_print, debug_stop
 from rpython.rlib.objectmodel import we_are_translated
+from rpython.rlib.jit_hooks import LOOP_STATS_CONTAINER, BOX_ARRAY
+from rpython.rtyper.annlowlevel import cast_instance_to_gcref, llstr
+from rpython.rtyper.lltypesystem import lltype
 
 #
 # Logic to decide which loops are old and not used any more.
@@ -19,6 +23,15 @@ from rpython.rlib.objectmodel import we_are_translated
 # 'generation' field is much smaller than the current generation, and
 # removed from the set.
 #
+# In addition, the total size of the machine code of the loops in
+# 'alive_loops' (with their bridges) can be limited to 'code_limit' KB.
+# When a new loop or bridge is about to be compiled and the limit is
+# exceeded, the least recently entered loops are removed from
+# 'alive_loops' until we are below it again.  Between two loops entered
+# equally recently, the one entered the fewest times goes first.  As
+# above, the memory is only released when the GC frees the LoopTokens;
+# a loop that another alive loop jumps to stays alive.
+#
 
 class MemoryManager(object):
 
@@ -38,6 +51,7 @@ class MemoryManager(object):
         self.current_generation = r_int64(1)
         self.next_check = r_int64(-1)
         self.alive_loops = {}
+        self.code_limit = 0
 
     def set_max_age(self, max_age, check_frequency=0):
         if max_age <= 0:
@@ -49,11 +63,17 @@ class MemoryManager(object):
             self.check_frequency = check_frequency
             self.next_check = self.current_generation + 1
 
+    def set_code_limit(self, code_limit):
+        # in KB; 0 means no limit
+        self.code_limit = code_limit
+
     def next_generation(self):
         self.current_generation += 1
         if self.current_generation == self.next_check:
             self._kill_old_loops_now()
             self.next_check = self.current_generation + self.check_frequency
+        if self.code_limit > 0:
+            self._enforce_code_limit()
 
     def keep_loop_alive(self, looptoken):
         if looptoken.generation != self.current_generation:
@@ -81,3 +101,75 @@ class MemoryManager(object):
             # a single one is not enough for all tests :-(
             rgc.collect(); rgc.collect(); rgc.collect()
         debug_stop("jit-mem-collect")
+
+    def _enforce_code_limit(self):
+        total_size = 0
+        for looptoken in self.alive_loops:
+            total_size += _get_code_size(looptoken)
+        limit = self.code_limit * 1024
+        if total_size <= limit:
+            return
+        debug_start("jit-mem-evict")
+        debug_print("Code size before:", total_size)
+        looptokens = self.alive_loops.keys()
+        LeastRecentlyEnteredFirst(looptokens).sort()
+        evicted = 0
+        for looptoken in looptokens:
+            if total_size <= limit:
+                break
+            del self.alive_loops[looptoken]
+            total_size -= _get_code_size(looptoken)
+            clt = looptoken.compiled_loop_token
+            if clt is not None:
+                clt.cpu.tracker.total_evicted_loops += 1
+                clt.cpu.tracker.total_evicted_bridges += clt.bridges_count
+            evicted += 1
+        debug_print("Loop tokens evicted:", evicted)
+        debug_print("Code size after: ", total_size)
+        debug_stop("jit-mem-evict")
+
+    def get_all_loop_stats(self):
+        """Return a LOOP_STATS_CONTAINER describing all the loops that
+        are currently kept alive."""
+        looptokens = self.alive_loops.keys()
+        result = lltype.malloc(LOOP_STATS_CONTAINER, len(looptokens),
+                               zero=True)
+        for i in range(len(looptokens)):
+            looptoken = looptokens[i]
+            item = result[i]
+            item.number = looptoken.number
+            jd = looptoken.outermost_jitdriver_sd
+            if jd is not None:
+                item.jitdriver_name = llstr(jd.jitdriver.name)
+            greenkey = looptoken.greenkey
+            if greenkey is not None:
+                item.greenkey = lltype.malloc(BOX_ARRAY, len(greenkey))
+                for j in range(len(greenkey)):
+                    item.greenkey[j] = cast_instance_to_gcref(greenkey[j])
+            item.entry_count = looptoken.entry_count
+            clt = looptoken.compiled_loop_token
+            if clt is not None:
+                item.guard_failures = clt.guard_failures
+                item.bridges_count = clt.bridges_count
+                item.code_size = clt.get_code_size()
+            item.trace_time = looptoken.trace_time
+            item.backend_time = looptoken.backend_time
+            item.invalidated = looptoken.invalidated
+        return result
+
+
+def _get_code_size(looptoken):
+    clt = looptoken.compiled_loop_token
+    if clt is None:
+        return 0
+    return clt.get_code_size()
+
+def _entered_less_recently(looptoken1, looptoken2):
+    # invalidated loops first, as they are useless anyway
+    if looptoken1.invalidated != looptoken2.invalidated:
+        return looptoken1.invalidated
+    if looptoken1.generation != looptoken2.generation:
+        return looptoken1.generation < looptoken2.generation
+    return looptoken1.entry_count < looptoken2.entry_count
+
+LeastRecentlyEnteredFirst = make_timsort_class(lt=_entered_less_recently)
@@ -1,4 +1,5 @@
 import sys
+import time
 
 import py
 
@@ -12,6 +13,8 @@ from rpython.jit.metainterp.history import (Const, ConstInt, ConstPtr,
 from rpython.jit.metainterp.jitprof import EmptyProfiler
 from rpython.jit.metainterp.logger import Logger
 from rpython.jit.metainterp.optimizeopt.util import args_dict
+from rpython.jit.metainterp.compilequeue import CompileJob
+from rpython.jit.metainterp.warmstate import JC_COMPILING
 from rpython.jit.metainterp.resoperation import rop, OpHelpers, GuardResOp
 from rpython.jit.metainterp.support import adr2int, ptr2int
 from rpython.rlib.rjitlog import rjitlog as jl
@@ -2060,6 +2063,7 @@ class MetaInterp(object):
         self.forced_virtualizable = None
         self.partial_trace = None
         self.retracing_from = (-1, -1, -1)
+        self.tracing_started = 0.0      # for the loop statistics
         self.call_pure_results = args_dict()
         self.heapcache = HeapCache()
 
@@ -2472,6 +2476,7 @@ class MetaInterp(object):
         debug_start('jit-tracing')
         self.staticdata._setup_once()
         self.staticdata.profiler.start_tracing()
+        self.tracing_started = time.time()
         assert jitdriver_sd is self.jitdriver_sd
         self.staticdata.try_to_free_some_loops()
         try:
@@ -2500,6 +2505,7 @@ class MetaInterp(object):
     def handle_guard_failure(self, resumedescr, deadframe):
         debug_start('jit-tracing')
         self.staticdata.profiler.start_tracing()
+        self.tracing_started = time.time()
         key = resumedescr.get_resumestorage()
         assert isinstance(key, compile.ResumeGuardDescr)
         # store the resumekey.wref_original_loop_token() on 'self' to make
@@ -2622,6 +2628,9 @@ class MetaInterp(object):
                     self.staticdata.log('cancelled too many times!')
                     raise SwitchToBlackhole(Counters.ABORT_BAD_LOOP)
             else:
+                # raises if the loop is put in the compile queue
+                self.defer_compile_loop(original_boxes, live_arg_boxes,
+                                        start, can_use_unroll)
                 target_token = self.compile_loop(
                     original_boxes, live_arg_boxes, start,
                     use_unroll=can_use_unroll)
@@ -2662,7 +2671,7 @@ class MetaInterp(object):
         # ignore the loop_token passed in.  It means that we go back to
         # interpreted mode, but it should come back very quickly to the
         # JIT, find probably the same 'loop_token', and execute it.
-        if we_are_translated():
+        if we_are_translated() or loop_token is None:
             num_green_args = self.jitdriver_sd.num_green_args
             gi, gr, gf = self._unpack_boxes(live_arg_boxes, 0, num_green_args)
             ri, rr, rf = self._unpack_boxes(live_arg_boxes, num_green_args,
@@ -2776,6 +2785,66 @@ class MetaInterp(object):
                 target_token.targeting_jitcell_token)
         return target_token
 
+    def defer_compile_loop(self, original_boxes, live_arg_boxes, start,
+                           use_unroll):
+        """If a compiler worker is running, put the loop in the compile
+        queue and continue running normally (see compilequeue.py).
+        Otherwise, or if the queue is full, return: the loop is compiled
+        now by compile_loop()."""
+        warmrunnerdesc = self.staticdata.warmrunnerdesc
+        if warmrunnerdesc is None or warmrunnerdesc.compile_queue is None:
+            return     # for tests
+        queue = warmrunnerdesc.compile_queue
+        if not queue.is_active():
+            return
+        if (self.cancel_count > 0 or
+                not isinstance(self.resumekey, compile.ResumeFromInterpDescr)):
+            return
+        if queue.is_full():
+            self.staticdata.profiler.count(Counters.COMPILE_QUEUE_FULL)
+            return
+        num_green_args = self.jitdriver_sd.num_green_args
+        greenkey = original_boxes[:num_green_args]
+        if has_compiled_targets(self.get_procedure_token(greenkey)):
+            return     # compile_loop() will cancel it
+        cell = self.jitdriver_sd.warmstate.JitCell.ensure_jit_cell_at_key(
+            greenkey)
+        if cell.flags & JC_COMPILING:
+            return     # another loop from there is already in the queue
+        cell.flags |= JC_COMPILING
+        job = CompileJob(self, original_boxes, live_arg_boxes, start,
+                         use_unroll)
+        job.tracing_time = time.time() - self.tracing_started
+        queue.push(job)
+        self.staticdata.profiler.count(Counters.COMPILE_QUEUED)
+        self.staticdata.log('queued for compilation')
+        jd_sd = self.jitdriver_sd
+        greenkey_repr = jd_sd.warmstate.get_location_str(greenkey)
+        warmrunnerdesc.hooks.on_compile_queued(jd_sd.jitdriver, greenkey,
+                                               greenkey_repr)
+        self.raise_continue_running_normally(live_arg_boxes, None)
+
+    def compile_queued_loop(self, job):
+        """Called by a compiler worker with a CompileJob that was put in
+        the compile queue by defer_compile_loop()."""
+        cell = job.get_jitcell()
+        if cell is not None:
+            cell.flags &= ~JC_COMPILING
+        num_green_args = self.jitdriver_sd.num_green_args
+        greenkey = job.original_boxes[:num_green_args]
+        if has_compiled_targets(self.get_procedure_token(greenkey)):
+            return     # another thread compiled it in the meantime
+        # don't count the time spent in the queue as tracing time
+        self.tracing_started = time.time() - job.tracing_time
+        debug_start('jit-compile-queued')
+        try:
+            self.compile_loop(job.original_boxes, job.live_arg_boxes,
+                              job.start, job.use_unroll)
+        except SwitchToBlackhole as stb:
+            self.aborted_tracing(stb.reason)
+        finally:
+            debug_stop('jit-compile-queued')
+
     def compile_retrace(self, original_boxes, live_arg_boxes, start):
         num_green_args = self.jitdriver_sd.num_green_args
         greenkey = original_boxes[:num_green_args]
@@ -69,6 +69,7 @@ class FakeMetaInterpStaticData(object):
 
 class FakeMetaInterp:
     call_pure_results = {}
+    tracing_started = 0.0
     box_names_memo = {}
     class jitdriver_sd:
         index = 0
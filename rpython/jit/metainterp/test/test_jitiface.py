@@ -1,6 +1,7 @@
 
 import py
 from rpython.rlib.jit import JitDriver, JitHookInterface, Counters, dont_look_inside
+from rpython.rlib.jit import set_param
 from rpython.rlib import jit_hooks
 from rpython.jit.metainterp.test.support import LLJitMixin
 from rpython.jit.codewriter.policy import JitPolicy
@@ -157,6 +158,90 @@ class JitHookInterfaceTests(object):
             assert jit_hooks.stats_get_times_value(None, Counters.TRACING) == 0
         self.meta_interp(main, [], ProfilerClass=EmptyProfiler)
 
+    def test_compile_queue(self):
+        driver = JitDriver(greens = [], reds = ['i'])
+        queued = []
+
+        class MyJitIface(JitHookInterface):
+            def are_hooks_enabled(self):
+                return False
+
+            def on_compile_queued(self, jitdriver, greenkey, greenkey_repr):
+                assert jitdriver is driver
+                queued.append(greenkey_repr)
+
+        def loop(i):
+            while i > 0:
+                driver.jit_merge_point(i=i)
+                i -= 1
+
+        def get(counter):
+            return jit_hooks.stats_get_counter_value(None, counter)
+
+        def main():
+            jit_hooks.compile_worker_start(None)
+            loop(30)      # traced and queued, the rest is interpreted
+            assert get(Counters.COMPILE_QUEUED) == 1
+            assert get(Counters.TOTAL_COMPILED_LOOPS) == 0
+            assert jit_hooks.compile_worker_run_one(None)
+            assert not jit_hooks.compile_worker_run_one(None)
+            assert get(Counters.TOTAL_COMPILED_LOOPS) == 1
+            loop(30)      # runs the compiled loop
+            assert get(Counters.TRACING) == 1
+            assert get(Counters.COMPILE_QUEUE_FULL) == 0
+            jit_hooks.compile_worker_stop(None)
+
+        self.meta_interp(main, [], ProfilerClass=Profiler,
+                         policy=JitPolicy(MyJitIface()))
+        assert len(queued) == 1
+        self.check_jitcell_token_count(1)
+
+    def test_compile_queue_full(self):
+        driver = JitDriver(greens = [], reds = ['i'])
+
+        def loop(i):
+            while i > 0:
+                driver.jit_merge_point(i=i)
+                i -= 1
+
+        def get(counter):
+            return jit_hooks.stats_get_counter_value(None, counter)
+
+        def main():
+            set_param(driver, 'compile_queue_size', 0)
+            jit_hooks.compile_worker_start(None)
+            loop(30)      # compiled at once
+            assert get(Counters.COMPILE_QUEUED) == 0
+            assert get(Counters.COMPILE_QUEUE_FULL) == 1
+            assert get(Counters.TOTAL_COMPILED_LOOPS) == 1
+            assert not jit_hooks.compile_worker_run_one(None)
+            jit_hooks.compile_worker_stop(None)
+
+        self.meta_interp(main, [], ProfilerClass=Profiler)
+
+    def test_compile_worker_stop(self):
+        driver = JitDriver(greens = [], reds = ['i'])
+
+        def loop(i):
+            while i > 0:
+                driver.jit_merge_point(i=i)
+                i -= 1
+
+        def get(counter):
+            return jit_hooks.stats_get_counter_value(None, counter)
+
+        def main():
+            jit_hooks.compile_worker_start(None)
+            loop(30)      # queued
+            jit_hooks.compile_worker_stop(None)
+            # the queue was dropped: traced again, and compiled at once
+            loop(30)
+            assert get(Counters.TRACING) == 2
+            assert get(Counters.COMPILE_QUEUED) == 1
+            assert get(Counters.TOTAL_COMPILED_LOOPS) == 1
+
+        self.meta_interp(main, [], ProfilerClass=Profiler)
+
     def test_get_jitcell_at_key(self):
         driver = JitDriver(greens = ['s'], reds = ['i'], name='jit')
 
@@ -227,6 +312,56 @@ class JitHookInterfaceTests(object):
         self.meta_interp(main, [1, 1], inline=True)
         self.check_resops(call_assembler_n=8)
 
+    def test_trace_when_reached(self):
+        driver = JitDriver(greens = ['s'], reds = ['i'], name='jit')
+
+        def loop(i, s):
+            while i > 0:
+                driver.jit_merge_point(i=i, s=s)
+                i -= 1
+
+        def main(s):
+            set_param(driver, 'threshold', 1000)
+            jit_hooks.trace_when_reached("jit", s + 1)
+            loop(5, s)          # too few iterations to be traced
+            loop(5, s + 1)      # traced at once
+            loop(5, s + 1)      # runs the compiled loop
+
+        self.meta_interp(main, [5])
+        self.check_jitcell_token_count(1)
+
+    def test_loop_stats(self):
+        driver = JitDriver(greens = ['s'], reds = ['i'], name='jit')
+
+        def loop(i, s):
+            while i > 0:
+                driver.jit_merge_point(i=i, s=s)
+                i -= 1
+
+        def main(s):
+            loop(30, s)
+            loop(30, s)
+            ll_stats = jit_hooks.stats_get_loop_stats(None)
+            assert len(ll_stats) == 1
+            stats = ll_stats[0]
+            assert hlstr(stats.jitdriver_name) == 'jit'
+            assert len(stats.greenkey) == 1
+            assert jit_hooks.box_getint(stats.greenkey[0]) == s
+            # entered once by each call, and left by the guard failure
+            # of 'i > 0'; the second failure compiled a bridge
+            assert stats.entry_count == 2
+            assert stats.guard_failures == 2
+            assert stats.bridges_count == 1
+            assert stats.trace_time > 0.0
+            assert stats.backend_time > 0.0
+            assert not stats.invalidated
+            #
+            assert not jit_hooks.is_dont_trace_here("jit", s)
+            jit_hooks.dont_trace_here("jit", s + 1)
+            assert jit_hooks.is_dont_trace_here("jit", s + 1)
+
+        self.meta_interp(main, [5])
+
     def test_trace_next_iteration_hash(self):
         driver = JitDriver(greens = ['s'], reds = ['i'], name="name")
         class Hashes(object):
@@ -21,6 +21,24 @@ from rpython.rlib import rgc
 class FakeLoopToken:
     generation = 0
     invalidated = False
+    entry_count = 0
+    compiled_loop_token = None
+
+class FakeTracker:
+    total_evicted_loops = 0
+    total_evicted_bridges = 0
+
+class FakeCPU:
+    def __init__(self):
+        self.tracker = FakeTracker()
+
+class FakeCompiledLoopToken:
+    bridges_count = 0
+    def __init__(self, cpu, size):
+        self.cpu = cpu
+        self.size = size
+    def get_code_size(self):
+        return self.size
 
 
 class _TestMemoryManager:
@@ -78,6 +96,49 @@ class _TestMemoryManager:
             else:
                 assert tokens[i] in memmgr.alive_loops
 
+    def test_code_limit(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(0)
+        memmgr.set_code_limit(10)      # KB
+        cpu = FakeCPU()
+        tokens = []
+        for i in range(6):
+            token = FakeLoopToken()
+            token.compiled_loop_token = FakeCompiledLoopToken(cpu, 3072)
+            token.compiled_loop_token.bridges_count = i
+            tokens.append(token)
+            memmgr.keep_loop_alive(token)
+            memmgr.next_generation()
+            # tokens[0] is entered again after each new loop
+            memmgr.keep_loop_alive(tokens[0])
+        # at most 3 loops of 3KB fit in 10KB; the least recently
+        # entered ones were evicted
+        assert memmgr.alive_loops == dict.fromkeys([tokens[0], tokens[4],
+                                                    tokens[5]])
+        assert cpu.tracker.total_evicted_loops == 3
+        assert cpu.tracker.total_evicted_bridges == 1 + 2 + 3
+
+    def test_code_limit_entry_count(self):
+        memmgr = MemoryManager()
+        memmgr.set_max_age(0)
+        memmgr.set_code_limit(4)
+        cpu = FakeCPU()
+        tokens = [FakeLoopToken() for i in range(3)]
+        for token in tokens:
+            token.compiled_loop_token = FakeCompiledLoopToken(cpu, 2048)
+        # all entered in the same generation, but not as many times
+        for n, token in zip([5, 2, 9], tokens):
+            token.entry_count = n
+            memmgr.keep_loop_alive(token)
+        memmgr.next_generation()
+        assert memmgr.alive_loops == dict.fromkeys([tokens[0], tokens[2]])
+        # an invalidated loop goes first
+        tokens[2].invalidated = True
+        memmgr.set_code_limit(2)
+        memmgr.next_generation()
+        assert memmgr.alive_loops == dict.fromkeys([tokens[0]])
+        assert cpu.tracker.total_evicted_loops == 2
+
 
 class _TestIntegration(LLJitMixin):
     # See comments in TestMemoryManager.  To get temporarily the normal
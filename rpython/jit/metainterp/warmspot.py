@@ -22,6 +22,7 @@ from rpython.jit.metainterp import history, pyjitpl, gc, memmgr, jitexc
 from rpython.jit.metainterp.pyjitpl import MetaInterpStaticData
 from rpython.jit.metainterp.jitprof import Profiler, EmptyProfiler
 from rpython.jit.metainterp.jitdriver import JitDriverStaticData
+from rpython.jit.metainterp.compilequeue import CompileQueue
 from rpython.jit.codewriter import support, codewriter
 from rpython.jit.codewriter.policy import JitPolicy
 from rpython.jit.codewriter.effectinfo import EffectInfo
@@ -237,6 +238,7 @@ class WarmRunnerDesc(object):
         pyjitpl._warmrunnerdesc = self   # this is a global for debugging only!
         self.set_translator(translator)
         self.memory_manager = memmgr.MemoryManager()
+        self.compile_queue = CompileQueue()
         self.build_cpu(CPUClass, **kwds)
         self.inline_inlineable_portals()
         self.find_portals()
@@ -691,7 +693,8 @@ class WarmRunnerDesc(object):
                 jitdrivers_by_name[name] = jd
         m = _find_jit_markers(self.translator.graphs,
                               ('get_jitcell_at_key', 'trace_next_iteration',
-                               'dont_trace_here', 'trace_next_iteration_hash'))
+                               'dont_trace_here', 'trace_next_iteration_hash',
+                               'trace_when_reached', 'is_dont_trace_here'))
         accessors = {}
 
         def get_accessor(name, jitdriver_name, function, ARGS, green_arg_spec):
@@ -715,6 +718,13 @@ class WarmRunnerDesc(object):
                     return cast_instance_to_gcref(function(%s))
                 """ % (arg_spec, convert, arg_spec)).compile(), d)
                 FUNC = lltype.Ptr(lltype.FuncType(ARGS, llmemory.GCREF))
+            elif name == 'is_dont_trace_here':
+                exec(py.code.Source("""
+                def accessor(%s):
+                    %s
+                    return function(%s)
+                """ % (arg_spec, convert, arg_spec)).compile(), d)
+                FUNC = lltype.Ptr(lltype.FuncType(ARGS, lltype.Bool))
             elif name == "trace_next_iteration_hash":
                 exec(py.code.Source("""
                 def accessor(arg0):
@@ -745,6 +755,10 @@ class WarmRunnerDesc(object):
                 func = JitCell.dont_trace_here
             elif op.args[0].value == 'trace_next_iteration_hash':
                 func = JitCell.trace_next_iteration_hash
+            elif op.args[0].value == 'trace_when_reached':
+                func = JitCell.trace_when_reached
+            elif op.args[0].value == 'is_dont_trace_here':
+                func = JitCell.is_dont_trace_here
             else:
                 func = JitCell._trace_next_iteration
             argspec = jitdrivers_by_name[jitdriver_name]._green_args_spec
@@ -850,7 +864,8 @@ class WarmRunnerDesc(object):
         # make sure we make a copy of function so it no longer belongs
         # to extregistry
         func = op.args[1].value
-        if func.__name__.startswith('stats_'):
+        if (func.__name__.startswith('stats_') or
+                func.__name__.startswith('compile_worker_')):
             # get special treatment since we rewrite it to a call that accepts
             # jit driver
             assert len(op.args) >= 3, ("%r must have a first argument "
@@ -137,6 +137,8 @@ JC_TRACING         = 0x01
 JC_DONT_TRACE_HERE = 0x02
 JC_TEMPORARY       = 0x04
 JC_TRACING_OCCURRED= 0x08
+JC_TRACE_WHEN_REACHED = 0x10
+JC_COMPILING       = 0x20
 
 class BaseJitCell(object):
     """Subclasses of BaseJitCell are used in tandem with the single
@@ -183,6 +185,16 @@ class BaseJitCell(object):
         this particular function.  (We only set this flag when aborting
         due to a trace too long, so we use the same flag as a hint to
         also mean "please trace from here as soon as possible".)
+
+        JC_TRACE_WHEN_REACHED: start tracing from this greenkey the
+        first time we reach it, without counting.  Set from outside
+        (jit_hooks.trace_when_reached()) for greenkeys that are known
+        to become hot, e.g. because they did in a previous run of the
+        same program.  It has no effect once tracing occurred.
+
+        JC_COMPILING: a loop traced from this greenkey is waiting in
+        the compile queue for a compiler worker (see compilequeue.py).
+        Until then, we keep interpreting and don't trace it again.
     """
     flags = 0     # JC_xxx flags
     wref_procedure_token = None
@@ -212,13 +224,16 @@ class BaseJitCell(object):
     def should_remove_jitcell(self):
         if self.get_procedure_token() is not None:
             return False    # don't remove JitCells with a procedure_token
-        if self.flags & JC_TRACING:
+        if self.flags & (JC_TRACING | JC_COMPILING):
             return False    # don't remove JitCells that are being traced
         if self.flags & JC_DONT_TRACE_HERE:
             # if we have this flag, and we *had* a procedure_token but
             # we no longer have one, then remove me.  this prevents this
             # JitCell from being immortal.
             return self.has_seen_a_procedure_token()     # i.e. dead weakref
+        if (self.flags & (JC_TRACE_WHEN_REACHED | JC_TRACING_OCCURRED) ==
+                JC_TRACE_WHEN_REACHED):
+            return False    # not reached yet
         return True   # Other JitCells can be removed.
 
 # ____________________________________________________________
@@ -308,6 +323,12 @@ class WarmEnterState(object):
             if self.warmrunnerdesc.memory_manager:
                 self.warmrunnerdesc.memory_manager.max_unroll_recursion = value
 
+    def set_param_code_limit(self, value):
+        # note: it's a global parameter, not a per-jitdriver one
+        if self.warmrunnerdesc:
+            if self.warmrunnerdesc.memory_manager:
+                self.warmrunnerdesc.memory_manager.set_code_limit(value)
+
     def set_param_vec(self, ivalue):
         self.vec = bool(ivalue)
 
@@ -317,6 +338,12 @@ class WarmEnterState(object):
     def set_param_vec_cost(self, ivalue):
         self.vec_cost = ivalue
 
+    def set_param_compile_queue_size(self, value):
+        # note: it's a global parameter, not a per-jitdriver one
+        if (self.warmrunnerdesc is not None and
+            self.warmrunnerdesc.compile_queue is not None):   # all for tests
+            self.warmrunnerdesc.compile_queue.limit = value
+
     def disable_noninlinable_function(self, greenkey):
         cell = self.JitCell.ensure_jit_cell_at_key(greenkey)
         cell.flags |= JC_DONT_TRACE_HERE
@@ -388,6 +415,7 @@ class WarmEnterState(object):
             #
             # Record in the memmgr that we just ran this loop,
             # so that it will keep it alive for a longer time
+            loop_token.entry_count += 1
             warmrunnerdesc.memory_manager.keep_loop_alive(loop_token)
             #
             # Handle the failure
@@ -455,10 +483,11 @@ class WarmEnterState(object):
 
             # Here, we have found 'cell'.
             #
-            if cell.flags & (JC_TRACING | JC_TEMPORARY):
-                if cell.flags & JC_TRACING:
+            if cell.flags & (JC_TRACING | JC_TEMPORARY | JC_COMPILING):
+                if cell.flags & (JC_TRACING | JC_COMPILING):
                     # tracing already happening in some outer invocation of
-                    # this function. don't trace a second time.
+                    # this function, or the loop is waiting in the compile
+                    # queue. don't trace a second time.
                     return
                 # attached by compile_tmp_callback().  count normally
                 if jitcounter.tick(hash, increment_threshold):
@@ -467,6 +496,11 @@ class WarmEnterState(object):
             # machine code was already compiled for these greenargs
             procedure_token = cell.get_procedure_token()
             if procedure_token is None:
+                if (cell.flags & (JC_TRACE_WHEN_REACHED | JC_TRACING_OCCURRED)
+                        == JC_TRACE_WHEN_REACHED):
+                    # known to become hot: trace it now, the first time
+                    bound_reached(hash, cell, *args)
+                    return
                 if cell.flags & JC_DONT_TRACE_HERE:
                     if not cell.has_seen_a_procedure_token():
                         # A JC_DONT_TRACE_HERE, i.e. a non-inlinable function.
@@ -629,6 +663,17 @@ class WarmEnterState(object):
             def dont_trace_here(*greenargs):
                 cell = JitCell._ensure_jit_cell_at_key(*greenargs)
                 cell.flags |= JC_DONT_TRACE_HERE
+
+            @staticmethod
+            def trace_when_reached(*greenargs):
+                cell = JitCell._ensure_jit_cell_at_key(*greenargs)
+                cell.flags |= JC_TRACE_WHEN_REACHED
+
+            @staticmethod
+            def is_dont_trace_here(*greenargs):
+                cell = JitCell.get_jitcell(*greenargs)
+                return (cell is not None and
+                        bool(cell.flags & JC_DONT_TRACE_HERE))
         #
         self.JitCell = JitCell
         return JitCell
@@ -60,6 +60,8 @@ abort: compiling:       11
 abort: vable escape:    12
 abort: bad loop:        135
 abort: force quasi-immut: 3
+compile queued:         7
+compile queue full:     2
 nvirtuals:              13
 nvholes:                14
 nvreused:               15
@@ -69,6 +71,8 @@ Total # of loops:       100
 Total # of bridges:     300
 Freed # of loops:       99
 Freed # of bridges:     299
+Evicted # of loops:     12
+Evicted # of bridges:   34
 '''
 
 def test_parse():
@@ -90,8 +94,12 @@ def test_parse():
     assert info.abort.vable_escape == 12
     assert info.abort.bad_loop == 135
     assert info.abort.force_quasiimmut == 3
+    assert info.compile_queued == 7
+    assert info.compile_queue_full == 2
     assert info.nvirtuals == 13
     assert info.nvholes == 14
     assert info.nvreused == 15
     assert info.vecopt_tried == 12
     assert info.vecopt_success == 4
+    assert info.total_evicted_loops == 12
+    assert info.total_evicted_bridges == 34
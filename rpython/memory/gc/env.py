@@ -5,6 +5,7 @@ import os, sys, platform
 from rpython.rlib.rarithmetic import r_uint
 from rpython.rlib.debug import debug_print, debug_start, debug_stop
 from rpython.rlib.rstring import assert_str0
+from rpython.rlib import rposix
 from rpython.rtyper.lltypesystem import lltype, rffi
 from rpython.rtyper.lltypesystem.lloperation import llop
 
@@ -109,9 +110,82 @@ def get_total_memory_darwin(result):
     return result
 
 
+# ____________________________________________________________
+# Get the memory limit and the CPU quota of the cgroup (v2 or v1) that
+# the process runs in, e.g. in a container.  We only look at the root
+# of the cgroup filesystem, which is where the container runtimes mount
+# the cgroup of the container itself.  Return -1.0 if there is no limit.
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+def _read_small_file(filename):
+    try:
+        fd = os.open(filename, os.O_RDONLY, 0644)
+        try:
+            return os.read(fd, 4096)
+        finally:
+            os.close(fd)
+    except OSError:
+        return ''
+
+def _parse_number(buf, start):
+    # parse the unsigned number at 'buf[start:]'; returns -1.0 if there
+    # is none (e.g. the word 'max' used by cgroup v2 for 'no limit')
+    stop = start
+    while stop < len(buf) and buf[stop].isdigit():
+        stop += 1
+    if start == stop:
+        return -1.0
+    return float(buf[start:stop])
+
+def get_cgroup_memory_limit(root=CGROUP_ROOT):
+    buf = _read_small_file(root + '/memory.max')                     # v2
+    if not buf:
+        buf = _read_small_file(root + '/memory/memory.limit_in_bytes')  # v1
+    result = _parse_number(buf, 0)
+    if result >= float(2**62):
+        result = -1.0      # v1 reports "no limit" as a huge number
+    return result
+
+def get_cgroup_cpu_limit(root=CGROUP_ROOT):
+    buf = _read_small_file(root + '/cpu.max')                        # v2
+    if buf:
+        quota = _parse_number(buf, 0)
+        period = -1.0
+        i = buf.find(' ')
+        if i >= 0:
+            period = _parse_number(buf, i + 1)
+    else:
+        quota = _parse_number(
+            _read_small_file(root + '/cpu/cpu.cfs_quota_us'), 0)    # v1
+        period = _parse_number(
+            _read_small_file(root + '/cpu/cpu.cfs_period_us'), 0)
+    if quota <= 0.0 or period <= 0.0:
+        return -1.0
+    return quota / period
+
+
 if sys.platform.startswith('linux'):
     def get_total_memory():
-        return get_total_memory_linux2('/proc/meminfo')
+        result = get_total_memory_linux2('/proc/meminfo')
+        limit = get_memory_limit()
+        if 0.0 < limit < result:
+            result = limit
+        return result
+
+    def get_memory_limit():
+        debug_start("gc-hardware")
+        result = get_cgroup_memory_limit()
+        debug_print("cgroup memory limit =", result)
+        debug_stop("gc-hardware")
+        return result
+
+    def get_cpu_limit():
+        debug_start("gc-hardware")
+        result = get_cgroup_cpu_limit()
+        debug_print("cgroup cpu limit =", result)
+        debug_stop("gc-hardware")
+        return result
 
 elif sys.platform == 'darwin':
     def get_total_memory():
@@ -125,6 +199,26 @@ else:
     def get_total_memory():
         return addressable_size       # XXX implement me for other platforms
 
+if not sys.platform.startswith('linux'):
+    def get_memory_limit():
+        return -1.0
+
+    def get_cpu_limit():
+        return -1.0
+
+def get_available_cpus():
+    """Return the number of CPUs we can use, i.e. the number of online
+    CPUs, but not more than the cgroup cpu limit (rounded up)."""
+    result = rposix.cpu_count()
+    limit = get_cpu_limit()
+    if limit > 0.0:
+        ilimit = int(limit)
+        if ilimit < limit:
+            ilimit += 1
+        if ilimit < result:
+            result = ilimit
+    return max(result, 1)
+
 
 # ____________________________________________________________
 # Estimation of the nursery size, based on the L2 cache.
@@ -21,12 +21,21 @@ class GcHooks(object):
     def is_gc_collect_enabled(self):
         return False
 
+    def get_alloc_sample_interval(self):
+        """
+        Return N > 0 to have on_gc_alloc_sample() called about every N bytes
+        allocated in the nursery, or 0.  Checked after every minor
+        collection.
+        """
+        return 0
+
     def on_gc_minor(self, duration, total_memory_used, pinned_objects):
         """
         Called after a minor collection
         """
 
-    def on_gc_collect_step(self, duration, oldstate, newstate):
+    def on_gc_collect_step(self, duration, oldstate, newstate,
+                           duration_parallel, threads):
         """
         Called after each individual step of a major collection, in case the GC is
         incremental.
@@ -34,6 +43,10 @@ class GcHooks(object):
         ``oldstate`` and ``newstate`` are integers which indicate the GC
         state; for incminimark, see incminimark.STATE_* and
         incminimark.GC_STATES.
+
+        ``threads`` is the number of threads which worked during this step
+        (see PYPY_GC_MARK_THREADS), and ``duration_parallel`` the part of
+        ``duration`` spent running them.
         """
 
 
@@ -45,6 +58,22 @@ class GcHooks(object):
         Called after a major collection is fully done
         """
 
+    def on_gc_alloc_sample(self, size):
+        """
+        Called when an object of ``size`` bytes is allocated in the nursery
+        and the sample point was reached (see get_alloc_sample_interval()).
+        It is called from the allocating code, so it can look at the stack.
+        The object does not exist yet: its type is reported later by
+        on_gc_alloc_sample_type().
+        """
+
+    def on_gc_alloc_sample_type(self, type_index):
+        """
+        Called the next time the GC runs after on_gc_alloc_sample(), with
+        the type of the sampled object: ``type_index`` is the same number as
+        the one returned by rgc.get_rpy_type_index(), or -1 if unknown.
+        """
+
     # the fire_* methods are meant to be called from the GC are should NOT be
     # overridden
 
@@ -54,9 +83,11 @@ class GcHooks(object):
             self.on_gc_minor(duration, total_memory_used, pinned_objects)
 
     @rgc.no_collect
-    def fire_gc_collect_step(self, duration, oldstate, newstate):
+    def fire_gc_collect_step(self, duration, oldstate, newstate,
+                             duration_parallel=0.0, threads=1):
         if self.is_gc_collect_step_enabled():
-            self.on_gc_collect_step(duration, oldstate, newstate)
+            self.on_gc_collect_step(duration, oldstate, newstate,
+                                    duration_parallel, threads)
 
     @rgc.no_collect
     def fire_gc_collect(self, num_major_collects,
@@ -68,3 +99,11 @@ class GcHooks(object):
                                arenas_count_before, arenas_count_after,
                                arenas_bytes, rawmalloc_bytes_before,
                                rawmalloc_bytes_after)
+
+    @rgc.no_collect
+    def fire_gc_alloc_sample(self, size):
+        self.on_gc_alloc_sample(size)
+
+    @rgc.no_collect
+    def fire_gc_alloc_sample_type(self, type_index):
+        self.on_gc_alloc_sample_type(type_index)
@@ -3,7 +3,8 @@
 Environment variables can be used to fine-tune the following parameters:
 
  PYPY_GC_NURSERY         The nursery size.  Defaults to 1/2 of your cache or
-                         '4M'.  Small values
+                         '4M', but at most 1/64th of the cgroup memory
+                         limit if there is one.  Small values
                          (like 1 or 1KB) are useful for debugging.
 
  PYPY_GC_NURSERY_DEBUG   If set to non-zero, will fill nursery with garbage,
@@ -30,13 +31,39 @@ Environment variables can be used to fine-tune the following parameters:
                          will first collect more often, then raise an
                          RPython MemoryError, and if that is not enough,
                          crash the program with a fatal error.  Try values
-                         like '1.6GB'.
+                         like '1.6GB'.  Defaults to 80% of the memory limit
+                         of the cgroup (e.g. the container) we run in, if
+                         there is one.  When more than half of it is used,
+                         the major collections are done earlier and earlier.
 
  PYPY_GC_MAX_DELTA       The major collection threshold will never be set
                          to more than PYPY_GC_MAX_DELTA the amount really
                          used after a collection.  Defaults to 1/8th of the
-                         total RAM size (which is constrained to be at most
-                         2/3/4GB on 32-bit systems).  Try values like '200MB'.
+                         total RAM size or of the cgroup memory limit (which
+                         is constrained to be at most 2/3/4GB on 32-bit
+                         systems).  Try values like '200MB'.
+
+ PYPY_GC_RELEASE_DELAY   Give the memory of free pages back to the OS at the
+                         end of every N major collections.  Defaults to 2.
+                         A negative value means never.
+
+ PYPY_GC_RELEASE_KEEP    The amount of memory in free pages that is kept
+                         when giving memory back to the OS, to be reused
+                         without page faults.  Defaults to 8 arenas, i.e.
+                         4MB on 64-bit systems.
+
+ PYPY_GC_MARK_THREADS    The number of threads that mark the heap during
+                         major collections, including the main thread,
+                         but not more than the number of available CPUs.
+                         While the arenas are swept, one of the helper
+                         threads also frees the large objects.  Defaults
+                         to 1, i.e. no helper thread.
+
+ PYPY_GC_PRETENURE       Allocate directly outside the nursery the objects
+                         of the types of which at least this fraction of
+                         the bytes survives minor collections, as measured
+                         by sampling the nursery.  Defaults to 0.8.  A
+                         negative value disables pretenuring.
 
  PYPY_GC_MIN             Don't collect while the memory size is below this
                          limit.  Useful to avoid spending all the time in
@@ -67,7 +94,7 @@ from rpython.rtyper.lltypesystem import lltype, llmemory, llarena, llgroup
 from rpython.rtyper.lltypesystem.lloperation import llop
 from rpython.rtyper.lltypesystem.llmemory import raw_malloc_usage
 from rpython.memory.gc.base import GCBase, MovingGCBase
-from rpython.memory.gc import env
+from rpython.memory.gc import env, parallelmark, pretenure
 from rpython.memory.support import mangle_hash
 from rpython.rlib.rarithmetic import ovfcheck, LONG_BIT, intmask, r_uint
 from rpython.rlib.rarithmetic import LONG_BIT_SHIFT
@@ -94,6 +121,11 @@ from rpython.memory.gc.minimarkpage import out_of_memory
 
 WORD = LONG_BIT // 8
 
+# When running in a cgroup with a memory limit (e.g. in a container), the
+# defaults are derived from that limit rather than from the total RAM
+CGROUP_NURSERY_FRACTION = 1.0 / 64   # upper bound for the nursery size
+CGROUP_HEAP_FRACTION = 0.8           # default value of PYPY_GC_MAX
+
 first_gcflag = 1 << (LONG_BIT//2)
 
 # The following flag is set on objects if we need to do something to
@@ -366,6 +398,44 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # for more details.
         self.size_objects_made_old = r_uint(0)
         self.threshold_objects_made_old = r_uint(0)
+        #
+        # The helper threads of PYPY_GC_MARK_THREADS, and what they did
+        # during the current major collection step (for the gc hooks).
+        gc = self
+        def run_mark_task(worker):
+            gc._run_mark_task(worker)
+        self.marker = parallelmark.ParallelMarker(run_mark_task)
+        self.step_threads = 1
+        self.step_parallel_duration = 0.0
+        #
+        # Pretenuring (see pretenure.py).  Every 'pretenure_interval' minor
+        # collections (0 means never), we sample the nursery up to
+        # 'pretenure_sample_end'.  'nursery_alloc_end' records where the
+        # densely allocated part of the nursery ends, if 'nursery_free'
+        # doesn't tell it.  'pretenure_active' is True if some types are
+        # currently allocated outside the nursery.
+        self.pretenure = pretenure.PretenureTable()
+        self.pretenure_interval = 0
+        self.pretenure_countdown = 0
+        self.pretenure_sample_end = llmemory.NULL
+        self.nursery_alloc_end = llmemory.NULL
+        self.pretenure_active = False
+        self.pretenured_since_minor = 0
+        #
+        # Allocation sampling (see GcHooks.get_alloc_sample_interval()).
+        # 'alloc_sample_countdown' bytes are left to allocate before the
+        # next sample, counted from 'alloc_sample_start'.  If the sample
+        # point is before 'nursery_top', we lower 'nursery_top' to it, so
+        # that the allocation reaching it goes to collect_and_reserve();
+        # the real top is then saved in 'alloc_sample_top'.  The type of
+        # the sampled object is read from 'alloc_sample_obj' the next time
+        # we enter the GC, when the header has been written.
+        self.alloc_sample_interval = 0
+        self.alloc_sample_countdown = 0
+        self.alloc_sample_seed = r_uint(0x2545F491)
+        self.alloc_sample_start = llmemory.NULL
+        self.alloc_sample_top = llmemory.NULL
+        self.alloc_sample_obj = llmemory.NULL
 
 
     def setup(self):
@@ -453,6 +523,7 @@ class IncrementalMiniMarkGC(MovingGCBase):
             #
             # From there on, the GC is fully initialized and the code
             # below can use it
+            memory_limit = env.get_memory_limit()
             newsize = env.read_from_env('PYPY_GC_NURSERY')
             # PYPY_GC_NURSERY=smallvalue means that minor collects occur
             # very frequently; the extreme case is PYPY_GC_NURSERY=1, which
@@ -465,6 +536,10 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 newsize = env.estimate_best_nursery_size()
                 if newsize <= 0:
                     newsize = defaultsize
+                if memory_limit > 0.0:
+                    maxsize = int(memory_limit * CGROUP_NURSERY_FRACTION)
+                    if newsize > maxsize:
+                        newsize = max(maxsize, minsize)
             if newsize < minsize:
                 self.debug_tiny_nursery = newsize & ~(WORD-1)
                 newsize = minsize
@@ -487,6 +562,8 @@ class IncrementalMiniMarkGC(MovingGCBase):
             max_heap_size = env.read_uint_from_env('PYPY_GC_MAX')
             if max_heap_size > 0:
                 self.max_heap_size = float(max_heap_size)
+            elif memory_limit > 0.0:
+                self.max_heap_size = memory_limit * CGROUP_HEAP_FRACTION
             #
             max_delta = env.read_uint_from_env('PYPY_GC_MAX_DELTA')
             if max_delta > 0:
@@ -500,6 +577,30 @@ class IncrementalMiniMarkGC(MovingGCBase):
             else:
                 self.gc_increment_step = newsize * 4
             #
+            release_delay = env.read_from_env('PYPY_GC_RELEASE_DELAY')
+            if release_delay == 0:
+                release_delay = 2
+            elif release_delay < 0:
+                release_delay = 0    # never
+            self.ac.release_delay = release_delay
+            release_keep = env.read_from_env('PYPY_GC_RELEASE_KEEP')
+            if release_keep > 0:
+                self.ac.release_keep = release_keep
+            else:
+                self.ac.release_keep = 8 * self.ac.arena_size
+            #
+            mark_threads = env.read_from_env('PYPY_GC_MARK_THREADS')
+            if mark_threads > 1:
+                # more threads than CPUs would only make things slower
+                self.marker.setup(min(mark_threads,
+                                      env.get_available_cpus()))
+            #
+            pretenure_ratio = env.read_float_from_env('PYPY_GC_PRETENURE')
+            if pretenure_ratio >= 0.0:
+                if pretenure_ratio > 0.0:
+                    self.pretenure.ratio = pretenure_ratio
+                self.pretenure_interval = 8
+            #
             nursery_debug = env.read_uint_from_env('PYPY_GC_NURSERY_DEBUG')
             if nursery_debug > 0:
                 self.gc_nursery_debug = True
@@ -590,6 +691,37 @@ class IncrementalMiniMarkGC(MovingGCBase):
         self.next_major_collection_threshold = threshold
         return bounded
 
+    def _heap_pressure(self, total_memory_used):
+        # 1.0 as long as no more than half of the max heap size is in use
+        # (or there is no max heap size), then going down linearly to 0.0
+        # when the whole max heap size is in use.
+        if self.max_heap_size > 0.0:
+            free = 1.0 - total_memory_used / self.max_heap_size
+            if free < 0.5:
+                if free < 0.0:
+                    free = 0.0
+                return free * 2.0
+        return 1.0
+
+    def major_collection_factor(self, total_memory_used):
+        # Normally 'major_collection_threshold'.  But when we have a max
+        # heap size and more than half of it is in use, the factor goes
+        # down linearly to 1.0, so that the next major collections are
+        # done earlier and earlier as we get closer to the limit.
+        factor = self.major_collection_threshold
+        return 1.0 + (factor - 1.0) * self._heap_pressure(total_memory_used)
+
+    def sweep_step_size(self, total_memory_used):
+        # The number of bytes that one step of STATE_SWEEPING processes.
+        # Normally '3 * nursery_size'.  Near the max heap size, it goes
+        # down in the same way as major_collection_factor(), but never
+        # below 'nursery_size', to keep the steps (and so the pauses)
+        # smaller while the majors get more frequent.
+        size = 3.0 * self.nursery_size * self._heap_pressure(total_memory_used)
+        if size < self.nursery_size:
+            return self.nursery_size
+        return int(size)
+
 
     def post_setup(self):
         # set up extra stuff for PYPY_GC_DEBUG.
@@ -668,6 +800,14 @@ class IncrementalMiniMarkGC(MovingGCBase):
             if rawtotalsize < min_size:
                 totalsize = rawtotalsize = min_size
             #
+            # If most objects of this type survive the minor collections,
+            # allocate it directly outside the nursery.  Not done for
+            # weakrefs and destructors (checks constant-folded).
+            if (not needs_finalizer and not contains_weakptr and
+                    self.pretenure_active and self.is_pretenured(typeid)):
+                obj = self.malloc_pretenured(typeid, totalsize)
+                return llmemory.cast_adr_to_ptr(obj, llmemory.GCREF)
+            #
             # Get the memory from the nursery.  If there is not enough space
             # there, do a collect first.
             result = self.nursery_free
@@ -728,25 +868,71 @@ class IncrementalMiniMarkGC(MovingGCBase):
                       raw_malloc_usage(self.minimal_size_in_nursery),
                       "malloc_varsize(): totalsize < minimalsize")
             #
-            # Get the memory from the nursery.  If there is not enough space
-            # there, do a collect first.
-            result = self.nursery_free
-            ll_assert(result != llmemory.NULL, "uninitialized nursery")
-            self.nursery_free = new_free = result + totalsize
-            if new_free > self.nursery_top:
-                result = self.collect_and_reserve(totalsize)
-            #
-            # Build the object.
-            llarena.arena_reserve(result, totalsize)
-            self.init_gc_object(result, typeid, flags=0)
+            if self.pretenure_active and self.is_pretenured(typeid):
+                # allocate it directly outside the nursery
+                obj = self.malloc_pretenured(typeid, totalsize)
+            else:
+                # Get the memory from the nursery.  If there is not enough
+                # space there, do a collect first.
+                result = self.nursery_free
+                ll_assert(result != llmemory.NULL, "uninitialized nursery")
+                self.nursery_free = new_free = result + totalsize
+                if new_free > self.nursery_top:
+                    result = self.collect_and_reserve(totalsize)
+                #
+                # Build the object.
+                llarena.arena_reserve(result, totalsize)
+                self.init_gc_object(result, typeid, flags=0)
+                obj = result + size_gc_header
             #
             # Set the length and return the object.
-            obj = result + size_gc_header
             (obj + offset_to_length).signed[0] = length
         #
         return llmemory.cast_adr_to_ptr(obj, llmemory.GCREF)
 
 
+    def is_pretenured(self, typeid):
+        # typeid 0 comes from the JIT, which reserves nursery memory
+        # for several objects at once
+        return (bool(self.combine(typeid, 0)) and
+                self.pretenure.is_pretenured(self.get_member_index(typeid)))
+    is_pretenured._always_inline_ = True
+
+    def malloc_pretenured(self, typeid, totalsize):
+        """Allocate an object of a pretenured type outside the nursery.
+        The returned object is not zero-filled and its length is not set."""
+        #
+        # Objects allocated here would not fill the nursery, but we still
+        # need to do minor collections, which drive the major collections.
+        rawtotalsize = raw_malloc_usage(totalsize)
+        self.pretenured_since_minor += rawtotalsize
+        if self.pretenured_since_minor > self.nursery_size:
+            self.minor_collection_with_major_progress()
+        #
+        result = self._malloc_out_of_nursery(totalsize)
+        self.pretenure.pretenured_bytes += rawtotalsize
+        self.size_objects_made_old += r_uint(rawtotalsize)
+        #
+        # Allocate the object black if we are marking: it is recorded in
+        # 'old_objects_pointing_to_young' anyway, so the next minor
+        # collection turns it gray again (see _minor_collection()).
+        if self.gc_state == STATE_MARKING:
+            flags = GCFLAG_VISITED
+        else:
+            flags = 0
+        self.init_gc_object(result, typeid, flags)
+        obj = result + self.gcheaderbuilder.size_gc_header
+        #
+        # The caller may initialize the object without a write barrier, as
+        # if it were young.  Record it now like the write barrier does, so
+        # that the next minor collection finds the young objects it
+        # points to.
+        if self.has_gcptr(typeid):
+            self.old_objects_pointing_to_young.append(obj)
+        return obj
+    malloc_pretenured._dont_inline_ = True
+
+
     def malloc_fixed_or_varsize_nonmovable(self, typeid, length):
         # length==0 for fixedsize
         obj = self.external_malloc(typeid, length, alloc_young=True)
@@ -855,6 +1041,23 @@ class IncrementalMiniMarkGC(MovingGCBase):
         major collection, and finally reserve totalsize bytes.
         """
 
+        if self.alloc_sample_interval > 0:
+            self._alloc_sample_flush()
+            self._alloc_sample_disarm(self.nursery_free - totalsize)
+            if self.nursery_free <= self.nursery_top:
+                # there is enough room: we only got here because
+                # 'nursery_top' was lowered to the sample point
+                result = self.nursery_free - totalsize
+                self._alloc_sample(result, totalsize)
+                self._alloc_sample_arm()
+                return result
+        #
+        # The nursery is densely allocated at least up to the start of
+        # the object that doesn't fit.  (The JIT doesn't change
+        # 'nursery_free' before calling us, so it is even a bit further.)
+        if not self.nursery_alloc_end:
+            self.nursery_alloc_end = self.nursery_free - totalsize
+        #
         minor_collection_count = 0
         while True:
             self.nursery_free = llmemory.NULL      # debug: don't use me
@@ -917,6 +1120,12 @@ class IncrementalMiniMarkGC(MovingGCBase):
                               "enough. Too many pinned objects?")
                     self._minor_collection()
             #
+            # The minor collection may have lowered 'nursery_top' for
+            # allocation sampling: undo that until we return.
+            if self.alloc_sample_top:
+                self.nursery_top = self.alloc_sample_top
+                self.alloc_sample_top = llmemory.NULL
+            #
             # Tried to do something about nursery_free overflowing
             # nursery_top before this point. Try to reserve totalsize now.
             # If this succeeds break out of loop.
@@ -929,11 +1138,71 @@ class IncrementalMiniMarkGC(MovingGCBase):
         #
         if self.debug_tiny_nursery >= 0:   # for debugging
             if self.nursery_top - self.nursery_free > self.debug_tiny_nursery:
+                self.nursery_alloc_end = self.nursery_free
                 self.nursery_free = self.nursery_top - self.debug_tiny_nursery
         #
+        if self.alloc_sample_interval > 0:
+            self._alloc_sample_disarm(result)
+            self._alloc_sample(result, totalsize)
+            self._alloc_sample_arm()
+        #
         return result
     collect_and_reserve._dont_inline_ = True
 
+    def _alloc_sample_arm(self):
+        # start counting the allocated bytes from 'nursery_free', and lower
+        # 'nursery_top' if the next sample point is before it
+        self.alloc_sample_start = self.nursery_free
+        if self.alloc_sample_countdown < self.nursery_top - self.nursery_free:
+            self.alloc_sample_top = self.nursery_top
+            self.nursery_top = self.nursery_free + self.alloc_sample_countdown
+
+    def _alloc_sample_disarm(self, end):
+        # put back the real 'nursery_top', and count the bytes allocated
+        # between 'alloc_sample_start' and 'end'
+        if self.alloc_sample_top:
+            self.nursery_top = self.alloc_sample_top
+            self.alloc_sample_top = llmemory.NULL
+        if self.alloc_sample_start:
+            self.alloc_sample_countdown -= end - self.alloc_sample_start
+            self.alloc_sample_start = llmemory.NULL
+
+    def _alloc_sample(self, result, totalsize):
+        # 'result' is the nursery object of 'totalsize' bytes that is
+        # being allocated; count it and sample it if we reach 0
+        rawtotalsize = raw_malloc_usage(totalsize)
+        self.alloc_sample_countdown -= rawtotalsize
+        if self.alloc_sample_countdown <= 0:
+            self.alloc_sample_countdown = self._alloc_sample_next()
+            self.alloc_sample_obj = result
+            self.hooks.fire_gc_alloc_sample(rawtotalsize)
+
+    def _alloc_sample_next(self):
+        # Return the distance to the next sample point, a pseudo-random
+        # number between interval/2 and 3*interval/2 (xorshift), so that
+        # a loop allocating always the same sequence of objects doesn't
+        # always sample the same one.
+        x = self.alloc_sample_seed
+        x ^= x << 13
+        x ^= x >> 7
+        x ^= x << 17
+        self.alloc_sample_seed = x
+        interval = self.alloc_sample_interval
+        return (interval >> 1) + intmask(x % r_uint(interval)) + 1
+
+    def _alloc_sample_flush(self):
+        # report the type of the object sampled last, if any
+        result = self.alloc_sample_obj
+        if result:
+            self.alloc_sample_obj = llmemory.NULL
+            obj = result + self.gcheaderbuilder.size_gc_header
+            typeid = self.get_type_id(obj)
+            if self.combine(typeid, 0):
+                type_index = self.get_member_index(typeid)
+            else:
+                type_index = -1    # the header was not written
+            self.hooks.fire_gc_alloc_sample_type(type_index)
+
 
     # XXX kill alloc_young and make it always True
     def external_malloc(self, typeid, length, alloc_young):
@@ -1091,6 +1360,10 @@ class IncrementalMiniMarkGC(MovingGCBase):
         if self.next_major_collection_threshold < 0:
             # cannot trigger a full collection now, but we can ensure
             # that one will occur very soon
+            if not self.nursery_alloc_end:
+                self.nursery_alloc_end = self.nursery_free
+            if self.alloc_sample_interval > 0:
+                self._alloc_sample_disarm(self.nursery_free)
             self.nursery_free = self.nursery_top
 
     def can_optimize_clean_setarrayitems(self):
@@ -1160,6 +1433,10 @@ class IncrementalMiniMarkGC(MovingGCBase):
         totalsmallersize = (
             size_gc_header + self.fixed_size(typeid) +
             self.varsize_item_sizes(typeid) * smallerlength)
+        # This leaves unused memory after the object, so the nursery is
+        # no longer densely allocated (see sample_nursery())
+        if not self.nursery_alloc_end:
+            self.nursery_alloc_end = obj - size_gc_header
         llarena.arena_shrink_obj(obj - size_gc_header, totalsmallersize)
         #
         offset_to_length = self.varsize_offset_to_length(typeid)
@@ -1715,6 +1992,24 @@ class IncrementalMiniMarkGC(MovingGCBase):
         self.pinned_objects_in_nursery = 0
         self.any_pinned_object_kept = False
         #
+        # The nursery objects are going away: report the type of the last
+        # sampled one, and stop counting the bytes allocated for sampling.
+        # ('nursery_free' is NULL if called from collect_and_reserve(),
+        # which did that already.)
+        if self.alloc_sample_interval > 0 and self.nursery_free:
+            self._alloc_sample_flush()
+            self._alloc_sample_disarm(self.nursery_free)
+        #
+        # Every 'pretenure_interval' minor collections, count how much
+        # memory each type uses in the nursery (see pretenure.py).  Not
+        # done if pinned objects split the nursery.
+        if self.pretenure_interval > 0:
+            self.pretenure_countdown -= 1
+            if (self.pretenure_countdown <= 0 and
+                    not any_pinned_object_from_earlier):
+                self.pretenure_countdown = self.pretenure_interval
+                self.sample_nursery()
+        #
         # Before everything else, remove from 'old_objects_pointing_to_young'
         # the young arrays.
         if self.young_rawmalloced_objects:
@@ -1885,11 +2180,28 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # from the nursery that we just moved out.
         self.size_objects_made_old += r_uint(self.nursery_surviving_size)
         #
+        self.nursery_alloc_end = llmemory.NULL
+        self.pretenured_since_minor = 0
+        if self.pretenure_sample_end:
+            self.pretenure_sample_end = llmemory.NULL
+            self.pretenure.update()
+            self.pretenure_active = self.pretenure.num_pretenured > 0
+        #
+        interval = self.hooks.get_alloc_sample_interval()
+        if interval != self.alloc_sample_interval:
+            self.alloc_sample_interval = interval
+            if interval > 0:
+                self.alloc_sample_countdown = self._alloc_sample_next()
+        if interval > 0:
+            self._alloc_sample_arm()
+        #
         total_memory_used = self.get_total_memory_used()
         debug_print("minor collect, total memory used:", total_memory_used)
         debug_print("number of pinned objects:",
                     self.pinned_objects_in_nursery)
         debug_print("total size of surviving objects:", self.nursery_surviving_size)
+        debug_print("number of pretenured types:",
+                    self.pretenure.num_pretenured)
         if self.DEBUG >= 2:
             self.debug_check_consistency()     # expensive!
         #
@@ -1903,6 +2215,31 @@ class IncrementalMiniMarkGC(MovingGCBase):
             total_memory_used=total_memory_used,
             pinned_objects=self.pinned_objects_in_nursery)
 
+    def sample_nursery(self):
+        """Record the memory used by each type in the nursery, as far as
+        we know that it is densely allocated, and set
+        'pretenure_sample_end' so that _trace_drag_out() records which
+        of these objects survive."""
+        limit = self.nursery_alloc_end
+        if not limit:
+            limit = self.nursery_free
+            if not limit:
+                return     # called again from collect_and_reserve()
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        addr = self.nursery
+        while addr < limit:
+            obj = addr + size_gc_header
+            totalsize = llarena.round_up_for_allocation(
+                size_gc_header + self.get_size(obj),
+                self.minimal_size_in_nursery)
+            if addr + totalsize > limit:
+                break
+            self.pretenure.record_allocated(
+                self.get_member_index(self.get_type_id(obj)),
+                raw_malloc_usage(totalsize))
+            addr += totalsize
+        self.pretenure_sample_end = addr
+
     def _reset_flag_old_objects_pointing_to_pinned(self, obj, ignore):
         ll_assert(self.header(obj).tid & GCFLAG_PINNED_OBJECT_PARENT_KNOWN != 0,
                   "!GCFLAG_PINNED_OBJECT_PARENT_KNOWN, but requested to reset.")
@@ -2159,6 +2496,12 @@ class IncrementalMiniMarkGC(MovingGCBase):
         # the layout, in non-translated versions.
         typeid = self.get_type_id(obj)
         obj = llarena.getfakearenaaddress(obj)
+        if obj < self.pretenure_sample_end:
+            # this object was counted by sample_nursery()
+            self.pretenure.record_survived(
+                self.get_member_index(typeid),
+                raw_malloc_usage(llarena.round_up_for_allocation(
+                    totalsize, self.minimal_size_in_nursery)))
         llarena.arena_reset(obj - size_gc_header, totalsize, 0)
         llarena.arena_reserve(obj - size_gc_header,
                               size_gc_header + llmemory.sizeof(FORWARDSTUB))
@@ -2306,6 +2649,8 @@ class IncrementalMiniMarkGC(MovingGCBase):
         start = time.time()
         debug_start("gc-collect-step")
         oldstate = self.gc_state
+        self.step_threads = 1
+        self.step_parallel_duration = 0.0
         debug_print("starting gc state: ", GC_STATES[self.gc_state])
         # Debugging checks
         if self.pinned_objects_in_nursery == 0:
@@ -2449,13 +2794,33 @@ class IncrementalMiniMarkGC(MovingGCBase):
             #END MARKING
         elif self.gc_state == STATE_SWEEPING:
             #
-            if self.raw_malloc_might_sweep.non_empty():
+            step_size = self.sweep_step_size(
+                float(self.get_total_memory_used()))
+            if (self.raw_malloc_might_sweep.non_empty() and
+                    self.marker.enabled() and self.marker.prepare() > 1):
+                # Same as the two cases below, but done at the same time:
+                # a helper thread frees the rawmalloced objects while we
+                # visit the arenas.  The two don't share any state.
+                parallel_start = time.time()
+                limit = step_size // self.small_request_threshold
+                self.marker.start_task(1, parallelmark.TASK_SWEEP_RAW, limit)
+                pagelimit = step_size // self.ac.page_size
+                arenas_done = self.ac.mass_free_incremental(
+                    self._free_if_unvisited, pagelimit)
+                nobjects = self.marker.wait_task(1).result
+                debug_print("freeing raw objects:", limit-nobjects,
+                            "freed, limit was", limit, "(in parallel)")
+                done = (arenas_done and
+                        not self.raw_malloc_might_sweep.non_empty())
+                self.step_threads = 2
+                self.step_parallel_duration += time.time() - parallel_start
+            elif self.raw_malloc_might_sweep.non_empty():
                 # Walk all rawmalloced objects and free the ones that don't
                 # have the GCFLAG_VISITED flag.  Visit at most 'limit' objects.
                 # This limit is conservatively high enough to guarantee that
-                # a total object size of at least '3 * nursery_size' bytes
-                # is processed.
-                limit = 3 * self.nursery_size // self.small_request_threshold
+                # a total object size of at least 'step_size' bytes is
+                # processed.
+                limit = step_size // self.small_request_threshold
                 nobjects = self.free_unvisited_rawmalloc_objects_step(limit)
                 debug_print("freeing raw objects:", limit-nobjects,
                             "freed, limit was", limit)
@@ -2463,9 +2828,9 @@ class IncrementalMiniMarkGC(MovingGCBase):
             else:
                 # Ask the ArenaCollection to visit a fraction of the objects.
                 # Free the ones that have not been visited above, and reset
-                # GCFLAG_VISITED on the others.  Visit at most '3 *
-                # nursery_size' bytes.
-                limit = 3 * self.nursery_size // self.ac.page_size
+                # GCFLAG_VISITED on the others.  Visit at most
+                # 'step_size' bytes.
+                limit = step_size // self.ac.page_size
                 done = self.ac.mass_free_incremental(self._free_if_unvisited,
                                                      limit)
                 status = done and "No more pages left." or "More to do."
@@ -2474,6 +2839,8 @@ class IncrementalMiniMarkGC(MovingGCBase):
             #
             if done:
                 self.num_major_collects += 1
+                self.pretenure.end_of_major_collection()
+                self.pretenure_active = self.pretenure.num_pretenured > 0
                 #
                 # We also need to reset the GCFLAG_VISITED on prebuilt GC objects.
                 self.prebuilt_root_objects.foreach(self._reset_gcflag_visited, None)
@@ -2486,8 +2853,9 @@ class IncrementalMiniMarkGC(MovingGCBase):
                 total_memory_used -= float(self.kept_alive_by_finalizer)
                 if total_memory_used < 0:
                     total_memory_used = 0
+                factor = self.major_collection_factor(total_memory_used)
                 bounded = self.set_major_threshold_from(
-                    min(total_memory_used * self.major_collection_threshold,
+                    min(total_memory_used * factor,
                         total_memory_used + self.max_delta),
                     reserving_size)
                 #
@@ -2548,13 +2916,16 @@ class IncrementalMiniMarkGC(MovingGCBase):
             ll_assert(False, "bogus gc_state")
 
         debug_print("stopping, now in gc state: ", GC_STATES[self.gc_state])
+        debug_print("threads used:", self.step_threads)
         debug_stop("gc-collect-step")
         duration = time.time() - start
         self.total_gc_time += duration
         self.hooks.fire_gc_collect_step(
             duration=duration,
             oldstate=oldstate,
-            newstate=self.gc_state)
+            newstate=self.gc_state,
+            duration_parallel=self.step_parallel_duration,
+            threads=self.step_threads)
 
     def _sweep_old_objects_pointing_to_pinned(self, obj, new_list):
         if self.header(obj).tid & GCFLAG_VISITED:
@@ -2678,6 +3049,10 @@ class IncrementalMiniMarkGC(MovingGCBase):
     TEST_VISIT_SINGLE_STEP = False    # for tests
 
     def visit_all_objects_step(self, size_to_track):
+        if self.marker.enabled() and not self.TEST_VISIT_SINGLE_STEP:
+            nthreads = self.marker.prepare()
+            if nthreads > 1:
+                return self.parallel_visit_step(size_to_track, nthreads)
         # Objects can be added to pending by visit
         pending = self.objects_to_trace
         while pending.non_empty():
@@ -2725,6 +3100,100 @@ class IncrementalMiniMarkGC(MovingGCBase):
         totalsize = size_gc_header + self.get_size(obj)
         return raw_malloc_usage(totalsize)
 
+    # ----------
+    # Parallel marking, with PYPY_GC_MARK_THREADS (see parallelmark.py)
+
+    def parallel_visit_step(self, size_to_track, nthreads):
+        # Like visit_all_objects_step(), but the objects are visited by
+        # 'nthreads' threads, each of which gets an equal part of
+        # 'size_to_track'.  The objects left at the end are put back
+        # into 'objects_to_trace'.
+        parallel_start = time.time()
+        marker = self.marker
+        pending = self.objects_to_trace
+        marker.begin_phase(nthreads)
+        while pending.non_empty():
+            marker.add_initial(pending.pop())
+        budget = size_to_track // nthreads + 1
+        i = 0
+        while i < nthreads:
+            marker.get_worker(i).budget = budget
+            i += 1
+        i = 1
+        while i < nthreads:
+            marker.start_task(i, parallelmark.TASK_MARK, 0)
+            i += 1
+        worker = marker.get_worker(0)
+        self._mark_worker_run(worker)
+        visited = budget - worker.budget
+        i = 1
+        while i < nthreads:
+            worker = marker.wait_task(i)
+            visited += budget - worker.budget
+            i += 1
+        leftover = marker.pop_leftover(pending)
+        #
+        if nthreads > self.step_threads:
+            self.step_threads = nthreads
+        self.step_parallel_duration += time.time() - parallel_start
+        if leftover > 0 or visited > size_to_track:
+            return 0
+        return size_to_track - visited
+
+    def _run_mark_task(self, worker):
+        # Runs in a helper thread: no GC allocation, no exception,
+        # no debug_print() here.
+        task = worker.task
+        if task == parallelmark.TASK_MARK:
+            self._mark_worker_run(worker)
+        elif task == parallelmark.TASK_SWEEP_RAW:
+            worker.result = self.free_unvisited_rawmalloc_objects_step(
+                worker.arg)
+
+    def _mark_worker_run(self, worker):
+        marker = self.marker
+        while True:
+            chunk = worker.chunk
+            while chunk.count > 0:
+                if worker.budget < 0:
+                    marker.stop(worker)
+                    return
+                chunk.count -= 1
+                obj = chunk.items[chunk.count]
+                worker.budget -= self._par_visit(obj, worker)
+                marker.share(worker)
+                chunk = worker.chunk
+            if not marker.steal(worker):
+                return
+
+    def _par_visit(self, obj, worker):
+        # Same as visit(), but the referenced objects go to the private
+        # chunk of 'worker'.  Another thread may visit the same object at
+        # the same time: then both set the same flags, and trace it twice,
+        # which is harmless.
+        hdr = self.header(obj)
+        if hdr.tid & (GCFLAG_VISITED | GCFLAG_NO_HEAP_PTRS):
+            return 0
+        hdr.tid |= GCFLAG_VISITED | GCFLAG_TRACK_YOUNG_PTRS
+        if self.has_gcptr(llop.extract_ushort(llgroup.HALFWORD, hdr.tid)):
+            self.trace(obj, self._par_collect_ref, worker)
+        size_gc_header = self.gcheaderbuilder.size_gc_header
+        totalsize = size_gc_header + self.get_size(obj)
+        return raw_malloc_usage(totalsize)
+
+    def _par_collect_ref(self, root, worker):
+        obj = root.address[0]
+        if not self.is_in_nursery(obj):
+            chunk = worker.chunk
+            if chunk.count == parallelmark.MARK_CHUNK_SIZE:
+                self.marker.publish(worker)
+                chunk = worker.chunk
+            chunk.items[chunk.count] = obj
+            chunk.count += 1
+        else:
+            ll_assert(self._is_pinned(obj),
+                      "non-pinned nursery obj in _par_collect_ref")
+
     # ----------
     # id() and identityhash() support
 
@@ -3059,6 +3528,14 @@ class IncrementalMiniMarkGC(MovingGCBase):
             return intmask(self.nursery_size)
         elif stats_no == rgc.TOTAL_GC_TIME:
             return int(self.total_gc_time * 1000)
+        elif stats_no == rgc.RELEASED_ARENA_MEMORY:
+            return intmask(self.ac.total_memory_released)
+        elif stats_no == rgc.PRETENURED_TYPES:
+            return self.pretenure.num_pretenured
+        elif stats_no == rgc.PRETENURED_MEMORY:
+            return self.pretenure.pretenured_bytes
+        elif stats_no == rgc.PRETENURE_REVERTS:
+            return self.pretenure.num_reverted
         return 0
 
 
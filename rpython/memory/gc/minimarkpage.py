@@ -1,6 +1,6 @@
 import sys
 from rpython.rtyper.lltypesystem import lltype, llmemory, llarena, rffi
-from rpython.rlib.rarithmetic import LONG_BIT, r_uint
+from rpython.rlib.rarithmetic import LONG_BIT, r_uint, r_ulonglong
 from rpython.rlib.objectmodel import we_are_translated
 from rpython.rlib.debug import ll_assert, fatalerror
 
@@ -24,6 +24,12 @@ ARENA = lltype.Struct('ArenaReference',
     ('totalpages', lltype.Signed),
     # -- A chained list of free pages in the arena.  Ends with NULL.
     ('freepages', llmemory.Address),
+    # -- The free pages whose memory was given back to the OS.  They are
+    #    not in 'freepages' (we cannot store a link inside them), but in
+    #    this bitmask instead, one bit per page.  They are also counted
+    #    in 'nfreepages'.
+    ('releasedpages', lltype.UnsignedLongLong),
+    ('nreleasedpages', lltype.Signed),
     # -- A linked list of arenas.  See below.
     ('nextarena', ARENA_PTR),
     )
@@ -39,6 +45,16 @@ ARENA_NULL = lltype.nullptr(ARENA)
 # arenas that have 'nfreepages == i'.  We allocate pages out of the
 # arena in 'current_arena'; when it is exhausted we pick another arena
 # with the smallest value for nfreepages (but > 0).
+#
+# Arenas that are not entirely free stay allocated, which keeps the
+# memory of their free pages resident.  To avoid that, at the end of
+# some major collections we give the memory of free pages back to the OS
+# with madvise(), keeping only 'release_keep' bytes of free pages, taken
+# from the arenas that will be picked first.  The released pages are
+# used again only after all the other free pages of their arena.
+
+# the 'releasedpages' bitmask must have room for all pages of an arena
+MAX_PAGES_FOR_RELEASE = 64
 
 # ____________________________________________________________
 #
@@ -143,6 +159,16 @@ class ArenaCollection(object):
         self.peak_memory_used = r_uint(0)
         self.total_memory_alloced = r_uint(0)
         self.peak_memory_alloced = r_uint(0)
+        #
+        # Policy for giving the memory of free pages back to the OS: do it
+        # at the end of every 'release_delay' major collections (never if
+        # 0), keeping 'release_keep' bytes of free pages.  The GC sets
+        # these values.  'total_memory_released' is the size of the pages
+        # currently released; it is not counted in 'total_memory_alloced'.
+        self.release_delay = 0
+        self.release_keep = 0
+        self.mass_frees_before_release = 0
+        self.total_memory_released = r_uint(0)
 
 
     def _new_page_ptr_list(self, length):
@@ -204,7 +230,7 @@ class ArenaCollection(object):
         # The result is simply 'current_arena.freepages'.
         arena = self.current_arena
         result = arena.freepages
-        if arena.nfreepages > 0:
+        if arena.nfreepages > arena.nreleasedpages:
             #
             # The 'result' was part of the chained list; read the next.
             arena.nfreepages -= 1
@@ -213,6 +239,13 @@ class ArenaCollection(object):
                                 llmemory.sizeof(llmemory.Address),
                                 0)
             #
+        elif arena.nreleasedpages > 0:
+            #
+            # The chained list is empty, but we have released pages.
+            arena.nfreepages -= 1
+            result = self._take_released_page(arena)
+            freepages = arena.freepages
+            #
         else:
             # The 'result' is part of the uninitialized pages.
             ll_assert(self.num_uninitialized_pages > 0,
@@ -224,11 +257,9 @@ class ArenaCollection(object):
                 freepages = NULL
         #
         arena.freepages = freepages
-        if freepages == NULL:
+        if freepages == NULL and arena.nfreepages == 0:
             # This was the last page, so put the arena away into
             # arenas_lists[0].
-            ll_assert(arena.nfreepages == 0, 
-                      "freepages == NULL but nfreepages > 0")
             arena.nextarena = self.arenas_lists[0]
             self.arenas_lists[0] = arena
             self.current_arena = ARENA_NULL
@@ -316,6 +347,8 @@ class ArenaCollection(object):
         arena.nfreepages = 0        # they are all uninitialized pages
         arena.totalpages = npages
         arena.freepages = firstpage
+        arena.releasedpages = r_ulonglong(0)
+        arena.nreleasedpages = 0
         self.num_uninitialized_pages = npages
         self.current_arena = arena
         self.arenas_count += 1
@@ -370,6 +403,7 @@ class ArenaCollection(object):
         if size_class >= 0:
             self._rehash_arenas_lists()
             self.size_class_with_old_pages = -1
+            self._maybe_release_free_pages()
         #
         return True
 
@@ -407,7 +441,9 @@ class ArenaCollection(object):
                     # The whole arena is empty.  Free it.
                     llarena.arena_reset(arena.base, self.arena_size, 4)
                     llarena.arena_free(arena.base)
-                    self.total_memory_alloced -= self.arena_size
+                    released = r_uint(arena.nreleasedpages * self.page_size)
+                    self.total_memory_released -= released
+                    self.total_memory_alloced -= self.arena_size - released
                     lltype.free(arena, flavor='raw', track_allocation=False)
                     self.arenas_count -= 1
                     #
@@ -425,6 +461,75 @@ class ArenaCollection(object):
         self.min_empty_nfreepages = 1
 
 
+    def _maybe_release_free_pages(self):
+        if (self.release_delay <= 0 or
+                self.max_pages_per_arena > MAX_PAGES_FOR_RELEASE):
+            return
+        self.mass_frees_before_release -= 1
+        if self.mass_frees_before_release <= 0:
+            self.mass_frees_before_release = self.release_delay
+            self.release_free_pages(self.release_keep)
+
+
+    def release_free_pages(self, keep):
+        """Give the memory of the free pages back to the OS, apart from
+        'keep' bytes of them.  The pages that we keep are the ones of
+        the arenas with the fewest free pages, because they are the
+        ones that allocate_new_page() uses first.  Pages of
+        'current_arena' are never released.
+        """
+        i = 1
+        while i < self.max_pages_per_arena:
+            arena = self.arenas_lists[i]
+            while arena != ARENA_NULL:
+                keep = self._release_arena_pages(arena, keep)
+                arena = arena.nextarena
+            i += 1
+
+
+    def _release_arena_pages(self, arena, keep):
+        # Walk the chained list of free pages of 'arena', keep the first
+        # ones as long as 'keep' allows, and release the others.
+        firstpage = start_of_page(arena.base + self.page_size - 1,
+                                  self.page_size)
+        prev = NULL
+        page = arena.freepages
+        while page != NULL:
+            nextpage = page.address[0]
+            if keep >= self.page_size:
+                keep -= self.page_size
+                prev = page
+            else:
+                if prev == NULL:
+                    arena.freepages = nextpage
+                else:
+                    prev.address[0] = nextpage
+                index = (page - firstpage) // self.page_size
+                llarena.arena_reset(page, self.page_size, 4)
+                arena.releasedpages |= r_ulonglong(1) << index
+                arena.nreleasedpages += 1
+                self.total_memory_released += self.page_size
+                self.total_memory_alloced -= self.page_size
+            page = nextpage
+        return keep
+
+
+    def _take_released_page(self, arena):
+        # Return one of the pages of 'arena' that were released, and
+        # remove it from the 'releasedpages' bitmask.
+        bits = arena.releasedpages
+        index = 0
+        while not (bits & (r_ulonglong(1) << index)):
+            index += 1
+        arena.releasedpages = bits & ~(r_ulonglong(1) << index)
+        arena.nreleasedpages -= 1
+        self.total_memory_released -= self.page_size
+        self.total_memory_alloced += self.page_size
+        firstpage = start_of_page(arena.base + self.page_size - 1,
+                                  self.page_size)
+        return firstpage + index * self.page_size
+
+
     def mass_free_in_pages(self, size_class, ok_to_free_func, max_pages):
         nblocks = self.nblocks_for_size[size_class]
         block_size = size_class * WORD
@@ -0,0 +1,342 @@
+"""
+Helper threads for incminimark, enabled with PYPY_GC_MARK_THREADS=N.
+
+During a major collection step, the marking is done by N threads: the
+main thread plus N-1 helper threads, which are plain OS threads started
+the first time they are needed.  The helper threads never hold the GIL
+and never run anything else than GC code that reads the heap and sets
+GCFLAG_VISITED; in particular they must not allocate GC objects, raise
+or print anything.
+
+Each thread keeps its gray objects in a private chunk.  Full chunks are
+moved to a pool shared by all threads, from which idle threads steal
+work; a thread that sees other threads idle also gives away half of its
+chunk.  The marking phase ends when all threads are idle and the pool is
+empty, or when the threads have used their share of the step's budget.
+
+Untranslated, no thread is started: the tasks of the helper threads are
+run one after the other by the main thread, which is enough to test the
+logic of the chunks and of the pool.
+"""
+import os, sys
+from rpython.rtyper.lltypesystem import lltype, llmemory, rffi
+from rpython.rtyper.lltypesystem.lloperation import llop
+from rpython.rtyper.annlowlevel import llhelper
+from rpython.rlib import rthread
+from rpython.rlib.objectmodel import we_are_translated
+from rpython.rlib.debug import ll_assert
+from rpython.translator.tool.cbuild import ExternalCompilationInfo
+
+
+MARK_CHUNK_SIZE = 254      # so that a chunk is 2KB on 64-bit
+SHARE_MIN = 16             # don't split chunks with fewer items than that
+MAX_MARK_THREADS = 32
+
+TASK_MARK = 1              # mark objects (see IncrementalMiniMarkGC)
+TASK_SWEEP_RAW = 2         # free the unvisited raw-malloced objects
+
+CHUNK = lltype.ForwardReference()
+CHUNK.become(lltype.Struct('GcMarkChunk',
+                           ('next', lltype.Ptr(CHUNK)),
+                           ('count', lltype.Signed),
+                           ('items', lltype.FixedSizeArray(
+                               llmemory.Address, MARK_CHUNK_SIZE))))
+CHUNKPTR = lltype.Ptr(CHUNK)
+NULL_CHUNK = lltype.nullptr(CHUNK)
+
+WORKER = lltype.Struct('GcMarkWorker',
+                       ('index', lltype.Signed),
+                       ('chunk', CHUNKPTR),    # the private gray objects
+                       ('budget', lltype.Signed),
+                       ('task', lltype.Signed),
+                       ('arg', lltype.Signed),
+                       ('result', lltype.Signed),
+                       ('start_lock', rthread.TLOCKP),
+                       ('done_lock', rthread.TLOCKP))
+WORKERPTR = lltype.Ptr(WORKER)
+WORKERARRAY = lltype.Array(WORKERPTR, hints={'nolength': True})
+NULL_LOCK = lltype.nullptr(rthread.TLOCKP.TO)
+
+# RPyThreadStart() without the wrapper that would acquire the GIL
+# around the callback: the helper threads run without the GIL.
+c_thread_start_nowrapper = rthread.llexternal('RPyThreadStart',
+                                              [rthread.CALLBACK], rffi.LONG,
+                                              _nowrapper=True)
+
+if sys.platform == 'win32':
+    def _yield_cpu():
+        pass
+else:
+    _c_sched_yield = rffi.llexternal('sched_yield', [], rffi.INT,
+                                     compilation_info=ExternalCompilationInfo(
+                                         includes=['sched.h']),
+                                     sandboxsafe=True, _nowrapper=True)
+    def _yield_cpu():
+        _c_sched_yield()
+
+
+def _allocate_lock():
+    # like rthread.allocate_ll_lock(), but returns NULL instead of raising
+    ll_lock = lltype.malloc(rthread.TLOCKP.TO, flavor='raw',
+                            track_allocation=False)
+    res = rthread.c_thread_lock_init(ll_lock)
+    if rffi.cast(lltype.Signed, res) <= 0:
+        lltype.free(ll_lock, flavor='raw', track_allocation=False)
+        return NULL_LOCK
+    return ll_lock
+
+
+class ParallelMarker(object):
+    _alloc_flavor_ = "raw"
+
+    def __init__(self, run_task):
+        "NOT_RPYTHON"
+        # 'run_task(worker)' runs 'worker.task'; it is called in the
+        # helper threads, or directly when untranslated.
+        self.run_task = run_task
+        self.nthreads = 1        # total number of marking threads
+        self.nworkers = 0        # number of allocated workers
+        self.workers = lltype.nullptr(WORKERARRAY)
+        self.pool_lock = NULL_LOCK
+        self.pool = NULL_CHUNK
+        self.free_chunks = NULL_CHUNK
+        self.nidle = 0
+        self.nactive = 0
+        self.next_index = 1
+        self.pid = 0
+        self.started = False
+        #
+        marker = self
+        def thread_main():
+            worker = marker._register_thread()
+            while True:
+                rthread.acquire_NOAUTO(worker.start_lock, True)
+                marker.run_task(worker)
+                rthread.release_NOAUTO(worker.done_lock)
+        self._thread_main = thread_main
+
+    def setup(self, nthreads):
+        if nthreads > MAX_MARK_THREADS:
+            nthreads = MAX_MARK_THREADS
+        if nthreads < 1:
+            nthreads = 1
+        self.nthreads = nthreads
+
+    def enabled(self):
+        return self.nthreads > 1
+
+    # ---------- chunks ----------
+
+    def _get_chunk(self):
+        # must be called with the pool lock, or with no helper running
+        chunk = self.free_chunks
+        if chunk:
+            self.free_chunks = chunk.next
+        else:
+            addr = llmemory.raw_malloc(llmemory.sizeof(CHUNK))
+            if not addr:
+                llop.debug_fatalerror(lltype.Void,
+                                      "out of memory in the gc mark threads")
+            chunk = llmemory.cast_adr_to_ptr(addr, CHUNKPTR)
+        chunk.next = NULL_CHUNK
+        chunk.count = 0
+        return chunk
+
+    def _put_chunk(self, chunk):
+        chunk.next = self.free_chunks
+        self.free_chunks = chunk
+
+    def _lock(self):
+        if we_are_translated():
+            rthread.acquire_NOAUTO(self.pool_lock, True)
+
+    def _unlock(self):
+        if we_are_translated():
+            rthread.release_NOAUTO(self.pool_lock)
+
+    def publish(self, worker):
+        """Move the private chunk of 'worker' to the pool and give it a
+        new empty one.  Called when the chunk is full."""
+        self._lock()
+        chunk = worker.chunk
+        chunk.next = self.pool
+        self.pool = chunk
+        worker.chunk = self._get_chunk()
+        self._unlock()
+
+    def share(self, worker):
+        """If some threads are idle, give them the top half of the
+        private chunk of 'worker'."""
+        chunk = worker.chunk
+        if self.nidle == 0 or chunk.count < SHARE_MIN or self.pool:
+            return      # (reading these fields without the lock is fine)
+        self._lock()
+        new = self._get_chunk()
+        half = chunk.count >> 1
+        i = half
+        while i < chunk.count:
+            new.items[i - half] = chunk.items[i]
+            i += 1
+        new.count = chunk.count - half
+        chunk.count = half
+        new.next = self.pool
+        self.pool = new
+        self._unlock()
+
+    def steal(self, worker):
+        """Called when the private chunk of 'worker' is empty.  Wait until
+        a chunk can be taken from the pool and return True, or return False
+        when the marking phase is finished."""
+        self._lock()
+        idle = False
+        while True:
+            chunk = self.pool
+            if chunk:
+                self.pool = chunk.next
+                chunk.next = NULL_CHUNK
+                self._put_chunk(worker.chunk)
+                worker.chunk = chunk
+                if idle:
+                    self.nidle -= 1
+                self._unlock()
+                return True
+            if not idle:
+                self.nidle += 1
+                idle = True
+            if self.nidle == self.nactive:
+                self._unlock()
+                return False
+            # wait until another thread publishes some work or goes idle
+            self._unlock()
+            _yield_cpu()
+            self._lock()
+
+    def stop(self, worker):
+        """Called when 'worker' has used its budget: give away all its
+        gray objects and count it as idle until the end of the phase."""
+        self._lock()
+        if worker.chunk.count > 0:
+            chunk = worker.chunk
+            chunk.next = self.pool
+            self.pool = chunk
+            worker.chunk = self._get_chunk()
+        self.nidle += 1
+        self._unlock()
+
+    def add_initial(self, obj):
+        # no helper is running here
+        chunk = self.pool
+        if not chunk or chunk.count == MARK_CHUNK_SIZE:
+            chunk = self._get_chunk()
+            chunk.next = self.pool
+            self.pool = chunk
+        chunk.items[chunk.count] = obj
+        chunk.count += 1
+
+    def pop_leftover(self, stack):
+        """Move the objects left in the pool at the end of a phase
+        to 'stack'.  Returns the number of objects moved."""
+        moved = 0
+        while self.pool:
+            chunk = self.pool
+            self.pool = chunk.next
+            while chunk.count > 0:
+                chunk.count -= 1
+                stack.append(chunk.items[chunk.count])
+                moved += 1
+            self._put_chunk(chunk)
+        return moved
+
+    # ---------- threads ----------
+
+    def get_worker(self, i):
+        return self.workers[i]
+
+    def prepare(self):
+        """Make sure the helper threads are running.  Returns the number
+        of threads that can be used, which is 1 if starting them failed."""
+        if not we_are_translated():
+            if not self.started:
+                self._allocate_workers()
+                self.started = True
+            return self.nthreads
+        pid = os.getpid()
+        if self.started and self.pid == pid:
+            return self.nworkers
+        # first call, or we are in a child process after a fork(): the
+        # helper threads don't exist here.  Forget about the old workers
+        # and locks, as they may be in any state.
+        self.pid = pid
+        self.started = True
+        self.next_index = 1
+        self.pool = NULL_CHUNK
+        self.pool_lock = _allocate_lock()
+        if not self.pool_lock:
+            self.nworkers = 1
+            return 1
+        self._allocate_workers()
+        i = 1
+        while i < self.nworkers:
+            worker = self.workers[i]
+            worker.start_lock = _allocate_lock()
+            worker.done_lock = _allocate_lock()
+            if not worker.start_lock or not worker.done_lock:
+                break
+            rthread.acquire_NOAUTO(worker.start_lock, True)
+            rthread.acquire_NOAUTO(worker.done_lock, True)
+            callback = llhelper(rthread.CALLBACK, self._thread_main)
+            ident = c_thread_start_nowrapper(callback)
+            if rffi.cast(lltype.Signed, ident) == -1:
+                break
+            i += 1
+        self.nworkers = i
+        return i
+
+    def _allocate_workers(self):
+        n = self.nthreads
+        self.workers = lltype.malloc(WORKERARRAY, n, flavor='raw',
+                                     track_allocation=False)
+        i = 0
+        while i < n:
+            worker = lltype.malloc(WORKER, flavor='raw', zero=True,
+                                   track_allocation=False)
+            worker.index = i
+            worker.chunk = self._get_chunk()
+            self.workers[i] = worker
+            i += 1
+        self.nworkers = n
+
+    def _register_thread(self):
+        # runs in a new helper thread
+        self._lock()
+        worker = self.workers[self.next_index]
+        self.next_index += 1
+        self._unlock()
+        return worker
+
+    def begin_phase(self, nthreads):
+        self.nidle = 0
+        if we_are_translated():
+            self.nactive = nthreads
+        else:
+            self.nactive = 1     # the workers run one after the other
+
+    def start_task(self, i, task, arg):
+        """Make the helper thread number 'i' (>= 1) run 'task'."""
+        ll_assert(i >= 1, "start_task(0)")
+        worker = self.workers[i]
+        worker.task = task
+        worker.arg = arg
+        if we_are_translated():
+            rthread.release_NOAUTO(worker.start_lock)
+
+    def wait_task(self, i):
+        """Wait until the helper thread number 'i' has finished its task,
+        and return the worker."""
+        worker = self.workers[i]
+        if we_are_translated():
+            rthread.acquire_NOAUTO(worker.done_lock, True)
+        else:
+            self.nidle = 0
+            self.run_task(worker)
+        return worker
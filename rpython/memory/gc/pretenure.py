@@ -0,0 +1,100 @@
+"""
+Pretenuring for incminimark: the types of which most objects survive
+their first minor collection are allocated directly outside the nursery.
+
+Every 'sample_interval' minor collections, the GC walks the start of the
+nursery and counts how many bytes were allocated for each type; then it
+counts how many bytes of these objects are copied out of the nursery.
+When enough bytes of a type were sampled and at least 'ratio' of them
+survived, the type is pretenured.  A pretenured type goes back to the
+nursery after 'probation' major collections, which resets its counters:
+it is pretenured again only if its objects still survive.
+
+The types are identified by their member index, which is dense.  The
+table of counters grows as needed; it is raw memory, not GC objects.
+"""
+from rpython.rtyper.lltypesystem import lltype
+
+
+STAT = lltype.Struct('GcPretenureStat',
+                     ('allocated', lltype.Signed),  # sampled bytes
+                     ('survived', lltype.Signed),   # of which copied out
+                     ('probation', lltype.Signed))  # >0 if pretenured
+STATARRAY = lltype.Array(STAT, hints={'nolength': True})
+
+
+class PretenureTable(object):
+    _alloc_flavor_ = "raw"
+
+    def __init__(self):
+        "NOT_RPYTHON"
+        self.size = 0
+        self.stats = lltype.nullptr(STATARRAY)
+        self.ratio = 0.8          # survival ratio above which we pretenure
+        self.min_bytes = 262144   # sampled bytes needed before deciding
+        self.probation = 2        # number of major collections
+        self.num_pretenured = 0   # number of currently pretenured types
+        self.num_reverted = 0     # total number of types that went back
+        self.pretenured_bytes = 0 # total bytes allocated outside nursery
+
+    def _grow(self, index):
+        newsize = max(self.size * 2, 64)
+        while newsize <= index:
+            newsize *= 2
+        newstats = lltype.malloc(STATARRAY, newsize, flavor='raw', zero=True,
+                                 track_allocation=False)
+        i = 0
+        while i < self.size:
+            newstats[i].allocated = self.stats[i].allocated
+            newstats[i].survived = self.stats[i].survived
+            newstats[i].probation = self.stats[i].probation
+            i += 1
+        if self.stats:
+            lltype.free(self.stats, flavor='raw', track_allocation=False)
+        self.stats = newstats
+        self.size = newsize
+
+    def is_pretenured(self, index):
+        return index < self.size and self.stats[index].probation > 0
+    is_pretenured._always_inline_ = True
+
+    def record_allocated(self, index, size):
+        if index >= self.size:
+            self._grow(index)
+        self.stats[index].allocated += size
+
+    def record_survived(self, index, size):
+        # only called for objects passed to record_allocated() before
+        self.stats[index].survived += size
+
+    def update(self):
+        """Called after each sampling minor collection.  Pretenure the
+        types that survive enough, and decay the counters of the others
+        so that a change of behavior is eventually noticed."""
+        i = 0
+        while i < self.size:
+            stat = self.stats[i]
+            if stat.allocated >= self.min_bytes and stat.probation == 0:
+                if stat.survived >= stat.allocated * self.ratio:
+                    stat.probation = self.probation
+                    self.num_pretenured += 1
+                stat.allocated >>= 1
+                stat.survived >>= 1
+            i += 1
+
+    def end_of_major_collection(self):
+        """Put back in the nursery the types that reached the end of
+        their probation; they are sampled again from scratch."""
+        if self.num_pretenured == 0:
+            return
+        i = 0
+        while i < self.size:
+            stat = self.stats[i]
+            if stat.probation > 0:
+                stat.probation -= 1
+                if stat.probation == 0:
+                    stat.allocated = 0
+                    stat.survived = 0
+                    self.num_pretenured -= 1
+                    self.num_reverted += 1
+            i += 1
@@ -844,3 +844,150 @@ class TestIncrementalMiniMarkGCFull(DirectGCTest):
             (incminimark.STATE_SWEEPING, incminimark.STATE_FINALIZING),
             (incminimark.STATE_FINALIZING, incminimark.STATE_SCANNING)
             ]
+
+
+class TestIncrementalMiniMarkGCParallelMark(TestIncrementalMiniMarkGCFull):
+    # the same tests, but with PYPY_GC_MARK_THREADS=3.  Untranslated, the
+    # work of the helper threads is done by the main thread.
+
+    def setup_method(self, meth):
+        TestIncrementalMiniMarkGCFull.setup_method(self, meth)
+        self.gc.marker.setup(3)
+
+    def test_parallel_mark_small_steps(self):
+        from rpython.rlib import rgc
+        from rpython.memory.gc import parallelmark
+        # a linked list, and large arrays with many references to its
+        # nodes, so that the private chunks of the workers get full
+        self.stackroots.append(lltype.nullptr(S))
+        for i in range(50):
+            obj = self.malloc(S)
+            obj.x = i
+            self.write(obj, 'next', self.stackroots[0])
+            self.stackroots[0] = obj
+        length = parallelmark.MARK_CHUNK_SIZE + 50
+        for j in range(3):
+            self.stackroots.append(self.malloc(VAR, length))
+            node = self.stackroots[0]
+            for i in range(length):
+                self.writearray(self.stackroots[-1], i, node)
+                node = node.next or self.stackroots[0]
+        self.malloc(VAR, 500)     # garbage
+        #
+        self.gc.gc_increment_step = 100
+        n = 0
+        while True:
+            val = self.gc.collect_step()
+            n += 1
+            if rgc.is_done(val):
+                break
+            assert n < 1000
+        assert n > 4     # the marking was done in several steps
+        #
+        node = self.stackroots[0]
+        for i in range(49, -1, -1):
+            assert node.x == i
+            node = node.next
+        assert not node
+        for j in range(3):
+            a = self.stackroots[1 + j]
+            for i in range(length):
+                assert a[i].x == 49 - i % 50
+
+
+class TestIncrementalMiniMarkGCPretenure(TestIncrementalMiniMarkGCFull):
+    # the same tests, but sampling the nursery at every minor collection
+    # and pretenuring the types as soon as possible
+
+    def setup_method(self, meth):
+        TestIncrementalMiniMarkGCFull.setup_method(self, meth)
+        self.gc.pretenure_interval = 1
+        self.gc.pretenure.min_bytes = 1
+
+    def test_pretenure_surviving_type(self):
+        from rpython.rlib import rgc
+        self.stackroots.append(self.malloc(VAR, 100))
+        for i in range(100):
+            p = self.malloc(S)
+            p.x = i
+            self.writearray(self.stackroots[0], i, p)
+            if self.gc.pretenure_active:
+                break
+        assert self.gc.is_pretenured(self.get_type_id(S))
+        assert not self.gc.is_pretenured(self.get_type_id(VAR))
+        assert self.gc.get_stats(rgc.PRETENURED_TYPES) == 1
+        #
+        # the new objects are allocated directly outside the nursery, but
+        # they can be initialized with young objects without any write
+        # barrier, like young objects
+        self.stackroots.append(self.malloc(S))
+        assert not self.gc.is_in_nursery(
+            llmemory.cast_ptr_to_adr(self.stackroots[1]))
+        assert self.gc.get_stats(rgc.PRETENURED_MEMORY) > 0
+        young = self.malloc(VARNODE)
+        assert self.gc.is_in_nursery(llmemory.cast_ptr_to_adr(young))
+        young.a = self.malloc(VAR, 3)
+        self.stackroots[1].x = 42
+        self.stackroots[1].next = self.stackroots[0][0]
+        self.stackroots.append(young)
+        self.gc.collect()
+        assert self.stackroots[1].x == 42
+        assert self.stackroots[1].next.x == 0
+        assert len(self.stackroots[2].a) == 3
+
+    def test_pretenure_young_pointer_without_write_barrier(self):
+        # a pretenured object that points to a young object, set without
+        # write barrier, keeps it alive during the next minor collection
+        T = lltype.GcStruct('T', ('s', lltype.Ptr(S)))
+        for i in range(20):
+            self.stackroots.append(self.malloc(T))
+        assert self.gc.is_pretenured(self.get_type_id(T))
+        t = self.malloc(T)
+        assert not self.gc.is_in_nursery(llmemory.cast_ptr_to_adr(t))
+        self.stackroots.append(t)
+        s = self.malloc(S)
+        assert self.gc.is_in_nursery(llmemory.cast_ptr_to_adr(s))
+        s.x = 1234
+        self.stackroots[-1].s = s        # no write barrier
+        self.gc._minor_collection()
+        s = self.stackroots[-1].s
+        assert not self.gc.is_in_nursery(llmemory.cast_ptr_to_adr(s))
+        assert s.x == 1234
+
+    def test_pretenure_during_marking(self):
+        from rpython.memory.gc import incminimark
+        T = lltype.GcStruct('T', ('s', lltype.Ptr(S)))
+        for i in range(20):
+            self.stackroots.append(self.malloc(T))
+        assert self.gc.is_pretenured(self.get_type_id(T))
+        self.gc.gc_increment_step = 1
+        self.gc.collect_step()
+        while self.gc.gc_state != incminimark.STATE_MARKING:
+            self.gc.collect_step()
+        t = self.malloc(T)
+        assert not self.gc.is_in_nursery(llmemory.cast_ptr_to_adr(t))
+        self.stackroots.append(t)
+        s = self.malloc(S)
+        s.x = 5678
+        self.stackroots[-1].s = s        # no write barrier
+        self.gc.collect()
+        assert self.stackroots[-1].s.x == 5678
+
+    def test_pretenure_revert_after_major_collections(self):
+        from rpython.rlib import rgc
+        T = lltype.GcStruct('T', ('x', lltype.Signed))
+        for i in range(20):
+            self.stackroots.append(self.malloc(T))
+        typeid = self.get_type_id(T)
+        assert self.gc.is_pretenured(typeid)
+        del self.stackroots[:]
+        self.gc.collect()
+        self.gc.collect()
+        assert not self.gc.is_pretenured(typeid)
+        assert self.gc.get_stats(rgc.PRETENURE_REVERTS) == 1
+        #
+        # sampled again: the objects that die don't pretenure the type
+        for i in range(100):
+            self.malloc(T)
+        self.gc._minor_collection()
+        assert not self.gc.is_pretenured(typeid)
@@ -190,3 +190,42 @@ cache3          : level=3 type=Unified scope=Shared size=24576K line_size=256 as
     assert result == 24576 * 1024
     result = env.get_L2cache_linux2_cpuinfo_s390x(str(filepath), label='cache2')
     assert result == 1536 * 1024
+
+def test_get_cgroup_memory_limit():
+    root = udir.join('cgroup_memory')
+    v1 = root.join('memory').ensure(dir=True)
+    assert env.get_cgroup_memory_limit(str(root)) == -1.0
+    v1.join('memory.limit_in_bytes').write('9223372036854771712\n')
+    assert env.get_cgroup_memory_limit(str(root)) == -1.0    # no limit
+    v1.join('memory.limit_in_bytes').write('1073741824\n')
+    assert env.get_cgroup_memory_limit(str(root)) == 1073741824.0
+    root.join('memory.max').write('max\n')
+    assert env.get_cgroup_memory_limit(str(root)) == -1.0
+    root.join('memory.max').write('536870912\n')
+    assert env.get_cgroup_memory_limit(str(root)) == 536870912.0
+
+def test_get_cgroup_cpu_limit():
+    root = udir.join('cgroup_cpu')
+    v1 = root.join('cpu').ensure(dir=True)
+    assert env.get_cgroup_cpu_limit(str(root)) == -1.0
+    v1.join('cpu.cfs_quota_us').write('-1\n')
+    v1.join('cpu.cfs_period_us').write('100000\n')
+    assert env.get_cgroup_cpu_limit(str(root)) == -1.0
+    v1.join('cpu.cfs_quota_us').write('250000\n')
+    assert env.get_cgroup_cpu_limit(str(root)) == 2.5
+    root.join('cpu.max').write('max 100000\n')
+    assert env.get_cgroup_cpu_limit(str(root)) == -1.0
+    root.join('cpu.max').write('50000 100000\n')
+    assert env.get_cgroup_cpu_limit(str(root)) == 0.5
+
+def test_get_available_cpus(monkeypatch):
+    monkeypatch.setattr(env.rposix, 'cpu_count', lambda: 8)
+    monkeypatch.setattr(env, 'get_cpu_limit', lambda: -1.0)
+    assert env.get_available_cpus() == 8
+    monkeypatch.setattr(env, 'get_cpu_limit', lambda: 2.5)
+    assert env.get_available_cpus() == 3
+    monkeypatch.setattr(env, 'get_cpu_limit', lambda: 0.5)
+    assert env.get_available_cpus() == 1
+    monkeypatch.setattr(env.rposix, 'cpu_count', lambda: 0)
+    monkeypatch.setattr(env, 'get_cpu_limit', lambda: -1.0)
+    assert env.get_available_cpus() == 1
@@ -1,6 +1,8 @@
 from rpython.rtyper.lltypesystem import lltype, llmemory
 from rpython.memory.gc.hook import GcHooks
-from rpython.memory.gc.test.test_direct import BaseDirectGCTest, S
+from rpython.memory.gc.test.test_direct import BaseDirectGCTest, S, VAR
+
+T = lltype.GcStruct('T', ('x', lltype.Signed))    # can be pinned
 
 
 class MyGcHooks(GcHooks):
@@ -10,6 +12,7 @@ class MyGcHooks(GcHooks):
         self._gc_minor_enabled = False
         self._gc_collect_step_enabled = False
         self._gc_collect_enabled = False
+        self._alloc_sample_interval = 0
         self.reset()
 
     def is_gc_minor_enabled(self):
@@ -21,11 +24,16 @@ class MyGcHooks(GcHooks):
     def is_gc_collect_enabled(self):
         return self._gc_collect_enabled
 
+    def get_alloc_sample_interval(self):
+        return self._alloc_sample_interval
+
     def reset(self):
         self.minors = []
         self.steps = []
         self.collects = []
         self.durations = []
+        self.threads = []
+        self.alloc_samples = []
 
     def on_gc_minor(self, duration, total_memory_used, pinned_objects):
         self.durations.append(duration)
@@ -33,8 +41,10 @@ class MyGcHooks(GcHooks):
             'total_memory_used': total_memory_used,
             'pinned_objects': pinned_objects})
 
-    def on_gc_collect_step(self, duration, oldstate, newstate):
+    def on_gc_collect_step(self, duration, oldstate, newstate,
+                           duration_parallel, threads):
         self.durations.append(duration)
+        self.threads.append((threads, duration_parallel))
         self.steps.append({
             'oldstate': oldstate,
             'newstate': newstate})
@@ -51,6 +61,13 @@ class MyGcHooks(GcHooks):
             'rawmalloc_bytes_before': rawmalloc_bytes_before,
             'rawmalloc_bytes_after': rawmalloc_bytes_after})
 
+    def on_gc_alloc_sample(self, size):
+        self.alloc_samples.append([size, None])
+
+    def on_gc_alloc_sample_type(self, type_index):
+        assert self.alloc_samples[-1][1] is None
+        self.alloc_samples[-1][1] = type_index
+
 
 class TestIncMiniMarkHooks(BaseDirectGCTest):
     from rpython.memory.gc.incminimark import IncrementalMiniMarkGC as GCClass
@@ -117,6 +134,67 @@ class TestIncMiniMarkHooks(BaseDirectGCTest):
              'rawmalloc_bytes_before': 0}
             ]
 
+    def test_on_gc_collect_step_threads(self):
+        self.gc.hooks._gc_collect_step_enabled = True
+        self.stackroots.append(self.malloc(S))
+        self.gc.collect()
+        assert self.gc.hooks.threads == [(1, 0.0)] * 4
+        self.gc.hooks.reset()
+        #
+        self.gc.marker.setup(3)
+        self.gc.collect()
+        threads = [t for (t, d) in self.gc.hooks.threads]
+        assert threads == [1, 3, 1, 1]
+        assert self.gc.hooks.threads[1][1] > 0.0
+
+    def test_on_gc_alloc_sample(self):
+        self.gc.hooks._alloc_sample_interval = 10 * self.size_of_S
+        self.gc._minor_collection()    # the interval is read here
+        for i in range(100):
+            self.malloc(S)
+        self.gc._minor_collection()
+        samples = self.gc.hooks.alloc_samples
+        # one sample every 5 to 15 objects
+        assert 100 // 15 <= len(samples) <= 100 // 5
+        type_index = self.gc.get_member_index(self.get_type_id(S))
+        assert samples == [[self.size_of_S, type_index]] * len(samples)
+        #
+        # several types
+        self.gc.hooks.reset()
+        for i in range(40):
+            self.malloc(VAR, 5)
+            self.malloc(S)
+        self.gc._minor_collection()
+        samples = self.gc.hooks.alloc_samples
+        var_index = self.gc.get_member_index(self.get_type_id(VAR))
+        assert sorted(set([index for (size, index) in samples])) == (
+            sorted([type_index, var_index]))
+        #
+        self.gc.hooks._alloc_sample_interval = 0
+        self.gc._minor_collection()
+        self.gc.hooks.reset()
+        for i in range(100):
+            self.malloc(S)
+        assert self.gc.hooks.alloc_samples == []
+        assert not self.gc.alloc_sample_top
+
+    def test_on_gc_alloc_sample_pinned(self):
+        self.gc.max_number_of_pinned_objects = 10
+        self.gc.hooks._alloc_sample_interval = 3 * self.size_of_S
+        self.gc._minor_collection()
+        for i in range(3):
+            p = self.malloc(T)
+            p.x = i
+            self.stackroots.append(p)
+            assert self.gc.pin(llmemory.cast_ptr_to_adr(p))
+            self.malloc(S)
+        self.gc._minor_collection()
+        for i in range(100):
+            self.malloc(S)
+        self.gc._minor_collection()
+        assert len(self.gc.hooks.alloc_samples) >= 100 // 5
+        assert [p.x for p in self.stackroots] == [0, 1, 2]
+
     def test_hook_disabled(self):
         self.gc._minor_collection()
         self.gc.collect()
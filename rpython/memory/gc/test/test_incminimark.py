@@ -68,3 +68,30 @@ def test_set_major_threshold():
     b = gc.set_major_threshold_from(42.7)
     assert b is False
     assert gc.next_major_collection_threshold == 100.0
+
+def test_major_collection_factor():
+    gc = IncrementalMiniMarkGC(None, major_collection_threshold=2.0)
+    # no max heap size: always the same factor
+    assert gc.major_collection_factor(1e12) == 2.0
+    gc.max_heap_size = 1000.0
+    assert gc.major_collection_factor(100.0) == 2.0
+    assert gc.major_collection_factor(500.0) == 2.0
+    # more than half of the max heap size used: collect earlier
+    assert gc.major_collection_factor(750.0) == 1.5
+    assert gc.major_collection_factor(900.0) == 1.2
+    assert gc.major_collection_factor(1000.0) == 1.0
+    assert gc.major_collection_factor(1200.0) == 1.0
+
+def test_sweep_step_size():
+    gc = IncrementalMiniMarkGC(None, nursery_size=1000)
+    # no max heap size: always '3 * nursery_size'
+    assert gc.sweep_step_size(1e12) == 3000
+    gc.max_heap_size = 1000.0
+    assert gc.sweep_step_size(100.0) == 3000
+    assert gc.sweep_step_size(500.0) == 3000
+    # more than half of the max heap size used: smaller steps
+    assert gc.sweep_step_size(600.0) == 2400
+    assert gc.sweep_step_size(750.0) == 1500
+    # but never less than 'nursery_size'
+    assert gc.sweep_step_size(900.0) == 1000
+    assert gc.sweep_step_size(1200.0) == 1000
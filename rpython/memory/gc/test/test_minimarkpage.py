@@ -477,3 +477,53 @@ def test_random(incremental=False):
 
 def test_random_incremental():
     test_random(incremental=True)
+
+def test_release_free_pages():
+    pagesize = hdrsize + 16
+    ac = arena_collection_for_test(pagesize, "#..#..", fill_with_objects=2)
+    arena = ac.current_arena
+    assert arena.nfreepages == 4
+    ac.current_arena = lltype.nullptr(arena._T)
+    arena.nextarena = lltype.nullptr(arena._T)
+    ac.arenas_lists[4] = arena
+    #
+    ac.release_free_pages(keep=pagesize)
+    # the first free page of the chained list is kept, the others released
+    assert arena.nfreepages == 4
+    assert arena.nreleasedpages == 3
+    assert arena.freepages == pagenum(ac, 1)
+    assert arena.freepages.address[0] == NULL
+    assert ac.total_memory_released == 3 * pagesize
+    #
+    # the kept page is reused first, then the released ones
+    ac.arenas_lists[4] = arena.nextarena
+    ac.current_arena = arena
+    for i in [1, 2, 4, 5]:
+        ac.allocate_new_page(2)
+        checkpage(ac, ac.page_for_size[2], i)
+        ac.page_for_size[2] = PAGE_NULL
+    assert arena.nfreepages == arena.nreleasedpages == 0
+    assert ac.total_memory_released == 0
+    assert not ac.current_arena
+    assert ac.arenas_lists[0] == arena
+
+def test_random_release():
+    # the same as test_random_incremental(), but releasing all free pages
+    # at the end of every major collection
+    original_init = ArenaCollection.__init__.im_func
+    original_take = ArenaCollection._take_released_page.im_func
+    taken = []
+    def init_and_release(self, *args):
+        original_init(self, *args)
+        self.release_delay = 1
+    def take_released_page(self, arena):
+        taken.append(arena)
+        return original_take(self, arena)
+    ArenaCollection.__init__ = init_and_release
+    ArenaCollection._take_released_page = take_released_page
+    try:
+        test_random(incremental=True)
+    finally:
+        ArenaCollection.__init__ = original_init
+        ArenaCollection._take_released_page = original_take
+    assert taken
@@ -1396,6 +1396,10 @@ class GcHooksStats(object):
     minors = 0
     steps = 0
     collects = 0
+    alloc_sample_interval = 0
+    alloc_samples = 0
+    alloc_sample_bytes = 0
+    alloc_sample_types = 0
 
     def reset(self):
         # the NonConstant are needed so that the annotator annotates the
@@ -1405,6 +1409,10 @@ class GcHooksStats(object):
         self.minors = NonConstant(0)
         self.steps = NonConstant(0)
         self.collects = NonConstant(0)
+        self.alloc_sample_interval = NonConstant(0)
+        self.alloc_samples = NonConstant(0)
+        self.alloc_sample_bytes = NonConstant(0)
+        self.alloc_sample_types = NonConstant(0)
 
 
 class MyGcHooks(GcHooks):
@@ -1421,10 +1429,14 @@ class MyGcHooks(GcHooks):
     def is_gc_collect_enabled(self):
         return True
 
+    def get_alloc_sample_interval(self):
+        return self.stats.alloc_sample_interval
+
     def on_gc_minor(self, duration, total_memory_used, pinned_objects):
         self.stats.minors += 1
 
-    def on_gc_collect_step(self, duration, oldstate, newstate):
+    def on_gc_collect_step(self, duration, oldstate, newstate,
+                           duration_parallel, threads):
         self.stats.steps += 1
         
     def on_gc_collect(self, num_major_collects,
@@ -1433,6 +1445,14 @@ class MyGcHooks(GcHooks):
                       rawmalloc_bytes_after):
         self.stats.collects += 1
 
+    def on_gc_alloc_sample(self, size):
+        self.stats.alloc_samples += 1
+        self.stats.alloc_sample_bytes += size
+
+    def on_gc_alloc_sample_type(self, type_index):
+        if type_index > 0:
+            self.stats.alloc_sample_types += 1
+
 
 class TestIncrementalMiniMarkGC(TestMiniMarkGC):
     gcname = "incminimark"
@@ -1514,6 +1534,35 @@ class TestIncrementalMiniMarkGC(TestMiniMarkGC):
         assert steps == 4 * collects   # 4 steps for each major collection
         assert minors == steps         # one minor collection for each step
 
+    def define_gc_alloc_sample(cls):
+        gchooks = cls.gchooks
+        stats = gchooks.stats
+        S = lltype.GcStruct('S', ('x', lltype.Signed))
+        def f():
+            stats.reset()
+            stats.alloc_sample_interval = 10 * WORD
+            llop.gc__collect(lltype.Void, 0)   # starts sampling
+            for i in range(500):
+                lltype.malloc(S)
+            stats.alloc_sample_interval = 0
+            llop.gc__collect(lltype.Void, 0)   # stops sampling
+            for i in range(500):
+                lltype.malloc(S)
+            return (1000000 * stats.alloc_samples +
+                       1000 * stats.alloc_sample_types +
+                              stats.alloc_sample_bytes // stats.alloc_samples)
+        return f
+
+    def test_gc_alloc_sample(self):
+        run = self.runner("gc_alloc_sample")
+        res = run([])
+        samples, res = divmod(res, 1000000)
+        types, size = divmod(res, 1000)
+        # 500 objects of 2 words, one sample every 10 words on average
+        assert 500 * 2 // 15 <= samples <= 500 * 2 // 5
+        assert types == samples
+        assert size == 2 * WORD
+
 # ________________________________________________________________
 # tagged pointers
 
@@ -565,6 +565,11 @@ PARAMETER_DOCS = {
     'vec_cost': 'threshold for which traces to bail. Unpacking increases the counter,'\
                 ' vector operation decrease the cost',
     'vec_all': 'try to vectorize trace loops that occur outside of the numpypy library',
+    'compile_queue_size': 'maximum number of loops waiting to be compiled by '
+                          'a compiler worker, if one is running',
+    'code_limit': 'maximum size in KB of the machine code kept alive; beyond '
+                  'it, the least recently entered loops are freed (0 = no '
+                  'limit)',
 }
 
 PARAMETERS = {'threshold': 1039, # just above 1024, prime
@@ -583,6 +588,8 @@ PARAMETERS = {'threshold': 1039, # just above 1024, prime
               'vec': 0,
               'vec_all': 0,
               'vec_cost': 0,
+              'compile_queue_size': 8,
+              'code_limit': 0,
               }
 unroll_parameters = unrolling_iterable(PARAMETERS.items())
 
@@ -1120,6 +1127,13 @@ class JitHookInterface(object):
         disabled function
         """
 
+    def on_compile_queued(self, jitdriver, greenkey, greenkey_repr):
+        """ A hook called each time a loop is put in the compile queue,
+        to be compiled later by a compiler worker (see
+        jit_hooks.compile_worker_run_one()).  Unlike the other hooks, it
+        is called even if are_hooks_enabled() returns False.
+        """
+
     #def before_optimize(self, debug_info):
     #    """ A hook called before optimizer is run, called with instance of
     #    JitDebugInfo. Overwrite for custom behavior
@@ -1329,6 +1343,8 @@ class Counters(object):
     ABORT_BAD_LOOP
     ABORT_ESCAPE
     ABORT_FORCE_QUASIIMMUT
+    COMPILE_QUEUED
+    COMPILE_QUEUE_FULL
     NVIRTUALS
     NVHOLES
     NVREUSED
@@ -1336,6 +1352,8 @@ class Counters(object):
     TOTAL_COMPILED_BRIDGES
     TOTAL_FREED_LOOPS
     TOTAL_FREED_BRIDGES
+    TOTAL_EVICTED_LOOPS
+    TOTAL_EVICTED_BRIDGES
     """
 
     counter_names = []
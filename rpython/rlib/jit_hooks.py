@@ -3,7 +3,7 @@ from rpython.rtyper.llannotation import SomePtr, lltype_to_annotation
 from rpython.rtyper.annlowlevel import (
     cast_instance_to_gcref, cast_gcref_to_instance, llstr)
 from rpython.rtyper.extregistry import ExtRegistryEntry
-from rpython.rtyper.lltypesystem import llmemory, lltype
+from rpython.rtyper.lltypesystem import llmemory, lltype, rstr
 from rpython.flowspace.model import Constant
 
 
@@ -97,6 +97,12 @@ def box_isint(llbox):
     from rpython.jit.metainterp.history import INT
     return _cast_to_box(llbox).type == INT
 
+@register_helper(SomePtr(llmemory.GCREF))
+def box_getref(llbox):
+    return _cast_to_box(llbox).getref_base()
+
+BOX_ARRAY = lltype.GcArray(llmemory.GCREF)
+
 # ------------------------- stats interface ---------------------------
 
 @register_helper(annmodel.SomeBool())
@@ -120,6 +126,26 @@ LOOP_RUN_CONTAINER = lltype.GcArray(lltype.Struct('elem',
 def stats_get_loop_run_times(warmrunnerdesc):
     return warmrunnerdesc.metainterp_sd.cpu.get_all_loop_runs()
 
+# see MemoryManager.get_all_loop_stats().  'greenkey' is an array of
+# boxes, see box_getint() and box_getref(); it is NULL for the loops that
+# don't start at a jit_merge_point.  'trace_time' and 'backend_time' are
+# in seconds, 'code_size' in bytes; they include the bridges.
+LOOP_STATS_CONTAINER = lltype.GcArray(lltype.Struct('loopstats',
+                                      ('number', lltype.Signed),
+                                      ('jitdriver_name', lltype.Ptr(rstr.STR)),
+                                      ('greenkey', lltype.Ptr(BOX_ARRAY)),
+                                      ('entry_count', lltype.Signed),
+                                      ('guard_failures', lltype.Signed),
+                                      ('bridges_count', lltype.Signed),
+                                      ('trace_time', lltype.Float),
+                                      ('backend_time', lltype.Float),
+                                      ('code_size', lltype.Signed),
+                                      ('invalidated', lltype.Bool)))
+
+@register_helper(lltype.Ptr(LOOP_STATS_CONTAINER))
+def stats_get_loop_stats(warmrunnerdesc):
+    return warmrunnerdesc.memory_manager.get_all_loop_stats()
+
 @register_helper(annmodel.SomeInteger(unsigned=True))
 def stats_asmmemmgr_allocated(warmrunnerdesc):
     return warmrunnerdesc.metainterp_sd.cpu.asmmemmgr.get_stats()[0]
@@ -128,6 +154,27 @@ def stats_asmmemmgr_allocated(warmrunnerdesc):
 def stats_asmmemmgr_used(warmrunnerdesc):
     return warmrunnerdesc.metainterp_sd.cpu.asmmemmgr.get_stats()[1]
 
+# ------------------- compiler worker interface -------------------
+# see rpython/jit/metainterp/compilequeue.py
+
+@register_helper(annmodel.s_None)
+def compile_worker_start(warmrunnerdesc):
+    """From now on, put the loops in the compile queue instead of
+    compiling them immediately."""
+    warmrunnerdesc.compile_queue.start_worker()
+
+@register_helper(annmodel.s_None)
+def compile_worker_stop(warmrunnerdesc):
+    """When the last worker stops, the loops still in the queue are
+    dropped."""
+    warmrunnerdesc.compile_queue.stop_worker()
+
+@register_helper(annmodel.SomeBool())
+def compile_worker_run_one(warmrunnerdesc):
+    """Compile one loop from the compile queue.  Returns False if the
+    queue was empty."""
+    return warmrunnerdesc.compile_queue.compile_one()
+
 # ---------------------- jitcell interface ----------------------
 
 def _new_hook(name, resulttype):
@@ -157,3 +204,5 @@ get_jitcell_at_key = _new_hook('get_jitcell_at_key', SomePtr(llmemory.GCREF))
 trace_next_iteration = _new_hook('trace_next_iteration', None)
 dont_trace_here = _new_hook('dont_trace_here', None)
 trace_next_iteration_hash = _new_hook('trace_next_iteration_hash', None)
+trace_when_reached = _new_hook('trace_when_reached', None)
+is_dont_trace_here = _new_hook('is_dont_trace_here', annmodel.SomeBool())
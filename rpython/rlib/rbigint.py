@@ -85,6 +85,20 @@ else:
 
 KARATSUBA_SQUARE_CUTOFF = 2 * KARATSUBA_CUTOFF
 
+# For long division, use the O(N**2) school algorithm unless both the
+# divisor and the quotient contain more than DIVMOD_FAST_CUTOFF digits.
+# In that case, use the recursive algorithm of Burnikel and Ziegler,
+# whose running time is that of Karatsuba multiplication times log(N).
+# This also makes converting a number to a decimal string subquadratic.
+
+DIVMOD_FAST_CUTOFF = 4 * KARATSUBA_CUTOFF
+
+# Strings of more than STR2INT_CUTOFF digit-sized chunks are converted
+# to a number by recursively splitting them in two halves, instead of
+# multiplying by the base one chunk at a time.
+
+STR2INT_CUTOFF = 2 * KARATSUBA_CUTOFF
+
 # For exponentiation, use the binary left-to-right algorithm
 # unless the exponent contains more than FIVEARY_CUTOFF digits.
 # In that case, do 5 bits at a time.  The potential drawback is that
@@ -2133,8 +2147,11 @@ def _divrem(a, b):
     if size_b == 1:
         z, urem = _divrem1(a, b.digit(0))
         rem = rbigint([_store_digit(urem)], int(urem != 0), 1)
-    else:
+    elif (size_b <= DIVMOD_FAST_CUTOFF or
+          size_a - size_b <= DIVMOD_FAST_CUTOFF):
         z, rem = _x_divrem(a, b)
+    else:
+        z, rem = _divmod_fast_pos(a, b)
     # Set the signs.
     # The quotient z has the sign of a*b;
     # the remainder r has the sign of a,
@@ -2145,6 +2162,109 @@ def _divrem(a, b):
         rem.sign = - rem.sign
     return z, rem
 
+# Helpers for the recursive division.  They work on numbers >= 0 and
+# split them at digit boundaries, i.e. 'k' is a number of digits.
+
+def _lower_digits(a, k):
+    """ Return a % 2**(SHIFT*k) """
+    size = a.numdigits()
+    if k >= size:
+        return a
+    if k <= 0:
+        return NULLRBIGINT
+    z = rbigint(a._digits[:k], 1, k)
+    z._normalize()
+    return z
+
+def _upper_digits(a, k):
+    """ Return a >> (SHIFT*k) """
+    size = a.numdigits()
+    if k >= size:
+        return NULLRBIGINT
+    if k <= 0:
+        return a
+    return rbigint(a._digits[k:size], a.sign, size - k)
+
+def _middle_digits(a, start, stop):
+    """ Return (a >> (SHIFT*start)) % 2**(SHIFT*(stop-start)) """
+    return _lower_digits(_upper_digits(a, start), stop - start)
+
+def _shift_digits_left(a, k):
+    """ Return a << (SHIFT*k) """
+    if a.sign == 0 or k == 0:
+        return a
+    size = a.numdigits()
+    return rbigint([NULLDIGIT] * k + a._digits[:size], a.sign, size + k)
+
+def _divrem_pos_basecase(a, b):
+    if a.lt(b):
+        return NULLRBIGINT, a
+    if b.numdigits() == 1:
+        z, urem = _divrem1(a, b.digit(0))
+        return z, rbigint([_store_digit(urem)], int(urem != 0), 1)
+    return _x_divrem(a, b)
+
+def _div2n1n(a, b, n):
+    """ Divide a by b, where b has n digits with the highest bit of the
+    top one set, and a < b * 2**(SHIFT*n).  Returns (q, r). """
+    if n <= DIVMOD_FAST_CUTOFF:
+        return _divrem_pos_basecase(a, b)
+    pad = n & 1
+    if pad:
+        a = _shift_digits_left(a, 1)
+        b = _shift_digits_left(b, 1)
+        n += 1
+    half_n = n >> 1
+    b1 = _upper_digits(b, half_n)
+    b2 = _lower_digits(b, half_n)
+    q1, r = _div3n2n(_upper_digits(a, n), _middle_digits(a, half_n, n),
+                     b, b1, b2, half_n)
+    q2, r = _div3n2n(r, _lower_digits(a, half_n), b, b1, b2, half_n)
+    if pad:
+        r = _upper_digits(r, 1)
+    return _shift_digits_left(q1, half_n).add(q2), r
+
+def _div3n2n(a12, a3, b, b1, b2, n):
+    """ Helper for _div2n1n(): divide the 3n-digits number (a12, a3) by
+    the 2n-digits number b = (b1, b2). """
+    if _upper_digits(a12, n).eq(b1):
+        q = rbigint([_store_digit(MASK)] * n, 1, n)
+        r = a12.sub(_shift_digits_left(b1, n)).add(b1)
+    else:
+        q, r = _div2n1n(a12, b1, n)
+    r = _shift_digits_left(r, n).add(a3).sub(q.mul(b2))
+    # this loop runs at most twice, because b1 is normalized
+    while r.sign < 0:
+        q = q.int_sub(1)
+        r = r.add(b)
+    return q, r
+
+def _divmod_fast_pos(a, b):
+    """ Divide |a| by |b| with the recursive algorithm of Burnikel and
+    Ziegler, returning the quotient and remainder, both >= 0. """
+    # normalize: shift b left so that the highest bit of its top digit
+    # is set, and shift a by the same amount
+    d = SHIFT - bits_in_digit(b.digit(abs(b.numdigits() - 1)))
+    a = a.abs().lshift(d)
+    b = b.abs().lshift(d)
+    n = b.numdigits()
+    # divide a, n digits at a time from the top, by b
+    size_a = a.numdigits()
+    nblocks = (size_a + n - 1) // n
+    qdigits = [NULLDIGIT] * (nblocks * n)
+    r = NULLRBIGINT
+    i = nblocks - 1
+    while i >= 0:
+        block = _middle_digits(a, i * n, (i + 1) * n)
+        q, r = _div2n1n(_shift_digits_left(r, n).add(block), b, n)
+        # q < 2**(SHIFT*n), so it fits in its block of digits
+        for j in range(q.numdigits()):
+            qdigits[i * n + j] = q._digits[j]
+        i -= 1
+    z = rbigint(qdigits, 1, nblocks * n)
+    z._normalize()
+    return z, r.rshift(d)
+
 def _x_int_lt(a, b, eq=False):
     """ Compare bigint a with int b for less than or less than or equal """
     osign = 1
@@ -2880,7 +3000,7 @@ def _decimalstr_to_bigint(s):
     elif s[p] == '+':
         p += 1
 
-    a = NULLRBIGINT
+    chunks = []
     tens = 1
     dig = 0
     ord0 = ord('0')
@@ -2888,10 +3008,12 @@ def _decimalstr_to_bigint(s):
         dig = dig * 10 + ord(s[p]) - ord0
         p += 1
         tens *= 10
-        if tens == DEC_MAX or p == lim:
-            a = _muladd1(a, tens, dig)
+        if tens == DEC_MAX and p < lim:
+            chunks.append(dig)
             tens = 1
             dig = 0
+    a = _chunks_to_bigint(chunks, DEC_MAX)
+    a = _muladd1(a, tens, dig)
     if sign and a.sign == 1:
         a.sign = -1
     return a
@@ -2901,23 +3023,52 @@ def parse_digit_string(parser):
     base = parser.base
     if (base & (base - 1)) == 0 and base >= 2:
         return parse_string_from_binary_base(parser)
-    a = NULLRBIGINT
+    chunks = []
     digitmax = BASE_MAX[base]
     tens, dig = 1, 0
     while True:
         digit = parser.next_digit()
-        if tens == digitmax or digit < 0:
-            a = _muladd1(a, tens, dig)
-            if digit < 0:
-                break
+        if digit < 0:
+            break
+        if tens == digitmax:
+            chunks.append(dig)
             dig = digit
             tens = base
         else:
             dig = dig * base + digit
             tens *= base
+    a = _chunks_to_bigint(chunks, digitmax)
+    a = _muladd1(a, tens, dig)
     a.sign *= parser.sign
     return a
 
+def _chunks_to_bigint(chunks, chunkbase):
+    """ Return the number whose digits in base 'chunkbase' are 'chunks',
+    most significant first.  'chunkbase' must fit in a digit. """
+    if len(chunks) <= STR2INT_CUTOFF:
+        a = NULLRBIGINT
+        for chunk in chunks:
+            a = _muladd1(a, chunkbase, chunk)
+        return a
+    powers = {}
+    return _chunks_to_bigint_rec(chunks, 0, len(chunks), chunkbase, powers)
+
+def _chunks_to_bigint_rec(chunks, start, stop, chunkbase, powers):
+    if stop - start <= STR2INT_CUTOFF:
+        a = NULLRBIGINT
+        for i in range(start, stop):
+            a = _muladd1(a, chunkbase, chunks[i])
+        return a
+    mid = (start + stop) // 2
+    hi = _chunks_to_bigint_rec(chunks, start, mid, chunkbase, powers)
+    lo = _chunks_to_bigint_rec(chunks, mid, stop, chunkbase, powers)
+    n = stop - mid
+    power = powers.get(n, None)
+    if power is None:
+        power = rbigint.fromint(chunkbase).pow(rbigint.fromint(n))
+        powers[n] = power
+    return hi.mul(power).add(lo)
+
 def parse_string_from_binary_base(parser):
     # The point to this routine is that it takes time linear in the number of
     # string characters.
@@ -580,6 +580,44 @@ if not _WIN32:
         with rffi.scoped_nonmovingbuffer(data) as buf:
             return handle_posix_error('pwrite', c_pwrite(fd, buf, count, offset))
 
+    class CConfig:
+        _compilation_info_ = eci.merge(
+            ExternalCompilationInfo(includes=['sys/uio.h']))
+        IOVEC = rffi_platform.Struct('struct iovec',
+                                     [('iov_base', rffi.VOIDP),
+                                      ('iov_len', rffi.SIZE_T)])
+    IOVEC = rffi_platform.configure(CConfig)['IOVEC']
+    IOVEC_ARRAY = rffi.CArray(IOVEC)
+
+    c_writev = external('writev',
+                        [rffi.INT, lltype.Ptr(IOVEC_ARRAY), rffi.INT],
+                        rffi.SSIZE_T,
+                        compilation_info=CConfig._compilation_info_,
+                        save_err=rffi.RFFI_SAVE_ERRNO)
+
+    @enforceargs(int, None)
+    def writev(fd, buffers):
+        """Writes the strings of the list 'buffers' with a single system
+        call.  Returns the number of bytes written, which may be less
+        than their total length."""
+        count = len(buffers)
+        nonmoving = []
+        iovs = lltype.malloc(IOVEC_ARRAY, count, flavor='raw')
+        try:
+            for i in range(count):
+                data = buffers[i]
+                buf, llobj, flag = rffi.get_nonmovingbuffer_ll(data)
+                nonmoving.append((buf, llobj, flag))
+                iov = iovs[i]
+                iov.c_iov_base = rffi.cast(rffi.VOIDP, buf)
+                rffi.setintfield(iov, 'c_iov_len', len(data))
+            res = c_writev(fd, iovs, count)
+        finally:
+            for buf, llobj, flag in nonmoving:
+                rffi.free_nonmovingbuffer_ll(buf, llobj, flag)
+            lltype.free(iovs, flavor='raw')
+        return handle_posix_error('writev', res)
+
     if HAVE_FALLOCATE:
         c_posix_fallocate = external('posix_fallocate',
                                      [rffi.INT, OFF_T, OFF_T], rffi.INT,
@@ -0,0 +1,1241 @@
+"""
+Parses a regular expression and turns it into SRE code, like
+sre_parse.py and sre_compile.py from the standard library, but in
+RPython.
+
+compile() gives exactly the same code as sre_compile.compile().  It does
+not reproduce its error messages: on an invalid pattern, it raises
+NotSupported, and so it does in the few cases where the standard library
+emits a warning or behaves oddly.  The caller should then use
+sre_compile.compile(), which raises the right error.
+"""
+import sys
+from rpython.rlib.rarithmetic import intmask, r_uint
+from rpython.rlib.rsre import rsre_char, rsre_constants as consts
+
+
+class NotSupported(Exception):
+    pass
+
+
+# the items of a parsed pattern, named like in sre_parse
+(LITERAL, NOT_LITERAL, ANY, IN, AT, CATEGORY, RANGE, NEGATE, CHARSET,
+ BIGCHARSET, BRANCH, SUBPATTERN, MAX_REPEAT, MIN_REPEAT, GROUPREF,
+ GROUPREF_EXISTS, ASSERT, ASSERT_NOT) = range(18)
+
+MAXREPEAT = rsre_char.MAXREPEAT
+GROUPS_LIMIT = 100     # "this version only supports 100 named groups"
+if rsre_char.CODESIZE == 2:
+    MAXCODE = 65535
+elif sys.maxint > 2**32:
+    MAXCODE = int(2**32 - 1)
+else:
+    MAXCODE = -1       # 0xFFFFFFFF, more than any int
+
+ESCAPED = 0x200000     # added to a character preceded by a backslash
+END = -1               # the end of the pattern
+
+ESCAPES = {
+    ord("a"): ord("\a"),
+    ord("b"): ord("\b"),
+    ord("f"): ord("\f"),
+    ord("n"): ord("\n"),
+    ord("r"): ord("\r"),
+    ord("t"): ord("\t"),
+    ord("v"): ord("\v"),
+    ord("\\"): ord("\\"),
+}
+
+AT_ESCAPES = {
+    ord("A"): consts.AT_BEGINNING_STRING,
+    ord("b"): consts.AT_BOUNDARY,
+    ord("B"): consts.AT_NON_BOUNDARY,
+    ord("Z"): consts.AT_END_STRING,
+}
+
+CATEGORY_ESCAPES = {
+    ord("d"): consts.CATEGORY_DIGIT,
+    ord("D"): consts.CATEGORY_NOT_DIGIT,
+    ord("s"): consts.CATEGORY_SPACE,
+    ord("S"): consts.CATEGORY_NOT_SPACE,
+    ord("w"): consts.CATEGORY_WORD,
+    ord("W"): consts.CATEGORY_NOT_WORD,
+}
+
+FLAGS = {
+    ord("i"): consts.SRE_FLAG_IGNORECASE,
+    ord("L"): consts.SRE_FLAG_LOCALE,
+    ord("m"): consts.SRE_FLAG_MULTILINE,
+    ord("s"): consts.SRE_FLAG_DOTALL,
+    ord("x"): consts.SRE_FLAG_VERBOSE,
+    ord("t"): consts.SRE_FLAG_TEMPLATE,
+    ord("u"): consts.SRE_FLAG_UNICODE,
+}
+
+AT_MULTILINE = {
+    consts.AT_BEGINNING: consts.AT_BEGINNING_LINE,
+    consts.AT_END: consts.AT_END_LINE,
+}
+
+AT_LOCALE = {
+    consts.AT_BOUNDARY: consts.AT_LOC_BOUNDARY,
+    consts.AT_NON_BOUNDARY: consts.AT_LOC_NON_BOUNDARY,
+}
+
+AT_UNICODE = {
+    consts.AT_BOUNDARY: consts.AT_UNI_BOUNDARY,
+    consts.AT_NON_BOUNDARY: consts.AT_UNI_NON_BOUNDARY,
+}
+
+CH_LOCALE = {
+    consts.CATEGORY_DIGIT: consts.CATEGORY_DIGIT,
+    consts.CATEGORY_NOT_DIGIT: consts.CATEGORY_NOT_DIGIT,
+    consts.CATEGORY_SPACE: consts.CATEGORY_SPACE,
+    consts.CATEGORY_NOT_SPACE: consts.CATEGORY_NOT_SPACE,
+    consts.CATEGORY_WORD: consts.CATEGORY_LOC_WORD,
+    consts.CATEGORY_NOT_WORD: consts.CATEGORY_LOC_NOT_WORD,
+    consts.CATEGORY_LINEBREAK: consts.CATEGORY_LINEBREAK,
+    consts.CATEGORY_NOT_LINEBREAK: consts.CATEGORY_NOT_LINEBREAK,
+}
+
+CH_UNICODE = {
+    consts.CATEGORY_DIGIT: consts.CATEGORY_UNI_DIGIT,
+    consts.CATEGORY_NOT_DIGIT: consts.CATEGORY_UNI_NOT_DIGIT,
+    consts.CATEGORY_SPACE: consts.CATEGORY_UNI_SPACE,
+    consts.CATEGORY_NOT_SPACE: consts.CATEGORY_UNI_NOT_SPACE,
+    consts.CATEGORY_WORD: consts.CATEGORY_UNI_WORD,
+    consts.CATEGORY_NOT_WORD: consts.CATEGORY_UNI_NOT_WORD,
+    consts.CATEGORY_LINEBREAK: consts.CATEGORY_UNI_LINEBREAK,
+    consts.CATEGORY_NOT_LINEBREAK: consts.CATEGORY_UNI_NOT_LINEBREAK,
+}
+
+# Sets of lowercase characters which have the same uppercase.
+_equivalences = [
+    [0x69, 0x131],          # LATIN SMALL LETTER I, DOTLESS I
+    [0x73, 0x17f],          # LATIN SMALL LETTER S, LONG S
+    [0xb5, 0x3bc],          # MICRO SIGN, GREEK SMALL LETTER MU
+    [0x345, 0x3b9, 0x1fbe], # COMBINING YPOGEGRAMMENI, IOTA, PROSGEGRAMMENI
+    [0x3b2, 0x3d0],         # BETA, BETA SYMBOL
+    [0x3b5, 0x3f5],         # EPSILON, LUNATE EPSILON SYMBOL
+    [0x3b8, 0x3d1],         # THETA, THETA SYMBOL
+    [0x3ba, 0x3f0],         # KAPPA, KAPPA SYMBOL
+    [0x3c0, 0x3d6],         # PI, PI SYMBOL
+    [0x3c1, 0x3f1],         # RHO, RHO SYMBOL
+    [0x3c2, 0x3c3],         # FINAL SIGMA, SIGMA
+    [0x3c6, 0x3d5],         # PHI, PHI SYMBOL
+    [0x1e61, 0x1e9b],       # S WITH DOT ABOVE, LONG S WITH DOT ABOVE
+]
+
+# Maps the lowercase code to lowercase codes which have the same uppercase.
+IGNORECASE_FIXES = {}
+for _t in _equivalences:
+    for _i in _t:
+        IGNORECASE_FIXES[_i] = [_j for _j in _t if _j != _i]
+del _t, _i
+
+
+def is_digit(c):
+    return ord("0") <= c <= ord("9")
+
+def is_octdigit(c):
+    return ord("0") <= c <= ord("7")
+
+def is_hexdigit(c):
+    return (is_digit(c) or ord("a") <= c <= ord("f") or
+            ord("A") <= c <= ord("F"))
+
+def hex_value(c):
+    if is_digit(c):
+        return c - ord("0")
+    elif c >= ord("a"):
+        return c - ord("a") + 10
+    else:
+        return c - ord("A") + 10
+
+def is_ident(c):
+    return (ord("a") <= c <= ord("z") or ord("A") <= c <= ord("Z") or
+            c == ord("_"))
+
+def is_special(c):
+    return (c == ord(".") or c == ord("\\") or c == ord("[") or
+            c == ord("{") or c == ord("(") or c == ord(")") or
+            c == ord("*") or c == ord("+") or c == ord("?") or
+            c == ord("^") or c == ord("$") or c == ord("|"))
+
+def name_of(chars):
+    """The group name made of 'chars', or None if it is not valid."""
+    if not is_ident(chars[0]):
+        return None
+    for c in chars:
+        if not (is_ident(c) or is_digit(c)):
+            return None
+    return ''.join([chr(c) for c in chars])
+
+def is_whitespace(c):
+    return (c == ord(" ") or c == ord("\t") or c == ord("\n") or
+            c == ord("\r") or c == ord("\v") or c == ord("\f"))
+
+# ____________________________________________________________
+
+class Item(object):
+    """An item of a parsed pattern, like the (op, av) tuples of sre_parse.
+    'av' and 'av2' are the integer arguments: the character, the codes
+    of AT and CATEGORY, the bounds of RANGE and of the repeats, the
+    group number, or the direction of the assertion."""
+
+    def __init__(self, op, av=0, av2=0):
+        self.op = op
+        self.av = av
+        self.av2 = av2
+        self.sub = None        # SubPattern of repeats, groups, assertions
+        self.sub2 = None       # the 'no' SubPattern of GROUPREF_EXISTS
+        self.branches = None   # list of SubPatterns of BRANCH
+        self.charset = None    # list of Items of IN
+        self.words = None      # the code of CHARSET and BIGCHARSET
+
+    def equals(self, other):
+        # like comparing the tuples of sre_parse, where the SubPatterns
+        # are only equal to themselves
+        if self is other:
+            return True
+        if self.op != other.op:
+            return False
+        op = self.op
+        if (op == LITERAL or op == NOT_LITERAL or op == AT or
+                op == GROUPREF or op == CATEGORY or op == NEGATE or
+                op == ANY):
+            return self.av == other.av
+        elif op == RANGE:
+            return self.av == other.av and self.av2 == other.av2
+        elif op == IN:
+            if len(self.charset) != len(other.charset):
+                return False
+            for i in range(len(self.charset)):
+                if not self.charset[i].equals(other.charset[i]):
+                    return False
+            return True
+        return False
+
+
+def new_item(op, av=0, av2=0, sub=None):
+    item = Item(op, av, av2)
+    item.sub = sub
+    return item
+
+
+class SubPattern(object):
+
+    def __init__(self, data=None):
+        if data is None:
+            data = []
+        self.data = data
+        self.lo = -1
+
+    def append(self, item):
+        self.data.append(item)
+
+    def getwidth(self):
+        """The (min, max) width of the subpattern, like in sre_parse."""
+        if self.lo >= 0:
+            return self.lo, self.hi
+        lo = hi = 0
+        for item in self.data:
+            op = item.op
+            if op == BRANCH:
+                i = MAXREPEAT - 1
+                j = 0
+                for branch in item.branches:
+                    l, h = branch.getwidth()
+                    i = min(i, l)
+                    j = max(j, h)
+                lo = _add(lo, i)
+                hi = _add(hi, j)
+            elif op == SUBPATTERN:
+                i, j = item.sub.getwidth()
+                lo = _add(lo, i)
+                hi = _add(hi, j)
+            elif op == MIN_REPEAT or op == MAX_REPEAT:
+                i, j = item.sub.getwidth()
+                lo = _add(lo, _mul(i, item.av))
+                hi = _add(hi, _mul(j, item.av2))
+            elif (op == ANY or op == RANGE or op == IN or op == LITERAL or
+                  op == NOT_LITERAL or op == CATEGORY):
+                lo = _add(lo, 1)
+                hi = _add(hi, 1)
+        self.lo = min(lo, MAXREPEAT - 1)
+        self.hi = min(hi, MAXREPEAT)
+        return self.lo, self.hi
+
+# the widths are capped at MAXREPEAT: saturate instead of overflowing
+def _add(a, b):
+    return min(a + b, MAXREPEAT)
+
+def _mul(a, b):
+    if a != 0 and b > MAXREPEAT // a:
+        return MAXREPEAT
+    return a * b
+
+# ____________________________________________________________
+# parsing
+
+class Tokenizer(object):
+
+    def __init__(self, chars):
+        self.chars = chars
+        self.index = 0
+        self.next = END
+        self._next()
+
+    def _next(self):
+        chars = self.chars
+        index = self.index
+        if index >= len(chars):
+            self.next = END
+            return
+        c = chars[index]
+        if c == ord("\\"):
+            if index + 1 >= len(chars):
+                raise NotSupported      # bogus escape (end of line)
+            c = ESCAPED + chars[index + 1]
+            index += 1
+        self.index = index + 1
+        self.next = c
+
+    def match(self, c):
+        if self.next == c:
+            self._next()
+            return True
+        return False
+
+    def get(self):
+        this = self.next
+        self._next()
+        return this
+
+
+class Parser(object):
+    """Like sre_parse.parse(), with sre_parse.Pattern as attributes."""
+
+    def __init__(self, chars, flags):
+        self.source = Tokenizer(chars)
+        self.flags = flags
+        self.open = []
+        self.groups = 1
+        self.groupdict = {}
+        self.lookbehind = 0
+
+    def opengroup(self, name):
+        gid = self.groups
+        self.groups = gid + 1
+        if name is not None:
+            if name in self.groupdict:
+                raise NotSupported      # redefinition of group name
+            self.groupdict[name] = gid
+        self.open.append(gid)
+        return gid
+
+    def closegroup(self, gid):
+        self.open.remove(gid)
+
+    def checkgroup(self, gid):
+        return gid < self.groups and gid not in self.open
+
+    def read_name(self, terminator):
+        """Read the characters of a group name up to 'terminator'."""
+        source = self.source
+        chars = []
+        while True:
+            c = source.get()
+            if c == END:
+                raise NotSupported      # unterminated name
+            if c == terminator:
+                break
+            chars.append(c)
+        if not chars:
+            raise NotSupported          # missing group name
+        return chars
+
+    def parse_sub(self, nested):
+        # parse an alternation: a|b|c
+        source = self.source
+        items = []
+        while True:
+            items.append(self.parse_one())
+            if source.match(ord("|")):
+                continue
+            if not nested:
+                break
+            if source.next == END or source.next == ord(")"):
+                break
+            raise NotSupported          # pattern not properly closed
+
+        if len(items) == 1:
+            return items[0]
+
+        subpattern = SubPattern()
+
+        # check if all items share a common prefix
+        while True:
+            prefix = None
+            for item in items:
+                if not item.data:
+                    break
+                if prefix is None:
+                    prefix = item.data[0]
+                elif not item.data[0].equals(prefix):
+                    break
+            else:
+                # all subitems start with a common "prefix".
+                # move it out of the branch
+                for item in items:
+                    del item.data[0]
+                assert prefix is not None
+                subpattern.append(prefix)
+                continue # check next one
+            break
+
+        # check if the branch can be replaced by a character set
+        for item in items:
+            if len(item.data) != 1 or item.data[0].op != LITERAL:
+                break
+        else:
+            charset = Item(IN)
+            charset.charset = [item.data[0] for item in items]
+            subpattern.append(charset)
+            return subpattern
+
+        branch = Item(BRANCH)
+        branch.branches = items
+        subpattern.append(branch)
+        return subpattern
+
+    def parse_sub_cond(self, condgroup):
+        source = self.source
+        item_yes = self.parse_one()
+        item_no = None
+        if source.match(ord("|")):
+            item_no = self.parse_one()
+            if source.match(ord("|")):
+                raise NotSupported      # more than two branches
+        if source.next != END and source.next != ord(")"):
+            raise NotSupported          # pattern not properly closed
+        item = new_item(GROUPREF_EXISTS, condgroup, sub=item_yes)
+        item.sub2 = item_no
+        return SubPattern([item])
+
+    def parse_class_escape(self, escape):
+        # handle escape code inside character class
+        source = self.source
+        c = escape - ESCAPED
+        if c in ESCAPES:
+            return Item(LITERAL, ESCAPES[c])
+        if c in CATEGORY_ESCAPES:
+            return Item(CATEGORY, CATEGORY_ESCAPES[c])
+        if c == ord("x"):
+            # hexadecimal escape (exactly two digits)
+            value = 0
+            count = 0
+            while is_hexdigit(source.next) and count < 2:
+                value = value * 16 + hex_value(source.get())
+                count += 1
+            if count != 2:
+                raise NotSupported      # bogus escape
+            return Item(LITERAL, value & 0xff)
+        elif is_octdigit(c):
+            # octal escape (up to three digits)
+            value = c - ord("0")
+            count = 1
+            while is_octdigit(source.next) and count < 3:
+                value = value * 8 + source.get() - ord("0")
+                count += 1
+            return Item(LITERAL, value & 0xff)
+        elif is_digit(c):
+            raise NotSupported          # bogus escape
+        return Item(LITERAL, c)
+
+    def parse_escape(self, escape):
+        # handle escape code in expression
+        source = self.source
+        c = escape - ESCAPED
+        if c in AT_ESCAPES:
+            return Item(AT, AT_ESCAPES[c])
+        if c in CATEGORY_ESCAPES:
+            item = Item(IN)
+            item.charset = [Item(CATEGORY, CATEGORY_ESCAPES[c])]
+            return item
+        if c in ESCAPES:
+            return Item(LITERAL, ESCAPES[c])
+        if c == ord("x"):
+            # hexadecimal escape
+            value = 0
+            count = 0
+            while is_hexdigit(source.next) and count < 2:
+                value = value * 16 + hex_value(source.get())
+                count += 1
+            if count != 2:
+                raise NotSupported      # bogus escape
+            return Item(LITERAL, value & 0xff)
+        elif c == ord("0"):
+            # octal escape
+            value = 0
+            count = 1
+            while is_octdigit(source.next) and count < 3:
+                value = value * 8 + source.get() - ord("0")
+                count += 1
+            return Item(LITERAL, value & 0xff)
+        elif is_digit(c):
+            # octal escape *or* decimal group reference (sigh)
+            group = c - ord("0")
+            if is_digit(source.next):
+                c2 = source.get()
+                if (is_octdigit(c) and is_octdigit(c2) and
+                        is_octdigit(source.next)):
+                    # got three octal digits; this is an octal escape
+                    c3 = source.get()
+                    value = ((c - ord("0")) * 64 + (c2 - ord("0")) * 8 +
+                             (c3 - ord("0")))
+                    return Item(LITERAL, value & 0xff)
+                group = group * 10 + c2 - ord("0")
+            # not an octal escape, so this is a group reference
+            if group < self.groups:
+                if not self.checkgroup(group):
+                    raise NotSupported  # cannot refer to open group
+                if self.lookbehind:
+                    raise NotSupported  # a warning
+                return Item(GROUPREF, group)
+            raise NotSupported          # bogus escape
+        return Item(LITERAL, c)
+
+    def parse_charset(self):
+        source = self.source
+        charset = []
+        if source.match(ord("^")):
+            charset.append(Item(NEGATE))
+        start = len(charset)
+        while True:
+            this = source.get()
+            if this == ord("]") and len(charset) != start:
+                break
+            elif this >= ESCAPED:
+                code1 = self.parse_class_escape(this)
+            elif this != END:
+                code1 = Item(LITERAL, this)
+            else:
+                raise NotSupported      # unexpected end of regular expression
+            if source.match(ord("-")):
+                # potential range
+                this = source.get()
+                if this == ord("]"):
+                    charset.append(code1)
+                    charset.append(Item(LITERAL, ord("-")))
+                    break
+                elif this != END:
+                    if this >= ESCAPED:
+                        code2 = self.parse_class_escape(this)
+                    else:
+                        code2 = Item(LITERAL, this)
+                    if code1.op != LITERAL or code2.op != LITERAL:
+                        raise NotSupported      # bad character range
+                    if code2.av < code1.av:
+                        raise NotSupported      # bad character range
+                    charset.append(Item(RANGE, code1.av, code2.av))
+                else:
+                    raise NotSupported  # unexpected end of regular expression
+            else:
+                charset.append(code1)
+
+        if len(charset) == 1 and charset[0].op == LITERAL:
+            return charset[0]
+        elif (len(charset) == 2 and charset[0].op == NEGATE and
+                  charset[1].op == LITERAL):
+            return Item(NOT_LITERAL, charset[1].av)
+        else:
+            item = Item(IN)
+            item.charset = charset
+            return item
+
+    def parse_count(self):
+        source = self.source
+        value = 0
+        count = 0
+        while is_digit(source.next):
+            value = value * 10 + source.get() - ord("0")
+            value = min(value, MAXREPEAT)     # too large, checked later
+            count += 1
+        return value, count
+
+    def parse_repeat(self, this, subpattern):
+        # repeat previous item.  Returns False if it is not a repeat
+        source = self.source
+        if this == ord("?"):
+            min, max = 0, 1
+        elif this == ord("*"):
+            min, max = 0, MAXREPEAT
+        elif this == ord("+"):
+            min, max = 1, MAXREPEAT
+        else:
+            assert this == ord("{")
+            if source.next == ord("}"):
+                return False
+            here_index = source.index
+            here_next = source.next
+            min, max = 0, MAXREPEAT
+            lo, lo_count = self.parse_count()
+            if source.match(ord(",")):
+                hi, hi_count = self.parse_count()
+            else:
+                hi, hi_count = lo, lo_count
+            if not source.match(ord("}")):
+                source.index = here_index
+                source.next = here_next
+                return False
+            if lo_count:
+                min = lo
+                if min >= MAXREPEAT:
+                    raise NotSupported  # the repetition number is too large
+            if hi_count:
+                max = hi
+                if max >= MAXREPEAT:
+                    raise NotSupported  # the repetition number is too large
+                if max < min:
+                    raise NotSupported  # bad repeat interval
+        # figure out which item to repeat
+        if not subpattern.data:
+            raise NotSupported          # nothing to repeat
+        item = subpattern.data[-1]
+        if item.op == AT:
+            raise NotSupported          # nothing to repeat
+        if item.op == MIN_REPEAT or item.op == MAX_REPEAT:
+            raise NotSupported          # multiple repeat
+        if source.match(ord("?")):
+            op = MIN_REPEAT
+        else:
+            op = MAX_REPEAT
+        subpattern.data[-1] = new_item(op, min, max, SubPattern([item]))
+        return True
+
+    def parse_group(self, subpattern):
+        # after a "(".  Returns the item to append, or None
+        source = self.source
+        group = 1
+        name = None
+        condgroup = 0
+        if source.match(ord("?")):
+            group = 0
+            # options
+            if source.match(ord("P")):
+                # python extensions
+                if source.match(ord("<")):
+                    # named group
+                    name = name_of(self.read_name(ord(">")))
+                    if name is None:
+                        raise NotSupported  # bad character in group name
+                    group = 1
+                elif source.match(ord("=")):
+                    # named backreference
+                    name = name_of(self.read_name(ord(")")))
+                    if name is None or name not in self.groupdict:
+                        raise NotSupported  # unknown group name
+                    if self.lookbehind:
+                        raise NotSupported  # a warning
+                    return Item(GROUPREF, self.groupdict[name])
+                else:
+                    raise NotSupported  # unknown specifier
+            elif source.match(ord(":")):
+                # non-capturing group
+                group = 2
+            elif source.match(ord("#")):
+                # comment
+                while source.next != END and source.next != ord(")"):
+                    source.get()
+                if not source.match(ord(")")):
+                    raise NotSupported  # unbalanced parenthesis
+                return None
+            elif (source.next == ord("=") or source.next == ord("!") or
+                      source.next == ord("<")):
+                # lookahead assertions
+                char = source.get()
+                dir = 1
+                if char == ord("<"):
+                    if source.next != ord("=") and source.next != ord("!"):
+                        raise NotSupported  # syntax error
+                    dir = -1 # lookbehind
+                    char = source.get()
+                    self.lookbehind += 1
+                p = self.parse_sub(nested=True)
+                if dir < 0:
+                    self.lookbehind -= 1
+                if not source.match(ord(")")):
+                    raise NotSupported  # unbalanced parenthesis
+                if char == ord("="):
+                    return new_item(ASSERT, dir, sub=p)
+                else:
+                    return new_item(ASSERT_NOT, dir, sub=p)
+            elif source.match(ord("(")):
+                # conditional backreference group
+                chars = self.read_name(ord(")"))
+                condname = name_of(chars)
+                group = 2
+                if condname is not None:
+                    if condname not in self.groupdict:
+                        raise NotSupported  # unknown group name
+                    condgroup = self.groupdict[condname]
+                else:
+                    # sre_parse accepts anything int() accepts; only
+                    # take plain numbers, and (?(0)...) is not even a
+                    # conditional group
+                    condgroup = 0
+                    for c in chars:
+                        if not is_digit(c) or condgroup >= GROUPS_LIMIT:
+                            raise NotSupported
+                        condgroup = condgroup * 10 + c - ord("0")
+                    if condgroup == 0:
+                        raise NotSupported
+                if self.lookbehind:
+                    raise NotSupported  # a warning
+            else:
+                # flags
+                if source.next not in FLAGS:
+                    raise NotSupported  # unexpected end of pattern
+                while source.next in FLAGS:
+                    self.flags |= FLAGS[source.get()]
+        if group:
+            # parse group contents
+            if group == 2:
+                # anonymous group
+                gid = 0
+            else:
+                gid = self.opengroup(name)
+            if condgroup:
+                p = self.parse_sub_cond(condgroup)
+            else:
+                p = self.parse_sub(nested=True)
+            if not source.match(ord(")")):
+                raise NotSupported      # unbalanced parenthesis
+            if gid:
+                self.closegroup(gid)
+            return new_item(SUBPATTERN, gid, sub=p)
+        else:
+            if not source.match(ord(")")):
+                raise NotSupported      # unknown extension
+            return None
+
+    def parse_one(self):
+        # parse a simple pattern
+        source = self.source
+        subpattern = SubPattern()
+        while True:
+            if source.next == ord("|") or source.next == ord(")"):
+                break # end of subpattern
+            this = source.get()
+            if this == END:
+                break # end of pattern
+
+            if self.flags & consts.SRE_FLAG_VERBOSE:
+                # skip whitespace and comments
+                if is_whitespace(this):
+                    continue
+                if this == ord("#"):
+                    while True:
+                        this = source.get()
+                        if this == END or this == ord("\n"):
+                            break
+                    continue
+
+            if this >= ESCAPED:
+                subpattern.append(self.parse_escape(this))
+            elif not is_special(this):
+                subpattern.append(Item(LITERAL, this))
+            elif this == ord("["):
+                subpattern.append(self.parse_charset())
+            elif (this == ord("?") or this == ord("*") or this == ord("+") or
+                      this == ord("{")):
+                if not self.parse_repeat(this, subpattern):
+                    subpattern.append(Item(LITERAL, this))
+            elif this == ord("."):
+                subpattern.append(Item(ANY))
+            elif this == ord("("):
+                item = self.parse_group(subpattern)
+                if item is not None:
+                    subpattern.append(item)
+            elif this == ord("^"):
+                subpattern.append(Item(AT, consts.AT_BEGINNING))
+            elif this == ord("$"):
+                subpattern.append(Item(AT, consts.AT_END))
+            else:
+                raise NotSupported      # parser error
+        return subpattern
+
+
+def parse(chars, flags):
+    """Returns the SubPattern and the Parser, whose attributes are the
+    ones of sre_parse.Pattern."""
+    parser = Parser(chars, flags)
+    p = parser.parse_sub(nested=False)
+    if parser.source.get() != END:
+        raise NotSupported      # unbalanced parenthesis or bogus characters
+    if (not (flags & consts.SRE_FLAG_VERBOSE) and
+            parser.flags & consts.SRE_FLAG_VERBOSE):
+        # the VERBOSE flag was switched on inside the pattern.  to be
+        # on the safe side, we'll parse the whole thing again...
+        return parse(chars, parser.flags)
+    return p, parser
+
+# ____________________________________________________________
+# code generation
+
+def _compile(code, data, flags):
+    # internal: compile a (sub)pattern
+    if (flags & consts.SRE_FLAG_IGNORECASE and
+            not (flags & consts.SRE_FLAG_LOCALE) and
+            flags & consts.SRE_FLAG_UNICODE):
+        fixes = True
+    else:
+        fixes = False
+    for item in data:
+        op = item.op
+        if op == LITERAL or op == NOT_LITERAL:
+            if flags & consts.SRE_FLAG_IGNORECASE:
+                lo = rsre_char.getlower(item.av, flags)
+                if fixes and lo in IGNORECASE_FIXES:
+                    code.append(consts.OPCODE_IN_IGNORE)
+                    skip = len(code)
+                    code.append(0)
+                    if op == NOT_LITERAL:
+                        code.append(consts.OPCODE_NEGATE)
+                    for k in [lo] + IGNORECASE_FIXES[lo]:
+                        code.append(consts.OPCODE_LITERAL)
+                        code.append(k)
+                    code.append(consts.OPCODE_FAILURE)
+                    code[skip] = len(code) - skip
+                else:
+                    if op == LITERAL:
+                        code.append(consts.OPCODE_LITERAL_IGNORE)
+                    else:
+                        code.append(consts.OPCODE_NOT_LITERAL_IGNORE)
+                    code.append(lo)
+            else:
+                if op == LITERAL:
+                    code.append(consts.OPCODE_LITERAL)
+                else:
+                    code.append(consts.OPCODE_NOT_LITERAL)
+                code.append(item.av)
+        elif op == IN:
+            if flags & consts.SRE_FLAG_IGNORECASE:
+                code.append(consts.OPCODE_IN_IGNORE)
+                fixup = True
+            else:
+                code.append(consts.OPCODE_IN)
+                fixup = False
+            skip = len(code)
+            code.append(0)
+            _compile_charset(item.charset, flags, code, fixup, fixes)
+            code[skip] = len(code) - skip
+        elif op == ANY:
+            if flags & consts.SRE_FLAG_DOTALL:
+                code.append(consts.OPCODE_ANY_ALL)
+            else:
+                code.append(consts.OPCODE_ANY)
+        elif op == MAX_REPEAT or op == MIN_REPEAT:
+            if flags & consts.SRE_FLAG_TEMPLATE:
+                raise NotSupported      # unsupported template operator
+            elif _simple(item):
+                if op == MAX_REPEAT:
+                    code.append(consts.OPCODE_REPEAT_ONE)
+                else:
+                    code.append(consts.OPCODE_MIN_REPEAT_ONE)
+                skip = len(code)
+                code.append(0)
+                code.append(item.av)
+                code.append(item.av2)
+                _compile(code, item.sub.data, flags)
+                code.append(consts.OPCODE_SUCCESS)
+                code[skip] = len(code) - skip
+            else:
+                code.append(consts.OPCODE_REPEAT)
+                skip = len(code)
+                code.append(0)
+                code.append(item.av)
+                code.append(item.av2)
+                _compile(code, item.sub.data, flags)
+                code[skip] = len(code) - skip
+                if op == MAX_REPEAT:
+                    code.append(consts.OPCODE_MAX_UNTIL)
+                else:
+                    code.append(consts.OPCODE_MIN_UNTIL)
+        elif op == SUBPATTERN:
+            if item.av:
+                code.append(consts.OPCODE_MARK)
+                code.append((item.av - 1) * 2)
+            _compile(code, item.sub.data, flags)
+            if item.av:
+                code.append(consts.OPCODE_MARK)
+                code.append((item.av - 1) * 2 + 1)
+        elif op == ASSERT or op == ASSERT_NOT:
+            if op == ASSERT:
+                code.append(consts.OPCODE_ASSERT)
+            else:
+                code.append(consts.OPCODE_ASSERT_NOT)
+            skip = len(code)
+            code.append(0)
+            if item.av >= 0:
+                code.append(0) # look ahead
+            else:
+                lo, hi = item.sub.getwidth()
+                if lo != hi:
+                    raise NotSupported  # look-behind requires fixed-width
+                code.append(lo) # look behind
+            _compile(code, item.sub.data, flags)
+            code.append(consts.OPCODE_SUCCESS)
+            code[skip] = len(code) - skip
+        elif op == AT:
+            code.append(consts.OPCODE_AT)
+            av = item.av
+            if flags & consts.SRE_FLAG_MULTILINE:
+                av = AT_MULTILINE.get(av, av)
+            if flags & consts.SRE_FLAG_LOCALE:
+                av = AT_LOCALE.get(av, av)
+            elif flags & consts.SRE_FLAG_UNICODE:
+                av = AT_UNICODE.get(av, av)
+            code.append(av)
+        elif op == BRANCH:
+            code.append(consts.OPCODE_BRANCH)
+            tail = []
+            for branch in item.branches:
+                skip = len(code)
+                code.append(0)
+                _compile(code, branch.data, flags)
+                code.append(consts.OPCODE_JUMP)
+                tail.append(len(code))
+                code.append(0)
+                code[skip] = len(code) - skip
+            code.append(0) # end of branch
+            for skip in tail:
+                code[skip] = len(code) - skip
+        elif op == CATEGORY:
+            code.append(consts.OPCODE_CATEGORY)
+            code.append(_category_code(item.av, flags))
+        elif op == GROUPREF:
+            if flags & consts.SRE_FLAG_IGNORECASE:
+                code.append(consts.OPCODE_GROUPREF_IGNORE)
+            else:
+                code.append(consts.OPCODE_GROUPREF)
+            code.append(item.av - 1)
+        elif op == GROUPREF_EXISTS:
+            code.append(consts.OPCODE_GROUPREF_EXISTS)
+            code.append(item.av - 1)
+            skipyes = len(code)
+            code.append(0)
+            _compile(code, item.sub.data, flags)
+            if item.sub2 is not None and item.sub2.data:
+                code.append(consts.OPCODE_JUMP)
+                skipno = len(code)
+                code.append(0)
+                code[skipyes] = len(code) - skipyes + 1
+                _compile(code, item.sub2.data, flags)
+                code[skipno] = len(code) - skipno
+            else:
+                code[skipyes] = len(code) - skipyes + 1
+        else:
+            raise NotSupported
+
+def _category_code(chcode, flags):
+    if flags & consts.SRE_FLAG_LOCALE:
+        return CH_LOCALE[chcode]
+    elif flags & consts.SRE_FLAG_UNICODE:
+        return CH_UNICODE[chcode]
+    return chcode
+
+def _simple(item):
+    # check if the repeated item is "simple"
+    lo, hi = item.sub.getwidth()
+    return lo == hi == 1 and item.sub.data[0].op != SUBPATTERN
+
+def _compile_charset(charset, flags, code, fixup, fixes):
+    # compile charset subprogram
+    for item in _optimize_charset(charset, flags, fixup, fixes):
+        op = item.op
+        if op == NEGATE:
+            code.append(consts.OPCODE_NEGATE)
+        elif op == LITERAL:
+            code.append(consts.OPCODE_LITERAL)
+            code.append(item.av)
+        elif op == RANGE:
+            code.append(consts.OPCODE_RANGE)
+            code.append(item.av)
+            code.append(item.av2)
+        elif op == CHARSET or op == BIGCHARSET:
+            if op == CHARSET:
+                code.append(consts.OPCODE_CHARSET)
+            else:
+                code.append(consts.OPCODE_BIGCHARSET)
+            code.extend(item.words)
+        elif op == CATEGORY:
+            code.append(consts.OPCODE_CATEGORY)
+            code.append(_category_code(item.av, flags))
+        else:
+            raise NotSupported
+    code.append(consts.OPCODE_FAILURE)
+
+def _set_chars(charmap, item, flags, fixup, fixes):
+    """Set the characters of the LITERAL or RANGE 'item' in 'charmap'.
+    Returns False if one of them does not fit, like the IndexError of
+    sre_compile; the ones before are set anyway."""
+    lo = item.av
+    if item.op == LITERAL:
+        hi = lo
+    else:
+        hi = item.av2
+    c = lo
+    while c <= hi:
+        i = c
+        if fixup:
+            i = rsre_char.getlower(c, flags)
+        if i >= len(charmap):
+            return False
+        charmap[i] = True
+        if fixes and i in IGNORECASE_FIXES:
+            for k in IGNORECASE_FIXES[i]:
+                if k >= len(charmap):
+                    return False
+                charmap[k] = True
+        c += 1
+    return True
+
+def _optimize_charset(charset, flags, fixup, fixes):
+    # internal: optimize character set
+    out = []
+    tail = []
+    charmap = [False] * 256
+    for item in charset:
+        op = item.op
+        if op == NEGATE:
+            out.append(item)
+        elif op == LITERAL or op == RANGE:
+            if not _set_chars(charmap, item, flags, fixup, fixes):
+                if len(charmap) == 256:
+                    # character set contains non-UCS1 character codes
+                    charmap.extend([False] * 0xff00)
+                    if _set_chars(charmap, item, flags, fixup, fixes):
+                        continue
+                # character set contains non-BMP character codes
+                if fixup and flags & consts.SRE_FLAG_UNICODE and op == RANGE:
+                    raise NotSupported  # buggy in sre_compile
+                tail.append(item)
+        else:
+            tail.append(item)
+
+    # compress character map
+    runs = []
+    q = 0
+    while True:
+        p = _find(charmap, True, q)
+        if p < 0:
+            break
+        if len(runs) >= 2:
+            runs = None
+            break
+        q = _find(charmap, False, p)
+        if q < 0:
+            runs.append((p, len(charmap)))
+            break
+        runs.append((p, q))
+    if runs is not None:
+        # use literal/range
+        for p, q in runs:
+            if q - p == 1:
+                out.append(Item(LITERAL, p))
+            else:
+                out.append(Item(RANGE, p, q - 1))
+        out += tail
+        # if the case was changed or new representation is more compact
+        if fixup or len(out) < len(charset):
+            return out
+        # else original character set is good enough
+        return charset
+
+    # use bitmap
+    if len(charmap) == 256:
+        item = Item(CHARSET)
+        item.words = _mk_bitmap(charmap)
+        out.append(item)
+        out += tail
+        return out
+
+    # big charset: the bitmap is sliced into chunks of 256 characters,
+    # duplicate chunks are eliminated, and each chunk is given a number.
+    # See sre_compile for the details.
+    comps = {}
+    mapping = [0] * 256
+    block = 0
+    data = []
+    for i in range(0, 65536, 256):
+        chunk = charmap[i:i + 256]
+        key = ''.join(['1' if bit else '0' for bit in chunk])
+        if key in comps:
+            mapping[i // 256] = comps[key]
+        else:
+            mapping[i // 256] = comps[key] = block
+            block += 1
+            data += chunk
+    item = Item(BIGCHARSET)
+    item.words = [block] + _bytes_to_codes(mapping) + _mk_bitmap(data)
+    out.append(item)
+    out += tail
+    return out
+
+def _find(charmap, value, start):
+    for i in range(start, len(charmap)):
+        if charmap[i] == value:
+            return i
+    return -1
+
+def _mk_bitmap(bits):
+    codebits = rsre_char.CODESIZE * 8
+    words = []
+    for i in range(0, len(bits), codebits):
+        word = r_uint(0)
+        for j in range(codebits):
+            if bits[i + j]:
+                word |= r_uint(1) << j
+        words.append(intmask(word))
+    return words
+
+def _bytes_to_codes(mapping):
+    # the bytes as words, in the native byte order
+    size = rsre_char.CODESIZE
+    words = []
+    for i in range(0, len(mapping), size):
+        word = r_uint(0)
+        for j in range(size):
+            if rsre_char.BIG_ENDIAN:
+                shift = (size - 1 - j) * 8
+            else:
+                shift = j * 8
+            word |= r_uint(mapping[i + j]) << shift
+        words.append(intmask(word))
+    return words
+
+def _below_maxcode(n):
+    return MAXCODE < 0 or n < MAXCODE
+
+def _compile_info(code, p, flags):
+    # internal: compile an info block.  in the current version,
+    # this contains min/max pattern width, and an optional literal
+    # prefix or a character map
+    lo, hi = p.getwidth()
+    if lo == 0:
+        return # not worth it
+    # look for a literal prefix
+    prefix = []
+    prefix_skip = 0
+    charset = None
+    if not (flags & consts.SRE_FLAG_IGNORECASE):
+        # look for literal prefix
+        for item in p.data:
+            if item.op == LITERAL:
+                if len(prefix) == prefix_skip:
+                    prefix_skip = prefix_skip + 1
+                prefix.append(item.av)
+            elif item.op == SUBPATTERN and len(item.sub.data) == 1:
+                item = item.sub.data[0]
+                if item.op == LITERAL:
+                    prefix.append(item.av)
+                else:
+                    break
+            else:
+                break
+        # if no prefix, look for charset prefix
+        if not prefix and p.data:
+            item = p.data[0]
+            if item.op == SUBPATTERN and item.sub.data:
+                item = item.sub.data[0]
+                if item.op == LITERAL:
+                    charset = [item]
+                elif item.op == BRANCH:
+                    charset = _branch_charset(item)
+            elif item.op == BRANCH:
+                charset = _branch_charset(item)
+            elif item.op == IN:
+                charset = item.charset
+    # add an info block
+    code.append(consts.OPCODE_INFO)
+    skip = len(code)
+    code.append(0)
+    # literal flag
+    mask = 0
+    if prefix:
+        mask = consts.SRE_INFO_PREFIX
+        if len(prefix) == prefix_skip == len(p.data):
+            mask = mask + consts.SRE_INFO_LITERAL
+    elif charset:
+        mask = mask + consts.SRE_INFO_CHARSET
+    code.append(mask)
+    # pattern length
+    if _below_maxcode(lo):
+        code.append(lo)
+    else:
+        code.append(MAXCODE)
+        prefix = prefix[:MAXCODE]
+    if _below_maxcode(hi):
+        code.append(hi)
+    else:
+        code.append(0)
+    # add literal prefix
+    if prefix:
+        code.append(len(prefix)) # length
+        code.append(prefix_skip) # skip
+        code.extend(prefix)
+        # generate overlap table
+        table = [-1] + ([0] * len(prefix))
+        for i in range(len(prefix)):
+            table[i + 1] = table[i] + 1
+            while table[i + 1] > 0 and prefix[i] != prefix[table[i + 1] - 1]:
+                table[i + 1] = table[table[i + 1] - 1] + 1
+        code.extend(table[1:]) # don't store first entry
+    elif charset:
+        _compile_charset(charset, flags, code, False, False)
+    code[skip] = len(code) - skip
+
+def _branch_charset(item):
+    # the first characters of the branches, if they are all literals
+    charset = []
+    for branch in item.branches:
+        if not branch.data or branch.data[0].op != LITERAL:
+            return None
+        charset.append(branch.data[0])
+    return charset
+
+# ____________________________________________________________
+
+class CompiledRegexp(object):
+    """The arguments of _sre.compile() given by sre_compile.compile():
+    'groups' is the number of groups and 'groupindex' maps the group
+    names to their numbers."""
+
+    def __init__(self, code, flags, groups, groupindex):
+        self.code = code
+        self.flags = flags
+        self.groups = groups
+        self.groupindex = groupindex
+
+
+def compile(chars, flags):
+    """Parse and compile the regular expression made of the characters
+    'chars', a list of character codes.  Returns a CompiledRegexp, or
+    raises NotSupported."""
+    if flags & consts.SRE_FLAG_DEBUG:
+        raise NotSupported      # dumps the parsed pattern
+    p, parser = parse(chars, flags)
+    flags = parser.flags | flags
+    if parser.groups > GROUPS_LIMIT:
+        raise NotSupported      # an AssertionError in sre_compile
+    code = []
+    _compile_info(code, p, flags)
+    _compile(code, p.data, flags)
+    code.append(consts.OPCODE_SUCCESS)
+    # rsre_core.CompiledPattern wants a list that is never resized
+    result = [0] * len(code)
+    for i in range(len(code)):
+        result[i] = code[i]
+    return CompiledRegexp(result, flags, parser.groups - 1, parser.groupdict)
@@ -52,6 +52,7 @@ class EndOfString(Exception):
 
 class CompiledPattern(object):
     _immutable_fields_ = ['pattern[*]', 'flags']
+    dfa = None     # a rsre_dfa.LazyDFA, for users of rsre_dfa
 
     def __init__(self, pattern, flags):
         self.pattern = pattern
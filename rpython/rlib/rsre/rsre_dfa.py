@@ -0,0 +1,1049 @@
+"""
+A matcher that runs in linear time, for the patterns that don't need
+backtracking.
+
+rsre_core is a backtracking matcher: on some strings, some patterns take
+an exponential time, and search() matches again at every position of the
+string.  This module handles the patterns without backreferences,
+lookaround assertions or conditional groups.  Their SRE code is turned
+into an NFA, with one node per character test, alternative and AT
+assertion; the states of the DFA are built from the NFA only when the
+matcher reaches them, and cached up to a memory limit, after which the
+cache is flushed.  If the cache would have to be flushed too often,
+the DFA gives up and rsre_core is used instead.
+
+The NFA keeps its threads in the order in which the backtracking
+matcher would try them, and drops the threads that come after one that
+reaches the end of the pattern.  This way the DFA finds the same match
+as rsre_core: the one starting at the leftmost position, and among
+them, the first one found by backtracking.  This would not be true for
+a repeated item that can match the empty string, because rsre_core has
+special cases for it, so these patterns are not supported either.
+
+The forward DFA only finds where the match ends.  A second DFA, built
+from the reversed NFA, then scans the string backward from there to
+find where the match starts; and if the pattern has groups, rsre_core
+matches once more at that position to find them.
+
+To use it, set the 'dfa' attribute of the CompiledPattern to the result
+of compile_dfa(), and call match_context() and search_context() from
+here instead of from rsre_core.  This is only worth it for the patterns
+for which may_backtrack_a_lot() returns True: rsre_core is specialized
+by the JIT, while the DFA scans the string up to three times and is
+opaque to the JIT.
+
+The NFAs of several patterns can also be put in a single DFA, with
+compile_set_dfa(): search_set() then finds which of the patterns match
+somewhere in the string, reading it only once.
+"""
+from rpython.rlib import jit
+from rpython.rlib.listsort import make_timsort_class
+from rpython.rlib.rsre import rsre_char, rsre_core, rsre_constants as consts
+from rpython.rlib.rsre.rsre_core import specializectx
+
+
+# the kinds of the nodes of the NFA, while it is built
+N_FAIL, N_MATCH, N_EMPTY, N_SPLIT, N_CHAR, N_AT = range(6)
+# the kinds of the edges of a Program
+E_EPS, E_CHAR, E_AT = range(3)
+
+# The bits describing a position in the string, for the AT assertions.
+# Each CUR_* bit is the PREV_* bit shifted by 4.
+PREV_BEGIN = 0x01       # at the start of the string
+PREV_NL = 0x02          # after a newline
+PREV_WORD = 0x04        # after a word character
+PREV_UNI_WORD = 0x08    # after a unicode word character
+CUR_END = 0x10          # at the end of the string
+CUR_NL = 0x20           # before a newline
+CUR_WORD = 0x40         # before a word character
+CUR_UNI_WORD = 0x80     # before a unicode word character
+CUR_END_NL = 0x100      # before a newline which is the last character
+
+_AT_BITS = {
+    consts.AT_BEGINNING: PREV_BEGIN,
+    consts.AT_BEGINNING_STRING: PREV_BEGIN,
+    consts.AT_BEGINNING_LINE: PREV_BEGIN | PREV_NL,
+    consts.AT_END: CUR_END | CUR_END_NL,
+    consts.AT_END_LINE: CUR_END | CUR_NL,
+    consts.AT_END_STRING: CUR_END,
+    consts.AT_BOUNDARY: PREV_BEGIN | CUR_END | PREV_WORD | CUR_WORD,
+    consts.AT_NON_BOUNDARY: PREV_BEGIN | CUR_END | PREV_WORD | CUR_WORD,
+    consts.AT_UNI_BOUNDARY: (PREV_BEGIN | CUR_END |
+                             PREV_UNI_WORD | CUR_UNI_WORD),
+    consts.AT_UNI_NON_BOUNDARY: (PREV_BEGIN | CUR_END |
+                                 PREV_UNI_WORD | CUR_UNI_WORD),
+}
+
+_CHAR_OPCODES = [consts.OPCODE_ANY, consts.OPCODE_ANY_ALL,
+                 consts.OPCODE_IN, consts.OPCODE_IN_IGNORE,
+                 consts.OPCODE_LITERAL, consts.OPCODE_LITERAL_IGNORE,
+                 consts.OPCODE_NOT_LITERAL, consts.OPCODE_NOT_LITERAL_IGNORE,
+                 consts.OPCODE_CATEGORY]
+
+MAX_NODES = 10000                  # bigger patterns use rsre_core
+MAX_SET_NODES = 200000             # the same, for all patterns of a set
+DEFAULT_CACHE_SIZE = 512 * 1024    # approximate bytes, for each DFA
+DEFAULT_SET_CACHE_SIZE = 8 * 1024 * 1024
+
+
+IntSort = make_timsort_class()
+
+
+class NotSupported(Exception):
+    pass
+
+class GiveUp(Exception):
+    """Raised when the DFA needs too many states for the string."""
+
+
+def prev_bits(c, mask):
+    """The PREV_* bits describing the position after the character 'c'."""
+    bits = 0
+    if mask & PREV_NL and rsre_char.is_linebreak(c):
+        bits |= PREV_NL
+    if mask & PREV_WORD and rsre_char.is_word(c):
+        bits |= PREV_WORD
+    if mask & PREV_UNI_WORD and rsre_char.is_uni_word(c):
+        bits |= PREV_UNI_WORD
+    return bits
+
+def cur_bits(c, mask):
+    """The CUR_* bits describing the position before the character 'c'."""
+    return prev_bits(c, mask >> 4) << 4
+
+def at_holds(atcode, bits):
+    """Like rsre_core.sre_at(), for a position described by 'bits'."""
+    if (atcode == consts.AT_BEGINNING or
+        atcode == consts.AT_BEGINNING_STRING):
+        return bool(bits & PREV_BEGIN)
+    elif atcode == consts.AT_BEGINNING_LINE:
+        return bool(bits & (PREV_BEGIN | PREV_NL))
+    elif atcode == consts.AT_END:
+        return bool(bits & (CUR_END | CUR_END_NL))
+    elif atcode == consts.AT_END_LINE:
+        return bool(bits & (CUR_END | CUR_NL))
+    elif atcode == consts.AT_END_STRING:
+        return bool(bits & CUR_END)
+    if bits & PREV_BEGIN and bits & CUR_END:
+        return False     # no boundary at all in the empty string
+    if (atcode == consts.AT_BOUNDARY or
+        atcode == consts.AT_NON_BOUNDARY):
+        boundary = bool(bits & PREV_WORD) != bool(bits & CUR_WORD)
+        return boundary == (atcode == consts.AT_BOUNDARY)
+    else:
+        boundary = bool(bits & PREV_UNI_WORD) != bool(bits & CUR_UNI_WORD)
+        return boundary == (atcode == consts.AT_UNI_BOUNDARY)
+
+def check_char(pattern, ppos, c):
+    """Like the match_XXX() functions of rsre_core, for the character 'c'.
+    A negative 'ppos' matches any character."""
+    if ppos < 0:
+        return True
+    op = pattern.pat(ppos)
+    if op == consts.OPCODE_ANY:
+        return not rsre_char.is_linebreak(c)
+    elif op == consts.OPCODE_ANY_ALL:
+        return True
+    elif op == consts.OPCODE_IN:
+        return rsre_char.check_charset(None, pattern, ppos + 2, c)
+    elif op == consts.OPCODE_IN_IGNORE:
+        return rsre_char.check_charset(None, pattern, ppos + 2,
+                                       rsre_char.getlower(c, pattern.flags))
+    elif op == consts.OPCODE_LITERAL:
+        return c == pattern.pat(ppos + 1)
+    elif op == consts.OPCODE_LITERAL_IGNORE:
+        return rsre_char.getlower(c, pattern.flags) == pattern.pat(ppos + 1)
+    elif op == consts.OPCODE_NOT_LITERAL:
+        return c != pattern.pat(ppos + 1)
+    elif op == consts.OPCODE_NOT_LITERAL_IGNORE:
+        return rsre_char.getlower(c, pattern.flags) != pattern.pat(ppos + 1)
+    else:
+        assert op == consts.OPCODE_CATEGORY
+        return rsre_char.category_dispatch(pattern.pat(ppos + 1), c)
+
+# ____________________________________________________________
+
+class NFABuilder(object):
+    """Turns the SRE code of CompiledPatterns into an NFA.  Raises
+    NotSupported if a pattern needs backtracking."""
+
+    def __init__(self, patterns, max_nodes=MAX_NODES):
+        self.patterns = patterns
+        self.max_nodes = max_nodes
+        self.pattern = None      # the pattern being compiled
+        self.pattern_index = 0
+        self.kinds = []
+        self.args = []       # N_CHAR: position of the opcode; N_AT: atcode
+        self.outs1 = []
+        self.outs2 = []      # only for N_SPLIT, which prefers 'out1'
+        self.pattern_ids = []     # the index of the pattern of each node
+        self.accepts = {}    # {N_MATCH node: index of the pattern}
+        self.mask = 0        # the bits needed by the AT assertions
+        self.has_groups = False
+
+    def build(self):
+        """Build the NFA of a single pattern."""
+        self.entry, self.match = self.add_pattern(0)
+        self.num_pattern_nodes = len(self.kinds)
+        self.restart = self.add_restart([self.entry])
+
+    def add_pattern(self, index):
+        """Add the nodes of the pattern 'index'.  Returns its first node
+        and its N_MATCH node."""
+        self.pattern = self.patterns[index]
+        self.pattern_index = index
+        match = self.new_node(N_MATCH)
+        entry, ppos = self.compile_sequence(0, match)
+        if self.pat(ppos) != consts.OPCODE_SUCCESS:
+            raise NotSupported
+        self.accepts[match] = index
+        return entry, match
+
+    def rollback(self, num_nodes, mask):
+        """Forget the nodes added after there were 'num_nodes' nodes."""
+        del self.kinds[num_nodes:]
+        del self.args[num_nodes:]
+        del self.outs1[num_nodes:]
+        del self.outs2[num_nodes:]
+        del self.pattern_ids[num_nodes:]
+        self.mask = mask
+
+    def add_restart(self, entries):
+        """For search(), start with a node that goes to the 'entries' in
+        order, or reads any character and comes back, with the lowest
+        preference, i.e. the pattern '.*?'.  Returns that node."""
+        anychar = self.new_node(N_CHAR, -1)
+        node = anychar
+        for i in range(len(entries) - 1, -1, -1):
+            node = self.new_split(entries[i], node)
+        self.outs1[anychar] = node
+        return node
+
+    def pat(self, ppos):
+        # the code can come from the user: check that it stays in bounds
+        code = self.pattern.pattern
+        if not 0 <= ppos < len(code) or code[ppos] < 0:
+            raise NotSupported
+        return code[ppos]
+
+    def new_node(self, kind, arg=-1, out1=-1, out2=-1):
+        if len(self.kinds) >= self.max_nodes:
+            raise NotSupported
+        self.kinds.append(kind)
+        self.args.append(arg)
+        self.outs1.append(out1)
+        self.outs2.append(out2)
+        self.pattern_ids.append(self.pattern_index)
+        return len(self.kinds) - 1
+
+    def new_split(self, preferred, other):
+        return self.new_node(N_SPLIT, -1, preferred, other)
+
+    def compile_sequence(self, ppos, cont):
+        """Compile the code starting at 'ppos' and ending with SUCCESS,
+        JUMP, MAX_UNTIL or MIN_UNTIL, which goes on to the node 'cont'.
+        Returns the first node and the position of the end."""
+        items = []
+        while True:
+            op = self.pat(ppos)
+            if (op == consts.OPCODE_SUCCESS or op == consts.OPCODE_JUMP or
+                op == consts.OPCODE_MAX_UNTIL or
+                op == consts.OPCODE_MIN_UNTIL):
+                break
+            items.append(ppos)
+            ppos = self.skip_item(ppos)
+        node = cont
+        for i in range(len(items) - 1, -1, -1):
+            node = self.compile_item(items[i], node)
+        return node, ppos
+
+    def skip_item(self, ppos):
+        op = self.pat(ppos)
+        if op == consts.OPCODE_ANY or op == consts.OPCODE_ANY_ALL:
+            return ppos + 1
+        elif (op == consts.OPCODE_LITERAL or
+              op == consts.OPCODE_LITERAL_IGNORE or
+              op == consts.OPCODE_NOT_LITERAL or
+              op == consts.OPCODE_NOT_LITERAL_IGNORE or
+              op == consts.OPCODE_CATEGORY or
+              op == consts.OPCODE_AT or
+              op == consts.OPCODE_MARK):
+            return ppos + 2
+        elif (op == consts.OPCODE_IN or op == consts.OPCODE_IN_IGNORE or
+              op == consts.OPCODE_INFO or
+              op == consts.OPCODE_REPEAT_ONE or
+              op == consts.OPCODE_MIN_REPEAT_ONE):
+            return ppos + 1 + self.pat(ppos + 1)
+        elif op == consts.OPCODE_REPEAT:
+            return ppos + 1 + self.pat(ppos + 1) + 1
+        elif op == consts.OPCODE_BRANCH:
+            ppos += 1
+            while self.pat(ppos):
+                ppos += self.pat(ppos)
+            return ppos + 1
+        else:
+            # backreferences, assertions, conditional groups...
+            raise NotSupported
+
+    def compile_item(self, ppos, cont):
+        op = self.pat(ppos)
+        if op in _CHAR_OPCODES:
+            return self.new_node(N_CHAR, ppos, cont)
+        elif op == consts.OPCODE_INFO:
+            return cont
+        elif op == consts.OPCODE_MARK:
+            self.has_groups = True
+            return cont
+        elif op == consts.OPCODE_AT:
+            atcode = self.pat(ppos + 1)
+            if atcode not in _AT_BITS:
+                raise NotSupported      # the locale-dependent ones
+            self.mask |= _AT_BITS[atcode]
+            return self.new_node(N_AT, atcode, cont)
+        elif op == consts.OPCODE_BRANCH:
+            # <BRANCH> <0=skip> code <JUMP> ... <NULL>
+            after = self.skip_item(ppos)
+            alternatives = []
+            ppos += 1
+            while self.pat(ppos):
+                entry, jump = self.compile_sequence(ppos + 1, cont)
+                if (self.pat(jump) != consts.OPCODE_JUMP or
+                        jump + 1 + self.pat(jump + 1) != after):
+                    raise NotSupported
+                alternatives.append(entry)
+                ppos += self.pat(ppos)
+            if not alternatives:
+                return self.new_node(N_FAIL)
+            node = alternatives[-1]
+            for i in range(len(alternatives) - 2, -1, -1):
+                node = self.new_split(alternatives[i], node)
+            return node
+        elif op == consts.OPCODE_REPEAT:
+            # <REPEAT> <skip> <1=min> <2=max> item <UNTIL> tail
+            until = ppos + 1 + self.pat(ppos + 1)
+            op = self.pat(until)
+            if op != consts.OPCODE_MAX_UNTIL and op != consts.OPCODE_MIN_UNTIL:
+                raise NotSupported
+            # rsre_core has special cases for the items matching the
+            # empty string; we don't reproduce them
+            probe = self.new_node(N_EMPTY)
+            if self.can_skip(self.compile_copy(ppos + 4, until, probe), probe):
+                raise NotSupported
+            return self.compile_repeat(ppos + 4, until, self.pat(ppos + 2),
+                                       self.pat(ppos + 3),
+                                       op == consts.OPCODE_MAX_UNTIL, cont)
+        elif (op == consts.OPCODE_REPEAT_ONE or
+              op == consts.OPCODE_MIN_REPEAT_ONE):
+            # <REPEAT_ONE> <skip> <1=min> <2=max> item <SUCCESS> tail
+            if self.pat(ppos + 4) not in _CHAR_OPCODES:
+                raise NotSupported
+            return self.compile_repeat(ppos + 4, -1, self.pat(ppos + 2),
+                                       self.pat(ppos + 3),
+                                       op == consts.OPCODE_REPEAT_ONE, cont)
+        else:
+            raise NotSupported
+
+    def compile_copy(self, item, until, cont):
+        """Compile one more copy of the repeated item.  'until' is the
+        position of the UNTIL which ends it, or -1 for a single character
+        item of REPEAT_ONE."""
+        if until < 0:
+            return self.new_node(N_CHAR, item, cont)
+        entry, end = self.compile_sequence(item, cont)
+        if end != until:
+            raise NotSupported
+        return entry
+
+    def compile_repeat(self, item, until, min, max, greedy, cont):
+        if max == rsre_char.MAXREPEAT:
+            node = self.new_split(-1, -1)
+            body = self.compile_copy(item, until, node)
+            if greedy:
+                self.outs1[node] = body
+                self.outs2[node] = cont
+            else:
+                self.outs1[node] = cont
+                self.outs2[node] = body
+        else:
+            if max < min:
+                raise NotSupported
+            node = cont
+            count = max - min   # no range(), the counts can be huge
+            while count > 0:
+                body = self.compile_copy(item, until, node)
+                if greedy:
+                    node = self.new_split(body, cont)
+                else:
+                    node = self.new_split(cont, body)
+                count -= 1
+        count = min
+        while count > 0:
+            node = self.compile_copy(item, until, node)
+            count -= 1
+        return node
+
+    def repeats_choice(self, ppos, in_repeat):
+        """Does the code starting at 'ppos' repeat an alternation or
+        another repeat?  Only looks at the code, without building nodes.
+        'in_repeat' is True if the code is itself repeated."""
+        while True:
+            op = self.pat(ppos)
+            if (op == consts.OPCODE_SUCCESS or op == consts.OPCODE_JUMP or
+                op == consts.OPCODE_MAX_UNTIL or
+                op == consts.OPCODE_MIN_UNTIL):
+                return False
+            if op == consts.OPCODE_BRANCH:
+                if in_repeat:
+                    return True
+                alt = ppos + 1
+                while self.pat(alt):
+                    if self.repeats_choice(alt + 1, False):
+                        return True
+                    alt += self.pat(alt)
+            elif (op == consts.OPCODE_REPEAT or
+                  op == consts.OPCODE_REPEAT_ONE or
+                  op == consts.OPCODE_MIN_REPEAT_ONE):
+                if self.pat(ppos + 3) > 1:
+                    if in_repeat:
+                        return True
+                    if (op == consts.OPCODE_REPEAT and
+                            self.repeats_choice(ppos + 4, True)):
+                        return True
+            ppos = self.skip_item(ppos)
+
+    def can_skip(self, entry, target):
+        """Can we go from 'entry' to 'target' without any character?"""
+        seen = [False] * len(self.kinds)
+        pending = [entry]
+        while pending:
+            node = pending.pop()
+            if node == target:
+                return True
+            if seen[node]:
+                continue
+            seen[node] = True
+            kind = self.kinds[node]
+            if kind == N_EMPTY or kind == N_SPLIT or kind == N_AT:
+                pending.append(self.outs1[node])
+            if kind == N_SPLIT:
+                pending.append(self.outs2[node])
+        return False
+
+    def edges(self):
+        """Returns the list of the edges (kind, arg, pattern index, target)
+        of each node, in their order of preference."""
+        result = []
+        for node in range(len(self.kinds)):
+            kind = self.kinds[node]
+            out1 = self.outs1[node]
+            index = self.pattern_ids[node]
+            if kind == N_EMPTY:
+                result.append([(E_EPS, -1, index, out1)])
+            elif kind == N_SPLIT:
+                result.append([(E_EPS, -1, index, out1),
+                               (E_EPS, -1, index, self.outs2[node])])
+            elif kind == N_CHAR:
+                result.append([(E_CHAR, self.args[node], index, out1)])
+            elif kind == N_AT:
+                result.append([(E_AT, self.args[node], index, out1)])
+            else:
+                result.append([])
+        return result
+
+    def forward_program(self, longest=False):
+        return Program(self.patterns, self.edges(), self.accepts, self.mask,
+                       longest)
+
+    def reverse_program(self):
+        # without the nodes of 'restart'
+        edges = self.edges()
+        reversed_edges = [[] for i in range(len(self.kinds))]
+        for node in range(self.num_pattern_nodes):
+            for kind, arg, index, target in edges[node]:
+                reversed_edges[target].append((kind, arg, index, node))
+        return Program(self.patterns, reversed_edges, {self.entry: 0},
+                       self.mask, longest=True)
+
+
+class Program(object):
+    """An NFA, with its edges in flat lists: those of the node 'n' are
+    from first_edge[n] to first_edge[n + 1].  The nodes in 'accepts' end
+    a pattern.  If 'longest' is False, the threads after the first one
+    that reaches them are dropped."""
+
+    def __init__(self, patterns, edges, accepts, mask, longest):
+        self.patterns = patterns
+        self.mask = mask
+        self.longest = longest
+        self.num_nodes = len(edges)
+        self.accept_ids = [-1] * self.num_nodes  # index of pattern, or -1
+        for node, index in accepts.items():
+            self.accept_ids[node] = index
+        self.first_edge = []
+        self.edge_kinds = []
+        self.edge_args = []
+        self.edge_pattern_ids = []
+        self.edge_targets = []
+        self.has_char = []     # if the node has an E_CHAR edge
+        self.in_kernel = []    # if the node has an E_CHAR or E_AT edge
+        for node_edges in edges:
+            self.first_edge.append(len(self.edge_kinds))
+            has_char = False
+            in_kernel = False
+            for kind, arg, index, target in node_edges:
+                self.edge_kinds.append(kind)
+                self.edge_args.append(arg)
+                self.edge_pattern_ids.append(index)
+                self.edge_targets.append(target)
+                if kind == E_CHAR:
+                    has_char = True
+                if kind != E_EPS:
+                    in_kernel = True
+            self.has_char.append(has_char)
+            self.in_kernel.append(in_kernel)
+        self.first_edge.append(len(self.edge_kinds))
+
+# ____________________________________________________________
+
+class DFAState(object):
+    """A state of the DFA: the nodes of the NFA reached at some position,
+    in their order of preference, before the AT assertions at that
+    position are checked.  'bits' describes the character that was just
+    read, and 'matches' are the indices of the patterns whose end the NFA
+    reached just before."""
+
+    def __init__(self, nodes, bits, matches):
+        self.nodes = nodes
+        self.bits = bits
+        self.matches = matches
+        self.matched = len(matches) > 0
+        self.dead = len(nodes) == 0
+        self.next_byte = None     # the next states, for characters < 256
+        self.next_other = None    # {character: next state} for the others
+
+
+class DFA(object):
+    """The lazily built DFA for a Program.  If 'forward' is True, it
+    reads the string forward, and DFAState.bits are the PREV_* bits;
+    otherwise it reads it backward, and they are the CUR_* bits."""
+
+    def __init__(self, program, forward, cache_size=DEFAULT_CACHE_SIZE):
+        self.program = program
+        self.forward = forward
+        self.cache_size = cache_size
+        self.seen = [0] * program.num_nodes
+        self.seen_mark = 0
+        self.flushed_at = -1
+        self.background = -1
+        self.flush()
+
+    def flush(self):
+        self.states = {}
+        self.start_states = {}
+        self.background_checks = {}   # {bits: (nodes, matches)}
+        self.background_reads = {}    # {bits * 0x110000 + c: nodes}
+        self.memory = 0
+
+    def set_background(self, node):
+        """Make the closure of 'node' part of every state, without
+        listing it in DFAState.nodes.  Only for 'longest' programs, where
+        the order of the threads does not matter.  search_set() uses it
+        for its restart node, which is reached again after every
+        character: this way, the states only list the threads that
+        really started, and the threads of the restart node are read
+        once per character, not once per state."""
+        assert self.program.longest
+        self.background = node
+        self.background_nodes = []
+        self.add_closure([node], self.new_mark(), self.background_nodes)
+        self.in_background = [False] * self.program.num_nodes
+        for kernel_node in self.background_nodes:
+            self.in_background[kernel_node] = True
+        self.flush()
+
+    def start_scan(self):
+        self.flushed_at = -1
+
+    def reserve(self, size, scanned):
+        """Account for 'size' more bytes in the cache, flushing it first if
+        it is full.  'scanned' is the number of characters read so far:
+        if the cache was already flushed less than 10 characters per state
+        ago, the DFA is not worth it."""
+        self.memory += size
+        if self.memory > self.cache_size:
+            if (self.flushed_at >= 0 and
+                    scanned - self.flushed_at < 10 * len(self.states)):
+                raise GiveUp
+            self.flush()
+            self.flushed_at = scanned
+            self.memory = size
+
+    def get_state(self, nodes, bits, matches, scanned):
+        key = _state_key(nodes, bits, matches)
+        state = self.states.get(key, None)
+        if state is None:
+            self.reserve(64 + 8 * (len(nodes) + len(matches)) + len(key),
+                         scanned)
+            state = DFAState(nodes, bits, matches)
+            if self.background >= 0:
+                state.dead = False
+            self.states[key] = state
+        return state
+
+    def start_state(self, start, bits, scanned):
+        bits &= self.program.mask
+        key = start * 512 + bits
+        state = self.start_states.get(key, None)
+        if state is None:
+            nodes = []
+            if start != self.background:
+                self.add_closure([start], self.new_mark(), nodes)
+            state = self.get_state(nodes, bits, [], scanned)
+            self.start_states[key] = state
+        return state
+
+    def new_mark(self):
+        self.seen_mark += 1
+        return self.seen_mark
+
+    def next_state(self, state, c, scanned):
+        if c < 256:
+            table = state.next_byte
+            if table is not None:
+                result = table[c]
+                if result is not None:
+                    return result
+        else:
+            others = state.next_other
+            if others is not None:
+                result = others.get(c, None)
+                if result is not None:
+                    return result
+        return self.compute_next_state(state, c, 0, scanned)
+
+    def compute_next_state(self, state, c, extra_bits, scanned):
+        """Compute the state after reading the character 'c'.  It is
+        cached, unless 'extra_bits' describes a special position."""
+        mask = self.program.mask
+        if self.forward:
+            bits = state.bits | cur_bits(c, mask) | extra_bits
+            next_bits = prev_bits(c, mask)
+        else:
+            bits = state.bits | prev_bits(c, mask)
+            next_bits = cur_bits(c, mask) | extra_bits
+        nodes, matches = self.check_assertions(state.nodes, bits)
+        if self.background >= 0:
+            nodes, matches = self.read_char_with_background(
+                nodes, matches, c, bits, scanned)
+        else:
+            nodes = self.read_char(nodes, c)
+        result = self.get_state(nodes, next_bits, matches, scanned)
+        if extra_bits == 0:
+            if c < 256:
+                if state.next_byte is None:
+                    self.reserve(8 * 256, scanned)
+                    state.next_byte = [None] * 256
+                state.next_byte[c] = result
+            else:
+                if state.next_other is None:
+                    state.next_other = {}
+                self.reserve(32, scanned)
+                state.next_other[c] = result
+        return result
+
+    def check_assertions(self, nodes, bits):
+        """Follow the AT assertions of 'nodes' which hold at the position
+        described by 'bits'.  Returns the nodes with E_CHAR edges that are
+        reached, and the indices of the patterns whose end is reached."""
+        program = self.program
+        mark = self.new_mark()
+        result = []
+        matches = []
+        pending = []
+        for start in nodes:
+            pending.append(start)
+            while pending:
+                node = pending.pop()
+                if self.seen[node] == mark:
+                    continue
+                self.seen[node] = mark
+                index = program.accept_ids[node]
+                if index >= 0:
+                    matches.append(index)
+                    if not program.longest:
+                        return result, matches
+                if program.has_char[node]:
+                    result.append(node)
+                # push the edges in reverse order, to visit them in order
+                i = program.first_edge[node + 1] - 1
+                while i >= program.first_edge[node]:
+                    kind = program.edge_kinds[i]
+                    if kind == E_EPS or (kind == E_AT and
+                                         at_holds(program.edge_args[i], bits)):
+                        pending.append(program.edge_targets[i])
+                    i -= 1
+        return result, matches
+
+    def read_char(self, nodes, c):
+        """Returns the nodes reached from 'nodes' by reading 'c'."""
+        program = self.program
+        mark = self.new_mark()
+        result = []
+        for node in nodes:
+            for i in range(program.first_edge[node],
+                           program.first_edge[node + 1]):
+                if program.edge_kinds[i] != E_CHAR:
+                    continue
+                pattern = program.patterns[program.edge_pattern_ids[i]]
+                if check_char(pattern, program.edge_args[i], c):
+                    if self.add_closure([program.edge_targets[i]], mark,
+                                        result):
+                        return result
+        return result
+
+    def read_char_with_background(self, nodes, matches, c, bits, scanned):
+        """Like read_char(), adding the threads of the background.
+        Returns the nodes reached, not in the background, and 'matches'
+        with those of the background."""
+        bg_nodes, bg_matches = self.check_background(bits)
+        if len(bg_matches) > 0:
+            matches = matches[:]
+            for index in bg_matches:
+                if index not in matches:
+                    matches.append(index)
+            IntSort(matches).sort()
+        key = bits * 0x110000 + c
+        bg_read = self.background_reads.get(key, None)
+        if bg_read is None:
+            bg_read = self.read_char(bg_nodes, c)
+            self.reserve(32 + 8 * len(bg_read), scanned)
+            self.background_reads[key] = bg_read
+        mark = self.new_mark()
+        result = []
+        for node in self.read_char(nodes, c) + bg_read:
+            if self.seen[node] != mark and not self.in_background[node]:
+                self.seen[node] = mark
+                result.append(node)
+        IntSort(result).sort()
+        return result, matches
+
+    def check_background(self, bits):
+        if bits not in self.background_checks:
+            self.background_checks[bits] = self.check_assertions(
+                self.background_nodes, bits)
+        return self.background_checks[bits]
+
+    def add_closure(self, pending, mark, result):
+        """Add to 'result' the nodes reached from 'pending' by E_EPS edges
+        and which have other edges, or are in 'accepts'.  Returns True if
+        the other threads must be dropped."""
+        program = self.program
+        while pending:
+            node = pending.pop()
+            if self.seen[node] == mark:
+                continue
+            self.seen[node] = mark
+            if program.accept_ids[node] >= 0:
+                result.append(node)
+                if not program.longest:
+                    return True
+            elif program.in_kernel[node]:
+                result.append(node)
+            i = program.first_edge[node + 1] - 1
+            while i >= program.first_edge[node]:
+                if program.edge_kinds[i] == E_EPS:
+                    pending.append(program.edge_targets[i])
+                i -= 1
+        return False
+
+    def final_matches(self, state, bits):
+        """The indices of the patterns whose end the NFA reaches at the end
+        of the scan."""
+        bits = (state.bits | bits) & self.program.mask
+        _, matches = self.check_assertions(state.nodes, bits)
+        if self.background >= 0:
+            _, bg_matches = self.check_background(bits)
+            matches = matches + bg_matches
+        return matches
+
+def _state_key(nodes, bits, matches):
+    parts = [str(bits)]
+    for index in matches:
+        parts.append('m%d' % index)
+    for node in nodes:
+        parts.append(str(node))
+    return ','.join(parts)
+
+
+class LazyDFA(object):
+    """The DFAs of a CompiledPattern, see compile_dfa()."""
+    gave_up = False
+
+    def __init__(self, builder, cache_size):
+        self.forward = DFA(builder.forward_program(), True, cache_size)
+        self.backward = DFA(builder.reverse_program(), False, cache_size)
+        self.match_start_node = builder.entry
+        self.search_start_node = builder.restart
+        self.backward_start_node = builder.match
+        self.has_groups = builder.has_groups
+
+
+def may_backtrack_a_lot(pattern):
+    """Returns True if the CompiledPattern repeats an alternation or
+    another repeat, like (a|aa)*c or (a+)+b.  These are the patterns for
+    which rsre_core can take an exponential time.  The others are better
+    left to rsre_core, whose loops are specialized by the JIT."""
+    builder = NFABuilder([pattern])
+    builder.pattern = pattern
+    try:
+        return builder.repeats_choice(0, False)
+    except NotSupported:
+        return False
+
+
+def compile_dfa(pattern, cache_size=DEFAULT_CACHE_SIZE):
+    """Returns a LazyDFA for the CompiledPattern, or None if the pattern
+    is not supported."""
+    if pattern.flags & consts.SRE_FLAG_LOCALE:
+        return None
+    builder = NFABuilder([pattern])
+    try:
+        builder.build()
+    except NotSupported:
+        return None
+    return LazyDFA(builder, cache_size)
+
+
+class SetDFA(object):
+    """The DFA of a list of CompiledPatterns, see compile_set_dfa()."""
+    gave_up = False
+
+    def __init__(self, patterns, builder, in_dfa, cache_size):
+        self.patterns = patterns
+        self.in_dfa = in_dfa      # if the pattern is handled by 'dfa'
+        self.num_in_dfa = 0
+        for flag in in_dfa:
+            if flag:
+                self.num_in_dfa += 1
+        if self.num_in_dfa > 0:
+            self.dfa = DFA(builder.forward_program(longest=True), True,
+                           cache_size)
+            self.dfa.set_background(builder.restart)
+        else:
+            self.dfa = None
+        self.start_node = builder.restart
+
+
+def compile_set_dfa(patterns, cache_size=DEFAULT_SET_CACHE_SIZE):
+    """Returns a SetDFA for the list of CompiledPatterns.  The patterns
+    that are not supported are left to rsre_core by search_set()."""
+    builder = NFABuilder(patterns, MAX_SET_NODES)
+    entries = []
+    in_dfa = [False] * len(patterns)
+    for i in range(len(patterns)):
+        if patterns[i].flags & consts.SRE_FLAG_LOCALE:
+            continue
+        num_nodes = len(builder.kinds)
+        mask = builder.mask
+        try:
+            entry, _ = builder.add_pattern(i)
+        except NotSupported:
+            builder.rollback(num_nodes, mask)
+            continue
+        entries.append(entry)
+        in_dfa[i] = True
+    builder.restart = builder.add_restart(entries)
+    return SetDFA(patterns, builder, in_dfa, cache_size)
+
+# ____________________________________________________________
+
+@specializectx
+def prev_bits_at(ctx, ptr, mask):
+    if ptr == ctx.ZERO:
+        return PREV_BEGIN & mask
+    return prev_bits(ctx.str(ctx.prev(ptr)), mask)
+
+@specializectx
+@jit.dont_look_inside
+def find_end(ctx, dfa, start):
+    """Reads the string forward from ctx.match_start.  Returns where the
+    match ends, or -1."""
+    mask = dfa.program.mask
+    end = ctx.end
+    ptr = ctx.match_start
+    dfa.start_scan()
+    state = dfa.start_state(start, prev_bits_at(ctx, ptr, mask), 0)
+    result = -1
+    scanned = 0
+    while ptr < end:
+        c = ctx.str(ptr)
+        nextptr = ctx.next(ptr)
+        if (mask & CUR_END_NL and nextptr == end and
+                rsre_char.is_linebreak(c)):
+            state = dfa.compute_next_state(state, c, CUR_END_NL, scanned)
+        else:
+            state = dfa.next_state(state, c, scanned)
+        if state.matched:
+            result = ptr
+        if state.dead:
+            return result
+        ptr = nextptr
+        scanned += 1
+    if len(dfa.final_matches(state, CUR_END)) > 0:
+        result = ptr
+    return result
+
+@specializectx
+@jit.dont_look_inside
+def find_start(ctx, dfa, start, ptr):
+    """Reads the string backward from 'ptr', where a match ends.  Returns
+    the first position, not before ctx.match_start, where it can start."""
+    mask = dfa.program.mask
+    end = ctx.end
+    low = ctx.match_start
+    dfa.start_scan()
+    if ptr == end:
+        bits = CUR_END & mask
+    else:
+        c = ctx.str(ptr)
+        bits = cur_bits(c, mask)
+        if (mask & CUR_END_NL and ctx.next(ptr) == end and
+                rsre_char.is_linebreak(c)):
+            bits |= CUR_END_NL
+    state = dfa.start_state(start, bits, 0)
+    result = -1
+    scanned = 0
+    while ptr > low:
+        prevptr = ctx.prev(ptr)
+        c = ctx.str(prevptr)
+        if mask & CUR_END_NL and ptr == end and rsre_char.is_linebreak(c):
+            state = dfa.compute_next_state(state, c, CUR_END_NL, scanned)
+        else:
+            state = dfa.next_state(state, c, scanned)
+        if state.matched:
+            result = ptr
+        if state.dead:
+            return result
+        ptr = prevptr
+        scanned += 1
+    if len(dfa.final_matches(state, prev_bits_at(ctx, ptr, mask))) > 0:
+        result = ptr
+    return result
+
+@specializectx
+@jit.dont_look_inside
+def find_set_matches(ctx, dfa, start, found, count):
+    """Reads the string forward from ctx.match_start, and sets found[i]
+    to True if the pattern 'i' matches somewhere.  Stops early when
+    'count' patterns are found."""
+    mask = dfa.program.mask
+    end = ctx.end
+    ptr = ctx.match_start
+    dfa.start_scan()
+    state = dfa.start_state(start, prev_bits_at(ctx, ptr, mask), 0)
+    scanned = 0
+    while ptr < end:
+        c = ctx.str(ptr)
+        nextptr = ctx.next(ptr)
+        if (mask & CUR_END_NL and nextptr == end and
+                rsre_char.is_linebreak(c)):
+            state = dfa.compute_next_state(state, c, CUR_END_NL, scanned)
+        else:
+            state = dfa.next_state(state, c, scanned)
+        if state.matched:
+            count = _record_matches(state.matches, found, count)
+            if count == 0:
+                return
+        if state.dead:
+            return
+        ptr = nextptr
+        scanned += 1
+    _record_matches(dfa.final_matches(state, CUR_END), found, count)
+
+def _record_matches(matches, found, count):
+    for index in matches:
+        if not found[index]:
+            found[index] = True
+            count -= 1
+    return count
+
+def match_context(ctx, pattern):
+    """Like rsre_core.match_context(), using pattern.dfa if possible."""
+    dfa = pattern.dfa
+    if dfa is None or dfa.gave_up or ctx.fullmatch_only:
+        return rsre_core.match_context(ctx, pattern)
+    ctx.original_pos = ctx.match_start
+    if ctx.end < ctx.match_start:
+        return False
+    try:
+        end = find_end(ctx, dfa.forward, dfa.match_start_node)
+    except GiveUp:
+        dfa.gave_up = True
+        return rsre_core.match_context(ctx, pattern)
+    if end < ctx.ZERO:
+        return False
+    return _found(ctx, pattern, dfa, ctx.match_start, end)
+
+def search_context(ctx, pattern):
+    """Like rsre_core.search_context(), using pattern.dfa if possible."""
+    dfa = pattern.dfa
+    if dfa is None or dfa.gave_up:
+        return rsre_core.search_context(ctx, pattern)
+    ctx.original_pos = ctx.match_start
+    if ctx.end < ctx.match_start:
+        return False
+    try:
+        end = find_end(ctx, dfa.forward, dfa.search_start_node)
+        if end < ctx.ZERO:
+            return False
+        start = find_start(ctx, dfa.backward, dfa.backward_start_node, end)
+    except GiveUp:
+        dfa.gave_up = True
+        return rsre_core.search_context(ctx, pattern)
+    if _found(ctx, pattern, dfa, start, end):
+        return True
+    return rsre_core.search_context(ctx, pattern)
+
+def _found(ctx, pattern, dfa, start, end):
+    assert start >= ctx.ZERO
+    if dfa.has_groups:
+        # second pass, to find the groups
+        if rsre_core.sre_match(ctx, pattern, 0, start, None) is None:
+            # should not occur, but if it does, rsre_core is right
+            dfa.gave_up = True
+            return False
+    else:
+        ctx.match_end = end
+        ctx.match_marks = None
+    ctx.match_start = start
+    return True
+
+def search_set(ctx, setdfa):
+    """Returns the sorted list of the indices of the patterns of the
+    SetDFA for which search_context() would find a match.  The context
+    is only used as the string and the positions to search."""
+    patterns = setdfa.patterns
+    start = ctx.match_start
+    if ctx.end < start:
+        return []
+    found = [False] * len(patterns)
+    use_dfa = setdfa.dfa is not None and not setdfa.gave_up
+    if use_dfa:
+        try:
+            find_set_matches(ctx, setdfa.dfa, setdfa.start_node, found,
+                             setdfa.num_in_dfa)
+        except GiveUp:
+            setdfa.gave_up = True
+            use_dfa = False
+            found = [False] * len(patterns)
+    result = []
+    for i in range(len(patterns)):
+        if not found[i] and not (use_dfa and setdfa.in_dfa[i]):
+            # the patterns that the DFA does not handle, searched one
+            # by one with the usual prefilters of rsre_core
+            ctx.reset(start)
+            found[i] = search_context(ctx, patterns[i])
+        if found[i]:
+            result.append(i)
+    ctx.reset(start)
+    return result
@@ -0,0 +1,133 @@
+# encoding: utf-8
+import py, random, warnings
+from rpython.rlib.rsre import rsre_char, rsre_compile
+from rpython.rlib.rsre.rsre_compile import NotSupported
+from rpython.rlib.rsre.rpy import get_code, sre_parse
+
+def setup_module(mod):
+    from rpython.rlib.unicodedata import unicodedb
+    rsre_char.set_unicode_db(unicodedb)
+
+
+PATTERNS = [
+    r'', r'a', r'abc', r'a|b|c', r'a|bc|def', r'ab|ac|ad', r'(a|b)|(a|c)',
+    r'a.b', r'(?s)a.b', r'^ab$', r'(?m)^ab$', r'\Aab\Z', r'\bfoo\B',
+    r'(?u)\bfoo\B', r'(?L)\bfoo\w', r'\d\D\s\S\w\W', r'(?u)\d\D\s\S\w\W',
+    r'[abc]', r'[^abc]', r'[a-z0-9_]', r'[^a]', r'[a]', r'[\d\s]', r'[\w-]',
+    r'[a-]', r'[]a]', r'[-a]', r'[\]\\]', r'[\x41-\x5a]', r'[\101\7]',
+    r'[\n\t\b]', r'[\A]', r'[ace]', r'[a-ce-gi-k]', r'[^\x00-\xff]',
+    r'[\x00-\x7f\x90]', r'[a-zA-Z]', r'(?i)[a-z]', r'(?i)[^k]',
+    r'(?iu)[k]', r'(?iu)[sS]', r'(?iu)s', r'(?iu)[^i]', r'(?i)abc',
+    r'(?i)a|B', r'(?i)\xb5', r'(?iu)\xb5', u'(?iu)σ', u'(?u)[Ā- ]',
+    u'[Ā̀-̐]', u'[Ā-Ȁ䀀-倀]',
+    u'(?i)[Ā-ƀ ]', u'[\U00010000-\U00010400a]',
+    u'(?i)[\U00010000a]', u'\U00012345x', u'(?u)あ+\w',
+    r'a*', r'a+', r'a?', r'a*?', r'a+?', r'a??', r'a{3}', r'a{3,}',
+    r'a{,3}', r'a{2,3}', r'a{2,3}?', r'a{}', r'a{', r'a{x}', r'a{1,x}',
+    r'a{0}', r'x{65536}', r'(?:ab)*', r'(ab)+', r'(a|b)*?c', r'(a)b(c)',
+    r'(?P<first>a)(?P<second>b)', r'(?P<x>a)(?P=x)', r'(a)\1', r'(a)(b)\2\1',
+    r'(?:a)', r'(?#comment)a', r'(?=a)b', r'(?!a)b', r'(?<=ab)c',
+    r'(?<!a)b', r'(a)?(?(1)b|c)', r'(?P<g>a)?(?(g)b)', r'(a)?(?(1)b)',
+    r'\x41\101\0\01\012\n', r'\a\f\v\r\t\\\.\*', r'a\-b\e',
+    r'(?x) a b # comment\n c', r'a(?x) b c', r'(?x)[ a]', r'(?ims)a',
+    r'(?u)x', r'(?t)ab', r'(a)(b)(c)(d)(e)(f)(g)(h)(i)(j)(k)\11\10',
+    r'\111', r'(abc)(?:def)|ghi', r'((a))', r'(a(b))', r'(?:(?:a))b',
+    r'(a)|(b)', r'a|', r'|a', r'(|a)', r'(a|)', r'(?:a|b)c', r'(abc|abd)',
+    r'[a]|b', r'x(?:ab|ac)', r'(ab)|(ac)', r'.|a', r'.*|.', r'\d+|\d+a',
+    r'a{1,2}|a{1,2}', r'(?i)x|(?i)y', r'(?:a*)*', r'(?:a*)+b', r'(a*)*b',
+    r'\b(\w+)\s+\1\b', r'(?<=\d{3})x', r'(?u)(?<=\w)x', r'a[^\n]*$',
+    r'[\x00-\xff]', r'[^\x00-\xff]', r'[\x00-\x10\x20\x30-\x40]',
+    r'[0-9a-fA-F]+', r'(?i)[0-9a-f]+', r'[.]', r'\.', r'^$', r'$', r'^',
+    r'(?:^)', r'(\d{4})-(\d{2})-(\d{2})', r'[\x80-\xff]', r'(?L)[\w]',
+    r'(?L)\d', r'(?iL)a', r'(?u)\w|\W', r'([a-c])+(?i)d',
+]
+
+INVALID = [
+    r'(', r')', r'(a', r'a)', r'[', r'[a', r'[a-', r'[z-a]', r'[\d-z]',
+    r'*', r'a**', r'a{3,2}', '\\', r'(?P<1a>x)', r'(?P<a>x)(?P<a>y)',
+    r'(?P=x)', r'(?P<a', r'(?Px)', r'(?<x)', r'(?z)', r'\x4', r'[\x4]',
+    r'\8', r'\9', r'\11', r'[\9]', r'(a)\2', r'(a\1)', r'(?<=a*)b', r'(?(x)a)', r'(?()a)',
+    r'(?(a)b)', r'(?(1)a|b|c)', r'^*', r'(a)(?<=\1)', r'(?P<n>a)(?<=(?P=n))',
+    r'x{4294967295}', r'x{99999999999}', r'(?(1a)x)', r'(?( 1)x)',
+    r'(?(0)x)', r'(?(-1)x)',
+] + ['(x)' * 100]
+
+
+def expected(regexp, flags):
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        code, _, (groups, groupindex, indexgroup) = get_code(
+            regexp, flags, allargs=True)
+    # get_code() adds SRE_FLAG_UNICODE to the flags of unicode patterns
+    final_flags = sre_parse.parse(regexp, flags).pattern.flags | flags
+    groupindex = dict([(str(name), gid)
+                       for name, gid in groupindex.items()])
+    return code.pattern, final_flags, groups, groupindex
+
+def compiled(regexp, flags):
+    chars = [ord(c) for c in regexp]
+    result = rsre_compile.compile(chars, flags)
+    return result.code, result.flags, result.groups, result.groupindex
+
+def check(regexp, flags=0):
+    try:
+        expect = expected(regexp, flags)
+    except Exception:
+        # any error or warning: sre_compile must be used instead
+        py.test.raises(NotSupported, compiled, regexp, flags)
+        return False
+    try:
+        got = compiled(regexp, flags)
+    except NotSupported:
+        return False
+    assert got == expect, repr(regexp)
+    return True
+
+
+def test_patterns():
+    for regexp in PATTERNS:
+        assert check(regexp), repr(regexp)
+
+def test_patterns_flags():
+    for regexp in PATTERNS:
+        for flags in [2, 8, 16, 32, 64, 2 | 32, 4 | 2]:
+            check(regexp, flags)
+
+def test_invalid():
+    for regexp in INVALID:
+        assert not check(regexp), repr(regexp)
+
+def test_re_tests():
+    from rpython.rlib.rsre.test.re_tests import tests
+    for t in tests:
+        check(t[0])
+
+def test_not_supported():
+    for regexp, flags in [(r'a', 128), (r'a*', 1),
+                          (u'(?iu)[\U00010400-\U00010410]', 0)]:
+        py.test.raises(NotSupported, compiled, regexp, flags)
+
+def test_verbose_inline_reparses():
+    code, flags, _, _ = compiled(r'a b(?x)', 0)
+    assert flags & 64
+    assert code == compiled(r'ab', 64)[0]
+
+def test_random_patterns():
+    r = random.Random(42)
+    pieces = ['a', 'b', 'ab', '.', '^', '$', '|', '(', ')', '(?:', '(?P<n%d>',
+              '[', ']', '[^', '-', '*', '+', '?', '{2}', '{1,3}', '{,2}',
+              '\\d', '\\w', '\\b', '\\1', '\\2', '\\x41', '\\0', '\\n',
+              '(?=', '(?!', '(?<=', '(?(1)', '(?i)', '(?u)', '(?x)', ' ',
+              '#', 'K', 's', u'\xb5', u'σ', u'Ā', u'\U00010401']
+    supported = 0
+    for i in range(3000):
+        regexp = u''.join([r.choice(pieces) for j in range(r.randrange(1, 9))])
+        regexp = regexp.replace('%d', str(i))
+        if r.random() < 0.5:
+            try:
+                regexp = str(regexp)
+            except UnicodeError:
+                continue
+        if check(regexp, r.choice([0, 0, 2, 32, 2 | 32])):
+            supported += 1
+    assert supported > 500
@@ -0,0 +1,201 @@
+# encoding: utf-8
+import random, time
+from rpython.rlib.rsre import rsre_core, rsre_dfa, rsre_char, rsre_utf8
+from rpython.rlib.rsre.rpy import get_code
+
+def setup_module(mod):
+    from rpython.rlib.unicodedata import unicodedb
+    rsre_char.set_unicode_db(unicodedb)
+
+
+SUPPORTED = [r'[abc][def][ghi]', r'<item>\s*<title>(.*?)</title>',
+             r'foobar', r'a|bc|def', r'ab.*cd', r'(a|ab)(c|bcd)(d*)',
+             r'\bfoo\b', r'\Bb', r'(?u)\w+\b', r'^abc$', r'(?m)^a.*$',
+             r'a\Z', r'\Aab', r'x*', r'', r'(a+|b)*c', r'(?:ab){2,4}?b',
+             r'a{2,3}', r'(?i)HeLLo', r'\d+\.\d*', r'[^a]+$', r'(a|b)*?b',
+             r'(ab|a)(bc|c)?', r'a.{3}b', r'(?s).+x', r'\w+@\w+\.com',
+             r'x?y??z']
+UNSUPPORTED = [r'(a|b|c|)+', r'(a*)*b', r'(a)\1', r'a(?=b)', r'(?<!a)b',
+               r'(a)?(?(1)b|c)', r'(?L)\w+']
+
+
+def compiled(regexp, cache_size=rsre_dfa.DEFAULT_CACHE_SIZE):
+    pattern = get_code(regexp)
+    pattern.dfa = rsre_dfa.compile_dfa(pattern, cache_size)
+    return pattern
+
+def spans(ctx, pattern):
+    marks = len([op for op in pattern.pattern
+                 if op == rsre_core.consts.OPCODE_MARK])
+    return [ctx.span(i) for i in range(marks // 2 + 1)]
+
+
+class BaseTestDFA:
+
+    def check(self, pattern, s, pos, endpos):
+        for name in ['match_context', 'search_context']:
+            expected = self.make_ctx(s, pos, endpos)
+            if not getattr(rsre_core, name)(expected, pattern):
+                expected = None
+            ctx = self.make_ctx(s, pos, endpos)
+            if not getattr(rsre_dfa, name)(ctx, pattern):
+                ctx = None
+            assert (ctx is None) == (expected is None), (name, s, pos)
+            if ctx is not None:
+                assert spans(ctx, pattern) == spans(expected, pattern), (
+                    name, s, pos)
+
+    def test_supported(self):
+        for regexp in SUPPORTED:
+            assert rsre_dfa.compile_dfa(get_code(regexp)) is not None, regexp
+        for regexp in UNSUPPORTED:
+            assert rsre_dfa.compile_dfa(get_code(regexp)) is None, regexp
+
+    def test_may_backtrack_a_lot(self):
+        for regexp in [r'(a|aa)*c', r'(a+)+b', r'(\w+\s?)*$',
+                       r'(?:x[ab]*)+', r'(?:a{2,3})*', r'x(?:(ab|b)c)+']:
+            assert rsre_dfa.may_backtrack_a_lot(get_code(regexp)), regexp
+        for regexp in [r'(a|b)?c', r'a+b+', r'(ab)+', r'(foo|bar)x',
+                       r'\d+\.\d*', r'(ab?)+', r'<item>\s*(.*?)</item>',
+                       r'(a)\1*', r'']:
+            assert not rsre_dfa.may_backtrack_a_lot(get_code(regexp)), regexp
+
+    def test_same_as_rsre_core(self):
+        r = random.Random(42)
+        for regexp in SUPPORTED:
+            pattern = compiled(regexp)
+            for i in range(300):
+                s = ''.join([r.choice(self.alphabet)
+                             for j in range(r.randrange(12))])
+                pos = r.randrange(len(s) + 1)
+                endpos = r.choice([len(s), r.randrange(pos, len(s) + 1)])
+                self.check(pattern, s, pos, endpos)
+
+    def test_groups(self):
+        pattern = compiled(r'(a|ab)(c|bcd)(d*)')
+        ctx = self.make_ctx('xxabcd', 0, 6)
+        assert rsre_dfa.search_context(ctx, pattern)
+        assert ctx.span(0) == self.spans_of('xxabcd', [(2, 6)])[0]
+        assert spans(ctx, pattern) == self.spans_of(
+            'xxabcd', [(2, 6), (2, 3), (3, 6), (6, 6)])
+
+    def test_no_catastrophic_backtracking(self):
+        pattern = compiled(r'(a|aa)*c')
+        s = 'a' * 200
+        t = time.time()
+        assert not rsre_dfa.search_context(self.make_ctx(s, 0, len(s)),
+                                           pattern)
+        assert not rsre_dfa.match_context(self.make_ctx(s, 0, len(s)),
+                                          pattern)
+        assert time.time() - t < 10.0
+
+    def test_cache_flush(self, monkeypatch):
+        # a pattern with a lot of states, and a small cache
+        flushes = []
+        def flush(dfa):
+            flushes.append(dfa)
+            old_flush(dfa)
+        old_flush = rsre_dfa.DFA.flush.im_func
+        monkeypatch.setattr(rsre_dfa.DFA, 'flush', flush)
+        r = random.Random(5)
+        pattern = compiled(r'a[ab]{6}c', cache_size=32768)
+        s = ''.join(['x' * 300 + ''.join([r.choice('ab') for j in range(8)])
+                     for i in range(20)]) + 'c'
+        self.check(pattern, s, 0, len(s))
+        assert len(flushes) > 2
+        assert not pattern.dfa.gave_up
+
+    def test_give_up(self):
+        r = random.Random(6)
+        pattern = compiled(r'a[ab]{10}c', cache_size=4096)
+        s = ''.join([r.choice('ab') for j in range(2000)])
+        self.check(pattern, s + 'c', 0, len(s) + 1)
+        assert pattern.dfa.gave_up
+        self.check(pattern, s + 'c', 0, len(s) + 1)
+
+    def check_set(self, setdfa, s, pos, endpos):
+        expected = [i for i, pattern in enumerate(setdfa.patterns)
+                    if rsre_core.search_context(self.make_ctx(s, pos, endpos),
+                                                pattern)]
+        ctx = self.make_ctx(s, pos, endpos)
+        assert rsre_dfa.search_set(ctx, setdfa) == expected, (s, pos, endpos)
+        assert ctx.match_start == self.make_ctx(s, pos, endpos).match_start
+
+    def test_set_same_as_rsre_core(self):
+        r = random.Random(43)
+        patterns = [get_code(regexp) for regexp in SUPPORTED + UNSUPPORTED]
+        setdfa = rsre_dfa.compile_set_dfa(patterns)
+        assert setdfa.in_dfa == ([True] * len(SUPPORTED) +
+                                 [False] * len(UNSUPPORTED))
+        for i in range(300):
+            s = ''.join([r.choice(self.alphabet)
+                         for j in range(r.randrange(12))])
+            pos = r.randrange(len(s) + 1)
+            endpos = r.choice([len(s), r.randrange(pos, len(s) + 1)])
+            self.check_set(setdfa, s, pos, endpos)
+        assert not setdfa.gave_up
+
+    def test_set_many_patterns(self):
+        patterns = [get_code(r'\bword%d\b' % i) for i in range(200)]
+        setdfa = rsre_dfa.compile_set_dfa(patterns)
+        ctx = self.make_ctx('word12 word7x word199 word1', 0, 27)
+        assert rsre_dfa.search_set(ctx, setdfa) == [1, 12, 199]
+        ctx = self.make_ctx('nothing here', 0, 12)
+        assert rsre_dfa.search_set(ctx, setdfa) == []
+
+    def test_set_stops_when_all_found(self, monkeypatch):
+        setdfa = rsre_dfa.compile_set_dfa([get_code('a'), get_code('b')])
+        s = 'ab' + 'x' * 100
+        read = []
+        def next_state(dfa, state, c, scanned):
+            read.append(c)
+            return old_next_state(dfa, state, c, scanned)
+        old_next_state = rsre_dfa.DFA.next_state.im_func
+        monkeypatch.setattr(rsre_dfa.DFA, 'next_state', next_state)
+        assert rsre_dfa.search_set(self.make_ctx(s, 0, len(s)),
+                                   setdfa) == [0, 1]
+        assert len(read) == 3
+
+    def test_set_give_up(self):
+        r = random.Random(7)
+        setdfa = rsre_dfa.compile_set_dfa([get_code(r'a[ab]{10}c'),
+                                           get_code(r'x')], cache_size=4096)
+        s = ''.join([r.choice('ab') for j in range(2000)]) + 'c'
+        self.check_set(setdfa, s, 0, len(s))
+        assert setdfa.gave_up
+        self.check_set(setdfa, s, 0, len(s))
+
+
+class TestDFAStr(BaseTestDFA):
+    alphabet = 'abcdxyz\n .@_'
+
+    def make_ctx(self, s, pos, endpos):
+        return rsre_core.StrMatchContext(s, pos, endpos)
+
+    def spans_of(self, s, spans):
+        return spans
+
+
+class TestDFAUnicode(BaseTestDFA):
+    alphabet = u'abcdxyz\n .@_\xe9†'
+
+    def make_ctx(self, s, pos, endpos):
+        return rsre_core.UnicodeMatchContext(unicode(s), pos, endpos)
+
+    def spans_of(self, s, spans):
+        return spans
+
+
+class TestDFAUtf8(BaseTestDFA):
+    alphabet = u'abcdxyz\n .@_\xe9†'
+
+    def make_ctx(self, s, pos, endpos):
+        u = unicode(s)
+        utf8 = u.encode('utf-8')
+        return rsre_utf8.make_utf8_ctx(utf8, len(u[:pos].encode('utf-8')),
+                                       len(u[:endpos].encode('utf-8')))
+
+    def spans_of(self, s, spans):
+        u = unicode(s)
+        return [(len(u[:i].encode('utf-8')), len(u[:j].encode('utf-8')))
+                for i, j in spans]
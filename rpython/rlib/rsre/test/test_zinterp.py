@@ -56,3 +56,63 @@ def test_translates():
         for x in rsre_re.split("a{2}", s):      print x
         return 0
     interpret(f, [3])  # assert does not crash
+
+def test_translates_dfa():
+    from rpython.rlib.rsre import rsre_dfa
+    from rpython.rlib.rsre.rpy import get_code
+    codes = [get_code(r"(a|b)*c\b").pattern, get_code(r"(?m)^x+$").pattern]
+    def f(i):
+        pattern = rsre_core.CompiledPattern(codes[i & 1], 0)
+        if rsre_dfa.may_backtrack_a_lot(pattern):
+            return -4
+        pattern.dfa = rsre_dfa.compile_dfa(pattern)
+        if pattern.dfa is None:
+            return -3
+        ctx = rsre_core.StrMatchContext("xxababc ab\nxx", 0, 13)
+        if not rsre_dfa.search_context(ctx, pattern):
+            return -1
+        ctx2 = rsre_core.UnicodeMatchContext(u"xabc", 0, 4)
+        if not rsre_dfa.match_context(ctx2, pattern):
+            return ctx.match_start * 100 + ctx.match_end
+        return -2
+    assert interpret(f, [0]) == 207
+    assert interpret(f, [1]) == 11 * 100 + 13
+
+def test_translates_set_dfa():
+    from rpython.rlib.rsre import rsre_dfa
+    from rpython.rlib.rsre.rpy import get_code
+    codes = [get_code(r"(a|b)*c\b").pattern, get_code(r"(a)\1").pattern,
+             get_code(r"(?m)^x+$").pattern]
+    def f(i):
+        patterns = [rsre_core.CompiledPattern(code, 0) for code in codes]
+        setdfa = rsre_dfa.compile_set_dfa(patterns)
+        if i:
+            ctx = rsre_core.StrMatchContext("xxababc aab\nxx", 0, 14)
+        else:
+            ctx = rsre_core.UnicodeMatchContext(u"abc", 0, 3)
+        result = 0
+        for index in rsre_dfa.search_set(ctx, setdfa):
+            result = result * 10 + index + 1
+        return result
+    assert interpret(f, [1]) == 123
+    assert interpret(f, [0]) == 1
+
+def test_translates_compile():
+    from rpython.rlib.rsre import rsre_compile
+    from rpython.rlib.rsre.rpy import get_code
+    regexps = [r"(?P<x>a|b)*c\b", r"(?i)[a-z\d]+?|\1", r"x{2,}(?=y)",
+               r"[^\x00-\x7f]|a{2}"]
+    def f(i):
+        try:
+            compiled = rsre_compile.compile([ord(c) for c in regexps[i]], 0)
+        except rsre_compile.NotSupported:
+            return -1
+        pattern = rsre_core.CompiledPattern(compiled.code, compiled.flags)
+        ctx = rsre_core.StrMatchContext("xxababc aab\nxx", 0, 14)
+        if not rsre_core.search_context(ctx, pattern):
+            return 0
+        return ctx.match_start * 10 + ctx.match_end + len(compiled.groupindex)
+    assert interpret(f, [0]) == 28
+    assert interpret(f, [1]) == -1
+    assert interpret(f, [2]) == 0
+    assert interpret(f, [3]) == 90
@@ -518,9 +518,50 @@ def create_utf8_index_storage(utf8, utf8len):
     """
     arraysize = utf8len // 64 + 1
     storage = lltype.malloc(UTF8_INDEX_STORAGE, arraysize)
+    _fill_utf8_index_storage(utf8, utf8len, storage, 0, 0)
+    return storage
+
+def extend_utf8_index_storage(utf8, utf8len, storage, index):
+    """ Return an index storage that covers at least the characters up to
+    and including 'index'.  'storage' is either null or the result of a
+    previous call; only the missing entries are computed.  The storage
+    grows geometrically, so that walking over the string in order builds
+    it in linear time.  Partial storages can be passed to all the
+    functions below, as long as they cover the index asked for.
+    """
+    fullsize = utf8len // 64 + 1
+    if storage:
+        oldsize = len(storage)
+        newsize = max(index // 64 + 1, oldsize * 2)
+    else:
+        oldsize = 0
+        newsize = index // 64 + 1
+    if newsize > fullsize:
+        newsize = fullsize
+    if newsize <= oldsize:
+        return storage
+    newstorage = lltype.malloc(UTF8_INDEX_STORAGE, newsize)
+    for i in range(oldsize):
+        newstorage[i].baseindex = storage[i].baseindex
+        for j in range(16):
+            newstorage[i].ofs[j] = storage[i].ofs[j]
     baseindex = 0
-    current = 0
-    while True:
+    if oldsize > 0:
+        # the last entry is complete, because it is not the final one:
+        # continue from the position of the character number 64 * oldsize
+        last = storage[oldsize - 1]
+        baseindex = last.baseindex + ord(last.ofs[15])
+        baseindex = next_codepoint_pos(utf8, baseindex)
+        baseindex = next_codepoint_pos(utf8, baseindex)
+        baseindex = next_codepoint_pos(utf8, baseindex)
+    _fill_utf8_index_storage(utf8, utf8len, newstorage, oldsize, baseindex)
+    return newstorage
+
+def _fill_utf8_index_storage(utf8, utf8len, storage, current, baseindex):
+    # fill the entries storage[current:], where 'baseindex' is the byte
+    # position of the character number 64 * current
+    utf8len -= current * 64
+    while current < len(storage):
         storage[current].baseindex = baseindex
         next = baseindex
         for i in range(16):
@@ -532,16 +573,17 @@ def create_utf8_index_storage(utf8, utf8len):
             utf8len -= 4
             if utf8len < 0:
                 assert current + 1 == len(storage)
-                break
+                return
             next = next_codepoint_pos(utf8, next)
             next = next_codepoint_pos(utf8, next)
             next = next_codepoint_pos(utf8, next)
-        else:
-            current += 1
-            baseindex = next
-            continue
-        break
-    return storage
+        current += 1
+        baseindex = next
+
+def utf8_index_storage_covers(storage, index):
+    """ Check if 'storage' is non-null and covers the character 'index'.
+    """
+    return bool(storage) and (index >> 6) < len(storage)
 
 @jit.elidable
 def codepoint_position_at_index(utf8, storage, index):
@@ -615,6 +657,10 @@ def codepoint_index_at_byte_position(utf8, storage, bytepos, num_codepoints):
     baseindex = storage[index_min].baseindex
     if baseindex == bytepos:
         return index_min << 6
+    if (index_min == len(storage) - 1 and
+            len(storage) <= num_codepoints >> 6):
+        # 'storage' is only partial and 'bytepos' is past its last entry
+        return (index_min << 6) + codepoints_in_utf8(utf8, baseindex, bytepos)
 
     # use ofs to get closer to the correct character index
     result = index_min << 6
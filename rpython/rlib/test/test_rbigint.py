@@ -977,6 +977,47 @@ class TestInternalFunctions(object):
             assert div.tolong() == _div
             assert rem.tolong() == _rem
 
+    def test__divmod_fast_pos(self, monkeypatch):
+        monkeypatch.setattr(lobj, "DIVMOD_FAST_CUTOFF", 2)
+        for i in range(50):
+            y = long(randint(1, 1 << randint(64, 2000)))
+            x = long(randint(0, 1 << randint(64, 4000)))
+            if i % 5 == 0:
+                x = (1L << (SHIFT * randint(10, 40))) - 1
+                y = (1L << (SHIFT * randint(3, 9))) - 1
+            if x < y:
+                continue
+            div, rem = lobj._divmod_fast_pos(rbigint.fromlong(x),
+                                             rbigint.fromlong(y))
+            assert div.tolong() == x // y
+            assert rem.tolong() == x % y
+            for sx, sy in (1, -1), (-1, -1), (-1, 1):
+                div, rem = rbigint.fromlong(sx * x).divmod(
+                                   rbigint.fromlong(sy * y))
+                assert (div.tolong(), rem.tolong()) == divmod(sx * x, sy * y)
+
+    def test_chunks_to_bigint(self, monkeypatch):
+        monkeypatch.setattr(lobj, "STR2INT_CUTOFF", 2)
+        for n in [0, 1, 2, 3, 5, 17, 100]:
+            chunks = [randint(0, 999) for i in range(n)]
+            expected = 0
+            for chunk in chunks:
+                expected = expected * 1000 + chunk
+            assert lobj._chunks_to_bigint(chunks, 1000).tolong() == expected
+
+    def test_str_and_parse_large(self, monkeypatch):
+        monkeypatch.setattr(lobj, "DIVMOD_FAST_CUTOFF", 2)
+        monkeypatch.setattr(lobj, "STR2INT_CUTOFF", 2)
+        x = long(randint(1 << 3000, 1 << 3001))
+        for value in [x, -x, 10L ** 900, 10L ** 900 - 1]:
+            s = str(value)
+            assert rbigint.fromlong(value).str() == s
+            assert rbigint.fromdecimalstr(s).tolong() == value
+            assert rbigint.fromstr(s).tolong() == value
+            s = rbigint.fromlong(value).format('0123456')
+            assert long(s, 7) == value
+            assert rbigint.fromstr(s, 7).tolong() == value
+
     def test_divmod(self):
         x = 12345678901234567890L
         for i in range(100):
@@ -1155,6 +1196,17 @@ class TestTranslatable(object):
         res = interpret(test, [])
         assert "".join(res.chars) == test()
 
+    def test_divmod_fast_and_str(self):
+        x = rbigint.fromint(7).pow(rbigint.fromint(300 * SHIFT))
+        y = rbigint.fromint(3).pow(rbigint.fromint(110 * SHIFT))
+        def test():
+            q, r = lobj._divmod_fast_pos(x, y)
+            s = q.str()
+            return rbigint.fromdecimalstr(s).mul(y).add(r).eq(x)
+        assert test()
+        res = interpret(test, [])
+        assert res
+
     def test_add(self):
         x = rbigint.fromint(-2147483647)
         y = rbigint.fromint(-1)
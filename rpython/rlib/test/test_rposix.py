@@ -762,6 +762,33 @@ def test_pwrite():
         os.close(fd)
     py.test.raises(OSError, rposix.pwrite, fd, b'ea', 1)
 
+@rposix_requires('writev')
+def test_writev():
+    fname = str(udir.join('os_test.txt'))
+    fd = os.open(fname, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0777)
+    try:
+        assert rposix.writev(fd, [b'Hello', b'', b' world']) == 11
+        assert rposix.writev(fd, []) == 0
+        os.lseek(fd, 0, 0)
+        assert os.read(fd, 20) == b'Hello world'
+    finally:
+        os.close(fd)
+    py.test.raises(OSError, rposix.writev, fd, [b'x'])
+
+@rposix_requires('writev')
+def test_writev_compiled():
+    fname = str(udir.join('os_test_writev.txt'))
+    def f(n):
+        fd = os.open(fname, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0777)
+        data = [str(i) * n for i in range(n)]
+        res = rposix.writev(fd, data)
+        os.close(fd)
+        return res
+    func = compile(f, [int])
+    assert func(5) == 25
+    with open(fname) as f:
+        assert f.read() == '00000111112222233333' + '44444'
+
 @rposix_requires('posix_fadvise')
 def test_posix_fadvise():
     if sys.maxint <= 2**32:
@@ -154,6 +154,41 @@ def test_codepoint_position_at_index_inverse(u):
                        b, storage, bytepos, len(u)) == i
 
 
+@given(strategies.text(), strategies.integers(min_value=0))
+@example(u'\xe4' * 64 * 5, 64)
+@example(u'x\u20ac' * 200, 1)
+def test_extend_utf8_index_storage(u, start):
+    b = u.encode('utf8')
+    start = start % (len(u) + 1)
+    storage = rutf8.extend_utf8_index_storage(b, len(u), rutf8.null_storage(),
+                                              start)
+    assert len(storage) == start // 64 + 1
+    full = rutf8.create_utf8_index_storage(b, len(u))
+    for i in range(start, len(u) + 1):
+        if not rutf8.utf8_index_storage_covers(storage, i):
+            storage = rutf8.extend_utf8_index_storage(b, len(u), storage, i)
+        bytepos = rutf8.codepoint_position_at_index(b, storage, i)
+        assert bytepos == len(u[:i].encode('utf8'))
+        assert rutf8.codepoint_index_at_byte_position(
+                       b, storage, bytepos, len(u)) == i
+    assert len(storage) == len(full)
+    for i in range(len(full)):
+        assert storage[i].baseindex == full[i].baseindex
+    for i in range(len(full) - 1):     # the last entry is not complete
+        assert list(storage[i].ofs) == list(full[i].ofs)
+
+def test_codepoint_index_at_byte_position_partial():
+    u = u'\xe4x' * 500
+    b = u.encode('utf8')
+    storage = rutf8.extend_utf8_index_storage(b, len(u), rutf8.null_storage(),
+                                              100)
+    assert len(storage) == 2
+    for i in range(len(u) + 1):
+        bytepos = len(u[:i].encode('utf8'))
+        assert rutf8.codepoint_index_at_byte_position(
+                       b, storage, bytepos, len(u)) == i
+
+
 repr_func = rutf8.make_utf8_escape_function(prefix='u', pass_printable=False,
                                             quotes=True)
 
@@ -1191,6 +1191,57 @@ class UsingFrameworkTest(object):
         f.close()
         assert data1 == data2
 
+    filename_dump_fork = str(udir.join('test_dump_rpy_heap_fork'))
+    def define_dump_rpy_heap_fork(self):
+        from rpython.rlib import rposix
+        U = lltype.GcForwardReference()
+        U.become(lltype.GcStruct('U', ('next', lltype.Ptr(U)),
+                                 ('x', lltype.Signed)))
+        S = lltype.GcStruct('S', ('u', lltype.Ptr(U)))
+        filename = self.filename_dump_fork
+
+        def fn():
+            s = lltype.malloc(S)
+            s.u = lltype.malloc(U)
+            s.u.next = lltype.malloc(U)
+            fd = os.open(filename, os.O_WRONLY | os.O_CREAT, 0666)
+            # like gc._dump_rpy_heap_fork() in PyPy: the child dumps the
+            # heap and exits, the parent only waits for it
+            pid = rffi.cast(lltype.Signed, rposix.c_fork())
+            if pid == 0:
+                ok = rgc.dump_rpy_heap(fd)
+                os._exit(0 if ok else 1)
+            os.close(fd)
+            if pid < 0:
+                return -1
+            pid1, status = os.waitpid(pid, 0)
+            keepalive_until_here(s)
+            if pid1 != pid:
+                return -2
+            return status
+
+        return fn
+
+    def test_dump_rpy_heap_fork(self):
+        if not hasattr(os, 'fork'):
+            py.test.skip("requires fork()")
+        res = self.run("dump_rpy_heap_fork")
+        assert res == 0
+        assert os.path.getsize(self.filename_dump_fork) > 64
+        # the same structure as without fork: the objects reachable from
+        # the roots, then the marker [0][0][0][-1], then the other objects
+        import array
+        words = array.array('l')
+        f = open(self.filename_dump_fork, 'rb')
+        words.fromstring(f.read())
+        f.close()
+        words = list(words)
+        markers = [i for i in range(len(words) - 3)
+                   if words[i:i + 4] == [0, 0, 0, -1]]
+        assert len(markers) == 1
+        assert markers[0] > 0
+        assert words[-1] == -1
+
     filename_dump_typeids_z = str(udir.join('test_typeids_z'))
     def define_write_typeids_z(self):
         U = lltype.GcForwardReference()
@@ -1913,6 +1964,132 @@ class TestIncrementalMiniMarkGC(TestMiniMarkGC):
         res = self.run("total_gc_time")
         assert res > 0 # should take a few microseconds
 
+    def define_released_arena_memory(cls):
+        def f():
+            l = []
+            for i in range(1000000):
+                l.append(str(i))
+            rgc.collect()     # move the strings out of the nursery
+            # keep a few objects alive, so that most arenas are not
+            # entirely freed but contain many free pages
+            keep = [l[i] for i in range(0, len(l), 5000)]
+            l = []
+            for i in range(10):
+                rgc.collect()
+            res = rgc.get_stats(rgc.RELEASED_ARENA_MEMORY)
+            keep[0] = None
+            return res
+        return f
+
+    def test_released_arena_memory(self):
+        res = self.run("released_arena_memory")
+        assert res > 1000000
+
+    def define_parallel_marking(cls):
+        class Node(object):
+            def __init__(self, value, next):
+                self.value = value
+                self.next = next
+        def build(n):
+            # a few long linked lists, and big arrays pointing to them
+            lists = [Node(0, None) for k in range(8)]
+            arrays = []
+            for i in range(n):
+                lists[i & 7] = Node(i, lists[i & 7])
+                if i % 10000 == 0:
+                    arrays.append([Node(j, lists[j & 7]) for j in range(5000)])
+            return lists, arrays
+        def checksum(lists, arrays):
+            total = 0
+            for node in lists:
+                while node is not None:
+                    total += node.value
+                    node = node.next
+            for array in arrays:
+                for node in array:
+                    total += node.value + node.next.value
+            return total
+        def f():
+            lists, arrays = build(300000)
+            expected = checksum(lists, arrays)
+            for i in range(5):
+                build(100000)      # garbage
+                rgc.collect()
+                if checksum(lists, arrays) != expected:
+                    return -1
+            return 42
+        return f
+
+    def test_parallel_marking(self):
+        from rpython.memory.gc.env import get_available_cpus
+        if get_available_cpus() < 2:
+            py.test.skip("the GC uses no more threads than CPUs")
+        logfile = str(udir.join('test_parallel_marking.log'))
+        def myrunner(args):
+            env = os.environ.copy()
+            env['PYPY_GC_MARK_THREADS'] = '4'
+            env['PYPY_GC_NURSERY'] = '1MB'
+            env['PYPYLOG'] = 'gc-collect-step:' + logfile
+            return subprocess.check_output(args, env=env)
+        res = self.run("parallel_marking", -1, runner=myrunner)
+        assert res == 42
+        # check that the helper threads really did some of the work
+        f = open(logfile)
+        log = f.read()
+        f.close()
+        threads = [int(line.split()[-1]) for line in log.splitlines()
+                   if line.startswith('threads used:')]
+        assert threads and max(threads) > 1
+        assert '(in parallel)' in log     # sweeping the raw objects
+
+    def define_pretenuring(cls):
+        class Box(object):
+            def __init__(self, value):
+                self.value = value
+        class Node(object):
+            def __init__(self, box, next):
+                self.box = box
+                self.next = next
+        class Garbage(object):
+            def __init__(self, value):
+                self.value = value
+        def checksum(lists):
+            total = 0
+            for node in lists:
+                while node is not None:
+                    total += node.box.value
+                    node = node.next
+            return total
+        def f():
+            # the Nodes all survive, and are pretenured quickly; they are
+            # initialized with pointers to young Boxes
+            lists = [None] * 8
+            garbage = Garbage(-1)
+            expected = 0
+            for i in range(300000):
+                lists[i & 7] = Node(Box(i), lists[i & 7])
+                expected += i
+                for j in range(5):
+                    garbage = Garbage(j)
+            if garbage.value != 4 or checksum(lists) != expected:
+                return -1
+            rgc.collect()
+            if checksum(lists) != expected:
+                return -2
+            # (the types may have gone back to the nursery by now)
+            if rgc.get_stats(rgc.PRETENURED_MEMORY) < 1000000:
+                return -3
+            return 42
+        return f
+
+    def test_pretenuring(self):
+        def myrunner(args):
+            env = os.environ.copy()
+            env['PYPY_GC_NURSERY'] = '1MB'
+            return subprocess.check_output(args, env=env)
+        res = self.run("pretenuring", runner=myrunner)
+        assert res == 42
+
     def define_increase_root_stack_depth(cls):
         class X:
             pass
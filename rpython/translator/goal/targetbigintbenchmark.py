@@ -262,6 +262,30 @@ def entry_point(argv):
 
     sumTime += _time
 
+    # conversion to and from decimal strings, and division, of numbers
+    # with 10**3 to 10**6 decimal digits
+    for ndigits in [1000, 10000, 100000, 1000000]:
+        x = rbigint.fromint(7).pow(rbigint.fromint(ndigits * 1183 // 1000))
+        y = rbigint.fromint(3).pow(rbigint.fromint(ndigits * 1048 // 1000))
+        t = time()
+        s = x.str()
+        _time = time() - t
+        sumTime += _time
+        print "str of %d digits:" % ndigits, _time
+
+        t = time()
+        rbigint.fromdecimalstr(s)
+        _time = time() - t
+        sumTime += _time
+        print "fromdecimalstr of %d digits:" % ndigits, _time
+
+        t = time()
+        x.divmod(y)
+        _time = time() - t
+        sumTime += _time
+        print "divmod of %d digits by %d digits:" % (ndigits,
+                                                     ndigits // 2), _time
+
     print "Sum: ", sumTime
 
     return 0